@@ -2,25 +2,34 @@
 API endpoints for lyrics generation.
 
 This module provides REST API endpoints for generating song lyrics
-from educational content and checking user rate limits.
+from educational content and checking user rate limits. Lyrics can also
+be streamed as Server-Sent Events (stage transitions, then tokens).
 """
 
+import json
 import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
 from app.models.lyrics import GenerateLyricsRequest, RegenerateLyricsRequest, GenerateLyricsResponse
 from app.models.user import RateLimitResponse
 from app.core.auth import get_current_user
 from app.services.rate_limiter import (
-    check_rate_limit,
+    reserve_song_quota,
+    commit_quota,
+    refund_quota,
     get_rate_limit,
-    increment_usage,
     check_regeneration_limit,
     increment_regeneration_usage
 )
-from app.services.cache import generate_content_hash, check_lyrics_cache, store_lyrics_cache
-from app.services.ai_pipeline import LyricsPipeline
-from app.core.firebase import get_firestore_client
+from app.services.cache import generate_content_hash, check_lyrics_cache, store_lyrics_cache, get_cache_stats
+from app.services.ai_pipeline import REGENERATION_TEMPERATURE, get_lyrics_pipeline
+from app.services.google_search import get_search_service
+from app.services.single_flight import SingleFlight
+from app.core.firebase import get_firestore_client, run_firestore
 
 
 # Configure logging
@@ -32,14 +41,102 @@ router = APIRouter(
     tags=["lyrics"]
 )
 
+# Concurrent generations for identical content share one pipeline run
+_pipeline_flights = SingleFlight('lyrics_pipeline')
+
 
 @router.get("/health")
 async def lyrics_health():
     """Health check endpoint for lyrics service."""
-    return {"status": "healthy", "service": "lyrics"}
+    return {
+        "status": "healthy",
+        "service": "lyrics",
+        "cache": get_cache_stats(),
+        "pipeline": _pipeline_flights.stats(),
+        "search_cache": get_search_service().stats(),
+    }
+
+
+async def _generate_and_cache(
+    content: str,
+    search_enabled: bool,
+    content_hash: str
+) -> Dict[str, Any]:
+    """
+    Run the lyrics pipeline and store the result in the cache.
+    
+    Concurrent calls with the same content hash and search flag share a
+    single pipeline execution and cache write; each caller receives the
+    same result (or the same error).
+    
+    Args:
+        content: Educational content to convert
+        search_enabled: Whether Google Search grounding is enabled
+        content_hash: Hash of the content from generate_content_hash
+        
+    Returns:
+        Pipeline result dictionary
+    """
+    async def run() -> Dict[str, Any]:
+        result = await get_lyrics_pipeline().execute(
+            content=content,
+            search_enabled=search_enabled
+        )
+        
+        logger.info(
+            f"Pipeline completed in {result['processing_time']:.2f}s",
+            extra={
+                'extra_fields': {
+                    'content_hash': result['content_hash'][:16],
+                    'processing_time': round(result['processing_time'], 3),
+                    'lyrics_length': len(result['lyrics'])
+                }
+            }
+        )
+        
+        await store_lyrics_cache(
+            content_hash=result['content_hash'],
+            lyrics=result['lyrics'],
+            original_content=content
+        )
+        return result
+    
+    result = await _pipeline_flights.do(f"{content_hash}:{search_enabled}", run)
+    return dict(result)
 
 
 
+async def _store_lyrics_history(
+    user_id: str,
+    request: GenerateLyricsRequest,
+    result: Dict[str, Any]
+) -> None:
+    """
+    Record a generated (non-cached) result in the user's lyrics history.
+    
+    Args:
+        user_id: Authenticated user ID
+        request: The original generation request
+        result: Pipeline result with lyrics, content_hash and processing_time
+    """
+    firestore_client = get_firestore_client()
+    history_ref = firestore_client.collection('lyrics_history').document()
+    await run_firestore(history_ref.set, {
+        'user_id': user_id,
+        'content_hash': result['content_hash'],
+        'lyrics': result['lyrics'],
+        'search_enabled': request.search_enabled,
+        'processing_time': result['processing_time'],
+        'created_at': datetime.now(timezone.utc),
+        'content_preview': request.content[:200]  # Store preview for reference
+    })
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @router.post("/generate", response_model=GenerateLyricsResponse)
 async def generate_lyrics(
     request: GenerateLyricsRequest,
@@ -50,7 +147,8 @@ async def generate_lyrics(
     
     This endpoint processes educational content through an AI pipeline to
     generate memorable song lyrics. It includes rate limiting, caching,
-    and optional Google Search grounding.
+    and optional Google Search grounding. Concurrent requests for the same
+    content share a single pipeline run.
     
     Args:
         request: Request containing content and search_enabled flag
@@ -78,9 +176,10 @@ async def generate_lyrics(
         }
     )
     
+    reservation = None
     try:
-        # Step 1: Check rate limit
-        await check_rate_limit(user_id)
+        # Step 1: Reserve one of today's song slots
+        reservation = await reserve_song_quota(user_id)
         
         # Step 2: Generate content hash
         content_hash = generate_content_hash(request.content)
@@ -100,52 +199,23 @@ async def generate_lyrics(
                     }
                 }
             )
-            # Don't increment usage for cached results to save user's quota
+            # Don't count cached results to save user's quota
+            await refund_quota(reservation)
             return GenerateLyricsResponse(**cached_result)
         
-        # Step 4: Execute AI pipeline
-        pipeline = LyricsPipeline()
-        result = await pipeline.execute(
+        # Step 4: Execute AI pipeline and store in cache (shared with
+        # concurrent requests for the same content)
+        result = await _generate_and_cache(
             content=request.content,
-            search_enabled=request.search_enabled
-        )
-        
-        logger.info(
-            f"Pipeline completed in {result['processing_time']:.2f}s",
-            extra={
-                'extra_fields': {
-                    'user_id': user_id,
-                    'content_hash': result['content_hash'][:16],
-                    'processing_time': round(result['processing_time'], 3),
-                    'lyrics_length': len(result['lyrics'])
-                }
-            }
+            search_enabled=request.search_enabled,
+            content_hash=content_hash
         )
         
-        # Step 5: Store in cache
-        await store_lyrics_cache(
-            content_hash=result['content_hash'],
-            lyrics=result['lyrics'],
-            original_content=request.content
-        )
+        # Step 5: Store in lyrics history
+        await _store_lyrics_history(user_id, request, result)
         
-        # Step 6: Store in lyrics history
-        firestore_client = get_firestore_client()
-        from datetime import datetime, timezone
-        
-        history_ref = firestore_client.collection('lyrics_history').document()
-        history_ref.set({
-            'user_id': user_id,
-            'content_hash': result['content_hash'],
-            'lyrics': result['lyrics'],
-            'search_enabled': request.search_enabled,
-            'processing_time': result['processing_time'],
-            'created_at': datetime.now(timezone.utc),
-            'content_preview': request.content[:200]  # Store preview for reference
-        })
-        
-        # Step 7: Increment usage counter
-        await increment_usage(user_id)
+        # Step 6: Confirm the reserved slot
+        await commit_quota(reservation)
         
         logger.info(
             f"Successfully generated lyrics",
@@ -163,9 +233,13 @@ async def generate_lyrics(
         
     except HTTPException:
         # Re-raise HTTP exceptions (like rate limit errors)
+        if reservation is not None:
+            await refund_quota(reservation)
         raise
     except ValueError as e:
         # Handle validation errors
+        if reservation is not None:
+            await refund_quota(reservation)
         logger.error(
             f"Validation error: {str(e)}",
             extra={
@@ -179,6 +253,8 @@ async def generate_lyrics(
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Handle unexpected errors
+        if reservation is not None:
+            await refund_quota(reservation)
         logger.error(
             f"Unexpected error generating lyrics: {str(e)}",
             extra={
@@ -196,6 +272,130 @@ async def generate_lyrics(
         )
 
 
+@router.post("/generate/stream")
+async def generate_lyrics_stream(
+    request: GenerateLyricsRequest,
+    user_id: str = Depends(get_current_user)
+) -> StreamingResponse:
+    """
+    Generate song lyrics, streaming progress as Server-Sent Events.
+    
+    The quota reservation and the cache check happen before the stream
+    opens, so those failures are ordinary HTTP errors. The stream then emits:
+    
+    - ``stage`` events (``{"stage": "summarizing"}`` etc.) as each pipeline
+      step starts
+    - ``token`` events (``{"content": "..."}``) as the lyrics are generated
+    - one ``complete`` event with the GenerateLyricsResponse fields, sent
+      after the lyrics are cached and recorded in history
+    - or one ``error`` event (``{"error": ..., "message": ...}``)
+    
+    A cache hit produces only the ``complete`` event.
+    
+    Args:
+        request: Request containing content and search_enabled flag
+        user_id: Authenticated user ID from Firebase token
+        
+    Returns:
+        StreamingResponse with media type text/event-stream
+        
+    Raises:
+        HTTPException: 429 if rate limit exceeded
+        HTTPException: 500 if the cache check fails
+    """
+    logger.info(
+        f"Streaming lyrics request from user {user_id[:8]}...",
+        extra={
+            'extra_fields': {
+                'user_id': user_id,
+                'content_length': len(request.content),
+                'search_enabled': request.search_enabled,
+                'endpoint': 'generate_lyrics_stream'
+            }
+        }
+    )
+    
+    reservation = await reserve_song_quota(user_id)
+    try:
+        content_hash = generate_content_hash(request.content)
+        cached_result = await check_lyrics_cache(content_hash)
+    except Exception as e:
+        await refund_quota(reservation)
+        logger.error(
+            f"Unexpected error starting lyrics stream: {str(e)}",
+            extra={
+                'extra_fields': {
+                    'user_id': user_id,
+                    'error_type': 'unexpected',
+                    'error': str(e)
+                }
+            },
+            exc_info=True
+        )
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate lyrics: {str(e)}"
+        )
+    
+    if cached_result:
+        # Don't count cached results to save user's quota
+        await refund_quota(reservation)
+    
+    async def event_stream() -> AsyncIterator[str]:
+        if cached_result:
+            yield _sse_event('complete', GenerateLyricsResponse(**cached_result).model_dump())
+            return
+        
+        try:
+            async for event in get_lyrics_pipeline().execute_stream(
+                content=request.content,
+                search_enabled=request.search_enabled
+            ):
+                name = event.pop('event')
+                if name != 'complete':
+                    yield _sse_event(name, event)
+                    continue
+                
+                await store_lyrics_cache(
+                    content_hash=event['content_hash'],
+                    lyrics=event['lyrics'],
+                    original_content=request.content
+                )
+                await _store_lyrics_history(user_id, request, event)
+                await commit_quota(reservation)
+                
+                yield _sse_event('complete', GenerateLyricsResponse(**event).model_dump())
+        except Exception as e:
+            logger.error(
+                f"Error streaming lyrics: {str(e)}",
+                extra={
+                    'extra_fields': {
+                        'user_id': user_id,
+                        'content_hash': content_hash[:16],
+                        'error_type': 'unexpected',
+                        'error': str(e)
+                    }
+                },
+                exc_info=True
+            )
+            yield _sse_event('error', {
+                'error': 'Lyrics generation failed',
+                'message': str(e)
+            })
+        finally:
+            # Failed or abandoned streams give the slot back (no-op once committed)
+            await refund_quota(reservation)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 @router.post("/regenerate", response_model=GenerateLyricsResponse)
 async def regenerate_lyrics(
     request: RegenerateLyricsRequest,
@@ -246,12 +446,12 @@ async def regenerate_lyrics(
         
         # Step 3: Execute AI pipeline (no cache check for regeneration - always generate fresh)
         # Use higher temperature (0.9) for regeneration to increase variation and creativity
-        pipeline = LyricsPipeline(temperature=0.9)
-        result = await pipeline.execute(
+        result = await get_lyrics_pipeline().execute(
             content=request.content,
             search_enabled=request.search_enabled,
             variation_counter=request.variation_counter,
-            previous_lyrics=request.previous_lyrics
+            previous_lyrics=request.previous_lyrics,
+            temperature=REGENERATION_TEMPERATURE
         )
         
         logger.info(
@@ -270,10 +470,8 @@ async def regenerate_lyrics(
         
         # Step 4: Store in lyrics history with regeneration flag
         firestore_client = get_firestore_client()
-        from datetime import datetime, timezone
-        
         history_ref = firestore_client.collection('lyrics_history').document()
-        history_ref.set({
+        await run_firestore(history_ref.set, {
             'user_id': user_id,
             'content_hash': result['content_hash'],
             'lyrics': result['lyrics'],
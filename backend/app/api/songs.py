@@ -5,11 +5,15 @@ This module provides REST API endpoints for generating songs from lyrics
 using the Suno API and tracking song generation status.
 """
 
+import asyncio
+import hashlib
 import logging
 import os
-from typing import Optional
+import uuid
+from datetime import datetime
+from typing import Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from app.models.songs import (
     GenerateSongRequest,
@@ -23,28 +27,52 @@ from app.models.songs import (
     SongHistorySummary,
 )
 from app.core.auth import get_current_user
-from app.services.cache import check_song_cache
-from app.services.rate_limiter import check_rate_limit, increment_usage
+from app.services.cache import check_song_cache, store_song_cache
+from app.services.rate_limiter import commit_quota, refund_quota, reserve_song_quota
 from app.services.suno_client import (
-    SunoClient,
+    get_suno_client,
     SunoAPIError,
     SunoRateLimitError,
     SunoAuthenticationError,
+    SunoStatus,
+    SunoTask,
     SunoValidationError,
 )
+from app.services.suno_poller import (
+    get_suno_poller,
+    variations_to_dicts,
+    map_suno_status_to_generation_status as _map_suno_status_to_generation_status,
+)
 from app.services.song_storage import (
     store_song_task,
     get_task_from_firestore,
-    update_task_status,
     create_share_link,
     get_song_by_share_token,
     verify_task_ownership,
+    load_timestamped_lyrics,
+    store_timestamped_lyrics,
+    get_cached_song_details,
+    cache_song_details,
+    MAX_VARIATIONS,
+    TASK_DETAILS_FIELDS,
+    TASK_STATUS_FIELDS,
+    TASK_TIMESTAMPS_FIELDS,
 )
+from app.services.timestamp_codec import COMPACT_MEDIA_TYPE, encode_timestamps
 
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Owners' song details may be cached by their browser but are revalidated
+# with the ETag on every use
+SONG_DETAILS_CACHE_CONTROL = "private, no-cache"
+
+# Shared songs: seconds browsers and shared caches (CDNs) may reuse a
+# response without revalidating, capped by the song's expiry
+SHARED_SONG_MAX_AGE = int(os.getenv("SHARED_SONG_MAX_AGE", "300"))
+SHARED_SONG_CDN_MAX_AGE = int(os.getenv("SHARED_SONG_CDN_MAX_AGE", "86400"))
+
 # Create router with prefix and tags for API documentation
 router = APIRouter(
     prefix="/api/songs",
@@ -52,34 +80,163 @@ router = APIRouter(
 )
 
 
+def _timestamps_response(
+    aligned_words: list[dict],
+    waveform_data: list[float],
+    encoding: str,
+) -> Union[dict, Response]:
+    """
+    Build a timestamped lyrics response in the requested wire format.
+    
+    The compact format is the binary blob from timestamp_codec; if the
+    data cannot be encoded compactly the JSON form is returned instead,
+    so clients must check the Content-Type.
+    """
+    if encoding == "compact":
+        try:
+            return Response(
+                content=encode_timestamps(aligned_words, waveform_data),
+                media_type=COMPACT_MEDIA_TYPE,
+            )
+        except ValueError as e:
+            logger.warning(
+                f"Falling back to JSON timestamps: {e}",
+                extra={'extra_fields': {'operation': 'timestamps_response'}}
+            )
+    return {
+        'aligned_words': aligned_words,
+        'waveform_data': waveform_data
+    }
+
+
+def _song_etag(scope: str, song_id: str, song_data: dict) -> Optional[str]:
+    """
+    Build a strong ETag for a song's details response.
+    
+    Every write to a song (status, primary variation, timestamps) sets
+    updated_at, so it identifies the response's content. Song cache hits
+    get updated_at and timestamp_variations copied from their source task
+    when its timestamps are stored (song_storage). The scope keeps
+    owner and shared responses (which differ in is_owner) apart.
+    
+    Returns:
+        Quoted ETag, or None for songs without updated_at
+    """
+    updated_at = song_data.get('updated_at')
+    if updated_at is None:
+        return None
+    if isinstance(updated_at, datetime):
+        updated_at = updated_at.isoformat()
+    material = '|'.join([
+        scope,
+        song_id,
+        str(updated_at),
+        str(song_data.get('primary_variation_index', 0)),
+        str(sorted(song_data.get('timestamp_variations', []))),
+    ])
+    return f'"{hashlib.sha256(material.encode()).hexdigest()[:32]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in (tag.removeprefix('W/') for tag in candidates)
+
+
+def _conditional_response(
+    request: Optional[Request],
+    response: Optional[Response],
+    etag: Optional[str],
+    headers: dict,
+) -> Optional[Response]:
+    """
+    Apply caching headers and answer a matching If-None-Match with 304.
+    
+    Returns:
+        A 304 Response if the client's copy is current; otherwise None,
+        after adding the headers to the endpoint's response
+    """
+    if etag:
+        headers = {**headers, 'ETag': etag}
+    if etag and request is not None and _etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    if response is not None:
+        response.headers.update(headers)
+    return None
+
+
 @router.get("/health")
 async def songs_health():
     """Health check endpoint for songs service."""
     return {"status": "healthy", "service": "songs"}
 
 
+async def _load_song_timestamps(song_id: str, song_data: dict) -> Optional[dict]:
+    """
+    Load the timestamped lyrics shown with a song's details.
+    
+    Returns the primary variation's timestamps, falling back to variation
+    0 (the only one stored for older songs). Songs served from the song
+    cache use the timestamps of the task they were cloned from, or their
+    own once that task has expired (see _variation_timestamps). Failures
+    only cost the lyrics sync, so they are logged and return None.
+    """
+    source_task_id = song_data.get('source_task_id')
+    primary_index = song_data.get('primary_variation_index', 0)
+    sources = [(source_task_id, None), (song_id, song_data)] if source_task_id else [(song_id, song_data)]
+    
+    try:
+        for task_id, known_song in sources:
+            timestamps = await load_timestamped_lyrics(task_id, primary_index, known_song)
+            if timestamps is None and primary_index != 0:
+                timestamps = await load_timestamped_lyrics(task_id, 0, known_song)
+            if timestamps is not None:
+                return timestamps
+        return None
+    except Exception as e:
+        logger.warning(
+            f"Failed to load timestamped lyrics for song: {song_id}",
+            extra={
+                'extra_fields': {
+                    'song_id': song_id,
+                    'error': str(e),
+                    'operation': 'load_song_timestamps'
+                }
+            }
+        )
+        return None
+
+
 @router.get("/history", response_model=list[SongHistorySummary])
 async def get_song_history(
     user_id: str = Depends(get_current_user),
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    response: Response = None
 ) -> list[SongHistorySummary]:
     """
     Get user's song history (non-expired songs).
     
     This endpoint:
-    1. Queries Firestore for user's songs ordered by created_at DESC
-    2. Filters out expired songs
-    3. Limits results to 20 most recent songs
-    4. Returns list of SongHistorySummary
+    1. Queries Firestore for one page of the user's completed, unexpired
+       songs ordered by created_at DESC (filtered by the query itself)
+    2. Limits results to 20 songs per page
+    3. Returns list of SongHistorySummary, with the cursor of the next
+       page in the X-Next-Cursor header when there is one
     
     Args:
         user_id: Authenticated user ID from Firebase token
         limit: Maximum number of songs to return (default: 20, max: 20)
+        cursor: X-Next-Cursor value of the previous page
+        response: Response used to set the X-Next-Cursor header
         
     Returns:
         List of SongHistorySummary ordered by created_at DESC
         
     Raises:
+        HTTPException: 400 if the cursor is invalid
         HTTPException: 401 if unauthenticated
         HTTPException: 500 if Firestore query fails
         
@@ -101,13 +258,19 @@ async def get_song_history(
         }
     )
     
-    # Step 1: Query Firestore for user's songs
-    # Note: We query with a higher limit to account for expired songs being filtered out
+    # Step 1: Query Firestore for one page of the user's playable songs
     try:
-        from app.services.song_storage import get_user_tasks
+        from app.services.song_storage import get_user_song_history
         
-        # Query with a higher limit to account for filtering
-        tasks = await get_user_tasks(user_id, limit=limit * 2)
+        tasks, next_cursor = await get_user_song_history(user_id, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'error': 'Invalid cursor',
+                'message': 'The history cursor is invalid. Start again from the first page.'
+            }
+        )
     except Exception as e:
         logger.error(
             f"Failed to query Firestore for user songs: {user_id[:8]}...",
@@ -127,7 +290,8 @@ async def get_song_history(
             }
         )
     
-    # Step 2: Filter out expired songs and songs without audio
+    # Step 2: Build summaries; songs that expired since the query ran or
+    # lack audio are skipped defensively
     current_time = datetime.now(timezone.utc)
     history_items = []
     
@@ -179,7 +343,7 @@ async def get_song_history(
             created_at_dt = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
         
         # Create lyrics preview (first 100 characters)
-        lyrics = task.get('lyrics', '')
+        lyrics = task.get('lyrics_preview') or task.get('lyrics', '')
         lyrics_preview = lyrics[:100]
         
         # Check if song has variations
@@ -202,6 +366,9 @@ async def get_song_history(
     # Step 3: Enforce limit on final results
     history_items = history_items[:limit]
     
+    if next_cursor and response is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    
     logger.info(
         f"Returning {len(history_items)} songs from history for user: {user_id[:8]}...",
         extra={
@@ -209,6 +376,7 @@ async def get_song_history(
                 'user_id': user_id,
                 'total_tasks': len(tasks),
                 'returned_items': len(history_items),
+                'has_next_page': next_cursor is not None,
                 'operation': 'get_song_history'
             }
         }
@@ -220,7 +388,9 @@ async def get_song_history(
 @router.get("/{song_id}/details", response_model=SongDetails)
 async def get_song_details(
     song_id: str,
-    user_id: str = Depends(get_current_user)
+    user_id: str = Depends(get_current_user),
+    request: Request = None,
+    response: Response = None,
 ) -> SongDetails:
     """
     Get complete song details for playback page.
@@ -229,11 +399,15 @@ async def get_song_details(
     1. Queries Firestore for the song by song_id
     2. Verifies user ownership or returns 403
     3. Checks expiration and returns 410 if expired
-    4. Returns SongDetails with all required fields
+    4. Returns 304 if the client's If-None-Match matches the song's ETag
+    5. Returns SongDetails with all required fields, reusing the ones
+       prebuilt for the cached song when there are any
     
     Args:
         song_id: The song/task ID
         user_id: Authenticated user ID from Firebase token
+        request: Request carrying If-None-Match
+        response: Response used to set the ETag and caching headers
         
     Returns:
         SongDetails with song_url, lyrics, style, created_at, expires_at, is_owner
@@ -258,9 +432,9 @@ async def get_song_details(
         }
     )
     
-    # Step 1: Query Firestore for song data
+    # Step 1: Query Firestore for song data (timestamps are loaded separately)
     try:
-        song_data = await get_task_from_firestore(song_id)
+        song_data = await get_task_from_firestore(song_id, fields=TASK_DETAILS_FIELDS)
     except Exception as e:
         logger.error(
             f"Failed to query Firestore for song: {song_id}",
@@ -374,7 +548,22 @@ async def get_song_details(
             }
         )
     
-    # Step 6: Parse datetime fields
+    # Step 6: Answer conditional requests before loading timestamps
+    not_modified = _conditional_response(
+        request,
+        response,
+        _song_etag('details', song_id, song_data),
+        {'Cache-Control': SONG_DETAILS_CACHE_CONTROL, 'Vary': 'Authorization'},
+    )
+    if not_modified is not None:
+        return not_modified
+    
+    # Only owners get this far, so cached details are the same for everyone
+    cached_details = get_cached_song_details(song_id)
+    if cached_details is not None:
+        return cached_details
+    
+    # Step 7: Parse datetime fields
     created_at = song_data.get('created_at')
     if hasattr(created_at, 'timestamp'):
         created_at_dt = datetime.fromtimestamp(created_at.timestamp(), tz=timezone.utc)
@@ -383,7 +572,7 @@ async def get_song_details(
     else:
         created_at_dt = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
     
-    # Step 7: Return SongDetails with timestamped lyrics and variations (Requirements: 1.2, 7.2, 7.4)
+    # Step 8: Return SongDetails with timestamped lyrics and variations (Requirements: 1.2, 7.2, 7.4)
     from app.models.songs import MusicStyle
     
     # Convert variations from dict to Pydantic models
@@ -421,7 +610,9 @@ async def get_song_details(
         }
     )
     
-    return SongDetails(
+    timestamps = await _load_song_timestamps(song_id, song_data)
+    
+    details = SongDetails(
         song_id=song_id,
         song_url=song_url,
         variations=variations_models,
@@ -431,10 +622,14 @@ async def get_song_details(
         created_at=created_at_dt,
         expires_at=expires_at_dt,
         is_owner=is_owner,
-        aligned_words=song_data.get('aligned_words'),
-        waveform_data=song_data.get('waveform_data'),
-        has_timestamps=song_data.get('has_timestamps', False),
+        aligned_words=timestamps['aligned_words'] if timestamps else None,
+        waveform_data=timestamps['waveform_data'] if timestamps else None,
+        has_timestamps=bool(timestamps and timestamps['aligned_words']),
     )
+    # Songs without timestamps yet may get them from another task's write
+    if details.has_timestamps:
+        cache_song_details(song_id, song_data, details)
+    return details
 
 
 @router.patch("/{task_id}/primary-variation")
@@ -482,7 +677,7 @@ async def update_song_primary_variation(
     
     # Step 1: Verify song exists
     try:
-        song_data = await get_task_from_firestore(task_id)
+        song_data = await get_task_from_firestore(task_id, fields=TASK_STATUS_FIELDS)
     except Exception as e:
         logger.error(
             f"Failed to query Firestore for song: {task_id}",
@@ -618,52 +813,17 @@ async def update_song_primary_variation(
         )
 
 
-@router.post("/{task_id}/timestamped-lyrics/{variation_index}")
-async def get_variation_timestamped_lyrics(
-    task_id: str,
-    variation_index: int,
-    user_id: str = Depends(get_current_user)
-) -> dict:
+async def _get_song_for_timestamps(task_id: str, user_id: str, operation: str) -> dict:
     """
-    Fetch timestamped lyrics for a specific song variation.
-    
-    This endpoint:
-    1. Verifies user owns the song
-    2. Retrieves the correct audio_id for the specified variation
-    3. Calls Suno API to fetch timestamped lyrics
-    4. Returns aligned_words and waveform_data
+    Load a song for a timestamped lyrics request and verify its owner.
     
-    Args:
-        task_id: The song/task ID
-        variation_index: Which variation (0 or 1)
-        user_id: Authenticated user ID from Firebase token
-        
-    Returns:
-        dict with aligned_words and waveform_data
-        
     Raises:
-        HTTPException: 404 if song not found
-        HTTPException: 403 if user doesn't own the song
-        HTTPException: 400 if variation_index is invalid
-        HTTPException: 500 if Suno API call fails
-        
-    Requirements: 6.1
+        HTTPException: 500 if Firestore fails, 404 if the song doesn't
+            exist, 403 if the user doesn't own it
     """
-    logger.info(
-        f"Timestamped lyrics request for song: {task_id}, variation: {variation_index}",
-        extra={
-            'extra_fields': {
-                'user_id': user_id,
-                'task_id': task_id,
-                'variation_index': variation_index,
-                'operation': 'get_variation_timestamped_lyrics'
-            }
-        }
-    )
-    
     # Step 1: Verify song exists
     try:
-        song_data = await get_task_from_firestore(task_id)
+        song_data = await get_task_from_firestore(task_id, fields=TASK_TIMESTAMPS_FIELDS)
     except Exception as e:
         logger.error(
             f"Failed to query Firestore for song: {task_id}",
@@ -671,7 +831,7 @@ async def get_variation_timestamped_lyrics(
                 'extra_fields': {
                     'task_id': task_id,
                     'error': str(e),
-                    'operation': 'get_variation_timestamped_lyrics'
+                    'operation': operation
                 }
             }
         )
@@ -690,7 +850,7 @@ async def get_variation_timestamped_lyrics(
                 'extra_fields': {
                     'task_id': task_id,
                     'user_id': user_id,
-                    'operation': 'get_variation_timestamped_lyrics'
+                    'operation': operation
                 }
             }
         )
@@ -711,7 +871,7 @@ async def get_variation_timestamped_lyrics(
                     'task_id': task_id,
                     'requesting_user': user_id,
                     'song_owner': song_data.get('user_id'),
-                    'operation': 'get_variation_timestamped_lyrics'
+                    'operation': operation
                 }
             }
         )
@@ -723,50 +883,51 @@ async def get_variation_timestamped_lyrics(
             }
         )
     
-    # Step 3: Validate variation_index
-    if variation_index not in (0, 1):
-        logger.warning(
-            f"Invalid variation_index: {variation_index}",
-            extra={
-                'extra_fields': {
-                    'task_id': task_id,
-                    'variation_index': variation_index,
-                    'operation': 'get_variation_timestamped_lyrics'
-                }
-            }
-        )
-        raise HTTPException(
-            status_code=400,
-            detail={
-                'error': 'Invalid variation',
-                'message': 'Variation index must be 0 or 1.'
-            }
-        )
+    return song_data
+
+
+async def _variation_timestamps(task_id: str, song_data: dict, variation_index: int) -> dict:
+    """
+    Get a variation's timestamped lyrics, fetching from Suno only once.
     
-    # Step 4: Get audio_id for the specified variation
-    variations = song_data.get('variations', [])
+    Stored timestamps are served directly; otherwise they are fetched
+    from Suno's alignment endpoint and stored for the next request.
+    Songs served from the song cache read and store the timestamps of
+    the task they were cloned from. That task expires independently of
+    the song cache entry, so once it is gone they are stored on (and
+    read from) the clone itself. Suno errors return empty arrays and
+    are not stored, so the next request retries.
     
-    if variation_index >= len(variations):
+    Raises:
+        HTTPException: 500 if the variation has no audio_id, 503 if Suno
+            is not configured
+    """
+    source_task_id = song_data.get('source_task_id')
+    storage_id = source_task_id or task_id
+    
+    try:
+        timestamps = await load_timestamped_lyrics(
+            storage_id, variation_index, None if source_task_id else song_data
+        )
+        if timestamps is None and source_task_id:
+            timestamps = await load_timestamped_lyrics(task_id, variation_index, song_data)
+    except Exception as e:
         logger.warning(
-            f"Variation index out of range for song: {task_id}",
+            f"Failed to load stored timestamped lyrics for song: {task_id}",
             extra={
                 'extra_fields': {
                     'task_id': task_id,
                     'variation_index': variation_index,
-                    'variations_count': len(variations),
-                    'operation': 'get_variation_timestamped_lyrics'
+                    'error': str(e),
+                    'operation': 'variation_timestamps'
                 }
             }
         )
-        raise HTTPException(
-            status_code=400,
-            detail={
-                'error': 'Invalid variation',
-                'message': f'Variation {variation_index} does not exist for this song.'
-            }
-        )
+        timestamps = None
+    if timestamps is not None:
+        return timestamps
     
-    variation = variations[variation_index]
+    variation = song_data.get('variations', [])[variation_index]
     audio_id = variation.get('audio_id')
     
     if not audio_id:
@@ -788,7 +949,6 @@ async def get_variation_timestamped_lyrics(
             }
         )
     
-    # Step 5: Call Suno API to fetch timestamped lyrics
     suno_api_key = os.getenv("SUNO_API_KEY")
     if not suno_api_key:
         logger.error(
@@ -808,62 +968,12 @@ async def get_variation_timestamped_lyrics(
             }
         )
     
-    suno_base_url = os.getenv("SUNO_API_URL", "https://api.sunoapi.org")
-    
     try:
-        async with SunoClient(api_key=suno_api_key, base_url=suno_base_url) as suno_client:
-            timestamped_lyrics = await suno_client.get_timestamped_lyrics(
-                task_id=task_id,
-                audio_id=audio_id
-            )
-            
-            if timestamped_lyrics is None:
-                logger.warning(
-                    f"Failed to fetch timestamped lyrics for variation {variation_index}",
-                    extra={
-                        'extra_fields': {
-                            'task_id': task_id,
-                            'variation_index': variation_index,
-                            'audio_id': audio_id,
-                            'operation': 'get_variation_timestamped_lyrics'
-                        }
-                    }
-                )
-                # Return empty arrays instead of failing
-                return {
-                    'aligned_words': [],
-                    'waveform_data': []
-                }
-            
-            # Convert AlignedWord dataclasses to dicts
-            aligned_words_dicts = [
-                {
-                    'word': word.word,
-                    'startS': word.start_s,
-                    'endS': word.end_s,
-                    'success': word.success,
-                    'palign': word.palign
-                }
-                for word in timestamped_lyrics.aligned_words
-            ]
-            
-            logger.info(
-                f"Successfully fetched timestamped lyrics for variation {variation_index}",
-                extra={
-                    'extra_fields': {
-                        'task_id': task_id,
-                        'variation_index': variation_index,
-                        'aligned_words_count': len(aligned_words_dicts),
-                        'operation': 'get_variation_timestamped_lyrics'
-                    }
-                }
-            )
-            
-            return {
-                'aligned_words': aligned_words_dicts,
-                'waveform_data': timestamped_lyrics.waveform_data
-            }
-    
+        suno_client = get_suno_client()
+        timestamped_lyrics = await suno_client.get_timestamped_lyrics(
+            task_id=storage_id,
+            audio_id=audio_id
+        )
     except SunoAPIError as e:
         logger.error(
             f"Suno API error fetching timestamped lyrics: {e}",
@@ -877,32 +987,245 @@ async def get_variation_timestamped_lyrics(
                 }
             }
         )
+        timestamped_lyrics = None
+    
+    if timestamped_lyrics is None:
+        logger.warning(
+            f"Failed to fetch timestamped lyrics for variation {variation_index}",
+            extra={
+                'extra_fields': {
+                    'task_id': task_id,
+                    'variation_index': variation_index,
+                    'audio_id': audio_id,
+                    'operation': 'get_variation_timestamped_lyrics'
+                }
+            }
+        )
         # Return empty arrays instead of failing
         return {
             'aligned_words': [],
             'waveform_data': []
         }
     
+    # Convert AlignedWord dataclasses to dicts
+    aligned_words_dicts = [
+        {
+            'word': word.word,
+            'startS': word.start_s,
+            'endS': word.end_s,
+            'success': word.success,
+            'palign': word.palign
+        }
+        for word in timestamped_lyrics.aligned_words
+    ]
+    
+    logger.info(
+        f"Successfully fetched timestamped lyrics for variation {variation_index}",
+        extra={
+            'extra_fields': {
+                'task_id': task_id,
+                'variation_index': variation_index,
+                'aligned_words_count': len(aligned_words_dicts),
+                'operation': 'get_variation_timestamped_lyrics'
+            }
+        }
+    )
+    
+    # Suno returns no words until alignment is ready; storing that would
+    # serve the empty result forever. A failed write only means the next
+    # request fetches again.
+    if aligned_words_dicts:
+        stored = await store_timestamped_lyrics(
+            task_id=storage_id,
+            aligned_words=aligned_words_dicts,
+            waveform_data=timestamped_lyrics.waveform_data,
+            variation_index=variation_index,
+        )
+        if not stored and source_task_id:
+            # The source task has expired and been deleted
+            await store_timestamped_lyrics(
+                task_id=task_id,
+                aligned_words=aligned_words_dicts,
+                waveform_data=timestamped_lyrics.waveform_data,
+                variation_index=variation_index,
+            )
+    
+    return {
+        'aligned_words': aligned_words_dicts,
+        'waveform_data': timestamped_lyrics.waveform_data
+    }
+
+
+def _timestamps_error(task_id: str, variation_index: Optional[int], e: Exception) -> HTTPException:
+    """Log an unexpected timestamped lyrics failure and build its 500 error."""
+    logger.error(
+        f"Unexpected error fetching timestamped lyrics: {e}",
+        extra={
+            'extra_fields': {
+                'task_id': task_id,
+                'variation_index': variation_index,
+                'error_type': 'unexpected',
+                'error_message': str(e),
+                'operation': 'get_variation_timestamped_lyrics'
+            }
+        }
+    )
+    return HTTPException(
+        status_code=500,
+        detail={
+            'error': 'Internal error',
+            'message': 'Failed to fetch timestamped lyrics. Please try again.'
+        }
+    )
+
+
+@router.post("/{task_id}/timestamped-lyrics", response_model=None)
+async def get_all_timestamped_lyrics(
+    task_id: str,
+    user_id: str = Depends(get_current_user),
+) -> dict:
+    """
+    Fetch timestamped lyrics for every variation of a song in one call.
+    
+    Variations are loaded (and fetched from Suno if not yet stored)
+    concurrently, so switching variations in the player needs no
+    further requests.
+    
+    Args:
+        task_id: The song/task ID
+        user_id: Authenticated user ID from Firebase token
+        
+    Returns:
+        dict with a "variations" list of variation_index, aligned_words
+        and waveform_data
+        
+    Raises:
+        HTTPException: 404 if song not found
+        HTTPException: 403 if user doesn't own the song
+        HTTPException: 500 if loading or fetching fails
+    """
+    song_data = await _get_song_for_timestamps(task_id, user_id, 'get_all_timestamped_lyrics')
+    indexes = range(min(len(song_data.get('variations', [])), MAX_VARIATIONS))
+    
+    try:
+        results = await asyncio.gather(*(
+            _variation_timestamps(task_id, song_data, index) for index in indexes
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(
-            f"Unexpected error fetching timestamped lyrics: {e}",
+        raise _timestamps_error(task_id, None, e)
+    
+    return {
+        'variations': [
+            {'variation_index': index, **timestamps}
+            for index, timestamps in zip(indexes, results)
+        ]
+    }
+
+
+@router.post("/{task_id}/timestamped-lyrics/{variation_index}", response_model=None)
+async def get_variation_timestamped_lyrics(
+    task_id: str,
+    variation_index: int,
+    user_id: str = Depends(get_current_user),
+    encoding: Literal["json", "compact"] = "json",
+) -> Union[dict, Response]:
+    """
+    Fetch timestamped lyrics for a specific song variation.
+    
+    This endpoint:
+    1. Verifies user owns the song
+    2. Retrieves the correct audio_id for the specified variation
+    3. Returns stored timestamped lyrics, or fetches them from Suno and
+       stores them for later requests
+    4. Returns aligned_words and waveform_data
+    
+    Args:
+        task_id: The song/task ID
+        variation_index: Which variation (0 or 1)
+        user_id: Authenticated user ID from Firebase token
+        encoding: "json", or "compact" for the binary format from
+            timestamp_codec (Content-Type application/vnd.learningsong.timestamps)
+        
+    Returns:
+        dict with aligned_words and waveform_data, or the compact blob
+        
+    Raises:
+        HTTPException: 404 if song not found
+        HTTPException: 403 if user doesn't own the song
+        HTTPException: 400 if variation_index is invalid
+        HTTPException: 500 if Suno API call fails
+        
+    Requirements: 6.1
+    """
+    logger.info(
+        f"Timestamped lyrics request for song: {task_id}, variation: {variation_index}",
+        extra={
+            'extra_fields': {
+                'user_id': user_id,
+                'task_id': task_id,
+                'variation_index': variation_index,
+                'operation': 'get_variation_timestamped_lyrics'
+            }
+        }
+    )
+    
+    # Steps 1-2: Verify song exists and user ownership
+    song_data = await _get_song_for_timestamps(task_id, user_id, 'get_variation_timestamped_lyrics')
+    
+    # Step 3: Validate variation_index
+    if variation_index not in (0, 1):
+        logger.warning(
+            f"Invalid variation_index: {variation_index}",
             extra={
                 'extra_fields': {
                     'task_id': task_id,
                     'variation_index': variation_index,
-                    'error_type': 'unexpected',
-                    'error_message': str(e),
                     'operation': 'get_variation_timestamped_lyrics'
                 }
             }
         )
         raise HTTPException(
-            status_code=500,
+            status_code=400,
+            detail={
+                'error': 'Invalid variation',
+                'message': 'Variation index must be 0 or 1.'
+            }
+        )
+    
+    # Step 4: Verify the variation exists
+    variations = song_data.get('variations', [])
+    
+    if variation_index >= len(variations):
+        logger.warning(
+            f"Variation index out of range for song: {task_id}",
+            extra={
+                'extra_fields': {
+                    'task_id': task_id,
+                    'variation_index': variation_index,
+                    'variations_count': len(variations),
+                    'operation': 'get_variation_timestamped_lyrics'
+                }
+            }
+        )
+        raise HTTPException(
+            status_code=400,
             detail={
-                'error': 'Internal error',
-                'message': 'Failed to fetch timestamped lyrics. Please try again.'
+                'error': 'Invalid variation',
+                'message': f'Variation {variation_index} does not exist for this song.'
             }
         )
+    
+    # Step 5: Serve stored timestamps or fetch them from Suno
+    try:
+        timestamps = await _variation_timestamps(task_id, song_data, variation_index)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _timestamps_error(task_id, variation_index, e)
+    
+    return _timestamps_response(timestamps['aligned_words'], timestamps['waveform_data'], encoding)
 
 
 @router.post("/{song_id}/share", response_model=ShareLinkResponse)
@@ -945,7 +1268,7 @@ async def create_song_share_link(
     
     # Step 1: Verify song exists
     try:
-        song_data = await get_task_from_firestore(song_id)
+        song_data = await get_task_from_firestore(song_id, fields=TASK_DETAILS_FIELDS)
     except Exception as e:
         logger.error(
             f"Failed to query Firestore for song: {song_id}",
@@ -1007,7 +1330,7 @@ async def create_song_share_link(
     
     # Step 3: Create share link
     try:
-        share_data = await create_share_link(song_id, user_id)
+        share_data = await create_share_link(song_id, user_id, song_data)
     except Exception as e:
         logger.error(
             f"Failed to create share link for song: {song_id}",
@@ -1052,17 +1375,29 @@ async def create_song_share_link(
 
 
 @router.get("/shared/{share_token}", response_model=SongDetails)
-async def get_shared_song(share_token: str) -> SongDetails:
+async def get_shared_song(
+    share_token: str,
+    request: Request = None,
+    response: Response = None,
+) -> SongDetails:
     """
     Get song details via share token (no auth required).
     
     This endpoint:
     1. Looks up share token in Firestore
     2. Checks if share link has expired
-    3. Returns SongDetails for the shared song
+    3. Returns 304 if the client's If-None-Match matches the song's ETag
+    4. Returns SongDetails for the shared song
+    
+    Responses are publicly cacheable (SHARED_SONG_CDN_MAX_AGE for CDNs,
+    SHARED_SONG_MAX_AGE for browsers, both capped by the song's and the
+    share link's expiry),
+    so a CDN can absorb traffic to popular share links.
     
     Args:
         share_token: The unique share token
+        request: Request carrying If-None-Match
+        response: Response used to set the ETag and caching headers
         
     Returns:
         SongDetails for the shared song
@@ -1195,7 +1530,31 @@ async def get_shared_song(share_token: str) -> SongDetails:
                 }
             )
     
-    # Step 5: Parse datetime fields
+    # Step 5: Answer conditional requests before loading timestamps.
+    # Caches may keep the response until the song or the link expires.
+    expiries = [
+        expiry for expiry in (expires_at_dt if expires_at else None, song_data.get('share_expires_at'))
+        if expiry is not None
+    ]
+    lifetime = SHARED_SONG_CDN_MAX_AGE
+    if expiries:
+        lifetime = max(0, int((min(expiries) - datetime.now(timezone.utc)).total_seconds()))
+    not_modified = _conditional_response(
+        request,
+        response,
+        _song_etag('shared', song_data.get('task_id', share_token), song_data),
+        {
+            'Cache-Control': (
+                f'public, max-age={min(SHARED_SONG_MAX_AGE, lifetime)}, '
+                f's-maxage={min(SHARED_SONG_CDN_MAX_AGE, lifetime)}'
+            ),
+            'Vary': 'Accept-Encoding',
+        },
+    )
+    if not_modified is not None:
+        return not_modified
+    
+    # Step 6: Parse datetime fields
     created_at = song_data.get('created_at')
     if hasattr(created_at, 'timestamp'):
         created_at_dt = datetime.fromtimestamp(created_at.timestamp(), tz=timezone.utc)
@@ -1204,7 +1563,7 @@ async def get_shared_song(share_token: str) -> SongDetails:
     else:
         created_at_dt = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
     
-    # Step 6: Return SongDetails with timestamped lyrics and variations (is_owner is False for shared songs)
+    # Step 7: Return SongDetails with timestamped lyrics and variations (is_owner is False for shared songs)
     # Requirements: 1.2, 7.2, 7.4 - Ensure shared song endpoint also returns timestamps and variations
     from app.models.songs import MusicStyle
     
@@ -1233,6 +1592,8 @@ async def get_shared_song(share_token: str) -> SongDetails:
         }
     )
     
+    timestamps = await _load_song_timestamps(song_data.get('task_id', song_id), song_data)
+    
     return SongDetails(
         song_id=song_id,
         song_url=song_url,
@@ -1243,9 +1604,9 @@ async def get_shared_song(share_token: str) -> SongDetails:
         created_at=created_at_dt,
         expires_at=expires_at_dt,
         is_owner=False,  # Shared songs are never owned by the viewer
-        aligned_words=song_data.get('aligned_words'),
-        waveform_data=song_data.get('waveform_data'),
-        has_timestamps=song_data.get('has_timestamps', False),
+        aligned_words=timestamps['aligned_words'] if timestamps else None,
+        waveform_data=timestamps['waveform_data'] if timestamps else None,
+        has_timestamps=bool(timestamps and timestamps['aligned_words']),
     )
 
 
@@ -1300,103 +1661,22 @@ async def generate_song_timeout_test(
 
 
 
-@router.post("/generate", response_model=GenerateSongResponse)
-async def generate_song(
-    request: GenerateSongRequest,
-    user_id: str = Depends(get_current_user)
-) -> GenerateSongResponse:
+async def _create_suno_task(user_id: str, request: GenerateSongRequest) -> SunoTask:
     """
-    Generate a song from lyrics using the Suno API.
-    
-    This endpoint:
-    1. Validates the user's rate limit
-    2. Checks the cache for existing songs with same content and style
-    3. Calls Suno API to create a new song generation task if cache miss
-    4. Stores the task in Firestore for tracking
-    5. Increments the user's usage counter
+    Start a Suno generation task, mapping Suno errors to HTTP errors.
     
     Args:
-        request: Song generation request with lyrics and style
-        user_id: Authenticated user ID from Firebase token
+        user_id: Authenticated user ID (for logging)
+        request: Song generation request
         
     Returns:
-        GenerateSongResponse with task_id and estimated_time
+        The created SunoTask
         
     Raises:
-        HTTPException: 429 if rate limit exceeded
         HTTPException: 400 if lyrics validation fails
         HTTPException: 500 if Suno API call fails
-        HTTPException: 503 if Suno API is unavailable
-        
-    Requirements: FR-3, FR-6
+        HTTPException: 503 if Suno API is unavailable or busy
     """
-    logger.info(
-        f"Song generation request from user: {user_id[:8]}...",
-        extra={
-            'extra_fields': {
-                'user_id': user_id,
-                'style': request.style.value,
-                'lyrics_length': len(request.lyrics),
-                'has_content_hash': request.content_hash is not None,
-                'operation': 'generate_song'
-            }
-        }
-    )
-    
-    # Step 1: Check rate limit
-    try:
-        await check_rate_limit(user_id)
-    except HTTPException:
-        logger.warning(
-            f"Rate limit exceeded for user: {user_id[:8]}...",
-            extra={
-                'extra_fields': {
-                    'user_id': user_id,
-                    'rate_limit_exceeded': True
-                }
-            }
-        )
-        raise
-    
-    # Step 2: Check cache if content_hash is provided
-    if request.content_hash:
-        try:
-            cached_result = await check_song_cache(
-                request.content_hash,
-                request.style.value
-            )
-            
-            if cached_result:
-                logger.info(
-                    f"Cache hit for song generation",
-                    extra={
-                        'extra_fields': {
-                            'user_id': user_id,
-                            'content_hash': request.content_hash,
-                            'style': request.style.value,
-                            'cache_hit': True,
-                            'task_id': cached_result['task_id']
-                        }
-                    }
-                )
-                return GenerateSongResponse(
-                    task_id=cached_result['task_id'],
-                    estimated_time=0  # Instant from cache
-                )
-        except Exception as e:
-            # Log cache error but continue with generation
-            logger.warning(
-                f"Cache check failed, continuing with generation: {e}",
-                extra={
-                    'extra_fields': {
-                        'user_id': user_id,
-                        'content_hash': request.content_hash,
-                        'cache_error': str(e)
-                    }
-                }
-            )
-    
-    # Step 3: Call Suno API to create song generation task
     suno_api_key = os.getenv("SUNO_API_KEY")
     if not suno_api_key:
         logger.error(
@@ -1416,27 +1696,25 @@ async def generate_song(
             }
         )
     
-    suno_base_url = os.getenv("SUNO_API_URL", "https://api.sunoapi.org")
-    
     try:
-        async with SunoClient(api_key=suno_api_key, base_url=suno_base_url) as suno_client:
-            task = await suno_client.create_song(
-                lyrics=request.lyrics,
-                style=request.style.value,
-                title="Learning Song"
-            )
-            
-            logger.info(
-                f"Suno task created: {task.task_id}",
-                extra={
-                    'extra_fields': {
-                        'user_id': user_id,
-                        'task_id': task.task_id,
-                        'estimated_time': task.estimated_time,
-                        'style': request.style.value
-                    }
+        suno_client = get_suno_client()
+        task = await suno_client.create_song(
+            lyrics=request.lyrics,
+            style=request.style.value,
+            title="Learning Song"
+        )
+        
+        logger.info(
+            f"Suno task created: {task.task_id}",
+            extra={
+                'extra_fields': {
+                    'user_id': user_id,
+                    'task_id': task.task_id,
+                    'estimated_time': task.estimated_time,
+                    'style': request.style.value
                 }
-            )
+            }
+        )
     
     except SunoValidationError as e:
         logger.warning(
@@ -1534,38 +1812,216 @@ async def generate_song(
             }
         )
     
-    # Step 4: Store task in Firestore
+    return task
+
+
+async def _serve_cached_song(
+    user_id: str,
+    request: GenerateSongRequest,
+    cached_result: dict
+) -> GenerateSongResponse:
+    """
+    Answer a song generation request from the song cache.
+    
+    The cached Suno task belongs to whoever generated it first, so the
+    user gets their own completed task that points at it through
+    source_task_id. Cache hits do not count against the daily limit.
+    
+    Args:
+        user_id: Authenticated user ID
+        request: Song generation request
+        cached_result: Hit returned by check_song_cache
+        
+    Returns:
+        GenerateSongResponse with the new task ID and a completed status
+    """
+    task_id = f"cached-{uuid.uuid4().hex}"
+    variations = cached_result['variations']
+    
+    task_doc = await store_song_task(
+        user_id,
+        task_id,
+        request,
+        variations=variations,
+        source_task_id=cached_result['task_id']
+    )
+    
+    logger.info(
+        f"Cache hit for song generation",
+        extra={
+            'extra_fields': {
+                'user_id': user_id,
+                'content_hash': request.content_hash,
+                'style': request.style.value,
+                'cache_hit': True,
+                'task_id': task_id,
+                'source_task_id': cached_result['task_id']
+            }
+        }
+    )
+    
+    return GenerateSongResponse(
+        task_id=task_id,
+        estimated_time=0,  # Instant from cache
+        status=SongStatusUpdate(
+            task_id=task_id,
+            status=GenerationStatus.COMPLETED,
+            progress=100,
+            song_url=task_doc.get('song_url'),
+            variations=[SongVariation(**v) for v in variations],
+        )
+    )
+
+
+async def cache_completed_song(task_id: str, suno_status: SunoStatus) -> None:
+    """
+    Store a newly completed song in the song cache.
+    
+    Registered as a SunoPoller listener, so it sees every completion
+    whether it arrived through WebSocket polling, the REST status
+    endpoint or a webhook callback. The entry holds the full variations
+    list under the content-hash key and the lyrics-hash key.
+    
+    Args:
+        task_id: The Suno task ID
+        suno_status: Status returned by Suno
+    """
+    if _map_suno_status_to_generation_status(suno_status.status) != GenerationStatus.COMPLETED:
+        return
+    if not suno_status.variations:
+        return
+    
     try:
-        await store_song_task(user_id, task.task_id, request)
+        task_data = await get_task_from_firestore(task_id)
+        if task_data is None or task_data.get('source_task_id'):
+            return
+        
+        variations = variations_to_dicts(suno_status)
+        await store_song_cache(
+            task_data.get('content_hash'),
+            task_data.get('style'),
+            task_id,
+            variations[0]['audio_url'],
+            variations=variations,
+            lyrics=task_data.get('lyrics')
+        )
     except Exception as e:
-        # Log error but don't fail the request - task was created successfully
-        logger.error(
-            f"Failed to store song task: {e}",
+        logger.warning(
+            f"Failed to cache completed song: {e}",
+            extra={
+                'extra_fields': {
+                    'task_id': task_id,
+                    'cache_error': str(e),
+                    'operation': 'cache_completed_song'
+                }
+            }
+        )
+
+
+get_suno_poller().add_listener(cache_completed_song)
+
+
+@router.post("/generate", response_model=GenerateSongResponse)
+async def generate_song(
+    request: GenerateSongRequest,
+    user_id: str = Depends(get_current_user)
+) -> GenerateSongResponse:
+    """
+    Generate a song from lyrics using the Suno API.
+    
+    This endpoint:
+    1. Reserves one of the user's daily song slots
+    2. Checks the cache for existing songs with same content (or lyrics)
+       and style, returning a completed task immediately on a hit
+    3. Calls Suno API to create a new song generation task if cache miss
+    4. Stores the task in Firestore for tracking
+    5. Commits the reserved slot (it is refunded on a cache hit or failure)
+    
+    Args:
+        request: Song generation request with lyrics and style
+        user_id: Authenticated user ID from Firebase token
+        
+    Returns:
+        GenerateSongResponse with task_id and estimated_time, plus the
+        completed status when served from cache
+        
+    Raises:
+        HTTPException: 429 if rate limit exceeded
+        HTTPException: 400 if lyrics validation fails
+        HTTPException: 500 if Suno API call fails
+        HTTPException: 503 if Suno API is unavailable
+        
+    Requirements: FR-3, FR-6
+    """
+    logger.info(
+        f"Song generation request from user: {user_id[:8]}...",
+        extra={
+            'extra_fields': {
+                'user_id': user_id,
+                'style': request.style.value,
+                'lyrics_length': len(request.lyrics),
+                'has_content_hash': request.content_hash is not None,
+                'operation': 'generate_song'
+            }
+        }
+    )
+    
+    # Step 1: Reserve one of today's song slots
+    try:
+        reservation = await reserve_song_quota(user_id)
+    except HTTPException:
+        logger.warning(
+            f"Rate limit exceeded for user: {user_id[:8]}...",
             extra={
                 'extra_fields': {
                     'user_id': user_id,
-                    'task_id': task.task_id,
-                    'error': str(e)
+                    'rate_limit_exceeded': True
                 }
             }
         )
+        raise
     
-    # Step 5: Increment usage counter
+    # Step 2: Check cache by content hash, then by lyrics hash
     try:
-        await increment_usage(user_id)
-        logger.info(
-            f"Usage incremented for user: {user_id[:8]}...",
+        cached_result = await check_song_cache(
+            request.content_hash,
+            request.style.value,
+            lyrics=request.lyrics
+        )
+        
+        # Entries written before variations were cached cannot be served complete
+        if cached_result and cached_result.get('variations'):
+            response = await _serve_cached_song(user_id, request, cached_result)
+            await refund_quota(reservation)
+            return response
+    except Exception as e:
+        # Log cache error but continue with generation
+        logger.warning(
+            f"Cache check failed, continuing with generation: {e}",
             extra={
                 'extra_fields': {
                     'user_id': user_id,
-                    'task_id': task.task_id
+                    'content_hash': request.content_hash,
+                    'cache_error': str(e)
                 }
             }
         )
+    
+    # Step 3: Call Suno API to create song generation task; the reserved
+    # slot is given back if no task could be started
+    try:
+        task = await _create_suno_task(user_id, request)
+    except Exception:
+        await refund_quota(reservation)
+        raise
+    
+    # Step 4: Store task in Firestore
+    try:
+        await store_song_task(user_id, task.task_id, request)
     except Exception as e:
         # Log error but don't fail the request - task was created successfully
         logger.error(
-            f"Failed to increment usage: {e}",
+            f"Failed to store song task: {e}",
             extra={
                 'extra_fields': {
                     'user_id': user_id,
@@ -1575,40 +2031,15 @@ async def generate_song(
             }
         )
     
+    # Step 5: Confirm the reserved slot
+    await commit_quota(reservation)
+    
     return GenerateSongResponse(
         task_id=task.task_id,
         estimated_time=task.estimated_time
     )
 
 
-
-
-
-def _map_suno_status_to_generation_status(suno_status: str) -> GenerationStatus:
-    """
-    Map Suno API status to GenerationStatus enum.
-    
-    Args:
-        suno_status: Status string from Suno API
-        
-    Returns:
-        Corresponding GenerationStatus enum value
-    """
-    status_mapping = {
-        'PENDING': GenerationStatus.QUEUED,
-        'TEXT_SUCCESS': GenerationStatus.PROCESSING,
-        'FIRST_SUCCESS': GenerationStatus.PROCESSING,
-        'GENERATING': GenerationStatus.PROCESSING,
-        'SUCCESS': GenerationStatus.COMPLETED,
-        'FAILED': GenerationStatus.FAILED,
-        'CREATE_TASK_FAILED': GenerationStatus.FAILED,
-        'GENERATE_AUDIO_FAILED': GenerationStatus.FAILED,
-        'CALLBACK_EXCEPTION': GenerationStatus.FAILED,
-        'SENSITIVE_WORD_ERROR': GenerationStatus.FAILED,
-    }
-    return status_mapping.get(suno_status, GenerationStatus.QUEUED)
-
-
 @router.get("/{task_id}", response_model=SongStatusUpdate)
 async def get_song_status(
     task_id: str,
@@ -1620,9 +2051,9 @@ async def get_song_status(
     This endpoint:
     1. Verifies the task belongs to the authenticated user
     2. Queries Firestore for task data
-    3. Calls Suno API to get current status
-    4. Updates Firestore with latest status
-    5. Returns the current status
+    3. Gets current status from the shared Suno poller, which coalesces
+       duplicate polls and persists fresh results to Firestore
+    4. Returns the current status
     
     Args:
         task_id: The song generation task ID
@@ -1650,9 +2081,9 @@ async def get_song_status(
         }
     )
     
-    # Step 1: Query Firestore for task data
+    # Step 1: Query Firestore for the status fields of the task
     try:
-        task_data = await get_task_from_firestore(task_id)
+        task_data = await get_task_from_firestore(task_id, fields=TASK_STATUS_FIELDS)
     except Exception as e:
         logger.error(
             f"Failed to query Firestore for task: {task_id}",
@@ -1769,24 +2200,23 @@ async def get_song_status(
             }
         )
     
-    suno_base_url = os.getenv("SUNO_API_URL", "https://api.sunoapi.org")
-    
     try:
-        async with SunoClient(api_key=suno_api_key, base_url=suno_base_url) as suno_client:
-            suno_status = await suno_client.get_task_status(task_id)
-            
-            logger.info(
-                f"Suno status retrieved for task: {task_id}",
-                extra={
-                    'extra_fields': {
-                        'task_id': task_id,
-                        'suno_status': suno_status.status,
-                        'progress': suno_status.progress,
-                        'has_song_url': suno_status.song_url is not None,
-                        'operation': 'get_song_status'
-                    }
+        # The shared poller coalesces this with WebSocket polling and other
+        # clients asking for the same task, and persists fresh results
+        suno_status = await get_suno_poller().get_status(task_id)
+        
+        logger.info(
+            f"Suno status retrieved for task: {task_id}",
+            extra={
+                'extra_fields': {
+                    'task_id': task_id,
+                    'suno_status': suno_status.status,
+                    'progress': suno_status.progress,
+                    'has_song_url': suno_status.song_url is not None,
+                    'operation': 'get_song_status'
                 }
-            )
+            }
+        )
     
     except SunoAPIError as e:
         logger.error(
@@ -1858,40 +2288,7 @@ async def get_song_status(
     # Step 6: Map Suno status to GenerationStatus
     generation_status = _map_suno_status_to_generation_status(suno_status.status)
     
-    # Step 7: Update Firestore with latest status
-    # Convert SongVariation dataclasses to dicts for storage
-    variations_dicts = [
-        {
-            'audio_url': var.audio_url,
-            'audio_id': var.audio_id,
-            'variation_index': var.variation_index
-        }
-        for var in suno_status.variations
-    ] if suno_status.variations else []
-    
-    try:
-        await update_task_status(
-            task_id=task_id,
-            status=generation_status.value,
-            progress=suno_status.progress,
-            song_url=suno_status.song_url,
-            error=suno_status.error,
-            variations=variations_dicts,
-        )
-    except Exception as e:
-        # Log error but don't fail the request - we have the status
-        logger.error(
-            f"Failed to update task status in Firestore: {e}",
-            extra={
-                'extra_fields': {
-                    'task_id': task_id,
-                    'error': str(e),
-                    'operation': 'update_task_status'
-                }
-            }
-        )
-    
-    # Step 8: Return status update with variations (Requirements: 7.2, 7.4)
+    # Step 7: Return status update with variations (Requirements: 7.2, 7.4)
     # Convert dataclass variations to Pydantic models
     variations_models = [
         SongVariation(
@@ -0,0 +1,159 @@
+"""
+API endpoints for receiving Suno API callbacks.
+
+Suno posts generation progress to the callBackUrl sent with each
+create_song request (SUNO_CALLBACK_URL). Callbacks are handed to the
+shared Suno poller, which persists the status and pushes it to the
+task's Socket.IO room immediately; polling only runs as a fallback.
+"""
+
+import hmac
+import logging
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from app.models.songs import SunoCallbackPayload
+from app.services.song_storage import get_task_from_firestore
+from app.services.suno_client import status_from_callback
+from app.services.suno_poller import get_suno_poller
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create router with prefix and tags for API documentation
+router = APIRouter(
+    prefix="/api/webhooks",
+    tags=["webhooks"]
+)
+
+
+def _verify_callback_token(token: Optional[str]) -> None:
+    """
+    Verify the shared secret carried in the callback URL.
+
+    Suno does not sign callbacks, so the callback URL must carry
+    SUNO_CALLBACK_SECRET as ?token=... Callbacks are refused while no
+    secret is configured, since anyone who knows a task ID could
+    otherwise post a fake completion.
+
+    Raises:
+        HTTPException: 503 if SUNO_CALLBACK_SECRET is not configured
+        HTTPException: 401 if the token is missing or does not match
+    """
+    secret = os.getenv("SUNO_CALLBACK_SECRET")
+    if not secret:
+        logger.error(
+            "Rejected Suno callback: SUNO_CALLBACK_SECRET is not configured",
+            extra={
+                'extra_fields': {
+                    'operation': 'suno_callback'
+                }
+            }
+        )
+        raise HTTPException(
+            status_code=503,
+            detail={
+                'error': 'Service unavailable',
+                'message': 'Callbacks are not configured.'
+            }
+        )
+
+    if not token or not hmac.compare_digest(token, secret):
+        logger.warning(
+            "Rejected Suno callback with invalid token",
+            extra={
+                'extra_fields': {
+                    'operation': 'suno_callback'
+                }
+            }
+        )
+        raise HTTPException(
+            status_code=401,
+            detail={
+                'error': 'Unauthorized',
+                'message': 'Invalid callback token.'
+            }
+        )
+
+
+@router.post("/suno")
+async def suno_callback(
+    payload: SunoCallbackPayload,
+    token: Optional[str] = None,
+) -> dict:
+    """
+    Receive a generation callback from the Suno API.
+
+    This endpoint:
+    1. Verifies the callback token
+    2. Verifies the task exists
+    3. Converts the payload to the same status a poll would return
+    4. Hands it to the shared poller, which updates Firestore (including
+       variations) and broadcasts to subscribed WebSocket clients
+
+    Args:
+        payload: Validated Suno callback body
+        token: Shared secret from the callback URL query string
+
+    Returns:
+        Acknowledgement with the task ID and mapped Suno status
+
+    Raises:
+        HTTPException: 503 if no callback secret is configured
+        HTTPException: 401 if the callback token is invalid
+        HTTPException: 404 if the task is unknown
+    """
+    _verify_callback_token(token)
+
+    task_id = payload.data.task_id
+    callback_type = payload.data.callbackType
+
+    logger.info(
+        f"Suno callback received for task: {task_id}",
+        extra={
+            'extra_fields': {
+                'task_id': task_id,
+                'callback_type': callback_type,
+                'code': payload.code,
+                'track_count': len(payload.data.data or []),
+                'operation': 'suno_callback'
+            }
+        }
+    )
+
+    task_data = await get_task_from_firestore(task_id)
+    if not task_data:
+        logger.warning(
+            f"Suno callback for unknown task: {task_id}",
+            extra={
+                'extra_fields': {
+                    'task_id': task_id,
+                    'operation': 'suno_callback'
+                }
+            }
+        )
+        raise HTTPException(
+            status_code=404,
+            detail={
+                'error': 'Task not found',
+                'message': 'The callback refers to an unknown song generation task.'
+            }
+        )
+
+    suno_status = status_from_callback(
+        callback_type=callback_type,
+        code=payload.code,
+        msg=payload.msg,
+        tracks=[track.model_dump() for track in payload.data.data or []],
+    )
+
+    await get_suno_poller().ingest(task_id, suno_status)
+
+    return {
+        'status': 'received',
+        'task_id': task_id,
+        'suno_status': suno_status.status,
+    }
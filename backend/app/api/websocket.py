@@ -13,12 +13,17 @@ from typing import Optional
 import socketio
 
 from app.core.auth import verify_websocket_token
-from app.services.suno_client import SunoClient, SunoAPIError
+from app.services.suno_client import SunoStatus, get_suno_client
+from app.services.suno_poller import (
+    get_suno_poller,
+    map_suno_status_to_generation_status as _map_suno_status_to_generation_status,
+    variations_to_dicts,
+)
 from app.services.song_storage import (
     get_task_from_firestore,
-    update_task_status,
     verify_task_ownership,
     store_timestamped_lyrics,
+    TASK_STATUS_FIELDS,
 )
 from app.models.songs import GenerationStatus
 
@@ -26,6 +31,13 @@ from app.models.songs import GenerationStatus
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Maximum time spent fetching timestamped lyrics for a completed song (seconds)
+TIMESTAMPS_FETCH_TIMEOUT = float(os.getenv("TIMESTAMPS_FETCH_TIMEOUT", "30"))
+
+# Timestamp fetches running in the background, by task ID; holding the
+# tasks keeps them from being garbage collected before they finish
+_timestamp_fetches: dict[str, asyncio.Task] = {}
+
 # Create Socket.IO server with async mode
 sio = socketio.AsyncServer(
     async_mode="asgi",
@@ -42,12 +54,6 @@ sio = socketio.AsyncServer(
 # Note: socketio_path should be empty since we mount at /socket.io in main.py
 socket_app = socketio.ASGIApp(sio, socketio_path="")
 
-# Polling interval in seconds
-POLL_INTERVAL = 5
-
-# Maximum polling duration (5 minutes - Suno generation can take 2-4 minutes)
-MAX_POLL_DURATION = 300
-
 
 class ConnectionManager:
     """
@@ -64,8 +70,6 @@ class ConnectionManager:
         self.session_users: dict[str, str] = {}
         # Maps session ID -> task_id for cleanup
         self.session_tasks: dict[str, str] = {}
-        # Maps task_id -> polling task for cancellation
-        self.polling_tasks: dict[str, asyncio.Task] = {}
     
     def add_connection(self, task_id: str, sid: str, user_id: str) -> None:
         """Add a connection to track for a specific task."""
@@ -85,8 +89,8 @@ class ConnectionManager:
             self.task_connections[task_id].discard(sid)
             if not self.task_connections[task_id]:
                 del self.task_connections[task_id]
-                # Cancel polling if no more connections for this task
-                self._cancel_polling(task_id)
+                # Stop polling if no more connections for this task
+                get_suno_poller().unwatch(task_id)
         
         logger.info(f"Connection removed: sid={sid}, task_id={task_id}")
         return task_id
@@ -106,65 +110,27 @@ class ConnectionManager:
     def has_active_connections(self, task_id: str) -> bool:
         """Check if there are active connections for a task."""
         return bool(self.task_connections.get(task_id))
-    
-    def set_polling_task(self, task_id: str, task: asyncio.Task) -> None:
-        """Store a polling task for a task_id."""
-        self.polling_tasks[task_id] = task
-    
-    def get_polling_task(self, task_id: str) -> Optional[asyncio.Task]:
-        """Get the polling task for a task_id."""
-        return self.polling_tasks.get(task_id)
-    
-    def _cancel_polling(self, task_id: str) -> None:
-        """Cancel polling for a task if running."""
-        polling_task = self.polling_tasks.pop(task_id, None)
-        if polling_task and not polling_task.done():
-            polling_task.cancel()
-            logger.info(f"Polling cancelled for task: {task_id}")
 
 
 # Global connection manager instance
 manager = ConnectionManager()
 
 
-def _map_suno_status_to_generation_status(suno_status: str) -> GenerationStatus:
-    """Map Suno API status to GenerationStatus enum."""
-    status_mapping = {
-        "PENDING": GenerationStatus.QUEUED,
-        "TEXT_SUCCESS": GenerationStatus.PROCESSING,
-        "FIRST_SUCCESS": GenerationStatus.PROCESSING,
-        "GENERATING": GenerationStatus.PROCESSING,
-        "SUCCESS": GenerationStatus.COMPLETED,
-        "FAILED": GenerationStatus.FAILED,
-        "CREATE_TASK_FAILED": GenerationStatus.FAILED,
-        "GENERATE_AUDIO_FAILED": GenerationStatus.FAILED,
-        "CALLBACK_EXCEPTION": GenerationStatus.FAILED,
-        "SENSITIVE_WORD_ERROR": GenerationStatus.FAILED,
-    }
-    return status_mapping.get(suno_status, GenerationStatus.QUEUED)
-
-
-async def poll_and_broadcast(task_id: str) -> None:
+async def start_polling(task_id: str) -> None:
     """
-    Poll Suno API for status updates and broadcast to connected clients.
+    Register a task with the shared Suno poller.
     
-    This function polls the Suno API every POLL_INTERVAL seconds and broadcasts
-    status updates to all clients subscribed to the task. Polling stops when:
-    - Task reaches a terminal state (completed or failed)
-    - No more clients are connected
-    - Maximum polling duration is exceeded
+    All subscribers of a task share one background poll; the results are
+    delivered through handle_poll_result. Polling stops when the task
+    reaches a terminal state, the last client disconnects, or the
+    poller's maximum duration is exceeded.
     
     Args:
         task_id: The Suno task ID to poll
         
     Requirements: FR-4, Task 16.3
     """
-    print(f"🎵 [POLL] Starting polling for task: {task_id}")
-    print(f"🎵 [POLL] Max duration: {MAX_POLL_DURATION}s, Poll interval: {POLL_INTERVAL}s")
-    logger.info(f"Starting polling for task: {task_id}")
-    
-    suno_api_key = os.getenv("SUNO_API_KEY")
-    if not suno_api_key:
+    if not os.getenv("SUNO_API_KEY"):
         print("❌ [POLL] SUNO_API_KEY not configured!")
         logger.error("SUNO_API_KEY not configured, cannot poll")
         await broadcast_status_update(task_id, {
@@ -175,190 +141,193 @@ async def poll_and_broadcast(task_id: str) -> None:
         })
         return
     
-    suno_base_url = os.getenv("SUNO_API_URL", "https://api.sunoapi.org")
-    print(f"🎵 [POLL] Using Suno API URL: {suno_base_url}")
-    start_time = asyncio.get_event_loop().time()
-    poll_count = 0
-    
-    try:
-        async with SunoClient(api_key=suno_api_key, base_url=suno_base_url) as suno_client:
-            while True:
-                poll_count += 1
-                # Check if we've exceeded max polling duration
-                elapsed = asyncio.get_event_loop().time() - start_time
-                remaining = MAX_POLL_DURATION - elapsed
-                
-                print(f"🔄 [POLL #{poll_count}] Task: {task_id[:16]}... | Elapsed: {elapsed:.1f}s | Remaining: {remaining:.1f}s")
-                
-                if elapsed > MAX_POLL_DURATION:
-                    print(f"⏰ [POLL] TIMEOUT after {elapsed:.1f}s for task: {task_id}")
-                    logger.warning(f"Polling timeout for task: {task_id}")
-                    await broadcast_status_update(task_id, {
-                        "task_id": task_id,
-                        "status": GenerationStatus.FAILED.value,
-                        "progress": 0,
-                        "error": "Generation timed out. Please try again.",
-                    })
-                    await update_task_status(
-                        task_id=task_id,
-                        status=GenerationStatus.FAILED.value,
-                        progress=0,
-                        error="Generation timed out",
-                    )
-                    break
-                
-                # Check if there are still connected clients
-                if not manager.has_active_connections(task_id):
-                    print(f"👋 [POLL] No active connections for task: {task_id}, stopping")
-                    logger.info(f"No active connections for task: {task_id}, stopping polling")
-                    break
-                
-                try:
-                    # Poll Suno API for status
-                    print(f"📡 [POLL] Calling Suno API get_task_status...")
-                    suno_status = await suno_client.get_task_status(task_id)
-                    generation_status = _map_suno_status_to_generation_status(suno_status.status)
-                    
-                    print(f"📊 [POLL] Suno response: status={suno_status.status}, progress={suno_status.progress}%, song_url={'YES' if suno_status.song_url else 'NO'}, error={suno_status.error}")
-                    
-                    # Prepare status update
-                    status_update = {
+    get_suno_poller().watch(task_id)
+    logger.info(f"Started polling for task: {task_id}")
+
+
+async def handle_poll_result(task_id: str, suno_status: SunoStatus) -> None:
+    """
+    Broadcast a fresh poll result from the shared poller to subscribers.
+    
+    Registered as a SunoPoller listener, so it runs once per upstream
+    result regardless of how many clients are subscribed or whether the
+    poll came from the background sweep or the REST status endpoint.
+    The poller has already persisted the status to Firestore.
+    
+    Args:
+        task_id: The Suno task ID
+        suno_status: Status returned by Suno
+        
+    Requirements: FR-4, Task 16.3
+    """
+    generation_status = _map_suno_status_to_generation_status(suno_status.status)
+    
+    print(f"📊 [POLL] Suno response: task={task_id[:16]}..., status={suno_status.status}, progress={suno_status.progress}%, song_url={'YES' if suno_status.song_url else 'NO'}, error={suno_status.error}")
+    
+    status_update = {
+        "task_id": task_id,
+        "status": generation_status.value,
+        "progress": suno_status.progress,
+        "song_url": suno_status.song_url,
+        "variations": variations_to_dicts(suno_status),
+        "error": suno_status.error,
+    }
+    
+    # Broadcast to all connected clients
+    if manager.has_active_connections(task_id):
+        await broadcast_status_update(task_id, status_update)
+    
+    logger.info(
+        f"Polled task {task_id}: status={generation_status.value}, progress={suno_status.progress}"
+    )
+    
+    if generation_status == GenerationStatus.COMPLETED:
+        print(f"✅ [POLL] Task COMPLETED! Song URL: {suno_status.song_url}")
+        _start_timestamp_fetch(task_id, suno_status, status_update)
+    elif generation_status == GenerationStatus.FAILED:
+        print(f"❌ [POLL] Task FAILED! Error: {suno_status.error}")
+
+
+async def _fetch_variation_timestamps(task_id: str, variation_index: int, audio_id: str) -> bool:
+    """
+    Fetch and store one variation's timestamped lyrics.
+    
+    Returns:
+        bool: True if timestamps were stored
+    """
+    timestamped_lyrics = await get_suno_client().get_timestamped_lyrics(
+        task_id=task_id,
+        audio_id=audio_id,
+    )
+    if not timestamped_lyrics or not timestamped_lyrics.aligned_words:
+        print(f"⚠️ [POLL] No timestamped lyrics available for task: {task_id}, variation: {variation_index}")
+        logger.info(f"No timestamped lyrics available for task: {task_id}, variation: {variation_index}")
+        return False
+    
+    # Convert AlignedWord dataclasses to dicts for storage
+    aligned_words_dicts = [
+        {
+            "word": aw.word,
+            "startS": aw.start_s,
+            "endS": aw.end_s,
+            "success": aw.success,
+            "palign": aw.palign,
+        }
+        for aw in timestamped_lyrics.aligned_words
+    ]
+    
+    stored = await store_timestamped_lyrics(
+        task_id=task_id,
+        aligned_words=aligned_words_dicts,
+        waveform_data=timestamped_lyrics.waveform_data,
+        variation_index=variation_index,
+    )
+    if not stored:
+        print(f"⚠️ [POLL] Failed to store timestamped lyrics for task: {task_id}, variation: {variation_index}")
+        logger.warning(
+            f"Failed to store timestamped lyrics for task: {task_id}",
+            extra={
+                "extra_fields": {
+                    "task_id": task_id,
+                    "variation_index": variation_index,
+                    "aligned_words_count": len(aligned_words_dicts),
+                }
+            }
+        )
+        return False
+    
+    print(f"✅ [POLL] Stored {len(aligned_words_dicts)} aligned words for task: {task_id}, variation: {variation_index}")
+    logger.info(
+        f"Timestamped lyrics stored for task: {task_id}",
+        extra={
+            "extra_fields": {
+                "task_id": task_id,
+                "variation_index": variation_index,
+                "aligned_words_count": len(aligned_words_dicts),
+            }
+        }
+    )
+    return True
+
+
+def _start_timestamp_fetch(task_id: str, suno_status: SunoStatus, status_update: dict) -> None:
+    """
+    Fetch a completed song's timestamped lyrics in the background.
+    
+    The poller awaits its listeners, so waiting for alignment here would
+    hold up status requests, webhook callbacks and poll sweeps. A task
+    that is already being fetched is not fetched again.
+    """
+    if task_id in _timestamp_fetches:
+        return
+    fetch = asyncio.create_task(_fetch_timestamped_lyrics(task_id, suno_status, status_update))
+    _timestamp_fetches[task_id] = fetch
+    fetch.add_done_callback(lambda done: _timestamp_fetches.pop(task_id, None))
+
+
+async def _fetch_timestamped_lyrics(task_id: str, suno_status: SunoStatus, status_update: dict) -> None:
+    """
+    Fetch and store timestamped lyrics for every variation after song completion.
+    
+    Variations are fetched concurrently and bounded by
+    TIMESTAMPS_FETCH_TIMEOUT; whatever is stored by then is announced to
+    subscribers in a follow-up song_status update carrying
+    timestamp_variations, so both variations play with synced lyrics
+    without further requests. Failures only cost the lyrics sync
+    (Requirements: 1.1, 2.1, 2.4).
+    """
+    audio_ids = {v.variation_index: v.audio_id for v in suno_status.variations if v.audio_id}
+    if not audio_ids and suno_status.audio_id:
+        audio_ids = {0: suno_status.audio_id}
+    if not audio_ids:
+        print(f"⚠️ [POLL] No audio_id available, skipping timestamped lyrics fetch")
+        logger.warning(f"No audio_id available for task: {task_id}, skipping timestamped lyrics")
+        return
+    
+    print(f"🎵 [POLL] Fetching timestamped lyrics for variations: {sorted(audio_ids)}")
+    fetches = {
+        asyncio.create_task(_fetch_variation_timestamps(task_id, index, audio_id)): index
+        for index, audio_id in audio_ids.items()
+    }
+    done, pending = await asyncio.wait(fetches, timeout=TIMESTAMPS_FETCH_TIMEOUT)
+    for fetch in pending:
+        fetch.cancel()
+    
+    ready = []
+    for fetch in done:
+        if fetch.exception() is not None:
+            # Log error but don't block song delivery (Requirements: 2.4)
+            print(f"⚠️ [POLL] Failed to fetch timestamped lyrics: {fetch.exception()}")
+            logger.warning(
+                f"Failed to fetch timestamped lyrics for task: {task_id}",
+                extra={
+                    "extra_fields": {
                         "task_id": task_id,
-                        "status": generation_status.value,
-                        "progress": suno_status.progress,
-                        "song_url": suno_status.song_url,
-                        "variations": [
-                            {
-                                "audio_url": v.audio_url,
-                                "audio_id": v.audio_id,
-                                "variation_index": v.variation_index,
-                            }
-                            for v in suno_status.variations
-                        ],
-                        "error": suno_status.error,
+                        "variation_index": fetches[fetch],
+                        "error": str(fetch.exception()),
                     }
-                    
-                    # Broadcast to all connected clients
-                    await broadcast_status_update(task_id, status_update)
-                    
-                    # Update Firestore
-                    await update_task_status(
-                        task_id=task_id,
-                        status=generation_status.value,
-                        progress=suno_status.progress,
-                        song_url=suno_status.song_url,
-                        error=suno_status.error,
-                        variations=[
-                            {
-                                "audio_url": v.audio_url,
-                                "audio_id": v.audio_id,
-                                "variation_index": v.variation_index,
-                            }
-                            for v in suno_status.variations
-                        ],
-                    )
-                    
-                    logger.info(
-                        f"Polled task {task_id}: status={generation_status.value}, progress={suno_status.progress}"
-                    )
-                    
-                    # Check if task is complete
-                    if generation_status in [GenerationStatus.COMPLETED, GenerationStatus.FAILED]:
-                        if generation_status == GenerationStatus.COMPLETED:
-                            print(f"✅ [POLL] Task COMPLETED! Song URL: {suno_status.song_url}")
-                            
-                            # Fetch timestamped lyrics after song completion (Requirements: 1.1, 2.1)
-                            if suno_status.audio_id:
-                                print(f"🎵 [POLL] Fetching timestamped lyrics for audio_id: {suno_status.audio_id}")
-                                try:
-                                    timestamped_lyrics = await suno_client.get_timestamped_lyrics(
-                                        task_id=task_id,
-                                        audio_id=suno_status.audio_id,
-                                    )
-                                    
-                                    if timestamped_lyrics and timestamped_lyrics.aligned_words:
-                                        # Convert AlignedWord dataclasses to dicts for storage
-                                        aligned_words_dicts = [
-                                            {
-                                                "word": aw.word,
-                                                "startS": aw.start_s,
-                                                "endS": aw.end_s,
-                                                "success": aw.success,
-                                                "palign": aw.palign,
-                                            }
-                                            for aw in timestamped_lyrics.aligned_words
-                                        ]
-                                        
-                                        # Store timestamped lyrics with song metadata
-                                        await store_timestamped_lyrics(
-                                            task_id=task_id,
-                                            aligned_words=aligned_words_dicts,
-                                            waveform_data=timestamped_lyrics.waveform_data,
-                                        )
-                                        print(f"✅ [POLL] Stored {len(aligned_words_dicts)} aligned words for task: {task_id}")
-                                        logger.info(
-                                            f"Timestamped lyrics stored for task: {task_id}",
-                                            extra={
-                                                "extra_fields": {
-                                                    "task_id": task_id,
-                                                    "aligned_words_count": len(aligned_words_dicts),
-                                                }
-                                            }
-                                        )
-                                    else:
-                                        print(f"⚠️ [POLL] No timestamped lyrics available for task: {task_id}")
-                                        logger.info(f"No timestamped lyrics available for task: {task_id}")
-                                except Exception as e:
-                                    # Log error but don't block song delivery (Requirements: 2.4)
-                                    print(f"⚠️ [POLL] Failed to fetch timestamped lyrics: {e}")
-                                    logger.warning(
-                                        f"Failed to fetch timestamped lyrics for task: {task_id}",
-                                        extra={
-                                            "extra_fields": {
-                                                "task_id": task_id,
-                                                "error": str(e),
-                                            }
-                                        }
-                                    )
-                            else:
-                                print(f"⚠️ [POLL] No audio_id available, skipping timestamped lyrics fetch")
-                                logger.warning(f"No audio_id available for task: {task_id}, skipping timestamped lyrics")
-                        else:
-                            print(f"❌ [POLL] Task FAILED! Error: {suno_status.error}")
-                        logger.info(f"Task {task_id} reached terminal state: {generation_status.value}")
-                        break
-                    
-                except SunoAPIError as e:
-                    print(f"⚠️ [POLL] Suno API error: {e}")
-                    logger.error(f"Suno API error while polling task {task_id}: {e}")
-                    # Continue polling on transient errors
-                
-                except Exception as e:
-                    print(f"⚠️ [POLL] Unexpected error: {type(e).__name__}: {e}")
-                    logger.error(f"Unexpected error while polling task {task_id}: {e}")
-                    # Continue polling on transient errors
-                
-                # Wait before next poll
-                print(f"💤 [POLL] Sleeping {POLL_INTERVAL}s before next poll...")
-                await asyncio.sleep(POLL_INTERVAL)
-    
-    except asyncio.CancelledError:
-        logger.info(f"Polling cancelled for task: {task_id}")
-        raise
-    
-    except Exception as e:
-        logger.error(f"Fatal error in polling for task {task_id}: {e}")
-        await broadcast_status_update(task_id, {
-            "task_id": task_id,
-            "status": GenerationStatus.FAILED.value,
-            "progress": 0,
-            "error": "An error occurred while tracking generation progress.",
-        })
+                }
+            )
+        elif fetch.result():
+            ready.append(fetches[fetch])
+    if pending:
+        logger.warning(
+            f"Timed out fetching timestamped lyrics for task: {task_id}",
+            extra={
+                "extra_fields": {
+                    "task_id": task_id,
+                    "variation_indexes": sorted(fetches[fetch] for fetch in pending),
+                    "timeout": TIMESTAMPS_FETCH_TIMEOUT,
+                }
+            }
+        )
     
-    finally:
-        # Clean up polling task reference
-        manager.polling_tasks.pop(task_id, None)
-        logger.info(f"Polling ended for task: {task_id}")
+    if ready and manager.has_active_connections(task_id):
+        await broadcast_status_update(task_id, {**status_update, "timestamp_variations": sorted(ready)})
+
+
+# Every fresh result from the shared poller is fanned out to subscribers
+get_suno_poller().add_listener(handle_poll_result)
 
 
 async def broadcast_status_update(task_id: str, status_update: dict) -> None:
@@ -468,7 +437,7 @@ async def subscribe(sid: str, data: dict):
     }, to=sid)
     
     # Get current task status and send to client
-    task_data = await get_task_from_firestore(task_id)
+    task_data = await get_task_from_firestore(task_id, fields=TASK_STATUS_FIELDS)
     if task_data:
         current_status = {
             "task_id": task_id,
@@ -487,14 +456,10 @@ async def subscribe(sid: str, data: dict):
         }
         await send_status_to_client(sid, current_status)
         
-        # Start polling if task is not in terminal state and no polling is active
+        # Start polling if task is not in terminal state (no-op if already watched)
         status = task_data.get("status")
         if status not in [GenerationStatus.COMPLETED.value, GenerationStatus.FAILED.value]:
-            existing_polling = manager.get_polling_task(task_id)
-            if not existing_polling or existing_polling.done():
-                polling_task = asyncio.create_task(poll_and_broadcast(task_id))
-                manager.set_polling_task(task_id, polling_task)
-                logger.info(f"Started polling for task: {task_id}")
+            await start_polling(task_id)
 
 
 @sio.event
@@ -3,14 +3,29 @@ Authentication module for Firebase token verification.
 
 This module provides FastAPI dependencies for authenticating users
 via Firebase ID tokens passed in the Authorization header.
+
+Verified tokens are cached in process, keyed by a SHA-256 digest of the
+token and valid until the token's exp claim, so repeat requests with the
+same token (status polling, Socket.IO subscribes) skip the signature
+check. With AUTH_CHECK_REVOKED=true, tokens are also checked against
+revocation, and cached entries are re-verified at least every
+AUTH_REVOCATION_CHECK_INTERVAL seconds.
 """
+import hashlib
+import logging
 import os
-from typing import Optional
+import time
+from typing import Any, Dict, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import firebase_admin
 from firebase_admin import auth
 
+from app.services.memory_cache import MISSING, MemoryCache
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
 
 # HTTP Bearer token security scheme
 security = HTTPBearer()
@@ -20,6 +35,121 @@ DEV_AUTH_TOKEN = 'dev-token-local'
 DEV_USER_ID = 'dev-user-local'
 IS_DEVELOPMENT = os.getenv('ENVIRONMENT', 'development').lower() == 'development'
 
+# Also reject tokens revoked by the Firebase Auth backend (costs a user lookup)
+AUTH_CHECK_REVOKED = os.getenv('AUTH_CHECK_REVOKED', 'false').lower() == 'true'
+
+# Seconds a cached token is trusted before revocation is checked again
+AUTH_REVOCATION_CHECK_INTERVAL = float(os.getenv('AUTH_REVOCATION_CHECK_INTERVAL', '300'))
+
+# Verified token cache; Firebase ID tokens live for one hour
+AUTH_TOKEN_CACHE_MAX_BYTES = int(os.getenv('AUTH_TOKEN_CACHE_MAX_BYTES', str(1024 * 1024)))
+AUTH_TOKEN_CACHE_MAX_TTL = float(os.getenv('AUTH_TOKEN_CACHE_MAX_TTL', '3600'))
+
+# (uid, expires_at epoch seconds) keyed by token digest
+_token_cache = MemoryCache(
+    name='verified_tokens',
+    max_bytes=AUTH_TOKEN_CACHE_MAX_BYTES,
+    ttl=AUTH_TOKEN_CACHE_MAX_TTL,
+    negative_ttl=0,
+)
+
+# Signature checks performed and rejected, for monitoring
+_verification_counts = {'verifications': 0, 'failures': 0}
+
+
+def _token_digest(token: str) -> str:
+    """Get the cache key of a token (the raw token is never stored)."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _verify_id_token(token: str) -> Optional[str]:
+    """
+    Verify a Firebase ID token and return its UID.
+    
+    Tokens verified before are answered from the cache until they expire.
+    Failed verifications are never cached.
+    
+    Args:
+        token: Firebase ID token string
+        
+    Returns:
+        The token's UID, or None if the token carries no UID
+        
+    Raises:
+        The firebase_admin.auth errors raised by verify_id_token
+    """
+    key = _token_digest(token)
+    cached = _token_cache.lookup(key)
+    if cached is not MISSING:
+        user_id, expires_at = cached
+        if expires_at > time.time():
+            return user_id
+        _token_cache.invalidate(key)
+    
+    _verification_counts['verifications'] += 1
+    try:
+        if AUTH_CHECK_REVOKED:
+            decoded_token = auth.verify_id_token(token, check_revoked=True)
+        else:
+            decoded_token = auth.verify_id_token(token)
+    except Exception:
+        _verification_counts['failures'] += 1
+        raise
+    
+    user_id = decoded_token.get("uid")
+    expires_at = decoded_token.get("exp")
+    if user_id and isinstance(expires_at, (int, float)):
+        if AUTH_CHECK_REVOKED:
+            expires_at = min(expires_at, time.time() + AUTH_REVOCATION_CHECK_INTERVAL)
+        if expires_at > time.time():
+            _token_cache.set(key, (user_id, expires_at))
+    return user_id
+
+
+def get_token_cache() -> MemoryCache:
+    """Get the in-process verified token cache."""
+    return _token_cache
+
+
+def get_token_cache_stats() -> Dict[str, Any]:
+    """Get token cache counters and verification totals for monitoring."""
+    return {
+        **_token_cache.stats(),
+        **_verification_counts,
+        'check_revoked': AUTH_CHECK_REVOKED,
+    }
+
+
+def clear_token_cache() -> None:
+    """Drop all cached tokens, e.g. after revoking a user's sessions."""
+    _token_cache.clear()
+    _verification_counts.update(verifications=0, failures=0)
+
+
+def prewarm_token_certificates() -> bool:
+    """
+    Fetch Google's token signing certificates before the first request.
+    
+    The Admin SDK caches the certificates per their Cache-Control headers;
+    fetching them at startup keeps that download off the first request.
+    Blocking; run it in a thread. Failures are logged and only mean the
+    first verification fetches the certificates itself.
+    
+    Returns:
+        True if the certificates were fetched
+    """
+    try:
+        # The SDK has no public hook; this is the request object its
+        # verifier uses, so the fetched certificates land in its cache
+        verifier = auth._get_client(firebase_admin.get_app())._token_verifier
+        response = verifier.request(verifier.id_token_verifier.cert_url)
+        if response.status != 200:
+            raise RuntimeError(f"certificate fetch returned HTTP {response.status}")
+        return True
+    except Exception as e:
+        logger.warning(f"Token certificate pre-warm failed: {e}")
+        return False
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -68,11 +198,8 @@ async def get_current_user(
         return DEV_USER_ID
     
     try:
-        # Verify the Firebase ID token
-        decoded_token = auth.verify_id_token(token)
-        
-        # Extract user ID from the decoded token
-        user_id = decoded_token.get("uid")
+        # Verify the Firebase ID token and extract the user ID
+        user_id = _verify_id_token(token)
         
         if not user_id:
             raise HTTPException(
@@ -167,11 +294,8 @@ async def verify_websocket_token(token: str) -> Optional[str]:
         return DEV_USER_ID
     
     try:
-        # Verify the Firebase ID token
-        decoded_token = auth.verify_id_token(token)
-        
-        # Extract user ID from the decoded token
-        user_id = decoded_token.get("uid")
+        # Verify the Firebase ID token and extract the user ID
+        user_id = _verify_id_token(token)
         
         return user_id if user_id else None
     
@@ -3,17 +3,32 @@ Firebase Admin SDK configuration and initialization.
 
 This module initializes the Firebase Admin SDK and provides
 a Firestore client instance for use throughout the application.
+
+The Firestore client is synchronous, so every blocking call made from
+async code must go through run_firestore() (or stream_documents()),
+which executes it on a bounded thread pool instead of the event loop.
 """
+import asyncio
+import functools
 import os
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
 import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore import Client
 
 
+T = TypeVar("T")
+
 # Global Firestore client instance
 _firestore_client: Optional[Client] = None
 
+# Maximum number of Firestore calls in flight per worker process
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "32"))
+
+# Bounded executor for blocking Firestore calls (created lazily)
+_firestore_executor: Optional[ThreadPoolExecutor] = None
+
 
 def initialize_firebase() -> None:
     """
@@ -72,5 +87,75 @@ def get_firestore_client() -> Client:
     return _firestore_client
 
 
+def get_firestore_executor() -> ThreadPoolExecutor:
+    """
+    Get the bounded executor used for blocking Firestore calls.
+    
+    Returns:
+        ThreadPoolExecutor: Executor with FIRESTORE_MAX_WORKERS threads
+    """
+    global _firestore_executor
+    
+    if _firestore_executor is None:
+        _firestore_executor = ThreadPoolExecutor(
+            max_workers=FIRESTORE_MAX_WORKERS,
+            thread_name_prefix="firestore",
+        )
+    return _firestore_executor
+
+
+async def run_firestore(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking Firestore call without stalling the event loop.
+    
+    Args:
+        func: Synchronous callable, e.g. ``doc_ref.get`` or ``doc_ref.update``
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+        
+    Returns:
+        The value returned by func
+        
+    Example:
+        doc = await run_firestore(doc_ref.get)
+        await run_firestore(doc_ref.update, {"status": "completed"})
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_firestore_executor(),
+        functools.partial(func, *args, **kwargs),
+    )
+
+
+async def stream_documents(query: Any) -> list:
+    """
+    Execute a Firestore query and collect all snapshots off the event loop.
+    
+    ``query.stream()`` is a lazy generator that performs network I/O while
+    it is iterated, so the whole iteration runs on the executor.
+    
+    Args:
+        query: Firestore query or collection reference
+        
+    Returns:
+        list: Document snapshots returned by the query
+    """
+    return await run_firestore(lambda: list(query.stream()))
+
+
+def shutdown_firestore_executor() -> None:
+    """
+    Shut down the Firestore executor, waiting for in-flight calls.
+    
+    Called on application shutdown. A new executor is created lazily
+    if run_firestore() is used again afterwards.
+    """
+    global _firestore_executor
+    
+    if _firestore_executor is not None:
+        _firestore_executor.shutdown(wait=True)
+        _firestore_executor = None
+
+
 # Convenience export for direct import
 firestore_client = get_firestore_client
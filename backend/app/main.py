@@ -1,15 +1,27 @@
 """
 FastAPI application entry point for AI Learning Song Creator.
 """
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from app.core.firebase import initialize_firebase
+from app.core.auth import get_token_cache_stats, prewarm_token_certificates
+from app.core.firebase import initialize_firebase, shutdown_firestore_executor
 from app.core.logging import configure_logging, RequestLoggingMiddleware
 from app.api.lyrics import router as lyrics_router
 from app.api.songs import router as songs_router
+from app.api.webhooks import router as webhooks_router
 from app.api.websocket import get_socket_app
+from app.services.ai_pipeline import close_lyrics_pipeline, get_lyrics_pipeline
+from app.services.cache import get_hit_stats
+from app.services.expiry_sweeper import get_expiry_sweeper
+from app.services.google_search import close_search_service
+from app.services.rate_limiter import get_quota_cache
+from app.services.song_storage import get_share_cache, get_song_cache
+from app.services.suno_client import close_suno_client, get_suno_client
+from app.services.suno_poller import get_suno_poller
 
 # Load environment variables
 load_dotenv()
@@ -18,10 +30,54 @@ load_dotenv()
 log_level = os.getenv("LOG_LEVEL", "INFO")
 configure_logging(log_level=log_level)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services on startup and release them on shutdown."""
+    try:
+        initialize_firebase()
+    except Exception as e:
+        # Log the error but don't crash the app in development
+        print(f"Warning: Firebase initialization failed: {e}")
+        print("The app will continue but Firebase-dependent features will not work.")
+    else:
+        # Fetch token signing certificates before the first request needs them
+        await asyncio.to_thread(prewarm_token_certificates)
+        # Delete expired songs and share links in the background
+        get_expiry_sweeper().start()
+
+    # Create the pooled Suno client up front so all requests share it
+    if os.getenv("SUNO_API_KEY"):
+        get_suno_client()
+
+    # Compile the lyrics graph once, before the first request needs it
+    if os.getenv("OPENAI_API_KEY"):
+        get_lyrics_pipeline()
+
+    # Flush cache hit statistics in the background
+    get_hit_stats().start()
+
+    yield
+
+    # Stop polling and sweeping before closing the client polls use, flush
+    # pending hit stats, then drain Firestore work
+    await get_suno_poller().stop()
+    await get_expiry_sweeper().stop()
+    await close_suno_client()
+    await close_lyrics_pipeline()
+    await close_search_service()
+    try:
+        await get_hit_stats().stop()
+    except Exception as e:
+        print(f"Warning: Failed to flush cache hit stats: {e}")
+    shutdown_firestore_executor()
+
+
 app = FastAPI(
     title="AI Learning Song Creator API",
     description="Backend API for generating educational songs with AI",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Mount Socket.IO app for WebSocket support
@@ -29,17 +85,6 @@ app = FastAPI(
 socket_app = get_socket_app()
 app.mount("/socket.io", socket_app)
 
-# Initialize Firebase on startup
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on application startup."""
-    try:
-        initialize_firebase()
-    except Exception as e:
-        # Log the error but don't crash the app in development
-        print(f"Warning: Firebase initialization failed: {e}")
-        print("The app will continue but Firebase-dependent features will not work.")
-
 # Add request logging middleware
 app.add_middleware(RequestLoggingMiddleware)
 
@@ -50,6 +95,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the frontend read the history page cursor
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -65,6 +112,19 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Counters of the app-wide caches and background jobs for monitoring."""
+    return {
+        "auth_cache": get_token_cache_stats(),
+        "quota_cache": get_quota_cache().stats(),
+        "song_cache": get_song_cache().stats(),
+        "share_cache": get_share_cache().stats(),
+        "expiry_sweeper": get_expiry_sweeper().stats(),
+    }
+
+
 # Register API routers
 app.include_router(lyrics_router)
 app.include_router(songs_router)
+app.include_router(webhooks_router)
@@ -70,6 +70,10 @@ class GenerateSongResponse(BaseModel):
         description="Estimated time to complete generation in seconds",
         ge=0
     )
+    status: Optional["SongStatusUpdate"] = Field(
+        default=None,
+        description="Completed status when the song was served from cache"
+    )
 
 
 class GenerationStatus(str, Enum):
@@ -136,6 +140,13 @@ class SongStatusUpdate(BaseModel):
         default=None,
         description="Error message (when failed)"
     )
+    timestamp_variations: list[int] = Field(
+        default_factory=list,
+        description="Variations whose timestamped lyrics are stored (sent in a follow-up update once ready)"
+    )
+
+
+GenerateSongResponse.model_rebuild()
 
 
 class AlignedWordDict(BaseModel):
@@ -327,3 +338,57 @@ class ShareLinkResponse(BaseModel):
             datetime: lambda v: v.isoformat()
         }
     }
+
+
+class SunoCallbackTrack(BaseModel):
+    """A generated track in a Suno callback payload."""
+    
+    id: str = Field(
+        ...,
+        description="Suno audio ID of the track"
+    )
+    audio_url: Optional[str] = Field(
+        default=None,
+        description="URL of the track audio (empty until generation completes)"
+    )
+    
+    model_config = {"extra": "ignore"}
+
+
+class SunoCallbackData(BaseModel):
+    """Task details in a Suno callback payload."""
+    
+    callbackType: str = Field(
+        ...,
+        description="Generation stage: text, first, complete or error"
+    )
+    task_id: str = Field(
+        ...,
+        min_length=1,
+        description="Suno task ID the callback refers to"
+    )
+    data: Optional[list[SunoCallbackTrack]] = Field(
+        default=None,
+        description="Generated tracks (present for first/complete stages)"
+    )
+    
+    model_config = {"extra": "ignore"}
+
+
+class SunoCallbackPayload(BaseModel):
+    """Body of a generation callback posted by the Suno API to SUNO_CALLBACK_URL."""
+    
+    code: int = Field(
+        ...,
+        description="Result code (200 on success)"
+    )
+    msg: str = Field(
+        default="",
+        description="Result message (error description on failure)"
+    )
+    data: SunoCallbackData = Field(
+        ...,
+        description="Task details"
+    )
+    
+    model_config = {"extra": "ignore"}
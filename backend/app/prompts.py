@@ -50,6 +50,19 @@ REGENERATE_SUMMARIZE_PROMPT = ChatPromptTemplate.from_messages([
     ("user", "{content}")
 ])
 
+# Map step for long inputs: each chunk is condensed before the normal
+# summarize prompt runs over the combined chunk notes
+SUMMARIZE_CHUNK_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an educational content expert. This is part {chunk_index} of {chunk_count} 
+    of a longer document. Extract the key facts, concepts, examples, numbers and names from 
+    this part as concise bullet points (max 150 words).
+    
+    - Keep only information that would help someone learn the topic
+    - Do not add an introduction or conclusion
+    - Do not mention that this is one part of a larger document"""),
+    ("user", "{content}")
+])
+
 CONVERT_TO_LYRICS_PROMPT = ChatPromptTemplate.from_messages([
     ("system", """You are a creative songwriter specializing in educational songs. 
     Convert the provided learning points into engaging, memorable song lyrics.
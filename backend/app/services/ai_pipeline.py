@@ -1,17 +1,64 @@
-"""AI Pipeline Service for generating lyrics from educational content."""
+"""AI Pipeline Service for generating lyrics from educational content.
 
+The compiled graph and its ChatOpenAI client are built once per process
+(see get_lyrics_pipeline) and share one pooled HTTP transport. The LLM
+temperature is passed per invocation through the graph config.
+
+Long inputs are summarized map-reduce style: the text is split on
+paragraph/sentence boundaries, chunks are condensed concurrently, and the
+normal summarize step runs over the combined chunk notes.
+"""
+
+import asyncio
 import hashlib
 import logging
+import os
+import re
 import time
-from typing import TypedDict, Optional
+from typing import Any, AsyncIterator, List, TypedDict, Optional
+import httpx
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
 from app.services.google_search import get_search_service
-from app.prompts import SUMMARIZE_CONTENT_PROMPT, CONVERT_TO_LYRICS_PROMPT
+from app.prompts import SUMMARIZE_CONTENT_PROMPT, SUMMARIZE_CHUNK_PROMPT, CONVERT_TO_LYRICS_PROMPT
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# LLM configuration
+LLM_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.7
+REGENERATION_TEMPERATURE = 0.9
+
+# Map-reduce summarization for long inputs
+MAP_REDUCE_THRESHOLD_WORDS = int(os.getenv("LYRICS_MAP_REDUCE_THRESHOLD_WORDS", "1500"))
+CHUNK_MAX_WORDS = int(os.getenv("LYRICS_CHUNK_MAX_WORDS", "800"))
+MAX_CONCURRENT_CHUNK_SUMMARIES = int(os.getenv("LYRICS_MAX_CONCURRENT_CHUNKS", "4"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+# Stage reported to streaming clients when each graph node starts
+NODE_STAGES = {
+    "check_search": "checking_search",
+    "google_search": "searching",
+    "clean": "cleaning",
+    "map_summarize": "summarizing",
+    "summarize": "summarizing",
+    "validate": "validating",
+    "convert": "converting",
+}
+
+# Connection pool for the shared OpenAI transport
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60.0"))
+
+# Process-wide shared instances (created lazily)
+_openai_http_client: Optional[httpx.AsyncClient] = None
+_lyrics_pipeline: Optional["LyricsPipeline"] = None
+
 
 class PipelineState(TypedDict):
     """State object for the lyrics generation pipeline."""
@@ -27,24 +74,53 @@ class PipelineState(TypedDict):
     current_stage: str
     variation_counter: int  # Which regeneration attempt (1, 2, 3, etc.)
     previous_lyrics: str  # Previous generated lyrics to avoid repeating
+    chunk_summaries: List[str]  # Map step output for long inputs (empty otherwise)
 
 
 class LyricsPipeline:
     """LangGraph-based pipeline for converting educational content to lyrics."""
     
-    def __init__(self, temperature: float = 0.7):
+    def __init__(self, temperature: float = DEFAULT_TEMPERATURE, llm: Optional[Any] = None):
         """
         Initialize the lyrics generation pipeline.
         
+        Prefer get_lyrics_pipeline() in request handlers; constructing a
+        pipeline compiles the graph and creates an LLM client.
+        
         Args:
-            temperature: LLM temperature for creativity (0.0-1.0).
+            temperature: Default LLM temperature for creativity (0.0-1.0).
                         Default 0.7 for balanced creativity.
                         Use 0.9+ for regeneration to increase variation.
+                        Can be overridden per call in execute().
+            llm: Chat model to use. Defaults to ChatOpenAI on the shared
+                 pooled HTTP transport.
         """
-        self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=temperature)
+        self.temperature = temperature
+        self.llm = llm or ChatOpenAI(
+            model=LLM_MODEL,
+            temperature=temperature,
+            http_async_client=get_openai_http_client(),
+        )
         self.graph = self._build_graph()
         logger.info(f"LyricsPipeline initialized with temperature={temperature}")
     
+    def _get_llm(self, config: Optional[RunnableConfig] = None) -> Any:
+        """
+        Get the LLM for one invocation.
+        
+        Args:
+            config: Graph config; configurable.temperature overrides the
+                    pipeline's default temperature for this call
+            
+        Returns:
+            The shared LLM, bound to the requested temperature if it differs
+        """
+        configurable = (config or {}).get("configurable") or {}
+        temperature = configurable.get("temperature")
+        if temperature is None or temperature == self.temperature:
+            return self.llm
+        return self.llm.bind(temperature=temperature)
+    
     def _build_graph(self) -> StateGraph:
         """Build the LangGraph state machine for lyrics generation."""
         workflow = StateGraph(PipelineState)
@@ -53,6 +129,7 @@ class LyricsPipeline:
         workflow.add_node("check_search", self._check_search_needed)
         workflow.add_node("google_search", self._google_search_grounding)
         workflow.add_node("clean", self._clean_text)
+        workflow.add_node("map_summarize", self._map_summarize)
         workflow.add_node("summarize", self._summarize)
         workflow.add_node("validate", self._validate_summary_length)
         workflow.add_node("convert", self._convert_to_lyrics)
@@ -78,8 +155,35 @@ class LyricsPipeline:
         # Add edge from google_search to clean
         workflow.add_edge("google_search", "clean")
         
-        # Add edge from clean to summarize
-        workflow.add_edge("clean", "summarize")
+        # Add conditional edge from clean: long inputs are condensed chunk
+        # by chunk first, then summarize reduces the chunk notes
+        def route_after_clean(state: PipelineState) -> str:
+            """Route to map_summarize for long inputs, otherwise to summarize."""
+            word_count = len(state["cleaned_text"].split())
+            return "map_summarize" if word_count > MAP_REDUCE_THRESHOLD_WORDS else "summarize"
+        
+        workflow.add_conditional_edges(
+            "clean",
+            route_after_clean,
+            {
+                "map_summarize": "map_summarize",
+                "summarize": "summarize"
+            }
+        )
+        
+        # Add conditional edge from map_summarize
+        def route_after_map(state: PipelineState) -> str:
+            """Route to summarize (reduce) unless a chunk failed."""
+            return "error" if state.get("error") else "summarize"
+        
+        workflow.add_conditional_edges(
+            "map_summarize",
+            route_after_map,
+            {
+                "summarize": "summarize",
+                "error": "error"
+            }
+        )
         
         # Add edge from summarize to validate
         workflow.add_edge("summarize", "validate")
@@ -241,41 +345,131 @@ class LyricsPipeline:
         )
         return state
     
-    async def _summarize(self, state: PipelineState) -> PipelineState:
+    async def _map_summarize(
+        self,
+        state: PipelineState,
+        config: Optional[RunnableConfig] = None
+    ) -> PipelineState:
+        """
+        Condense a long input chunk by chunk (map step).
+        
+        Chunks are summarized concurrently, at most
+        MAX_CONCURRENT_CHUNK_SUMMARIES at a time. The notes are kept in
+        order in chunk_summaries for the summarize (reduce) step.
+        
+        Args:
+            state: Current pipeline state
+            config: Graph config carrying the per-call temperature
+            
+        Returns:
+            Updated state with chunk_summaries
+        """
+        start_time = time.time()
+        chunks = split_into_chunks(state["cleaned_text"])
+        logger.info(
+            "Pipeline stage: map_summarize",
+            extra={
+                'extra_fields': {
+                    'stage': 'map_summarize',
+                    'input_length': len(state["cleaned_text"]),
+                    'chunk_count': len(chunks)
+                }
+            }
+        )
+        state["current_stage"] = "summarizing"
+        
+        chain = SUMMARIZE_CHUNK_PROMPT | self._get_llm(config)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHUNK_SUMMARIES)
+        
+        async def summarize_chunk(index: int, chunk: str) -> str:
+            async with semaphore:
+                response = await chain.ainvoke({
+                    "content": chunk,
+                    "chunk_index": index + 1,
+                    "chunk_count": len(chunks)
+                })
+                return response.content
+        
+        try:
+            state["chunk_summaries"] = list(await asyncio.gather(
+                *(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks))
+            ))
+            
+            elapsed_time = time.time() - start_time
+            logger.info(
+                f"Summarized {len(chunks)} chunks",
+                extra={
+                    'extra_fields': {
+                        'stage': 'map_summarize',
+                        'execution_time': round(elapsed_time, 3),
+                        'chunk_count': len(chunks),
+                        'notes_length': sum(len(n) for n in state["chunk_summaries"])
+                    }
+                }
+            )
+        except Exception as e:
+            elapsed_time = time.time() - start_time
+            logger.error(
+                f"Chunk summarization failed: {str(e)}",
+                extra={
+                    'extra_fields': {
+                        'stage': 'map_summarize',
+                        'execution_time': round(elapsed_time, 3),
+                        'error': str(e)
+                    }
+                }
+            )
+            state["error"] = f"Failed to summarize content: {str(e)}"
+        
+        return state
+    
+    async def _summarize(
+        self,
+        state: PipelineState,
+        config: Optional[RunnableConfig] = None
+    ) -> PipelineState:
         """
         Extract 3-5 key learning points from content.
         
         Args:
             state: Current pipeline state
+            config: Graph config carrying the per-call temperature
             
         Returns:
             Updated state with summary
         """
         start_time = time.time()
+        
+        # Reduce step for long inputs: summarize the combined chunk notes
+        chunk_summaries = state.get("chunk_summaries") or []
+        content = "\n\n".join(chunk_summaries) if chunk_summaries else state["cleaned_text"]
+        
         logger.info(
             "Pipeline stage: summarize",
             extra={
                 'extra_fields': {
                     'stage': 'summarize',
-                    'input_length': len(state["cleaned_text"]),
+                    'input_length': len(content),
+                    'chunk_count': len(chunk_summaries),
                     'variation_counter': state.get("variation_counter", 1)
                 }
             }
         )
         state["current_stage"] = "summarizing"
+        llm = self._get_llm(config)
         
         # Use regeneration summarization prompt if variation counter > 1
         if state.get("variation_counter", 1) > 1:
             from app.prompts import REGENERATE_SUMMARIZE_PROMPT
-            chain = REGENERATE_SUMMARIZE_PROMPT | self.llm
+            chain = REGENERATE_SUMMARIZE_PROMPT | llm
             prompt_vars = {
-                "content": state["cleaned_text"],
+                "content": content,
                 "variation_counter": state.get("variation_counter", 1)
             }
         else:
             from app.prompts import SUMMARIZE_CONTENT_PROMPT
-            chain = SUMMARIZE_CONTENT_PROMPT | self.llm
-            prompt_vars = {"content": state["cleaned_text"]}
+            chain = SUMMARIZE_CONTENT_PROMPT | llm
+            prompt_vars = {"content": content}
         
         try:
             response = await chain.ainvoke(prompt_vars)
@@ -371,12 +565,17 @@ class LyricsPipeline:
         
         return state
     
-    async def _convert_to_lyrics(self, state: PipelineState) -> PipelineState:
+    async def _convert_to_lyrics(
+        self,
+        state: PipelineState,
+        config: Optional[RunnableConfig] = None
+    ) -> PipelineState:
         """
         Convert summary into structured song lyrics.
         
         Args:
             state: Current pipeline state
+            config: Graph config carrying the per-call temperature
             
         Returns:
             Updated state with lyrics
@@ -394,6 +593,7 @@ class LyricsPipeline:
             }
         )
         state["current_stage"] = "converting"
+        llm = self._get_llm(config)
         
         # Use regeneration prompt if variation counter is provided
         if state.get("variation_counter", 1) > 1 or state.get("previous_lyrics"):
@@ -404,7 +604,7 @@ class LyricsPipeline:
             if state.get("previous_lyrics"):
                 previous_context = f"PATTERNS TO AVOID FROM PREVIOUS VERSION:\n{state['previous_lyrics'][:1000]}\n\nCreate something completely different."
             
-            chain = REGENERATE_TO_LYRICS_PROMPT | self.llm
+            chain = REGENERATE_TO_LYRICS_PROMPT | llm
             prompt_vars = {
                 "summary": state["summary"],
                 "variation_counter": state.get("variation_counter", 1),
@@ -412,7 +612,7 @@ class LyricsPipeline:
             }
         else:
             from app.prompts import CONVERT_TO_LYRICS_PROMPT
-            chain = CONVERT_TO_LYRICS_PROMPT | self.llm
+            chain = CONVERT_TO_LYRICS_PROMPT | llm
             prompt_vars = {"summary": state["summary"]}
         
         try:
@@ -478,12 +678,37 @@ class LyricsPipeline:
         state["current_stage"] = "error"
         return state
     
+    @staticmethod
+    def _initial_state(
+        content: str,
+        search_enabled: bool,
+        variation_counter: int,
+        previous_lyrics: str
+    ) -> PipelineState:
+        """Build the initial graph state for one execution."""
+        return {
+            "user_input": content,
+            "search_enabled": search_enabled,
+            "enriched_content": "",
+            "cleaned_text": "",
+            "summary": "",
+            "summary_valid": False,
+            "lyrics": "",
+            "error": None,
+            "content_hash": "",
+            "current_stage": "initializing",
+            "variation_counter": variation_counter,
+            "previous_lyrics": previous_lyrics,
+            "chunk_summaries": []
+        }
+    
     async def execute(
         self, 
         content: str, 
         search_enabled: bool,
         variation_counter: int = 1,
-        previous_lyrics: str = ""
+        previous_lyrics: str = "",
+        temperature: Optional[float] = None
     ) -> dict:
         """
         Execute the lyrics generation pipeline.
@@ -493,6 +718,8 @@ class LyricsPipeline:
             search_enabled: Whether to use Google Search grounding
             variation_counter: Which regeneration attempt (1, 2, 3, etc.)
             previous_lyrics: Previous generated lyrics to avoid repeating patterns
+            temperature: LLM temperature for this call (defaults to the
+                         pipeline's temperature)
             
         Returns:
             Dictionary with lyrics, content_hash, cached flag, and processing_time
@@ -510,30 +737,23 @@ class LyricsPipeline:
                     'content_length': len(content),
                     'word_count': len(content.split()),
                     'variation_counter': variation_counter,
-                    'has_previous_lyrics': bool(previous_lyrics)
+                    'has_previous_lyrics': bool(previous_lyrics),
+                    'temperature': temperature if temperature is not None else self.temperature
                 }
             }
         )
         
         # Initialize state
-        initial_state: PipelineState = {
-            "user_input": content,
-            "search_enabled": search_enabled,
-            "enriched_content": "",
-            "cleaned_text": "",
-            "summary": "",
-            "summary_valid": False,
-            "lyrics": "",
-            "error": None,
-            "content_hash": "",
-            "current_stage": "initializing",
-            "variation_counter": variation_counter,
-            "previous_lyrics": previous_lyrics
-        }
+        initial_state = self._initial_state(
+            content, search_enabled, variation_counter, previous_lyrics
+        )
         
         try:
             # Invoke the graph
-            result = await self.graph.ainvoke(initial_state)
+            result = await self.graph.ainvoke(
+                initial_state,
+                config={"configurable": {"temperature": temperature}}
+            )
             
             # Check for errors
             if result.get("error"):
@@ -576,3 +796,178 @@ class LyricsPipeline:
                 exc_info=True
             )
             raise
+
+    
+    async def execute_stream(
+        self,
+        content: str,
+        search_enabled: bool,
+        variation_counter: int = 1,
+        previous_lyrics: str = "",
+        temperature: Optional[float] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Execute the pipeline, yielding progress as it happens.
+        
+        Yields, in order:
+            - {"event": "stage", "stage": ...} when each node starts
+              (checking_search, searching, cleaning, summarizing,
+              validating, converting)
+            - {"event": "token", "content": ...} for each lyrics token
+              produced by the convert step
+            - {"event": "complete", ...} with the same fields execute()
+              returns
+        
+        Args:
+            content: Educational content to convert to lyrics
+            search_enabled: Whether to use Google Search grounding
+            variation_counter: Which regeneration attempt (1, 2, 3, etc.)
+            previous_lyrics: Previous generated lyrics to avoid repeating patterns
+            temperature: LLM temperature for this call (defaults to the
+                         pipeline's temperature)
+            
+        Raises:
+            Exception: If pipeline execution fails
+        """
+        start_time = time.time()
+        
+        logger.info(
+            f"Starting streaming pipeline execution",
+            extra={
+                'extra_fields': {
+                    'search_enabled': search_enabled,
+                    'content_length': len(content),
+                    'variation_counter': variation_counter,
+                    'streaming': True
+                }
+            }
+        )
+        
+        initial_state = self._initial_state(
+            content, search_enabled, variation_counter, previous_lyrics
+        )
+        result: Optional[PipelineState] = None
+        last_stage = None
+        
+        async for mode, chunk in self.graph.astream(
+            initial_state,
+            config={"configurable": {"temperature": temperature}},
+            stream_mode=["tasks", "messages", "values"]
+        ):
+            if mode == "tasks":
+                # Task start events carry no result yet
+                stage = NODE_STAGES.get(chunk.get("name"))
+                if stage and stage != last_stage and "result" not in chunk:
+                    last_stage = stage
+                    yield {"event": "stage", "stage": stage}
+            elif mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == "convert" and message.content:
+                    yield {"event": "token", "content": message.content}
+            else:
+                result = chunk
+        
+        if result is None or result.get("error"):
+            error = result.get("error") if result else "Pipeline produced no result"
+            logger.error(f"Streaming pipeline failed: {error}")
+            raise Exception(error)
+        
+        processing_time = time.time() - start_time
+        logger.info(
+            f"Streaming pipeline completed successfully in {processing_time:.2f}s",
+            extra={
+                'extra_fields': {
+                    'total_execution_time': round(processing_time, 3),
+                    'success': True,
+                    'lyrics_length': len(result["lyrics"]),
+                    'content_hash': result["content_hash"][:16],
+                    'streaming': True
+                }
+            }
+        )
+        
+        yield {
+            "event": "complete",
+            "lyrics": result["lyrics"],
+            "content_hash": result["content_hash"],
+            "cached": False,
+            "processing_time": processing_time
+        }
+
+
+def split_into_chunks(text: str, max_words: int = CHUNK_MAX_WORDS) -> List[str]:
+    """
+    Split text into chunks of at most max_words, on natural boundaries.
+    
+    Text is broken at paragraph and sentence boundaries and the pieces are
+    packed greedily into chunks. A single sentence longer than max_words is
+    cut at word boundaries.
+    
+    Args:
+        text: Text to split
+        max_words: Maximum words per chunk
+        
+    Returns:
+        Ordered list of chunks (empty for blank text)
+    """
+    pieces: List[List[str]] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        for sentence in _SENTENCE_BREAK.split(paragraph.strip()):
+            words = sentence.split()
+            for start in range(0, len(words), max_words):
+                pieces.append(words[start:start + max_words])
+    
+    chunks: List[str] = []
+    current: List[str] = []
+    for words in pieces:
+        if current and len(current) + len(words) > max_words:
+            chunks.append(" ".join(current))
+            current = []
+        current.extend(words)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def get_openai_http_client() -> httpx.AsyncClient:
+    """
+    Get the pooled HTTP transport shared by all OpenAI calls.
+    
+    Returns:
+        Process-wide httpx.AsyncClient with keep-alive connection pooling
+    """
+    global _openai_http_client
+    if _openai_http_client is None or _openai_http_client.is_closed:
+        _openai_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=OPENAI_TIMEOUT,
+        )
+    return _openai_http_client
+
+
+def get_lyrics_pipeline() -> LyricsPipeline:
+    """
+    Get the process-wide lyrics pipeline.
+    
+    The graph is compiled and the LLM client created on first use only.
+    Pass temperature to execute() to vary it per request.
+    
+    Returns:
+        Shared LyricsPipeline instance
+    """
+    global _lyrics_pipeline
+    if _lyrics_pipeline is None:
+        _lyrics_pipeline = LyricsPipeline()
+    return _lyrics_pipeline
+
+
+async def close_lyrics_pipeline() -> None:
+    """Drop the shared pipeline and close its HTTP transport (call on shutdown)."""
+    global _lyrics_pipeline, _openai_http_client
+    _lyrics_pipeline = None
+    if _openai_http_client is not None:
+        await _openai_http_client.aclose()
+        _openai_http_client = None
@@ -4,18 +4,79 @@ Cache service for storing and retrieving generated lyrics.
 This module implements content-based caching using SHA-256 hashing
 to reduce redundant API calls and improve response times. Cached
 lyrics are stored in Firestore with hit tracking and access timestamps.
+
+An in-process L1 (LRU/TTL, bounded by bytes) sits in front of the
+cached_songs collection, so hot entries and recent misses are answered
+from memory and concurrent lookups for one key share a single read.
+Hit statistics are written behind in batches, so cache hits are read-only.
 """
 
 import hashlib
 import logging
+import os
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Any, Dict, List, Optional
 
-from app.core.firebase import get_firestore_client
+from app.core.firebase import get_firestore_client, run_firestore
+from app.services.cache_stats import CacheHitStats
+from app.services.memory_cache import MemoryCache
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Firestore collection holding both lyrics and song cache entries
+CACHE_COLLECTION = 'cached_songs'
+
+# L1 cache configuration
+L1_MAX_BYTES = int(os.getenv('CACHE_L1_MAX_BYTES', str(16 * 1024 * 1024)))
+L1_TTL_SECONDS = float(os.getenv('CACHE_L1_TTL_SECONDS', '600'))
+L1_NEGATIVE_TTL_SECONDS = float(os.getenv('CACHE_L1_NEGATIVE_TTL_SECONDS', '30'))
+
+# In-process L1 keyed by cached_songs document ID
+_l1_cache = MemoryCache(
+    name=CACHE_COLLECTION,
+    max_bytes=L1_MAX_BYTES,
+    ttl=L1_TTL_SECONDS,
+    negative_ttl=L1_NEGATIVE_TTL_SECONDS,
+)
+
+# Write-behind hit_count/last_accessed aggregator for cached_songs
+_hit_stats = CacheHitStats(collection=CACHE_COLLECTION)
+
+
+def get_l1_cache() -> MemoryCache:
+    """Get the in-process L1 cache for the cached_songs collection."""
+    return _l1_cache
+
+
+def get_hit_stats() -> CacheHitStats:
+    """Get the write-behind hit statistics aggregator."""
+    return _hit_stats
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Get L1 counters and occupancy plus the pending hit-stats backlog."""
+    return {**_l1_cache.stats(), 'hit_stats': _hit_stats.stats()}
+
+
+async def _get_cache_entry(doc_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a cached_songs document through the L1 cache.
+    
+    Args:
+        doc_id: Document ID (content hash, or content hash and style)
+        
+    Returns:
+        The document data, or None if it does not exist
+    """
+    async def load() -> Optional[Dict[str, Any]]:
+        firestore_client = get_firestore_client()
+        cache_ref = firestore_client.collection(CACHE_COLLECTION).document(doc_id)
+        cache_doc = await run_firestore(cache_ref.get)
+        return cache_doc.to_dict() if cache_doc.exists else None
+    
+    return await _l1_cache.get_or_load(doc_id, load)
+
 
 def generate_content_hash(content: str) -> str:
     """
@@ -56,8 +117,9 @@ async def check_lyrics_cache(content_hash: str) -> Optional[Dict[str, Any]]:
     """
     Check if lyrics exist in the cache for the given content hash.
     
-    If a cache hit occurs, updates the hit_count and last_accessed
-    timestamp in Firestore to track cache usage.
+    Lookups go through the in-process L1 before Firestore. If a cache
+    hit occurs, the hit is recorded for the write-behind hit_count and
+    last_accessed update, so the lookup itself never writes.
     
     Args:
         content_hash: SHA-256 hash of the content
@@ -83,11 +145,9 @@ async def check_lyrics_cache(content_hash: str) -> Optional[Dict[str, Any]]:
         }
     )
     
-    firestore_client = get_firestore_client()
-    cache_ref = firestore_client.collection('cached_songs').document(content_hash)
-    cache_doc = cache_ref.get()
+    cache_data = await _get_cache_entry(content_hash)
     
-    if not cache_doc.exists:
+    if cache_data is None:
         logger.info(
             "Cache miss",
             extra={
@@ -99,15 +159,13 @@ async def check_lyrics_cache(content_hash: str) -> Optional[Dict[str, Any]]:
         )
         return None
     
-    cache_data = cache_doc.to_dict()
     current_time = datetime.now(timezone.utc)
     
-    # Update cache statistics
+    # Count the hit in memory; it is flushed to Firestore as an Increment later.
+    # The L1 copy is bumped too so this process reports a current count.
     new_hit_count = cache_data.get('hit_count', 0) + 1
-    cache_ref.update({
-        'hit_count': new_hit_count,
-        'last_accessed': current_time
-    })
+    cache_data['hit_count'] = new_hit_count
+    _hit_stats.record_hit(content_hash, current_time)
     
     logger.info(
         f"Cache hit (hit count: {new_hit_count})",
@@ -160,7 +218,7 @@ async def store_lyrics_cache(
     )
     
     firestore_client = get_firestore_client()
-    cache_ref = firestore_client.collection('cached_songs').document(content_hash)
+    cache_ref = firestore_client.collection(CACHE_COLLECTION).document(content_hash)
     
     current_time = datetime.now(timezone.utc)
     
@@ -177,7 +235,10 @@ async def store_lyrics_cache(
         # Store first 200 characters as preview
         cache_entry['content_preview'] = original_content[:200]
     
-    cache_ref.set(cache_entry)
+    await run_firestore(cache_ref.set, cache_entry)
+    
+    # Replace any negative or stale L1 entry with the new data
+    _l1_cache.set(content_hash, dict(cache_entry))
     
     logger.info(
         "Lyrics cached successfully",
@@ -190,47 +251,102 @@ async def store_lyrics_cache(
     )
 
 
-async def check_song_cache(content_hash: str, style: str) -> Optional[Dict[str, Any]]:
+def song_cache_keys(
+    content_hash: Optional[str],
+    style: str,
+    lyrics: Optional[str] = None
+) -> List[str]:
+    """
+    Get the song cache document IDs for a request, in lookup order.
+    
+    Songs are keyed by the hash of the source content and, independently,
+    by the hash of the final lyrics, so a song still hits when the client
+    did not send a content_hash (e.g. edited or pasted lyrics).
+    
+    Args:
+        content_hash: SHA-256 hash of the source content, if known
+        style: Music style (e.g., 'pop', 'rock', 'jazz')
+        lyrics: Song lyrics, if known
+        
+    Returns:
+        Cache keys: content key first, then lyrics key
+    """
+    keys = []
+    if content_hash:
+        keys.append(f"{content_hash}_{style}")
+    if lyrics and lyrics.strip():
+        keys.append(f"lyrics_{generate_content_hash(lyrics)}_{style}")
+    return keys
+
+
+async def check_song_cache(
+    content_hash: Optional[str],
+    style: str,
+    lyrics: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
     """
     Check if a song exists in the cache for the given content hash and style.
     
-    If a cache hit occurs, updates the hit_count and last_accessed
-    timestamp in Firestore to track cache usage.
+    The content key is tried first, then the lyrics key. A content key
+    entry stored for other lyrics (e.g. after /regenerate or an edit) is
+    skipped, so the user never gets a song for lyrics they didn't send.
+    Lookups go through the in-process L1 before Firestore. If a cache hit
+    occurs, the hit is recorded for the write-behind hit_count and
+    last_accessed update, so the lookup itself never writes.
     
     Args:
-        content_hash: SHA-256 hash of the content
+        content_hash: SHA-256 hash of the content, or None
         style: Music style (e.g., 'pop', 'rock', 'jazz')
+        lyrics: Song lyrics, used for the lyrics-hash key
         
     Returns:
         Dictionary containing cached song data if found, None otherwise.
         Dictionary structure:
             - task_id: The Suno task ID for the cached song
             - song_url: URL to the generated song
+            - variations: Completed variations (may be empty for old entries)
             - estimated_time: 0 for cached results (instant)
             - cached: Always True for cache hits
             - hit_count: Number of times this cache entry has been accessed
             
     Requirements: FR-3
     """
-    cache_key = f"{content_hash}_{style}"
+    lyrics_hash = generate_content_hash(lyrics) if lyrics and lyrics.strip() else None
+    for cache_key in song_cache_keys(content_hash, style, lyrics):
+        result = await _check_song_cache_key(cache_key, lyrics_hash)
+        if result is not None:
+            return result
+    return None
+
+
+async def _check_song_cache_key(
+    cache_key: str,
+    lyrics_hash: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Look up one song cache document and record the hit.
     
+    Args:
+        cache_key: cached_songs document ID
+        lyrics_hash: Hash of the requested lyrics; entries stored with
+            other lyrics are misses (entries without lyrics_hash match)
+        
+    Returns:
+        The cache hit (see check_song_cache), or None
+    """
     logger.info(
         f"Checking song cache for key: {cache_key[:24]}...",
         extra={
             'extra_fields': {
-                'content_hash': content_hash,
-                'style': style,
                 'cache_key': cache_key,
                 'operation': 'song_cache_check'
             }
         }
     )
     
-    firestore_client = get_firestore_client()
-    cache_ref = firestore_client.collection('cached_songs').document(cache_key)
-    cache_doc = cache_ref.get()
+    cache_data = await _get_cache_entry(cache_key)
     
-    if not cache_doc.exists:
+    if cache_data is None:
         logger.info(
             "Song cache miss",
             extra={
@@ -242,8 +358,6 @@ async def check_song_cache(content_hash: str, style: str) -> Optional[Dict[str,
         )
         return None
     
-    cache_data = cache_doc.to_dict()
-    
     # Verify this is a song cache entry (has task_id and song_url)
     if 'task_id' not in cache_data or 'song_url' not in cache_data:
         logger.warning(
@@ -258,14 +372,25 @@ async def check_song_cache(content_hash: str, style: str) -> Optional[Dict[str,
         )
         return None
     
+    if lyrics_hash and cache_data.get('lyrics_hash') not in (None, lyrics_hash):
+        logger.info(
+            "Song cache entry is for other lyrics",
+            extra={
+                'extra_fields': {
+                    'cache_key': cache_key,
+                    'cache_hit': False
+                }
+            }
+        )
+        return None
+    
     current_time = datetime.now(timezone.utc)
     
-    # Update cache statistics
+    # Count the hit in memory; it is flushed to Firestore as an Increment later.
+    # The L1 copy is bumped too so this process reports a current count.
     new_hit_count = cache_data.get('hit_count', 0) + 1
-    cache_ref.update({
-        'hit_count': new_hit_count,
-        'last_accessed': current_time
-    })
+    cache_data['hit_count'] = new_hit_count
+    _hit_stats.record_hit(cache_key, current_time)
     
     logger.info(
         f"Song cache hit (hit count: {new_hit_count})",
@@ -282,6 +407,7 @@ async def check_song_cache(content_hash: str, style: str) -> Optional[Dict[str,
     return {
         'task_id': cache_data['task_id'],
         'song_url': cache_data['song_url'],
+        'variations': [dict(v) for v in cache_data.get('variations') or []],
         'estimated_time': 0,
         'cached': True,
         'hit_count': new_hit_count
@@ -289,44 +415,36 @@ async def check_song_cache(content_hash: str, style: str) -> Optional[Dict[str,
 
 
 async def store_song_cache(
-    content_hash: str,
+    content_hash: Optional[str],
     style: str,
     task_id: str,
-    song_url: str
+    song_url: str,
+    variations: Optional[List[Dict[str, Any]]] = None,
+    lyrics: Optional[str] = None
 ) -> None:
     """
     Store a completed song in the cache.
     
-    Creates a new cache entry in Firestore with the song data and metadata.
-    The cache key is a combination of content_hash and style to allow
-    different styles for the same content.
+    Creates a cache entry in Firestore with the song data and metadata under
+    every key from song_cache_keys: content_hash and style, and lyrics hash
+    and style when lyrics are given, so different styles for the same
+    content are cached separately.
     
     Args:
-        content_hash: SHA-256 hash of the content
+        content_hash: SHA-256 hash of the content, or None
         style: Music style (e.g., 'pop', 'rock', 'jazz')
         task_id: The Suno task ID for the song
         song_url: URL to the generated song
+        variations: Completed variations (audio_url, audio_id, variation_index)
+        lyrics: Song lyrics, used for the lyrics-hash key
         
     Requirements: FR-3
     """
-    cache_key = f"{content_hash}_{style}"
-    
-    logger.info(
-        f"Storing song in cache: {cache_key[:24]}...",
-        extra={
-            'extra_fields': {
-                'content_hash': content_hash,
-                'style': style,
-                'cache_key': cache_key,
-                'task_id': task_id,
-                'operation': 'song_cache_store'
-            }
-        }
-    )
+    cache_keys = song_cache_keys(content_hash, style, lyrics)
+    if not cache_keys:
+        return
     
     firestore_client = get_firestore_client()
-    cache_ref = firestore_client.collection('cached_songs').document(cache_key)
-    
     current_time = datetime.now(timezone.utc)
     
     cache_entry = {
@@ -334,18 +452,39 @@ async def store_song_cache(
         'style': style,
         'task_id': task_id,
         'song_url': song_url,
+        'variations': [dict(v) for v in variations or []],
         'created_at': current_time,
         'last_accessed': current_time,
         'hit_count': 0,
     }
+    if lyrics:
+        cache_entry['lyrics_hash'] = generate_content_hash(lyrics)
     
-    cache_ref.set(cache_entry)
+    for cache_key in cache_keys:
+        logger.info(
+            f"Storing song in cache: {cache_key[:24]}...",
+            extra={
+                'extra_fields': {
+                    'content_hash': content_hash,
+                    'style': style,
+                    'cache_key': cache_key,
+                    'task_id': task_id,
+                    'operation': 'song_cache_store'
+                }
+            }
+        )
+        
+        cache_ref = firestore_client.collection(CACHE_COLLECTION).document(cache_key)
+        await run_firestore(cache_ref.set, cache_entry)
+        
+        # Replace any negative or stale L1 entry with the new data
+        _l1_cache.set(cache_key, dict(cache_entry))
     
     logger.info(
         "Song cached successfully",
         extra={
             'extra_fields': {
-                'cache_key': cache_key,
+                'cache_keys': cache_keys,
                 'task_id': task_id,
                 'cache_stored': True
             }
@@ -0,0 +1,213 @@
+"""
+Write-behind hit statistics for Firestore cache entries.
+
+Cache hits are counted in memory and periodically flushed to Firestore
+as batched firestore.Increment updates, so the hit path never writes.
+Increments are commutative, which avoids lost updates between workers
+and keeps popular entries under the per-document write rate limit.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+
+from app.core.firebase import get_firestore_client, run_firestore
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Seconds between background flushes
+FLUSH_INTERVAL_SECONDS = float(os.getenv('CACHE_STATS_FLUSH_INTERVAL', '30'))
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+
+@dataclass
+class _PendingHits:
+    """Hits accumulated for one document since the last flush."""
+
+    count: int
+    last_accessed: datetime
+
+
+class CacheHitStats:
+    """
+    Accumulates cache hits in memory and flushes them as batched increments.
+
+    Pending hits that fail to flush are merged back and retried on the next
+    flush, except for documents that no longer exist.
+    """
+
+    def __init__(self, collection: str, flush_interval: float = FLUSH_INTERVAL_SECONDS):
+        """
+        Initialize the aggregator.
+
+        Args:
+            collection: Firestore collection holding the counted documents
+            flush_interval: Seconds between background flushes
+        """
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, _PendingHits] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Counters for monitoring
+        self.flushed_hits = 0
+        self.flush_failures = 0
+
+    @property
+    def pending(self) -> Dict[str, _PendingHits]:
+        """Hits not yet written to Firestore, keyed by document ID."""
+        return self._pending
+
+    def record_hit(self, doc_id: str, accessed_at: datetime) -> None:
+        """
+        Record a cache hit without touching Firestore.
+
+        Args:
+            doc_id: Cache document ID
+            accessed_at: Time of the hit
+        """
+        pending = self._pending.get(doc_id)
+        if pending is None:
+            self._pending[doc_id] = _PendingHits(count=1, last_accessed=accessed_at)
+            return
+        pending.count += 1
+        if accessed_at > pending.last_accessed:
+            pending.last_accessed = accessed_at
+
+    def pending_hits(self, doc_id: str) -> int:
+        """Get the number of unflushed hits for a document."""
+        pending = self._pending.get(doc_id)
+        return pending.count if pending else 0
+
+    async def flush(self) -> int:
+        """
+        Write all pending hits to Firestore in batches.
+
+        Returns:
+            Number of documents updated
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = self._pending, {}
+            items = list(pending.items())
+            firestore_client = get_firestore_client()
+            collection = firestore_client.collection(self.collection)
+            updated = 0
+
+            for start in range(0, len(items), MAX_BATCH_WRITES):
+                chunk = items[start:start + MAX_BATCH_WRITES]
+                batch = firestore_client.batch()
+                for doc_id, hits in chunk:
+                    batch.update(collection.document(doc_id), {
+                        'hit_count': firestore.Increment(hits.count),
+                        'last_accessed': hits.last_accessed,
+                    })
+
+                try:
+                    await run_firestore(batch.commit)
+                except NotFound as e:
+                    # A counted entry was deleted; its hits are no longer needed
+                    self.flush_failures += 1
+                    logger.warning(
+                        f"Dropped cache hit stats for missing documents: {e}",
+                        extra={
+                            'extra_fields': {
+                                'collection': self.collection,
+                                'documents': len(chunk),
+                                'operation': 'cache_stats_flush'
+                            }
+                        }
+                    )
+                    continue
+                except Exception as e:
+                    self.flush_failures += 1
+                    self._requeue(chunk)
+                    logger.error(
+                        f"Failed to flush cache hit stats: {e}",
+                        extra={
+                            'extra_fields': {
+                                'collection': self.collection,
+                                'documents': len(chunk),
+                                'operation': 'cache_stats_flush'
+                            }
+                        }
+                    )
+                    continue
+
+                updated += len(chunk)
+                self.flushed_hits += sum(hits.count for _, hits in chunk)
+
+            logger.debug(
+                f"Flushed cache hit stats for {updated} documents",
+                extra={
+                    'extra_fields': {
+                        'collection': self.collection,
+                        'documents': updated,
+                        'operation': 'cache_stats_flush'
+                    }
+                }
+            )
+            return updated
+
+    def _requeue(self, chunk: list) -> None:
+        """Merge hits from a failed batch back into the pending map."""
+        for doc_id, hits in chunk:
+            pending = self._pending.get(doc_id)
+            if pending is None:
+                self._pending[doc_id] = hits
+                continue
+            pending.count += hits.count
+            if hits.last_accessed > pending.last_accessed:
+                pending.last_accessed = hits.last_accessed
+
+    def start(self) -> None:
+        """Start the background flush loop if it is not already running."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Flush pending hits every flush_interval seconds."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Cache hit stats flush loop error: {e}")
+
+    async def stop(self) -> None:
+        """Stop the background loop and flush whatever is still pending."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+        await self.flush()
+
+    def clear(self) -> None:
+        """Drop pending hits and reset counters."""
+        self._pending.clear()
+        self.flushed_hits = self.flush_failures = 0
+
+    def stats(self) -> dict:
+        """Get flush counters and backlog for monitoring."""
+        return {
+            'pending_documents': len(self._pending),
+            'pending_hits': sum(p.count for p in self._pending.values()),
+            'flushed_hits': self.flushed_hits,
+            'flush_failures': self.flush_failures,
+        }
@@ -0,0 +1,218 @@
+"""
+Background sweeper for expired songs and share links.
+
+Every worker process runs the sweep loop, but each run first takes a
+lease on a lock document in Firestore, so only one worker per interval
+(the leader) actually sweeps. A leader that dies holds the lease for at
+most one interval before another worker takes over.
+
+Runs page through expired documents in batches of at most 500 deletes
+with a bounded number of batches in flight (see song_storage). Deleted
+counts and run times are logged and reported by stats().
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from google.cloud import firestore
+
+from app.core.firebase import get_firestore_client, run_firestore
+from app.services.song_storage import (
+    SHARE_LINKS_COLLECTION,
+    SONGS_COLLECTION,
+    cleanup_expired_share_links,
+    cleanup_expired_tasks,
+)
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps (and the leader lock's lease)
+SWEEP_INTERVAL_SECONDS = float(os.getenv('EXPIRY_SWEEP_INTERVAL', '3600'))
+
+# Maximum delete batches committing at once per collection
+SWEEP_MAX_CONCURRENT_BATCHES = int(os.getenv('EXPIRY_SWEEP_MAX_CONCURRENCY', '4'))
+
+# Leader lock document: locks/expiry_sweeper
+LOCK_COLLECTION = 'locks'
+LOCK_DOCUMENT = 'expiry_sweeper'
+
+
+def _acquire_lease_in_transaction(
+    transaction,
+    lock_ref,
+    holder: str,
+    now: datetime,
+    lease_until: datetime
+) -> bool:
+    """
+    Take or renew the sweeper lease unless another holder's is still valid.
+
+    Runs inside a Firestore transaction, so two workers cannot both take
+    an expired lease.
+
+    Returns:
+        True if this holder now owns the lease
+    """
+    snapshot = lock_ref.get(transaction=transaction)
+    lock = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    if lock.get('holder') not in (None, holder) and lock.get('lease_until', now) > now:
+        return False
+    transaction.set(lock_ref, {
+        'holder': holder,
+        'lease_until': lease_until,
+        'acquired_at': now,
+    })
+    return True
+
+
+class ExpirySweeper:
+    """
+    Periodically deletes expired songs and share links on one worker.
+    """
+
+    def __init__(
+        self,
+        interval: float = SWEEP_INTERVAL_SECONDS,
+        max_concurrency: int = SWEEP_MAX_CONCURRENT_BATCHES,
+    ):
+        """
+        Initialize the sweeper.
+
+        Args:
+            interval: Seconds between sweeps; also the lease taken per sweep
+            max_concurrency: Maximum delete batches committing at once
+        """
+        self.interval = interval
+        self.max_concurrency = max_concurrency
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._sweep_task: Optional[asyncio.Task] = None
+
+        # Counters for monitoring
+        self.runs = 0
+        self.skipped_runs = 0
+        self.failures = 0
+        self.deleted: Dict[str, int] = {SONGS_COLLECTION: 0, SHARE_LINKS_COLLECTION: 0}
+        self.last_run_seconds: Optional[float] = None
+        self.last_run_at: Optional[datetime] = None
+
+    async def acquire_lease(self) -> bool:
+        """
+        Take the leader lock for one interval.
+
+        Returns:
+            True if this worker should sweep now
+        """
+        firestore_client = get_firestore_client()
+        lock_ref = firestore_client.collection(LOCK_COLLECTION).document(LOCK_DOCUMENT)
+        now = datetime.now(timezone.utc)
+
+        return await run_firestore(
+            firestore.transactional(_acquire_lease_in_transaction),
+            firestore_client.transaction(),
+            lock_ref,
+            self.holder,
+            now,
+            now + timedelta(seconds=self.interval),
+        )
+
+    async def sweep(self) -> Optional[Dict[str, int]]:
+        """
+        Delete expired documents if this worker holds the leader lock.
+
+        Returns:
+            Documents deleted per collection, or None if another worker
+            holds the lock
+        """
+        if not await self.acquire_lease():
+            self.skipped_runs += 1
+            logger.debug(
+                "Expiry sweep skipped: another worker holds the lock",
+                extra={
+                    'extra_fields': {
+                        'holder': self.holder,
+                        'operation': 'expiry_sweep'
+                    }
+                }
+            )
+            return None
+
+        start = time.perf_counter()
+        deleted = {
+            SONGS_COLLECTION: await cleanup_expired_tasks(self.max_concurrency),
+            SHARE_LINKS_COLLECTION: await cleanup_expired_share_links(self.max_concurrency),
+        }
+        duration = time.perf_counter() - start
+
+        self.runs += 1
+        for collection, count in deleted.items():
+            self.deleted[collection] += count
+        self.last_run_seconds = duration
+        self.last_run_at = datetime.now(timezone.utc)
+
+        logger.info(
+            f"Expiry sweep deleted {sum(deleted.values())} documents in {duration:.2f}s",
+            extra={
+                'extra_fields': {
+                    'deleted': deleted,
+                    'duration_seconds': round(duration, 3),
+                    'holder': self.holder,
+                    'operation': 'expiry_sweep'
+                }
+            }
+        )
+        return deleted
+
+    def start(self) -> None:
+        """Start the background sweep loop if it is not already running."""
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Sweep every interval seconds."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Expiry sweep loop error: {e}")
+
+    async def stop(self) -> None:
+        """Stop the background loop, cancelling a sweep in progress."""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+
+    def stats(self) -> dict:
+        """Get deleted counts and run times for monitoring."""
+        return {
+            'runs': self.runs,
+            'skipped_runs': self.skipped_runs,
+            'failures': self.failures,
+            'deleted': dict(self.deleted),
+            'last_run_seconds': self.last_run_seconds,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+# Singleton instance
+_expiry_sweeper: Optional[ExpirySweeper] = None
+
+
+def get_expiry_sweeper() -> ExpirySweeper:
+    """Get or create the shared expiry sweeper singleton."""
+    global _expiry_sweeper
+    if _expiry_sweeper is None:
+        _expiry_sweeper = ExpirySweeper()
+    return _expiry_sweeper
@@ -1,11 +1,47 @@
 """
 Google Custom Search API integration for content enrichment.
+
+Searches share one pooled HTTP client. Results are cached in memory for
+SEARCH_CACHE_TTL seconds under a normalized query key, and concurrent
+identical queries share a single upstream request. Set
+GOOGLE_SEARCH_CACHE_PERSIST=true to also keep results in Firestore so
+they survive restarts and are shared between workers.
 """
+import hashlib
+import logging
 import os
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 import httpx
 from fastapi import HTTPException
 
+from app.core.firebase import get_firestore_client, run_firestore
+from app.services.memory_cache import MemoryCache
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Seconds a search result is reused before Google is queried again
+SEARCH_CACHE_TTL = float(os.getenv("GOOGLE_SEARCH_CACHE_TTL", "86400"))
+
+# Byte budget of the in-memory result cache
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("GOOGLE_SEARCH_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Keep results in Firestore as well as in memory
+SEARCH_CACHE_PERSIST = os.getenv("GOOGLE_SEARCH_CACHE_PERSIST", "false").lower() == "true"
+
+# Firestore collection for persisted search results
+SEARCH_CACHE_COLLECTION = "search_cache"
+
+# Connection pool and timeout for the Google API client
+SEARCH_MAX_CONNECTIONS = int(os.getenv("GOOGLE_SEARCH_MAX_CONNECTIONS", "10"))
+SEARCH_TIMEOUT = float(os.getenv("GOOGLE_SEARCH_TIMEOUT", "10"))
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for cache lookups (case and whitespace insensitive)."""
+    return " ".join(query.lower().split())
+
 
 class GoogleSearchService:
     """Service for enriching content using Google Custom Search API."""
@@ -14,7 +50,25 @@ class GoogleSearchService:
         self.api_key = os.getenv("GOOGLE_SEARCH_API_KEY")
         self.search_engine_id = os.getenv("GOOGLE_SEARCH_ENGINE_ID")
         self.base_url = "https://www.googleapis.com/customsearch/v1"
-        
+        self.persist = SEARCH_CACHE_PERSIST
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache = MemoryCache(
+            name="google_search",
+            max_bytes=SEARCH_CACHE_MAX_BYTES,
+            ttl=SEARCH_CACHE_TTL,
+            negative_ttl=SEARCH_CACHE_TTL,
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client shared by all searches."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=SEARCH_MAX_CONNECTIONS),
+                timeout=SEARCH_TIMEOUT,
+            )
+        return self._client
+    
     async def search_and_enrich(self, query: str, max_results: int = 5) -> str:
         """
         Search Google and enrich content with top results.
@@ -36,7 +90,7 @@ class GoogleSearchService:
             )
         
         try:
-            results = await self._perform_search(query, max_results)
+            results = await self._cached_search(query, max_results)
             return self._format_results(results)
         except httpx.HTTPError as e:
             raise HTTPException(
@@ -44,6 +98,36 @@ class GoogleSearchService:
                 detail=f"Google Search API error: {str(e)}"
             )
     
+    async def _cached_search(self, query: str, max_results: int) -> List[Dict]:
+        """
+        Get search results from the cache, searching Google on a miss.
+        
+        Concurrent misses for the same normalized query share one search.
+        Failed searches are not cached.
+        
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to retrieve
+            
+        Returns:
+            List of search result dictionaries
+        """
+        key = f"{min(max_results, 10)}:{normalize_query(query)}"
+        
+        async def load() -> List[Dict]:
+            if self.persist:
+                stored = await self._load_persisted(key)
+                if stored is not None:
+                    return stored
+            
+            results = await self._perform_search(query, max_results)
+            
+            if self.persist:
+                await self._persist(key, results)
+            return results
+        
+        return await self._cache.get_or_load(key, load)
+    
     async def _perform_search(self, query: str, max_results: int) -> List[Dict]:
         """
         Perform the actual Google Custom Search API call.
@@ -62,13 +146,52 @@ class GoogleSearchService:
             "num": min(max_results, 10)  # API max is 10
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(self.base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
+        response = await self.client.get(self.base_url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        
         return data.get("items", [])
     
+    @staticmethod
+    def _document_id(key: str) -> str:
+        """Firestore document ID for a cache key."""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    
+    async def _load_persisted(self, key: str) -> Optional[List[Dict]]:
+        """Read unexpired results from Firestore; None if absent or unavailable."""
+        try:
+            doc_ref = get_firestore_client().collection(SEARCH_CACHE_COLLECTION).document(
+                self._document_id(key)
+            )
+            doc = await run_firestore(doc_ref.get)
+        except Exception as e:
+            logger.warning(f"Search cache read failed: {e}")
+            return None
+        
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        expires_at = data.get("expires_at")
+        if expires_at is None or expires_at <= datetime.now(timezone.utc):
+            return None
+        return data.get("items", [])
+    
+    async def _persist(self, key: str, results: List[Dict]) -> None:
+        """Write results to Firestore; failures only cost a future search."""
+        current_time = datetime.now(timezone.utc)
+        try:
+            doc_ref = get_firestore_client().collection(SEARCH_CACHE_COLLECTION).document(
+                self._document_id(key)
+            )
+            await run_firestore(doc_ref.set, {
+                "query": key,
+                "items": results,
+                "created_at": current_time,
+                "expires_at": current_time + timedelta(seconds=SEARCH_CACHE_TTL),
+            })
+        except Exception as e:
+            logger.warning(f"Search cache write failed: {e}")
+    
     def _format_results(self, results: List[Dict]) -> str:
         """
         Format search results into a readable string.
@@ -95,6 +218,16 @@ class GoogleSearchService:
             )
         
         return "\n\n".join(formatted_parts)
+    
+    def stats(self) -> dict:
+        """Get result cache counters for monitoring."""
+        return {**self._cache.stats(), "persist": self.persist}
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 
 # Singleton instance
@@ -107,3 +240,9 @@ def get_search_service() -> GoogleSearchService:
     if _search_service is None:
         _search_service = GoogleSearchService()
     return _search_service
+
+
+async def close_search_service() -> None:
+    """Close the shared search client (call on shutdown)."""
+    if _search_service is not None:
+        await _search_service.close()
@@ -0,0 +1,234 @@
+"""
+In-process memory cache with LRU eviction, TTL expiry and a byte budget.
+
+This module provides a small L1 cache used in front of Firestore-backed
+caches. It supports negative caching (remembering that a key does not
+exist), single-flight loading so concurrent misses for the same key share
+one backend read, and hit/miss/eviction counters for monitoring.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from app.services.single_flight import SingleFlight
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Approximate fixed cost of an entry (key, bookkeeping), in bytes
+ENTRY_OVERHEAD_BYTES = 64
+
+# Returned by lookup() when the key is not cached at all
+MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimate the memory footprint of a cached value in bytes.
+
+    Counts the UTF-8 length of string content (which dominates for cached
+    lyrics) plus a fixed overhead for every other field.
+
+    Args:
+        value: Cached value (dict, list, str or scalar)
+
+    Returns:
+        Approximate size in bytes
+    """
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, dict):
+        return sum(len(str(k)) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return 8
+
+
+@dataclass
+class _Entry:
+    """A cached value with its expiry time and size."""
+
+    value: Any
+    expires_at: float
+    size: int
+
+
+class MemoryCache:
+    """
+    Bounded in-process cache with LRU eviction and per-entry TTL.
+
+    A value of None is a negative entry: the key is known not to exist in
+    the backing store and lookups short-circuit until it expires.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int,
+        ttl: float,
+        negative_ttl: float,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            name: Cache name used in logs and stats
+            max_bytes: Total byte budget before least recently used entries are evicted
+            ttl: Seconds a positive entry stays valid
+            negative_ttl: Seconds a negative (missing) entry stays valid
+            sizeof: Function estimating the byte size of a value
+        """
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._sizeof = sizeof
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._loads = SingleFlight(name)
+        # Keys being loaded -> whether they were written since the load started
+        self._loading: dict[str, bool] = {}
+        self.current_bytes = 0
+
+        # Counters for monitoring
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+
+    def lookup(self, key: str) -> Any:
+        """
+        Look up a key without loading it.
+
+        Returns:
+            The cached value (None for a negative entry), or MISSING if the
+            key is not cached or has expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        if entry.value is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return entry.value
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value, evicting least recently used entries if over budget.
+
+        Storing None records a negative entry with the shorter negative TTL.
+        Values larger than the whole budget are not cached.
+        """
+        self._mark_written(key)
+        self._store(key, value)
+
+    def _store(self, key: str, value: Any) -> None:
+        """Store a value without affecting loads in flight."""
+        size = self._sizeof(value) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            self._remove(key)
+            return
+
+        ttl = self.negative_ttl if value is None else self.ttl
+        self._remove(key)
+        self._entries[key] = _Entry(value=value, expires_at=time.monotonic() + ttl, size=size)
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes and self._entries:
+            evicted_key, _ = next(iter(self._entries.items()))
+            self._remove(evicted_key)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Drop a key from the cache."""
+        self._mark_written(key)
+        self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all entries and reset counters."""
+        for key in self._loading:
+            self._loading[key] = True
+        self._entries.clear()
+        self.current_bytes = 0
+        self.hits = self.negative_hits = self.misses = self.evictions = self.loads = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Get a value, loading it from the backing store on a miss.
+
+        Concurrent misses for the same key share a single loader call. The
+        loaded value (including None for "does not exist") is cached,
+        unless the key was set or invalidated while the loader ran: the
+        loaded value may then be older than that write.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function returning the value, or None if absent
+
+        Returns:
+            The cached or loaded value (None if the key does not exist)
+        """
+        value = self.lookup(key)
+        if value is not MISSING:
+            return value
+
+        return await self._loads.do(key, lambda: self._load(key, loader))
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Run the loader once and cache its result if the key was not written meanwhile."""
+        self.loads += 1
+        self._loading[key] = False
+        try:
+            value = await loader()
+        finally:
+            written = self._loading.pop(key)
+        if not written:
+            self._store(key, value)
+        return value
+
+    def _mark_written(self, key: str) -> None:
+        """Keep a load in flight for the key from caching its older result."""
+        if key in self._loading:
+            self._loading[key] = True
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry and release its bytes."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+
+    def stats(self) -> dict:
+        """Get counters and occupancy for monitoring."""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'name': self.name,
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'loads': self.loads,
+            'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
@@ -5,15 +5,28 @@ This module implements a daily rate limit system that allows each user
 to generate up to 3 songs per day and regenerate lyrics up to 10 times per day.
 Both limits reset at midnight UTC. Regeneration and song generation counters
 are tracked independently.
+
+Song quota is taken atomically with reserve_song_quota before the work
+starts and then either committed or refunded, so concurrent requests
+cannot overshoot the limit.
+
+Daily song usage is mirrored in a per-process cache keyed by user and
+day. Status reads are answered from memory; the reservation path always
+runs its transaction and refreshes the entry, and entries are re-read
+from Firestore after QUOTA_CACHE_TTL_SECONDS, so other workers'
+reservations are picked up within that window.
 """
 
 import logging
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from fastapi import HTTPException
+from google.cloud import firestore
 
-from app.core.firebase import get_firestore_client
+from app.core.firebase import get_firestore_client, run_firestore
+from app.services.memory_cache import MemoryCache
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -26,27 +39,155 @@ IS_DEVELOPMENT = os.getenv('ENVIRONMENT', 'development').lower() == 'development
 DAILY_SONG_LIMIT = 3
 DAILY_REGENERATION_LIMIT = 10
 
+# Per-day song counters live in users/{uid}/usage/{YYYY-MM-DD}
+USAGE_COLLECTION = 'usage'
+SONG_USAGE_FIELD = 'songs'
+
+# Days a usage document is kept after its day ends (for a Firestore TTL policy)
+USAGE_RETENTION_DAYS = 7
+
+# Seconds a cached daily usage count is trusted before re-reading Firestore
+QUOTA_CACHE_TTL_SECONDS = float(os.getenv('QUOTA_CACHE_TTL_SECONDS', '30'))
+QUOTA_CACHE_MAX_BYTES = int(os.getenv('QUOTA_CACHE_MAX_BYTES', str(1024 * 1024)))
+
+# Songs used per "{user_id}:{YYYY-MM-DD}", shared by all requests in this process
+_quota_cache = MemoryCache(
+    name='song_quota',
+    max_bytes=QUOTA_CACHE_MAX_BYTES,
+    ttl=QUOTA_CACHE_TTL_SECONDS,
+    negative_ttl=QUOTA_CACHE_TTL_SECONDS,
+)
+
 # Log on module load to verify code is loaded
 logger.info(f"🔧 Rate limiter loaded: IS_DEVELOPMENT={IS_DEVELOPMENT}, DEV_USER_ID={DEV_USER_ID}")
 
 
-async def check_rate_limit(user_id: str) -> None:
+@dataclass
+class QuotaReservation:
+    """
+    A quota slot taken by reserve_song_quota.
+    
+    The slot is already counted against the day it was reserved on.
+    Settle it with commit_quota once the work succeeded, or give it back
+    with refund_quota if it failed or was served without cost.
     """
-    Check if user has exceeded their daily rate limit.
     
-    This function queries Firestore for the user's current usage and
-    determines if they can generate another song. If the user doesn't
-    exist, a new user document is created. If the daily reset time has
-    passed, the counter is reset.
+    user_id: str
+    day: str
+    field: str = SONG_USAGE_FIELD
+    bypass: bool = False
+    settled: bool = False
+
+
+def _usage_day(current_time: datetime) -> str:
+    """Get the UTC date key (YYYY-MM-DD) of a usage counter."""
+    return current_time.astimezone(timezone.utc).date().isoformat()
+
+
+def get_quota_cache() -> MemoryCache:
+    """Get the in-process daily song usage cache."""
+    return _quota_cache
+
+
+def _quota_key(user_id: str, day: str) -> str:
+    """Get the quota cache key of a user's usage on a day."""
+    return f"{user_id}:{day}"
+
+
+def _usage_ref(firestore_client, user_id: str, day: str):
+    """Get the per-day usage counter document for a user."""
+    return (
+        firestore_client.collection('users').document(user_id)
+        .collection(USAGE_COLLECTION).document(day)
+    )
+
+
+def _reserve_in_transaction(
+    transaction,
+    usage_ref,
+    field: str,
+    limit: int,
+    expires_at: datetime
+) -> Optional[int]:
+    """
+    Take one slot of a daily counter if it is below the limit.
+    
+    Runs inside a Firestore transaction, so concurrent reservations for
+    the same user and day are serialized and cannot overshoot the limit.
+    
+    Returns:
+        The counter value including this reservation, or None if the limit
+        was already reached
+    """
+    snapshot = usage_ref.get(transaction=transaction)
+    used = (snapshot.to_dict() or {}).get(field, 0) if snapshot.exists else 0
+    if used >= limit:
+        return None
+    transaction.set(usage_ref, {
+        field: firestore.Increment(1),
+        'expires_at': expires_at,
+    }, merge=True)
+    return used + 1
+
+
+def _raise_song_limit_exceeded(
+    user_id: str,
+    current_time: datetime,
+    reset_time: datetime
+) -> None:
+    """
+    Reject a song generation because the daily limit is reached.
+    
+    Raises:
+        HTTPException: 429 Too Many Requests with retry information
+    """
+    seconds_until_reset = (reset_time - current_time).total_seconds()
+    logger.warning(
+        f"Rate limit exceeded for user: {user_id[:8]}...",
+        extra={
+            'extra_fields': {
+                'user_id': user_id,
+                'songs_today': DAILY_SONG_LIMIT,
+                'rate_limit_exceeded': True,
+                'retry_after': int(seconds_until_reset)
+            }
+        }
+    )
+    raise HTTPException(
+        status_code=429,
+        detail={
+            'error': 'Rate limit exceeded',
+            'message': f'You have reached your daily limit of {DAILY_SONG_LIMIT} songs',
+            'retry_after': int(seconds_until_reset),
+            'reset_time': reset_time.isoformat()
+        }
+    )
+
+
+async def reserve_song_quota(user_id: str) -> QuotaReservation:
+    """
+    Atomically check and take one of the user's daily song slots.
+    
+    Counters are keyed by UTC date (users/{uid}/usage/{YYYY-MM-DD}), so
+    the midnight reset needs no write: a new day simply starts a new
+    counter. The check and the increment run in one transaction, which
+    also decides rejections: a cached count at the limit may predate
+    another worker's refund, so it is never used to reject.
     
     Args:
         user_id: Firebase user ID (anonymous or authenticated)
         
+    Returns:
+        QuotaReservation to pass to commit_quota or refund_quota
+        
     Raises:
         HTTPException: 429 Too Many Requests if rate limit exceeded
         
     Requirements: FR-2
     """
+    current_time = datetime.now(timezone.utc)
+    day = _usage_day(current_time)
+    
     # Development mode: bypass rate limiting for dev user
     if IS_DEVELOPMENT and user_id == DEV_USER_ID:
         logger.info(
@@ -59,111 +200,122 @@ async def check_rate_limit(user_id: str) -> None:
                 }
             }
         )
-        return
+        return QuotaReservation(user_id=user_id, day=day, bypass=True)
+    
+    reset_time = _get_next_midnight_utc(current_time)
+    
+    firestore_client = get_firestore_client()
+    usage_ref = _usage_ref(firestore_client, user_id, day)
+    
+    songs_today = await run_firestore(
+        firestore.transactional(_reserve_in_transaction),
+        firestore_client.transaction(),
+        usage_ref,
+        SONG_USAGE_FIELD,
+        DAILY_SONG_LIMIT,
+        reset_time + timedelta(days=USAGE_RETENTION_DAYS),
+    )
+    
+    _quota_cache.set(
+        _quota_key(user_id, day),
+        DAILY_SONG_LIMIT if songs_today is None else songs_today
+    )
+    if songs_today is None:
+        _raise_song_limit_exceeded(user_id, current_time, reset_time)
     
     logger.info(
-        f"Checking rate limit for user: {user_id[:8]}...",
+        f"Song quota reserved: {DAILY_SONG_LIMIT - songs_today} songs remaining",
         extra={
             'extra_fields': {
                 'user_id': user_id,
-                'operation': 'rate_limit_check'
+                'songs_today': songs_today,
+                'remaining': DAILY_SONG_LIMIT - songs_today,
+                'usage_day': day
             }
         }
     )
+    return QuotaReservation(user_id=user_id, day=day)
+
+
+async def commit_quota(reservation: QuotaReservation) -> None:
+    """
+    Confirm a reservation after the song was generated.
     
-    firestore_client = get_firestore_client()
-    user_ref = firestore_client.collection('users').document(user_id)
-    user_doc = user_ref.get()
-    
-    current_time = datetime.now(timezone.utc)
+    The daily counter already includes the reservation; this records the
+    lifetime total and last generation time on the user document. Errors
+    are logged, not raised, because the work has already succeeded.
     
-    if not user_doc.exists:
-        # Create new user document with initial values
-        next_reset = _get_next_midnight_utc(current_time)
-        user_ref.set({
-            'created_at': current_time,
-            'songs_generated_today': 0,
-            'daily_limit_reset': next_reset,
-            'total_songs_generated': 0
-        })
-        logger.info(
-            f"New user created: {user_id[:8]}...",
+    Args:
+        reservation: Reservation returned by reserve_song_quota
+        
+    Requirements: FR-2
+    """
+    if reservation.bypass or reservation.settled:
+        return
+    reservation.settled = True
+    
+    try:
+        firestore_client = get_firestore_client()
+        user_ref = firestore_client.collection('users').document(reservation.user_id)
+        await run_firestore(user_ref.set, {
+            'total_songs_generated': firestore.Increment(1),
+            'last_generated_at': datetime.now(timezone.utc),
+        }, merge=True)
+    except Exception as e:
+        logger.error(
+            f"Failed to record usage totals: {e}",
             extra={
                 'extra_fields': {
-                    'user_id': user_id,
-                    'new_user': True,
-                    'remaining': 3
+                    'user_id': reservation.user_id,
+                    'usage_day': reservation.day,
+                    'error': str(e)
                 }
             }
         )
-        return
-    
-    user_data = user_doc.to_dict()
-    reset_time = user_data['daily_limit_reset']
+
+
+async def refund_quota(reservation: QuotaReservation) -> None:
+    """
+    Return a reserved slot because the generation failed or was free.
     
-    # Convert Firestore timestamp to datetime if needed
-    if hasattr(reset_time, 'timestamp'):
-        reset_time = datetime.fromtimestamp(reset_time.timestamp(), tz=timezone.utc)
-    elif not reset_time.tzinfo:
-        reset_time = reset_time.replace(tzinfo=timezone.utc)
+    The refund is applied to the day the slot was reserved on, even if
+    the request crossed midnight. Errors are logged, not raised, so a
+    refund never masks the original failure.
     
-    # Check if daily reset is needed
-    if current_time >= reset_time:
-        next_reset = _get_next_midnight_utc(current_time)
-        user_ref.update({
-            'songs_generated_today': 0,
-            'daily_limit_reset': next_reset
-        })
+    Args:
+        reservation: Reservation returned by reserve_song_quota
+    """
+    if reservation.bypass or reservation.settled:
+        return
+    reservation.settled = True
+    _quota_cache.invalidate(_quota_key(reservation.user_id, reservation.day))
+    
+    try:
+        firestore_client = get_firestore_client()
+        usage_ref = _usage_ref(firestore_client, reservation.user_id, reservation.day)
+        await run_firestore(usage_ref.set, {
+            reservation.field: firestore.Increment(-1),
+        }, merge=True)
         logger.info(
-            f"Rate limit reset for user: {user_id[:8]}...",
+            f"Song quota refunded for user: {reservation.user_id[:8]}...",
             extra={
                 'extra_fields': {
-                    'user_id': user_id,
-                    'rate_limit_reset': True,
-                    'next_reset': next_reset.isoformat()
+                    'user_id': reservation.user_id,
+                    'usage_day': reservation.day
                 }
             }
         )
-        return
-    
-    # Check if limit exceeded
-    songs_today = user_data.get('songs_generated_today', 0)
-    remaining = DAILY_SONG_LIMIT - songs_today
-    
-    logger.info(
-        f"Rate limit check passed: {remaining} songs remaining",
-        extra={
-            'extra_fields': {
-                'user_id': user_id,
-                'songs_today': songs_today,
-                'remaining': remaining,
-                'rate_limit_ok': songs_today < DAILY_SONG_LIMIT
-            }
-        }
-    )
-    
-    if songs_today >= DAILY_SONG_LIMIT:
-        seconds_until_reset = (reset_time - current_time).total_seconds()
-        logger.warning(
-            f"Rate limit exceeded for user: {user_id[:8]}...",
+    except Exception as e:
+        logger.error(
+            f"Failed to refund song quota: {e}",
             extra={
                 'extra_fields': {
-                    'user_id': user_id,
-                    'songs_today': songs_today,
-                    'rate_limit_exceeded': True,
-                    'retry_after': int(seconds_until_reset)
+                    'user_id': reservation.user_id,
+                    'usage_day': reservation.day,
+                    'error': str(e)
                 }
             }
         )
-        raise HTTPException(
-            status_code=429,
-            detail={
-                'error': 'Rate limit exceeded',
-                'message': f'You have reached your daily limit of {DAILY_SONG_LIMIT} songs',
-                'retry_after': int(seconds_until_reset),
-                'reset_time': reset_time.isoformat()
-            }
-        )
 
 
 async def get_rate_limit(user_id: str) -> Dict[str, Any]:
@@ -171,7 +323,8 @@ async def get_rate_limit(user_id: str) -> Dict[str, Any]:
     Get the current rate limit status for a user.
     
     Returns the number of songs remaining and when the limit resets.
-    If the user doesn't exist, creates a new user document.
+    Answered from the in-process quota cache when possible; otherwise
+    today's usage counter is read. Nothing is written.
     
     Args:
         user_id: Firebase user ID (anonymous or authenticated)
@@ -184,139 +337,28 @@ async def get_rate_limit(user_id: str) -> Dict[str, Any]:
     Requirements: FR-2
     """
     # Development mode: return unlimited for dev user
-    print(f"🔍 DEBUG: get_rate_limit called with user_id={user_id}, IS_DEVELOPMENT={IS_DEVELOPMENT}, DEV_USER_ID={DEV_USER_ID}")
     if IS_DEVELOPMENT and user_id == DEV_USER_ID:
-        print(f"✅ Returning unlimited rate limit for dev user")
         return {
             'remaining': 999,  # Effectively unlimited
             'reset_time': datetime.now(timezone.utc) + timedelta(days=365)
         }
     
-    firestore_client = get_firestore_client()
-    user_ref = firestore_client.collection('users').document(user_id)
-    user_doc = user_ref.get()
-    
     current_time = datetime.now(timezone.utc)
+    day = _usage_day(current_time)
     
-    if not user_doc.exists:
-        # Create new user document
-        next_reset = _get_next_midnight_utc(current_time)
-        user_ref.set({
-            'created_at': current_time,
-            'songs_generated_today': 0,
-            'daily_limit_reset': next_reset,
-            'total_songs_generated': 0
-        })
-        return {
-            'remaining': DAILY_SONG_LIMIT,
-            'reset_time': next_reset
-        }
-    
-    user_data = user_doc.to_dict()
-    reset_time = user_data['daily_limit_reset']
-    
-    # Convert Firestore timestamp to datetime if needed
-    if hasattr(reset_time, 'timestamp'):
-        reset_time = datetime.fromtimestamp(reset_time.timestamp(), tz=timezone.utc)
-    elif not reset_time.tzinfo:
-        reset_time = reset_time.replace(tzinfo=timezone.utc)
+    async def load_songs_today() -> int:
+        firestore_client = get_firestore_client()
+        usage_doc = await run_firestore(_usage_ref(firestore_client, user_id, day).get)
+        return (usage_doc.to_dict() or {}).get(SONG_USAGE_FIELD, 0) if usage_doc.exists else 0
     
-    # Check if daily reset is needed
-    if current_time >= reset_time:
-        next_reset = _get_next_midnight_utc(current_time)
-        user_ref.update({
-            'songs_generated_today': 0,
-            'daily_limit_reset': next_reset
-        })
-        return {
-            'remaining': DAILY_SONG_LIMIT,
-            'reset_time': next_reset
-        }
-    
-    songs_today = user_data.get('songs_generated_today', 0)
-    remaining = max(0, DAILY_SONG_LIMIT - songs_today)
+    songs_today = await _quota_cache.get_or_load(_quota_key(user_id, day), load_songs_today)
     
     return {
-        'remaining': remaining,
-        'reset_time': reset_time
+        'remaining': max(0, DAILY_SONG_LIMIT - songs_today),
+        'reset_time': _get_next_midnight_utc(current_time)
     }
 
 
-async def increment_usage(user_id: str) -> None:
-    """
-    Increment the user's song generation counter.
-    
-    This should be called after successfully generating a song.
-    Also increments the total_songs_generated counter for analytics.
-    
-    Args:
-        user_id: Firebase user ID (anonymous or authenticated)
-        
-    Requirements: FR-2
-    """
-    # Development mode: skip incrementing for dev user
-    if IS_DEVELOPMENT and user_id == DEV_USER_ID:
-        logger.info(
-            f"Usage increment skipped for dev user: {user_id[:8]}...",
-            extra={
-                'extra_fields': {
-                    'user_id': user_id,
-                    'dev_mode': True
-                }
-            }
-        )
-        return
-    
-    firestore_client = get_firestore_client()
-    user_ref = firestore_client.collection('users').document(user_id)
-    user_doc = user_ref.get()
-    
-    if not user_doc.exists:
-        # This shouldn't happen if check_rate_limit was called first,
-        # but handle it gracefully
-        current_time = datetime.now(timezone.utc)
-        next_reset = _get_next_midnight_utc(current_time)
-        user_ref.set({
-            'created_at': current_time,
-            'songs_generated_today': 1,
-            'daily_limit_reset': next_reset,
-            'total_songs_generated': 1
-        })
-        logger.info(
-            f"Usage incremented for new user: {user_id[:8]}...",
-            extra={
-                'extra_fields': {
-                    'user_id': user_id,
-                    'songs_today': 1,
-                    'total_songs': 1
-                }
-            }
-        )
-    else:
-        # Increment both daily and total counters
-        user_data = user_doc.to_dict()
-        new_daily = user_data.get('songs_generated_today', 0) + 1
-        new_total = user_data.get('total_songs_generated', 0) + 1
-        
-        user_ref.update({
-            'songs_generated_today': new_daily,
-            'total_songs_generated': new_total,
-            'last_generated_at': datetime.now(timezone.utc)
-        })
-        
-        logger.info(
-            f"Usage incremented for user: {user_id[:8]}...",
-            extra={
-                'extra_fields': {
-                    'user_id': user_id,
-                    'songs_today': new_daily,
-                    'total_songs': new_total,
-                    'remaining': DAILY_SONG_LIMIT - new_daily
-                }
-            }
-        )
-
-
 def _get_next_midnight_utc(current_time: datetime) -> datetime:
     """
     Calculate the next midnight UTC from the given time.
@@ -381,14 +423,14 @@ async def check_regeneration_limit(user_id: str) -> None:
     
     firestore_client = get_firestore_client()
     user_ref = firestore_client.collection('users').document(user_id)
-    user_doc = user_ref.get()
+    user_doc = await run_firestore(user_ref.get)
     
     current_time = datetime.now(timezone.utc)
     
     if not user_doc.exists:
         # Create new user document with initial values
         next_reset = _get_next_midnight_utc(current_time)
-        user_ref.set({
+        await run_firestore(user_ref.set, {
             'created_at': current_time,
             'songs_generated_today': 0,
             'regenerations_today': 0,
@@ -420,7 +462,7 @@ async def check_regeneration_limit(user_id: str) -> None:
     # Check if daily reset is needed
     if current_time >= reset_time:
         next_reset = _get_next_midnight_utc(current_time)
-        user_ref.update({
+        await run_firestore(user_ref.update, {
             'songs_generated_today': 0,
             'regenerations_today': 0,
             'daily_limit_reset': next_reset
@@ -505,14 +547,14 @@ async def increment_regeneration_usage(user_id: str) -> None:
     
     firestore_client = get_firestore_client()
     user_ref = firestore_client.collection('users').document(user_id)
-    user_doc = user_ref.get()
+    user_doc = await run_firestore(user_ref.get)
     
     if not user_doc.exists:
         # This shouldn't happen if check_regeneration_limit was called first,
         # but handle it gracefully
         current_time = datetime.now(timezone.utc)
         next_reset = _get_next_midnight_utc(current_time)
-        user_ref.set({
+        await run_firestore(user_ref.set, {
             'created_at': current_time,
             'songs_generated_today': 0,
             'regenerations_today': 1,
@@ -536,7 +578,7 @@ async def increment_regeneration_usage(user_id: str) -> None:
         new_daily = user_data.get('regenerations_today', 0) + 1
         new_total = user_data.get('total_regenerations', 0) + 1
         
-        user_ref.update({
+        await run_firestore(user_ref.update, {
             'regenerations_today': new_daily,
             'total_regenerations': new_total,
             'last_regenerated_at': datetime.now(timezone.utc)
@@ -581,14 +623,14 @@ async def get_regeneration_limit(user_id: str) -> Dict[str, Any]:
     
     firestore_client = get_firestore_client()
     user_ref = firestore_client.collection('users').document(user_id)
-    user_doc = user_ref.get()
+    user_doc = await run_firestore(user_ref.get)
     
     current_time = datetime.now(timezone.utc)
     
     if not user_doc.exists:
         # Create new user document
         next_reset = _get_next_midnight_utc(current_time)
-        user_ref.set({
+        await run_firestore(user_ref.set, {
             'created_at': current_time,
             'songs_generated_today': 0,
             'regenerations_today': 0,
@@ -613,7 +655,7 @@ async def get_regeneration_limit(user_id: str) -> Dict[str, Any]:
     # Check if daily reset is needed
     if current_time >= reset_time:
         next_reset = _get_next_midnight_utc(current_time)
-        user_ref.update({
+        await run_firestore(user_ref.update, {
             'songs_generated_today': 0,
             'regenerations_today': 0,
             'daily_limit_reset': next_reset
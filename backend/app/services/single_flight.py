@@ -0,0 +1,91 @@
+"""
+Single-flight execution of concurrent identical async operations.
+
+Callers that ask for the same key while an operation is running await the
+running one instead of starting their own. Nothing is cached: once the
+operation finishes, the next call for the key starts a new run.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key.
+
+    The shared operation runs as its own task and is shielded from callers,
+    so one caller disconnecting does not cancel the work for the others.
+    Exceptions are raised to every caller of that run and are not remembered.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the group.
+
+        Args:
+            name: Name used in logs and stats
+        """
+        self.name = name
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        # Counters for monitoring
+        self.runs = 0
+        self.shared = 0
+
+    def is_running(self, key: str) -> bool:
+        """Check whether an operation for the key is in flight."""
+        return key in self._in_flight
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn for the key, or join the run already in flight.
+
+        Args:
+            key: Deduplication key
+            fn: Coroutine function to run if nothing is in flight for the key
+
+        Returns:
+            The result of the shared run
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.runs += 1
+            task = asyncio.create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+            logger.debug(
+                f"Joined in-flight {self.name} run",
+                extra={
+                    'extra_fields': {
+                        'single_flight': self.name,
+                        'key': key[:24]
+                    }
+                }
+            )
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """Drop a finished run and mark its exception as retrieved."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Get run/share counters for monitoring."""
+        return {
+            'name': self.name,
+            'in_flight': len(self._in_flight),
+            'runs': self.runs,
+            'shared': self.shared,
+        }
@@ -4,16 +4,29 @@ Song storage service for Firestore operations.
 This module provides helper functions for storing, retrieving, and managing
 song generation tasks in Firestore with 48-hour TTL for anonymous users.
 
+Timestamped lyrics (aligned_words, waveform_data) are stored per variation
+in songs/{task_id}/timestamps/{variation_index}, not in the song document
+that status updates rewrite. Older songs that still carry them inline are
+read through load_timestamped_lyrics as variation 0.
+
 Requirements: FR-3, Task 17
 """
 
+import asyncio
+import base64
+import json
 import logging
+import os
 import secrets
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Optional
+
+from google.cloud import firestore
 
-from app.core.firebase import get_firestore_client
+from app.core.firebase import get_firestore_client, run_firestore, stream_documents
 from app.models.songs import GenerateSongRequest, GenerationStatus
+from app.services.memory_cache import MISSING, MemoryCache, estimate_size
+from app.services.timestamp_codec import COMPACT_ENCODING, decode_timestamps, encode_timestamps
 
 
 # Configure logging
@@ -31,12 +44,182 @@ ANONYMOUS_TTL_HOURS = 48
 # TTL for share links (48 hours)
 SHARE_LINK_TTL_HOURS = 48
 
+# Maximum songs per history page
+HISTORY_PAGE_SIZE = 20
+
+# Per-process cache of completed and failed song documents (seconds, bytes).
+# Other workers' writes become visible once an entry expires.
+SONG_CACHE_TTL_SECONDS = float(os.getenv("SONG_CACHE_TTL_SECONDS", "300"))
+SONG_CACHE_MAX_BYTES = int(os.getenv("SONG_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# In-process cache of resolved share links: seconds a snapshot is served
+# before share_links is read again, and the cache's byte budget
+SHARE_CACHE_TTL_SECONDS = float(os.getenv("SHARE_CACHE_TTL_SECONDS", "60"))
+SHARE_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("SHARE_CACHE_NEGATIVE_TTL_SECONDS", "10"))
+SHARE_CACHE_MAX_BYTES = int(os.getenv("SHARE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Subcollection of songs/{task_id} holding one timestamps document per variation
+TIMESTAMPS_COLLECTION = "timestamps"
+
+# Fields of a timestamps document (and of legacy songs that stored them inline)
+TIMESTAMP_FIELDS = ["aligned_words", "waveform_data"]
+
+# Suno returns at most this many variations per song
+MAX_VARIATIONS = 2
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+
+# Firestore allows at most 30 values in an "in" filter
+MAX_IN_QUERY_VALUES = 30
+
+# Expired-data cleanup: delete batches committing at once
+CLEANUP_MAX_CONCURRENT_BATCHES = 4
+
+# Characters of lyrics stored as lyrics_preview for the history list
+LYRICS_PREVIEW_LENGTH = 100
+
+# Field projections: reads that need only these fields skip the large
+# lyrics, aligned_words and waveform_data payloads.
+# song_url and audio_id are included so _migrate_task_schema can run.
+TASK_OWNER_FIELDS = ["user_id"]
+TASK_STATUS_FIELDS = [
+    "user_id",
+    "task_id",
+    "status",
+    "progress",
+    "song_url",
+    "audio_id",
+    "error",
+    "variations",
+    "primary_variation_index",
+]
+TASK_DETAILS_FIELDS = [
+    "user_id",
+    "task_id",
+    "source_task_id",
+    "lyrics",
+    "style",
+    "status",
+    "progress",
+    "song_url",
+    "audio_id",
+    "error",
+    "created_at",
+    "updated_at",
+    "expires_at",
+    "variations",
+    "primary_variation_index",
+    "has_timestamps",
+    "timestamp_variations",
+]
+TASK_HISTORY_FIELDS = [
+    "task_id",
+    "style",
+    "status",
+    "created_at",
+    "expires_at",
+    "lyrics_preview",
+    "song_url",
+    "audio_id",
+    "variations",
+    "primary_variation_index",
+]
+TASK_TIMESTAMPS_FIELDS = [
+    "user_id",
+    "source_task_id",
+    "song_url",
+    "audio_id",
+    "variations",
+    "has_timestamps",
+    "timestamp_variations",
+]
+_DETAILS_FIELD_SET = frozenset(TASK_DETAILS_FIELDS)
+
+# Statuses after which a song only changes through this module's writes
+TERMINAL_STATUSES = {GenerationStatus.COMPLETED.value, GenerationStatus.FAILED.value}
+
+
+def _song_entry_size(entry: dict) -> int:
+    """Estimate the size of a song cache entry, including its prebuilt details."""
+    details = entry["details"]
+    return estimate_size(entry["doc"]) + (estimate_size(details.model_dump()) if details is not None else 0)
+
+
+# Task ID -> {"doc": song projected to TASK_DETAILS_FIELDS, "details": SongDetails or None}
+_song_cache = MemoryCache(
+    name=SONGS_COLLECTION,
+    max_bytes=SONG_CACHE_MAX_BYTES,
+    ttl=SONG_CACHE_TTL_SECONDS,
+    negative_ttl=0,
+    sizeof=_song_entry_size,
+)
+
+# Bumped by every invalidation, so reads that raced a write aren't cached
+_song_cache_epoch = 0
+
+
+def get_song_cache() -> MemoryCache:
+    """Get the per-process cache of terminal song documents."""
+    return _song_cache
+
+
+def invalidate_song_cache(task_id: str) -> None:
+    """Drop a song from the song cache after writing to it."""
+    global _song_cache_epoch
+    _song_cache_epoch += 1
+    _song_cache.invalidate(task_id)
+
+
+def get_cached_song_details(task_id: str):
+    """
+    Get the prebuilt SongDetails of a cached song.
+    
+    Returns:
+        SongDetails, or None if the song or its details aren't cached
+    """
+    entry = _song_cache.lookup(task_id)
+    return None if entry is MISSING else entry["details"]
+
+
+def cache_song_details(task_id: str, song_data: dict, details) -> None:
+    """
+    Attach a prebuilt SongDetails to a cached song.
+    
+    Ignored unless the cached document is the one the details were built
+    from (same updated_at), so details never outlive a write.
+    
+    Args:
+        task_id: The song's task ID
+        song_data: Song document the details were built from
+        details: The SongDetails response
+    """
+    entry = _song_cache.lookup(task_id)
+    if entry is MISSING or entry["doc"].get("updated_at") != song_data.get("updated_at"):
+        return
+    _song_cache.set(task_id, {"doc": entry["doc"], "details": details})
+
+
+# Share token -> {"expires_at", "song"}; None for unknown tokens
+_share_cache = MemoryCache(
+    name=SHARE_LINKS_COLLECTION,
+    max_bytes=SHARE_CACHE_MAX_BYTES,
+    ttl=SHARE_CACHE_TTL_SECONDS,
+    negative_ttl=SHARE_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+
+def get_share_cache() -> MemoryCache:
+    """Get the in-process cache of resolved share links."""
+    return _share_cache
+
 
 async def store_song_task(
     user_id: str,
     task_id: str,
     request: GenerateSongRequest,
     variations: Optional[list[dict]] = None,
+    source_task_id: Optional[str] = None,
 ) -> dict:
     """
     Store a song generation task in Firestore.
@@ -44,11 +227,16 @@ async def store_song_task(
     Creates a document in the 'songs' collection to track the task status
     and allow recovery after page refresh.
     
+    When source_task_id is given, the task is a song cache hit: it is
+    stored already completed with the cached variations, and Suno calls
+    for it (e.g. timestamped lyrics) go to the source task.
+    
     Args:
         user_id: Firebase user ID
-        task_id: Suno task ID
+        task_id: Suno task ID, or a new ID for a cache hit
         request: Original song generation request
         variations: Optional list of song variations (Requirements: 1.2, 7.3)
+        source_task_id: Suno task ID of the cached song this task reuses
         
     Returns:
         dict: The stored task document data
@@ -65,6 +253,7 @@ async def store_song_task(
         "task_id": task_id,
         "content_hash": request.content_hash,
         "lyrics": request.lyrics,
+        "lyrics_preview": request.lyrics[:LYRICS_PREVIEW_LENGTH],
         "style": request.style.value,
         "status": GenerationStatus.QUEUED.value,
         "progress": 0,
@@ -77,8 +266,16 @@ async def store_song_task(
         "primary_variation_index": 0,  # Default to first variation (Requirements: 1.3)
     }
     
+    if source_task_id:
+        task_doc.update({
+            "source_task_id": source_task_id,
+            "status": GenerationStatus.COMPLETED.value,
+            "progress": 100,
+            "song_url": variations[0].get("audio_url") if variations else None,
+        })
+    
     songs_ref = firestore_client.collection(SONGS_COLLECTION).document(task_id)
-    songs_ref.set(task_doc)
+    await run_firestore(songs_ref.set, task_doc)
     
     logger.info(
         f"Song task stored: {task_id}",
@@ -98,25 +295,43 @@ async def store_song_task(
     return task_doc
 
 
-async def get_task_from_firestore(task_id: str) -> Optional[dict]:
+async def get_task_from_firestore(
+    task_id: str,
+    fields: Optional[list[str]] = None,
+) -> Optional[dict]:
     """
     Retrieve a song generation task from Firestore.
     
     Implements backward compatibility: if variations field is missing,
     migrates old song_url to variations[0] on read.
     
+    Completed and failed songs read with all of TASK_DETAILS_FIELDS are
+    kept in a per-process cache, which then answers reads projected to
+    any subset of those fields. Writes through this module invalidate it.
+    
     Args:
         task_id: The Suno task ID
+        fields: Only download these fields (e.g. TASK_STATUS_FIELDS);
+            None downloads the whole document
         
     Returns:
         Task document data if found, None otherwise
         
     Requirements: FR-3, 1.4
     """
+    if fields is not None and _DETAILS_FIELD_SET.issuperset(fields):
+        entry = _song_cache.lookup(task_id)
+        if entry is not MISSING:
+            return dict(entry["doc"])
+    epoch = _song_cache_epoch
+    
     firestore_client = get_firestore_client()
     
     task_ref = firestore_client.collection(SONGS_COLLECTION).document(task_id)
-    task_doc = task_ref.get()
+    if fields is None:
+        task_doc = await run_firestore(task_ref.get)
+    else:
+        task_doc = await run_firestore(task_ref.get, field_paths=fields)
     
     if not task_doc.exists:
         logger.debug(f"Task not found in Firestore: {task_id}")
@@ -158,6 +373,14 @@ async def get_task_from_firestore(task_id: str) -> Optional[dict]:
     if "primary_variation_index" not in task_data:
         task_data["primary_variation_index"] = 0
     
+    if (
+        task_data.get("status") in TERMINAL_STATUSES
+        and (fields is None or _DETAILS_FIELD_SET.issubset(fields))
+        and epoch == _song_cache_epoch
+    ):
+        doc = {key: value for key, value in task_data.items() if key in _DETAILS_FIELD_SET}
+        _song_cache.set(task_id, {"doc": doc, "details": None})
+    
     return task_data
 
 
@@ -174,6 +397,9 @@ async def update_task_status(
     """
     Update a song generation task status in Firestore.
     
+    Timestamp data, if given, is written for variation 0 to its own
+    timestamps document in the same batch.
+    
     Args:
         task_id: The Suno task ID
         status: New status value
@@ -221,17 +447,18 @@ async def update_task_status(
     if error is not None:
         update_data["error"] = error
     
-    # Add timestamped lyrics data if provided (Requirements: 2.2)
-    if aligned_words is not None:
-        update_data["aligned_words"] = aligned_words
-        update_data["has_timestamps"] = len(aligned_words) > 0
-    
-    if waveform_data is not None:
-        update_data["waveform_data"] = waveform_data
-    
     try:
         task_ref = firestore_client.collection(SONGS_COLLECTION).document(task_id)
-        task_ref.update(update_data)
+        
+        # Add timestamped lyrics data if provided (Requirements: 2.2)
+        if aligned_words is not None or waveform_data is not None:
+            batch = firestore_client.batch()
+            update_data.update(_write_timestamps(batch, task_ref, 0, aligned_words, waveform_data))
+            batch.update(task_ref, update_data)
+            await run_firestore(batch.commit)
+        else:
+            await run_firestore(task_ref.update, update_data)
+        invalidate_song_cache(task_id)
         
         logger.info(
             f"Task status updated: {task_id}",
@@ -263,48 +490,126 @@ async def update_task_status(
         return False
 
 
+def _timestamps_ref(task_ref, variation_index: int):
+    """Get the timestamps document of one variation of a song."""
+    return task_ref.collection(TIMESTAMPS_COLLECTION).document(str(variation_index))
+
+
+def _write_timestamps(
+    batch,
+    task_ref,
+    variation_index: int,
+    aligned_words: Optional[list[dict]],
+    waveform_data: Optional[list[float]],
+) -> dict:
+    """
+    Add a variation's timestamps document to a write batch.
+    
+    Aligned words are stored with their waveform as one compact blob
+    (see timestamp_codec), which is several times smaller than the
+    equivalent lists of maps and faster to decode.
+    
+    Returns:
+        dict: Fields to update on the song document itself
+    """
+    timestamps = {"variation_index": variation_index, "updated_at": datetime.now(timezone.utc)}
+    song_update = {"timestamp_variations": firestore.ArrayUnion([variation_index])}
+    timestamps_ref = _timestamps_ref(task_ref, variation_index)
+    
+    if aligned_words is not None:
+        song_update["has_timestamps"] = len(aligned_words) > 0
+        try:
+            timestamps["encoding"] = COMPACT_ENCODING
+            timestamps["data"] = encode_timestamps(aligned_words, waveform_data)
+            batch.set(timestamps_ref, timestamps)
+            return song_update
+        except ValueError as e:
+            # Values the compact format cannot hold are stored as plain lists
+            logger.warning(
+                f"Storing timestamps uncompressed: {task_ref.id}",
+                extra={
+                    "extra_fields": {
+                        "task_id": task_ref.id,
+                        "variation_index": variation_index,
+                        "error": str(e),
+                        "operation": "write_timestamps",
+                    }
+                },
+            )
+            timestamps = {
+                "variation_index": variation_index,
+                "updated_at": timestamps["updated_at"],
+                "aligned_words": aligned_words,
+            }
+    if waveform_data is not None:
+        timestamps["waveform_data"] = waveform_data
+    
+    batch.set(timestamps_ref, timestamps, merge=True)
+    return song_update
+
+
+def _timestamps_from_document(data: dict) -> dict:
+    """
+    Get aligned_words and waveform_data from a timestamps document.
+    
+    Raises:
+        ValueError: If the document's compact data cannot be decoded
+    """
+    if data.get("encoding") == COMPACT_ENCODING:
+        decoded = decode_timestamps(data["data"])
+        return {
+            "aligned_words": decoded.aligned_words(),
+            "waveform_data": decoded.waveform_data(),
+        }
+    return {
+        "aligned_words": data.get("aligned_words") or [],
+        "waveform_data": data.get("waveform_data") or [],
+    }
+
+
 async def store_timestamped_lyrics(
     task_id: str,
     aligned_words: list[dict],
     waveform_data: Optional[list[float]] = None,
+    variation_index: int = 0,
 ) -> bool:
     """
-    Store timestamped lyrics data for a song.
+    Store timestamped lyrics data for a song variation.
     
-    This function updates an existing song document with timestamped lyrics
-    data fetched from the Suno API.
+    The data goes to the variation's timestamps document; the song
+    document only records which variations have timestamps, so status
+    reads and rewrites stay small.
     
     Args:
         task_id: The Suno task ID
         aligned_words: Array of aligned words with timing information
             Each word should have: word, startS, endS, success, palign
         waveform_data: Optional waveform data for visualization
+        variation_index: Which variation the timestamps belong to
         
     Returns:
         bool: True if storage successful, False otherwise
         
     Requirements: 2.2, 2.3
     """
-    firestore_client = get_firestore_client()
-    
-    update_data = {
-        "aligned_words": aligned_words,
-        "has_timestamps": len(aligned_words) > 0,
-        "updated_at": datetime.now(timezone.utc),
-    }
-    
-    if waveform_data is not None:
-        update_data["waveform_data"] = waveform_data
-    
     try:
+        firestore_client = get_firestore_client()
         task_ref = firestore_client.collection(SONGS_COLLECTION).document(task_id)
-        task_ref.update(update_data)
+        batch = firestore_client.batch()
+        update_data = _write_timestamps(batch, task_ref, variation_index, aligned_words, waveform_data)
+        update_data["updated_at"] = datetime.now(timezone.utc)
+        batch.update(task_ref, update_data)
+        await run_firestore(batch.commit)
+        invalidate_song_cache(task_id)
+        await _refresh_share_snapshots(task_id, update_data)
+        await _refresh_cache_clones(task_id, update_data)
         
         logger.info(
             f"Timestamped lyrics stored: {task_id}",
             extra={
                 "extra_fields": {
                     "task_id": task_id,
+                    "variation_index": variation_index,
                     "aligned_words_count": len(aligned_words),
                     "has_waveform": waveform_data is not None,
                     "operation": "store_timestamped_lyrics",
@@ -326,13 +631,68 @@ async def store_timestamped_lyrics(
         return False
 
 
-async def get_user_tasks(user_id: str, limit: int = 10) -> list[dict]:
+async def load_timestamped_lyrics(
+    task_id: str,
+    variation_index: int = 0,
+    song_data: Optional[dict] = None,
+) -> Optional[dict]:
+    """
+    Load the timestamped lyrics of one song variation.
+    
+    Songs stored before timestamps moved to their own documents keep them
+    inline; those are returned as variation 0 (migration on read, like
+    _migrate_task_schema). Pass the already-read song document to skip
+    the legacy lookup for songs that cannot have inline data.
+    
+    Args:
+        task_id: The Suno task ID
+        variation_index: Which variation to load
+        song_data: Song document (any projection including has_timestamps
+            and timestamp_variations), if already read
+        
+    Returns:
+        dict with aligned_words and waveform_data, or None if none are stored
+        
+    Raises:
+        ValueError: If the stored compact data is corrupt
+    """
+    firestore_client = get_firestore_client()
+    task_ref = firestore_client.collection(SONGS_COLLECTION).document(task_id)
+    
+    if song_data is None or variation_index in song_data.get("timestamp_variations", []):
+        snapshot = await run_firestore(_timestamps_ref(task_ref, variation_index).get)
+        if snapshot.exists:
+            return _timestamps_from_document(snapshot.to_dict())
+    
+    # Legacy: variation 0 timestamps stored inline on the song document
+    is_legacy = song_data is None or (
+        song_data.get("has_timestamps") and "timestamp_variations" not in song_data
+    )
+    if variation_index != 0 or not is_legacy:
+        return None
+    
+    snapshot = await run_firestore(task_ref.get, field_paths=TIMESTAMP_FIELDS)
+    data = snapshot.to_dict() if snapshot.exists else None
+    if not data or not data.get("aligned_words"):
+        return None
+    return {
+        "aligned_words": data["aligned_words"],
+        "waveform_data": data.get("waveform_data") or [],
+    }
+
+
+async def get_user_tasks(
+    user_id: str,
+    limit: int = 10,
+    fields: Optional[list[str]] = None,
+) -> list[dict]:
     """
     Get all song tasks for a user.
     
     Args:
         user_id: Firebase user ID
         limit: Maximum number of tasks to return
+        fields: Only download these fields; None downloads whole documents
         
     Returns:
         List of task documents ordered by creation time (newest first)
@@ -349,9 +709,11 @@ async def get_user_tasks(user_id: str, limit: int = 10) -> list[dict]:
             .order_by("created_at", direction="DESCENDING")
             .limit(limit)
         )
+        if fields is not None:
+            tasks_ref = tasks_ref.select(fields)
         
         tasks = []
-        for doc in tasks_ref.stream():
+        for doc in await stream_documents(tasks_ref):
             task_data = doc.to_dict()
             task_data = _migrate_task_schema(task_data, doc.id)
             tasks.append(task_data)
@@ -377,9 +739,11 @@ async def get_user_tasks(user_id: str, limit: int = 10) -> list[dict]:
             .where("user_id", "==", user_id)
             .limit(limit * 2)  # Fetch more to ensure we get newest after sorting
         )
+        if fields is not None:
+            tasks_ref = tasks_ref.select(list({*fields, "created_at"}))
         
         tasks = []
-        for doc in tasks_ref.stream():
+        for doc in await stream_documents(tasks_ref):
             task_data = doc.to_dict()
             task_data = _migrate_task_schema(task_data, doc.id)
             tasks.append(task_data)
@@ -393,6 +757,139 @@ async def get_user_tasks(user_id: str, limit: int = 10) -> list[dict]:
         return tasks[:limit]
 
 
+async def _fill_lyrics_previews(firestore_client, tasks: list[dict], task_ids: list[str]) -> None:
+    """
+    Add lyrics_preview to tasks stored before the field existed.
+    
+    The lyrics of all such tasks are fetched in one batched read.
+    """
+    missing = [
+        (task, task_id) for task, task_id in zip(tasks, task_ids)
+        if "lyrics_preview" not in task
+    ]
+    if not missing:
+        return
+    
+    collection = firestore_client.collection(SONGS_COLLECTION)
+    refs = [collection.document(task_id) for _, task_id in missing]
+    snapshots = await run_firestore(
+        lambda: list(firestore_client.get_all(refs, field_paths=["lyrics"]))
+    )
+    lyrics_by_id = {
+        snapshot.id: (snapshot.to_dict() or {}).get("lyrics") or ""
+        for snapshot in snapshots
+        if snapshot.exists
+    }
+    for task, task_id in missing:
+        task["lyrics_preview"] = lyrics_by_id.get(task_id, "")[:LYRICS_PREVIEW_LENGTH]
+
+
+def encode_history_cursor(created_at: datetime, task_id: str) -> str:
+    """
+    Encode the position after a history item as an opaque cursor.
+    
+    Args:
+        created_at: created_at of the last song on the page
+        task_id: Document ID of the last song on the page, which orders
+            songs created at the same time
+        
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps({"created_at": created_at.isoformat(), "id": task_id})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime, str]:
+    """
+    Decode a cursor produced by encode_history_cursor.
+    
+    Args:
+        cursor: Cursor string from a previous history page
+        
+    Returns:
+        tuple: (created_at, document ID) of the last song on the previous page
+        
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        task_id = payload["id"]
+        if not isinstance(task_id, str) or not task_id:
+            raise ValueError("missing document ID")
+        return datetime.fromisoformat(payload["created_at"]), task_id
+    except Exception as e:
+        raise ValueError(f"Invalid history cursor: {cursor!r}") from e
+
+
+async def get_user_song_history(
+    user_id: str,
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Get one page of a user's playable songs, newest first.
+    
+    Expired and unfinished songs are filtered by the query itself
+    (status == completed, expires_at > now), so every document read is
+    returned. Only TASK_HISTORY_FIELDS are downloaded; lyrics_preview is
+    filled from the full lyrics for documents written before it existed.
+    
+    Requires the songs composite index in firestore.indexes.json (and
+    Firestore's support for ordering by a field other than the inequality
+    field); there is deliberately no unindexed fallback.
+    Pages are keyed by (created_at, document ID), so songs created at the
+    same time are neither skipped nor repeated across pages.
+    
+    Args:
+        user_id: Firebase user ID
+        limit: Maximum number of songs on the page
+        cursor: Cursor returned with the previous page, or None for the first page
+        
+    Returns:
+        tuple: (task documents, cursor for the next page or None if this is the last)
+        
+    Raises:
+        ValueError: If the cursor is malformed
+        
+    Requirements: 6.1, 6.3
+    """
+    start_after = decode_history_cursor(cursor) if cursor else None
+    firestore_client = get_firestore_client()
+    
+    query = (
+        firestore_client.collection(SONGS_COLLECTION)
+        .where("user_id", "==", user_id)
+        .where("status", "==", GenerationStatus.COMPLETED.value)
+        .where("expires_at", ">", datetime.now(timezone.utc))
+        .order_by("created_at", direction="DESCENDING")
+        .order_by("__name__", direction="DESCENDING")
+        .select(TASK_HISTORY_FIELDS)
+    )
+    if start_after is not None:
+        created_at, task_id = start_after
+        query = query.start_after({"created_at": created_at, "__name__": task_id})
+    
+    # One extra document tells whether another page exists
+    docs = await stream_documents(query.limit(limit + 1))
+    
+    tasks = []
+    for doc in docs[:limit]:
+        task_data = doc.to_dict()
+        task_data = _migrate_task_schema(task_data, doc.id)
+        tasks.append(task_data)
+    
+    await _fill_lyrics_previews(firestore_client, tasks, [doc.id for doc in docs[:limit]])
+    
+    next_cursor = None
+    if len(docs) > limit and tasks:
+        next_cursor = encode_history_cursor(tasks[-1]["created_at"], docs[limit - 1].id)
+    
+    return tasks, next_cursor
+
+
 def _migrate_task_schema(task_data: dict, task_id: str) -> dict:
     """
     Apply backward compatibility migration for task schema.
@@ -442,7 +939,7 @@ async def verify_task_ownership(task_id: str, user_id: str) -> bool:
         
     Requirements: FR-3
     """
-    task_data = await get_task_from_firestore(task_id)
+    task_data = await get_task_from_firestore(task_id, fields=TASK_OWNER_FIELDS)
     
     if task_data is None:
         return False
@@ -450,38 +947,117 @@ async def verify_task_ownership(task_id: str, user_id: str) -> bool:
     return task_data.get("user_id") == user_id
 
 
-async def cleanup_expired_tasks() -> int:
+async def _delete_expired(
+    collection_name: str,
+    docs_per_batch: int,
+    add_deletes: Callable[[Any, Any], None],
+    max_concurrency: int,
+    operation: str,
+) -> list[str]:
     """
-    Delete expired song tasks from Firestore.
+    Page through a collection's expired documents and delete them in batches.
     
-    This function removes all tasks where expires_at is in the past.
-    Should be called periodically (e.g., via a scheduled Cloud Function).
+    Pages of expired documents are read in expires_at order, each starting
+    after the last document of the previous page, while up to
+    max_concurrency delete batches commit at once. A failed batch is
+    logged and skipped; its documents are retried by the next sweep.
     
-    Returns:
-        int: Number of tasks deleted
+    Args:
+        collection_name: Collection whose documents carry expires_at
+        docs_per_batch: Documents per page and delete batch
+        add_deletes: Adds the deletes for one expired document to a batch
+        max_concurrency: Maximum batches committing at once
+        operation: Operation name for logs
         
-    Requirements: Task 17.2 (TTL cleanup)
+    Returns:
+        IDs of the deleted documents
     """
     firestore_client = get_firestore_client()
     
-    current_time = datetime.now(timezone.utc)
-    
-    # Query for expired tasks
-    expired_ref = (
-        firestore_client.collection(SONGS_COLLECTION)
-        .where("expires_at", "<", current_time)
-        .limit(500)  # Process in batches
+    query = (
+        firestore_client.collection(collection_name)
+        .where("expires_at", "<", datetime.now(timezone.utc))
+        .order_by("expires_at")
+        .select(["expires_at"])
+        .limit(docs_per_batch)
     )
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def commit(batch, doc_ids: list[str]) -> list[str]:
+        try:
+            await run_firestore(batch.commit)
+            return doc_ids
+        except Exception as e:
+            logger.error(
+                f"Failed to delete expired documents from {collection_name}",
+                extra={
+                    "extra_fields": {
+                        "collection": collection_name,
+                        "documents": len(doc_ids),
+                        "error": str(e),
+                        "operation": operation,
+                    }
+                },
+            )
+            return []
+        finally:
+            semaphore.release()
+    
+    commits = []
+    try:
+        page = await stream_documents(query)
+        while page:
+            await semaphore.acquire()
+            batch = firestore_client.batch()
+            for doc in page:
+                add_deletes(batch, doc)
+            commits.append(asyncio.create_task(commit(batch, [doc.id for doc in page])))
+            if len(page) < docs_per_batch:
+                break
+            page = await stream_documents(query.start_after(page[-1]))
+    finally:
+        # Batches already handed to Firestore are awaited even if paging fails
+        deleted = await asyncio.gather(*commits)
+    
+    return [doc_id for doc_ids in deleted for doc_id in doc_ids]
+
+
+async def cleanup_expired_tasks(max_concurrency: int = CLEANUP_MAX_CONCURRENT_BATCHES) -> int:
+    """
+    Delete expired song tasks from Firestore.
     
-    deleted_count = 0
-    batch = firestore_client.batch()
+    This function removes all tasks where expires_at is in the past,
+    together with their per-variation timestamps documents, in batches of
+    at most MAX_BATCH_WRITES deletes, and then the deleted songs' share
+    links (whose snapshots would otherwise keep serving them). Run
+    periodically by the expiry sweeper.
     
-    for doc in expired_ref.stream():
+    Args:
+        max_concurrency: Maximum delete batches committing at once
+    
+    Returns:
+        int: Number of tasks deleted
+        
+    Requirements: Task 17.2 (TTL cleanup)
+    """
+    def add_deletes(batch, doc) -> None:
         batch.delete(doc.reference)
-        deleted_count += 1
+        for variation_index in range(MAX_VARIATIONS):
+            batch.delete(_timestamps_ref(doc.reference, variation_index))
+    
+    deleted_task_ids = await _delete_expired(
+        SONGS_COLLECTION,
+        MAX_BATCH_WRITES // (1 + MAX_VARIATIONS),
+        add_deletes,
+        max_concurrency,
+        "cleanup_expired_tasks",
+    )
+    for task_id in deleted_task_ids:
+        invalidate_song_cache(task_id)
+    await _delete_share_links(deleted_task_ids)
     
+    deleted_count = len(deleted_task_ids)
     if deleted_count > 0:
-        batch.commit()
         logger.info(
             f"Cleaned up {deleted_count} expired song tasks",
             extra={
@@ -495,6 +1071,82 @@ async def cleanup_expired_tasks() -> int:
     return deleted_count
 
 
+async def _delete_share_links(song_ids: list[str]) -> None:
+    """
+    Delete the share links of deleted songs.
+    
+    Failures are logged: the links' snapshots carry the song's expires_at,
+    so leftover links answer "expired" until they are swept themselves.
+    """
+    if not song_ids:
+        return
+    
+    try:
+        firestore_client = get_firestore_client()
+        links = []
+        for start in range(0, len(song_ids), MAX_IN_QUERY_VALUES):
+            query = (
+                firestore_client.collection(SHARE_LINKS_COLLECTION)
+                .where("song_id", "in", song_ids[start:start + MAX_IN_QUERY_VALUES])
+                .select(["song_id"])
+            )
+            links.extend(await stream_documents(query))
+        
+        for start in range(0, len(links), MAX_BATCH_WRITES):
+            batch = firestore_client.batch()
+            for link in links[start:start + MAX_BATCH_WRITES]:
+                batch.delete(link.reference)
+            await run_firestore(batch.commit)
+        for link in links:
+            _share_cache.invalidate(link.id)
+    except Exception as e:
+        logger.warning(
+            f"Failed to delete share links of {len(song_ids)} expired songs",
+            extra={
+                "extra_fields": {
+                    "songs": len(song_ids),
+                    "error": str(e),
+                    "operation": "cleanup_expired_tasks",
+                }
+            },
+        )
+
+
+async def cleanup_expired_share_links(max_concurrency: int = CLEANUP_MAX_CONCURRENT_BATCHES) -> int:
+    """
+    Delete expired share links from Firestore.
+    
+    Args:
+        max_concurrency: Maximum delete batches committing at once
+    
+    Returns:
+        int: Number of share links deleted
+    """
+    deleted_tokens = await _delete_expired(
+        SHARE_LINKS_COLLECTION,
+        MAX_BATCH_WRITES,
+        lambda batch, doc: batch.delete(doc.reference),
+        max_concurrency,
+        "cleanup_expired_share_links",
+    )
+    for share_token in deleted_tokens:
+        _share_cache.invalidate(share_token)
+    
+    deleted_count = len(deleted_tokens)
+    if deleted_count > 0:
+        logger.info(
+            f"Cleaned up {deleted_count} expired share links",
+            extra={
+                "extra_fields": {
+                    "deleted_count": deleted_count,
+                    "operation": "cleanup_expired_share_links",
+                }
+            },
+        )
+    
+    return deleted_count
+
+
 async def extend_task_ttl(task_id: str, hours: int = ANONYMOUS_TTL_HOURS) -> bool:
     """
     Extend the TTL of a task.
@@ -514,10 +1166,13 @@ async def extend_task_ttl(task_id: str, hours: int = ANONYMOUS_TTL_HOURS) -> boo
     
     try:
         task_ref = firestore_client.collection(SONGS_COLLECTION).document(task_id)
-        task_ref.update({
+        update_data = {
             "expires_at": new_expires_at,
             "updated_at": datetime.now(timezone.utc),
-        })
+        }
+        await run_firestore(task_ref.update, update_data)
+        invalidate_song_cache(task_id)
+        await _refresh_share_snapshots(task_id, update_data)
         
         logger.info(
             f"Task TTL extended: {task_id}",
@@ -577,10 +1232,13 @@ async def update_primary_variation(
     
     try:
         task_ref = firestore_client.collection(SONGS_COLLECTION).document(task_id)
-        task_ref.update({
+        update_data = {
             "primary_variation_index": variation_index,
             "updated_at": datetime.now(timezone.utc),
-        })
+        }
+        await run_firestore(task_ref.update, update_data)
+        invalidate_song_cache(task_id)
+        await _refresh_share_snapshots(task_id, update_data)
         
         logger.info(
             f"Primary variation updated: {task_id}",
@@ -614,16 +1272,18 @@ async def update_primary_variation(
 # ============================================================================
 
 
-async def create_share_link(song_id: str, user_id: str) -> dict:
+async def create_share_link(song_id: str, user_id: str, song_data: Optional[dict] = None) -> dict:
     """
     Create a shareable link for a song.
     
     Generates a unique token and stores the share link in Firestore
-    with a 48-hour expiration.
+    with a 48-hour expiration. The link carries a snapshot of the song's
+    details, so resolving it needs a single read.
     
     Args:
         song_id: The song/task ID to share
         user_id: Firebase user ID who is creating the share
+        song_data: The song read with TASK_DETAILS_FIELDS, if already read
         
     Returns:
         dict: Share link data including share_token, song_id, expires_at
@@ -632,6 +1292,9 @@ async def create_share_link(song_id: str, user_id: str) -> dict:
     """
     firestore_client = get_firestore_client()
     
+    if song_data is None:
+        song_data = await get_task_from_firestore(song_id, fields=TASK_DETAILS_FIELDS)
+    
     # Generate a unique share token (URL-safe)
     share_token = secrets.token_urlsafe(32)
     
@@ -645,10 +1308,11 @@ async def create_share_link(song_id: str, user_id: str) -> dict:
         "created_at": current_time,
         "expires_at": expires_at,
     }
+    snapshot = _share_snapshot(song_data)
     
     # Store share link document using share_token as document ID
     share_ref = firestore_client.collection(SHARE_LINKS_COLLECTION).document(share_token)
-    share_ref.set(share_doc)
+    await run_firestore(share_ref.set, {**share_doc, "song": snapshot} if snapshot else share_doc)
     
     logger.info(
         f"Share link created for song: {song_id}",
@@ -666,89 +1330,219 @@ async def create_share_link(song_id: str, user_id: str) -> dict:
     return share_doc
 
 
-async def get_song_by_share_token(share_token: str) -> Optional[dict]:
+def _share_snapshot(song_data: Optional[dict]) -> Optional[dict]:
+    """Get the song fields a share link keeps a copy of."""
+    if not song_data:
+        return None
+    return {field: song_data[field] for field in TASK_DETAILS_FIELDS if field in song_data}
+
+
+def _as_utc(value) -> datetime:
+    """Convert a Firestore timestamp, datetime or ISO string to an aware UTC datetime."""
+    if hasattr(value, "timestamp"):
+        return datetime.fromtimestamp(value.timestamp(), tz=timezone.utc)
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+async def _load_share_link(share_token: str) -> Optional[dict]:
     """
-    Retrieve song data via share token.
+    Read a share link and its song snapshot from Firestore.
     
-    Looks up the share link, validates it hasn't expired, and returns
-    the associated song data.
+    Links created before snapshots existed read the song as well and get
+    the snapshot written back (migration on read).
     
-    Args:
-        share_token: The unique share token
-        
     Returns:
-        dict: Song data if found and valid, None if share link not found
-        
-    Raises:
-        ValueError: If share link has expired
-        
-    Requirements: 5.3, 5.4
+        {"expires_at", "song"}, or None if the link or its song doesn't exist
     """
     firestore_client = get_firestore_client()
     
     # Look up share link
     share_ref = firestore_client.collection(SHARE_LINKS_COLLECTION).document(share_token)
-    share_doc = share_ref.get()
+    share_doc = await run_firestore(share_ref.get)
     
     if not share_doc.exists:
         logger.debug(f"Share link not found: {share_token[:8]}...")
         return None
     
     share_data = share_doc.to_dict()
+    song_id = share_data.get("song_id")
+    song_data = share_data.get("song")
     
-    # Check if share link has expired
-    expires_at = share_data.get("expires_at")
-    if expires_at:
-        # Handle both datetime objects and Firestore timestamps
-        if hasattr(expires_at, "timestamp"):
-            expires_at_dt = datetime.fromtimestamp(expires_at.timestamp(), tz=timezone.utc)
-        elif isinstance(expires_at, datetime):
-            expires_at_dt = expires_at if expires_at.tzinfo else expires_at.replace(tzinfo=timezone.utc)
-        else:
-            expires_at_dt = datetime.fromisoformat(str(expires_at).replace("Z", "+00:00"))
-        
-        if datetime.now(timezone.utc) > expires_at_dt:
-            logger.info(
-                f"Share link expired: {share_token[:8]}...",
+    if song_data is None:
+        song_data = await get_task_from_firestore(song_id, fields=TASK_DETAILS_FIELDS)
+        if song_data is None:
+            logger.warning(
+                f"Song not found for share link: {share_token[:8]}...",
+                extra={
+                    "extra_fields": {
+                        "share_token": share_token[:8] + "...",
+                        "song_id": song_id,
+                        "operation": "get_song_by_share_token",
+                    }
+                },
+            )
+            return None
+        try:
+            await run_firestore(share_ref.update, {"song": _share_snapshot(song_data)})
+        except Exception as e:
+            logger.warning(
+                f"Failed to store share snapshot: {share_token[:8]}...",
                 extra={
                     "extra_fields": {
                         "share_token": share_token[:8] + "...",
-                        "expires_at": expires_at_dt.isoformat(),
+                        "error": str(e),
                         "operation": "get_song_by_share_token",
                     }
                 },
             )
-            raise ValueError("Share link has expired")
     
-    # Get the associated song
-    song_id = share_data.get("song_id")
-    song_data = await get_task_from_firestore(song_id)
+    expires_at = share_data.get("expires_at")
+    return {
+        "expires_at": _as_utc(expires_at) if expires_at else None,
+        "song": song_data,
+    }
+
+
+async def get_song_by_share_token(share_token: str) -> Optional[dict]:
+    """
+    Retrieve song data via share token.
     
-    if song_data is None:
-        logger.warning(
-            f"Song not found for share link: {share_token[:8]}...",
+    Resolved links are served from an in-process cache for
+    SHARE_CACHE_TTL_SECONDS, and concurrent misses for a token share one
+    Firestore read, so a link opened by many people at once costs one
+    read per TTL window. Expiry is checked on every call.
+    
+    Args:
+        share_token: The unique share token
+        
+    Returns:
+        dict: Song data (plus the link's own share_expires_at) if found and
+            valid, None if share link not found
+        
+    Raises:
+        ValueError: If share link has expired
+        
+    Requirements: 5.3, 5.4
+    """
+    share = await _share_cache.get_or_load(share_token, lambda: _load_share_link(share_token))
+    if share is None:
+        return None
+    
+    # Check if share link has expired
+    expires_at_dt = share["expires_at"]
+    if expires_at_dt and datetime.now(timezone.utc) > expires_at_dt:
+        logger.info(
+            f"Share link expired: {share_token[:8]}...",
             extra={
                 "extra_fields": {
                     "share_token": share_token[:8] + "...",
-                    "song_id": song_id,
+                    "expires_at": expires_at_dt.isoformat(),
                     "operation": "get_song_by_share_token",
                 }
             },
         )
-        return None
+        raise ValueError("Share link has expired")
     
+    song_data = share["song"]
     logger.info(
-        f"Song retrieved via share link: {song_id}",
+        f"Song retrieved via share link: {song_data.get('task_id')}",
         extra={
             "extra_fields": {
                 "share_token": share_token[:8] + "...",
-                "song_id": song_id,
+                "song_id": song_data.get("task_id"),
                 "operation": "get_song_by_share_token",
             }
         },
     )
     
-    return song_data
+    # Callers get their own copy of the cached snapshot
+    return {**song_data, "share_expires_at": expires_at_dt}
+
+
+async def _refresh_share_snapshots(task_id: str, updates: dict) -> None:
+    """
+    Copy changed song fields into the snapshots of the song's share links.
+    
+    Costs one query read (plus a write per link) and is only called for
+    the rare writes that change a shared song's details. Links without a
+    snapshot are left alone (a dotted update would create a partial one)
+    and take the whole song on their next read. Failures are logged: a
+    stale snapshot only shows the old primary variation or timestamps
+    until the link expires.
+    """
+    try:
+        firestore_client = get_firestore_client()
+        query = (
+            firestore_client.collection(SHARE_LINKS_COLLECTION)
+            .where("song_id", "==", task_id)
+            .select(["song_id", "song.task_id"])
+        )
+        links = await stream_documents(query)
+        if not links:
+            return
+        
+        snapshot_links = [link for link in links if (link.to_dict() or {}).get("song")]
+        if snapshot_links:
+            batch = firestore_client.batch()
+            for link in snapshot_links:
+                batch.update(link.reference, {f"song.{field}": value for field, value in updates.items()})
+            await run_firestore(batch.commit)
+        for link in links:
+            _share_cache.invalidate(link.id)
+    except Exception as e:
+        logger.warning(
+            f"Failed to refresh share snapshots: {task_id}",
+            extra={
+                "extra_fields": {
+                    "task_id": task_id,
+                    "error": str(e),
+                    "operation": "refresh_share_snapshots",
+                }
+            },
+        )
+
+
+async def _refresh_cache_clones(task_id: str, updates: dict) -> None:
+    """
+    Copy a song's new timestamp fields into the songs cloned from it.
+    
+    Song cache hits (source_task_id) read their timestamps from the
+    source task, so without this their updated_at, timestamp_variations
+    and therefore ETag would not change when the source's timestamps
+    arrive. Costs one query read (plus a write per clone). Failures are
+    logged: clones then show the timestamps only once re-fetched.
+    """
+    try:
+        firestore_client = get_firestore_client()
+        query = (
+            firestore_client.collection(SONGS_COLLECTION)
+            .where("source_task_id", "==", task_id)
+            .select(["source_task_id"])
+        )
+        clones = await stream_documents(query)
+        if not clones:
+            return
+        
+        batch = firestore_client.batch()
+        for clone in clones:
+            batch.update(clone.reference, updates)
+        await run_firestore(batch.commit)
+        for clone in clones:
+            invalidate_song_cache(clone.id)
+            await _refresh_share_snapshots(clone.id, updates)
+    except Exception as e:
+        logger.warning(
+            f"Failed to refresh cache clones: {task_id}",
+            extra={
+                "extra_fields": {
+                    "task_id": task_id,
+                    "error": str(e),
+                    "operation": "refresh_cache_clones",
+                }
+            },
+        )
 
 
 async def validate_share_link(share_token: str) -> bool:
@@ -767,7 +1561,7 @@ async def validate_share_link(share_token: str) -> bool:
     
     # Look up share link
     share_ref = firestore_client.collection(SHARE_LINKS_COLLECTION).document(share_token)
-    share_doc = share_ref.get()
+    share_doc = await run_firestore(share_ref.get)
     
     if not share_doc.exists:
         logger.debug(f"Share link not found for validation: {share_token[:8]}...")
@@ -5,6 +5,7 @@ to generate music from lyrics.
 """
 
 import asyncio
+import importlib.util
 import logging
 import os
 from dataclasses import dataclass
@@ -22,6 +23,17 @@ SUNO_API_BASE_URL = "https://api.sunoapi.org"
 # Default timeout for API requests (seconds)
 DEFAULT_TIMEOUT = 30.0
 
+# Connection pool configuration for the shared client
+MAX_CONNECTIONS = int(os.getenv("SUNO_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUNO_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("SUNO_KEEPALIVE_EXPIRY", "30.0"))  # seconds
+
+# HTTP/2 multiplexes concurrent requests over one connection; needs the h2 package
+HTTP2_ENABLED = (
+    os.getenv("SUNO_HTTP2", "true").lower() == "true"
+    and importlib.util.find_spec("h2") is not None
+)
+
 # Retry configuration
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 1.0  # seconds
@@ -167,6 +179,8 @@ class SunoClient:
         api_key: str,
         base_url: str = SUNO_API_BASE_URL,
         timeout: float = DEFAULT_TIMEOUT,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = HTTP2_ENABLED,
     ):
         """
         Initialize Suno API client.
@@ -175,6 +189,8 @@ class SunoClient:
             api_key: Suno API authentication key
             base_url: Base URL for Suno API
             timeout: Request timeout in seconds
+            limits: Connection pool limits (defaults to the SUNO_* pool settings)
+            http2: Whether to negotiate HTTP/2 with the Suno API
         """
         if not api_key:
             raise ValueError("api_key cannot be empty")
@@ -182,6 +198,12 @@ class SunoClient:
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
+        self.limits = limits or httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        )
+        self.http2 = http2
         self._client: Optional[httpx.AsyncClient] = None
 
     @property
@@ -195,6 +217,8 @@ class SunoClient:
                     "Content-Type": "application/json",
                 },
                 timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
             )
         return self._client
 
@@ -240,7 +264,8 @@ class SunoClient:
         title = title[:80] if title else "Learning Song"
         
         # Get callback URL from environment or use a placeholder
-        # The API requires this field, but we poll for status instead of using webhooks
+        # The API requires this field; when it points at /api/webhooks/suno,
+        # status updates are pushed and polling only runs as a fallback
         callback_url = os.getenv("SUNO_CALLBACK_URL", "https://example.com/callback")
         
         # Get model version from environment variable with validation
@@ -637,7 +662,8 @@ class SunoClient:
             logger.error(f"Unexpected error fetching timestamped lyrics: {e}")
             return None
 
-    def _status_to_progress(self, status: str) -> int:
+    @staticmethod
+    def _status_to_progress(status: str) -> int:
         """Map Suno status to progress percentage."""
         status_progress = {
             "PENDING": 10,
@@ -653,7 +679,8 @@ class SunoClient:
         }
         return status_progress.get(status, 0)
 
-    def _get_error_message(self, status: str) -> str:
+    @staticmethod
+    def _get_error_message(status: str) -> str:
         """Get user-friendly error message for failed status."""
         error_messages = {
             "FAILED": "Song generation failed. Please try again.",
@@ -678,3 +705,110 @@ class SunoClient:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit."""
         await self.close()
+
+
+# Maps Suno callbackType values to the equivalent record-info status
+CALLBACK_TYPE_STATUS = {
+    "text": "TEXT_SUCCESS",
+    "first": "FIRST_SUCCESS",
+    "complete": "SUCCESS",
+    "error": "FAILED",
+}
+
+
+def status_from_callback(
+    callback_type: str,
+    code: int,
+    msg: str,
+    tracks: list[dict],
+) -> SunoStatus:
+    """
+    Build a SunoStatus from a Suno generation callback.
+
+    Mirrors get_task_status so callbacks and polls produce identical
+    results: variations are only reported once generation is complete.
+
+    Args:
+        callback_type: Callback stage (text, first, complete, error)
+        code: Result code from the callback (200 on success)
+        msg: Result message from the callback (logged on failure)
+        tracks: Generated tracks as dicts with "id" and "audio_url"
+
+    Returns:
+        SunoStatus equivalent to polling the task at this stage
+    """
+    status = CALLBACK_TYPE_STATUS.get(callback_type, "GENERATING")
+    if code != 200:
+        status = "FAILED"
+
+    variations = []
+    error = None
+
+    if status == "SUCCESS":
+        for idx, track in enumerate(tracks[:2]):
+            if track.get("audio_url") and track.get("id"):
+                variations.append(SongVariation(
+                    audio_url=track["audio_url"],
+                    audio_id=track["id"],
+                    variation_index=idx,
+                ))
+        if not variations:
+            logger.warning("Completion callback contained no valid variations")
+    elif status == "FAILED":
+        # Use the same user-facing message as polling; msg is only logged
+        logger.warning(f"Suno reported generation failure: {msg}")
+        error = SunoClient._get_error_message(status)
+
+    return SunoStatus(
+        status=status,
+        progress=SunoClient._status_to_progress(status),
+        variations=variations,
+        song_url=variations[0].audio_url if variations else None,
+        error=error,
+        audio_id=variations[0].audio_id if variations else None,
+    )
+
+# Singleton instance shared by all requests (managed by the app lifespan)
+_suno_client: Optional[SunoClient] = None
+
+
+def get_suno_client() -> SunoClient:
+    """
+    Get or create the process-wide Suno client singleton.
+
+    Reusing one client keeps a warm connection pool to the Suno API, so
+    requests skip the TCP and TLS handshake a per-request client pays.
+
+    Returns:
+        The shared SunoClient
+
+    Raises:
+        ValueError: If SUNO_API_KEY is not configured
+    """
+    global _suno_client
+    if _suno_client is None:
+        _suno_client = SunoClient(
+            api_key=os.getenv("SUNO_API_KEY", ""),
+            base_url=os.getenv("SUNO_API_URL", SUNO_API_BASE_URL),
+        )
+        logger.info(
+            "Shared Suno client created",
+            extra={
+                "extra_fields": {
+                    "base_url": _suno_client.base_url,
+                    "http2": _suno_client.http2,
+                    "max_connections": MAX_CONNECTIONS,
+                    "max_keepalive_connections": MAX_KEEPALIVE_CONNECTIONS,
+                    "keepalive_expiry": KEEPALIVE_EXPIRY,
+                }
+            },
+        )
+    return _suno_client
+
+
+async def close_suno_client() -> None:
+    """Close the shared Suno client and its pooled connections."""
+    global _suno_client
+    if _suno_client is not None:
+        await _suno_client.close()
+        _suno_client = None
@@ -0,0 +1,431 @@
+"""
+Shared Suno status poller.
+
+This module provides a single process-wide poller that multiplexes every
+in-flight Suno generation task over the shared SunoClient connection pool.
+Polls for the same task are coalesced: concurrent callers share one
+upstream request, and results younger than COALESCE_WINDOW are served
+from memory. Fresh results are persisted to Firestore once and fanned
+out to registered listeners (e.g. the WebSocket rooms), so upstream
+traffic grows with distinct tasks rather than clients x requests.
+
+When SUNO_CALLBACK_URL is configured, Suno pushes status changes to the
+webhook route, which hands them to ingest(); polling then only runs as a
+slow fallback sweep in case a callback is lost.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from app.models.songs import GenerationStatus
+from app.services.song_storage import update_task_status
+from app.services.suno_client import SunoClient, SunoStatus, get_suno_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Background polling interval for watched tasks (seconds)
+POLL_INTERVAL = 5
+
+# Maximum time a task is watched (5 minutes - Suno generation can take 2-4 minutes)
+MAX_POLL_DURATION = 300
+
+# Results younger than this are reused instead of polling Suno again (seconds)
+COALESCE_WINDOW = float(os.getenv("SUNO_POLL_COALESCE_WINDOW", "2.0"))
+
+# Polling interval and result reuse window when webhook callbacks are enabled (seconds)
+FALLBACK_POLL_INTERVAL = float(os.getenv("SUNO_FALLBACK_POLL_INTERVAL", "30"))
+
+# Maximum number of concurrent upstream status requests per sweep
+MAX_CONCURRENT_POLLS = int(os.getenv("SUNO_MAX_CONCURRENT_POLLS", "16"))
+
+# Error reported when a watched task exceeds MAX_POLL_DURATION
+TIMEOUT_ERROR = "Generation timed out. Please try again."
+
+# Listener signature: called with (task_id, suno_status) for every fresh result
+PollListener = Callable[[str, SunoStatus], Awaitable[None]]
+
+
+def map_suno_status_to_generation_status(suno_status: str) -> GenerationStatus:
+    """
+    Map Suno API status to GenerationStatus enum.
+
+    Args:
+        suno_status: Status string from Suno API
+
+    Returns:
+        Corresponding GenerationStatus enum value
+    """
+    status_mapping = {
+        "PENDING": GenerationStatus.QUEUED,
+        "TEXT_SUCCESS": GenerationStatus.PROCESSING,
+        "FIRST_SUCCESS": GenerationStatus.PROCESSING,
+        "GENERATING": GenerationStatus.PROCESSING,
+        "SUCCESS": GenerationStatus.COMPLETED,
+        "FAILED": GenerationStatus.FAILED,
+        "CREATE_TASK_FAILED": GenerationStatus.FAILED,
+        "GENERATE_AUDIO_FAILED": GenerationStatus.FAILED,
+        "CALLBACK_EXCEPTION": GenerationStatus.FAILED,
+        "SENSITIVE_WORD_ERROR": GenerationStatus.FAILED,
+    }
+    return status_mapping.get(suno_status, GenerationStatus.QUEUED)
+
+
+def webhooks_enabled() -> bool:
+    """
+    Check whether Suno is configured to push status callbacks.
+
+    Callbacks are rejected without SUNO_CALLBACK_SECRET, so polling stays
+    at full rate until both the URL and the secret are set.
+    """
+    return bool(os.getenv("SUNO_CALLBACK_URL") and os.getenv("SUNO_CALLBACK_SECRET"))
+
+
+def is_terminal_status(suno_status: SunoStatus) -> bool:
+    """Check whether a Suno status is completed or failed."""
+    return map_suno_status_to_generation_status(suno_status.status) in (
+        GenerationStatus.COMPLETED,
+        GenerationStatus.FAILED,
+    )
+
+
+def variations_to_dicts(suno_status: SunoStatus) -> list[dict]:
+    """Convert SongVariation dataclasses to dicts for storage and broadcast."""
+    return [
+        {
+            "audio_url": v.audio_url,
+            "audio_id": v.audio_id,
+            "variation_index": v.variation_index,
+        }
+        for v in suno_status.variations
+    ]
+
+
+@dataclass
+class _PollResult:
+    """Most recent upstream result for a task."""
+
+    status: SunoStatus
+    polled_at: float
+
+
+class SunoPoller:
+    """
+    Process-wide registry and poller for in-flight Suno tasks.
+
+    Tasks are registered with watch() (e.g. on WebSocket subscribe) and
+    polled in the background every poll_interval seconds until they reach
+    a terminal state, are unwatched, or exceed max_poll_duration. The REST
+    status endpoint uses get_status(), which shares results and in-flight
+    requests with the background sweep.
+    """
+
+    def __init__(
+        self,
+        poll_interval: Optional[float] = None,
+        coalesce_window: Optional[float] = None,
+        max_poll_duration: float = MAX_POLL_DURATION,
+        max_concurrency: int = MAX_CONCURRENT_POLLS,
+    ):
+        """
+        Initialize the poller.
+
+        Args:
+            poll_interval: Seconds between background sweeps (default:
+                POLL_INTERVAL, or FALLBACK_POLL_INTERVAL with webhooks)
+            coalesce_window: Seconds a result is reused before re-polling
+                (default: COALESCE_WINDOW, or FALLBACK_POLL_INTERVAL with webhooks)
+            max_poll_duration: Seconds a watched task is polled before timing out
+            max_concurrency: Maximum concurrent upstream requests per sweep
+        """
+        self.poll_interval = poll_interval
+        self.coalesce_window = coalesce_window
+        self.max_poll_duration = max_poll_duration
+        self.max_concurrency = max_concurrency
+
+        # Maps task_id -> monotonic time the task started being watched
+        self._watched: dict[str, float] = {}
+        # Maps task_id -> latest upstream result
+        self._results: dict[str, _PollResult] = {}
+        # Monotonic time _results was last pruned
+        self._pruned_at = time.monotonic()
+        # Maps task_id -> in-flight upstream request shared by all callers
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._listeners: list[PollListener] = []
+        self._loop_task: Optional[asyncio.Task] = None
+        # Overrides the shared client when set (used by tests and benchmarks)
+        self._client: Optional[SunoClient] = None
+
+        # Number of requests actually sent to Suno (for metrics and tests)
+        self.upstream_requests = 0
+
+    @property
+    def interval(self) -> float:
+        """Effective seconds between background sweeps."""
+        if self.poll_interval is not None:
+            return self.poll_interval
+        return FALLBACK_POLL_INTERVAL if webhooks_enabled() else POLL_INTERVAL
+
+    @property
+    def window(self) -> float:
+        """Effective seconds a result is reused before re-polling."""
+        if self.coalesce_window is not None:
+            return self.coalesce_window
+        return FALLBACK_POLL_INTERVAL if webhooks_enabled() else COALESCE_WINDOW
+
+    @property
+    def client(self) -> SunoClient:
+        """Get the Suno client used for all polls."""
+        return self._client or get_suno_client()
+
+    def add_listener(self, listener: PollListener) -> None:
+        """Register a coroutine called for every fresh poll result."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: PollListener) -> None:
+        """Unregister a previously added listener."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def watch(self, task_id: str) -> None:
+        """
+        Register a task for background polling.
+
+        Starts the shared polling loop if it is not already running.
+        Watching an already-watched task is a no-op.
+        """
+        if task_id not in self._watched:
+            self._watched[task_id] = time.monotonic()
+            logger.info(f"Watching task: {task_id} ({len(self._watched)} active)")
+
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._run())
+
+    def unwatch(self, task_id: str) -> None:
+        """Stop background polling for a task."""
+        if self._watched.pop(task_id, None) is not None:
+            logger.info(f"Stopped watching task: {task_id} ({len(self._watched)} active)")
+
+    def is_watching(self, task_id: str) -> bool:
+        """Check whether a task is registered for background polling."""
+        return task_id in self._watched
+
+    @property
+    def active_task_ids(self) -> list[str]:
+        """Task IDs currently registered for background polling."""
+        return list(self._watched)
+
+    async def get_status(self, task_id: str) -> SunoStatus:
+        """
+        Get the current Suno status for a task, coalescing duplicate polls.
+
+        Returns the cached result if it is younger than coalesce_window;
+        otherwise joins an in-flight request for the same task or starts one.
+
+        Args:
+            task_id: The Suno task ID
+
+        Returns:
+            SunoStatus from Suno (possibly shared with other callers)
+
+        Raises:
+            SunoAPIError: If the upstream request fails
+        """
+        cached = self._results.get(task_id)
+        if cached and time.monotonic() - cached.polled_at < self.window:
+            return cached.status
+
+        in_flight = self._in_flight.get(task_id)
+        if in_flight is None:
+            in_flight = asyncio.create_task(self._fetch(task_id))
+            self._in_flight[task_id] = in_flight
+            in_flight.add_done_callback(
+                lambda _: self._in_flight.pop(task_id, None)
+            )
+
+        # Shield so a cancelled caller does not cancel the shared request
+        return await asyncio.shield(in_flight)
+
+    async def _fetch(self, task_id: str) -> SunoStatus:
+        """Poll Suno once, then persist and fan out the result if it changed."""
+        self.upstream_requests += 1
+        suno_status = await self.client.get_task_status(task_id)
+        await self._record(task_id, suno_status)
+        return suno_status
+
+    async def ingest(self, task_id: str, suno_status: SunoStatus) -> None:
+        """
+        Record a status pushed by a Suno webhook callback.
+
+        The result is shared with get_status callers, persisted and fanned
+        out exactly like a polled result, and a terminal status stops
+        background polling for the task.
+
+        Args:
+            task_id: The Suno task ID
+            suno_status: Status built from the callback payload
+        """
+        if is_terminal_status(suno_status):
+            self.unwatch(task_id)
+        await self._record(task_id, suno_status)
+
+    async def _record(self, task_id: str, suno_status: SunoStatus) -> None:
+        """Store a result, then persist and fan it out if it changed."""
+        # REST reads and webhooks record results without a running sweep loop
+        if time.monotonic() - self._pruned_at >= self.window:
+            self._prune_results(keep=task_id)
+        previous = self._results.get(task_id)
+        if previous and is_terminal_status(previous.status) and not is_terminal_status(suno_status):
+            # A poll that raced a completion callback must not roll the task back
+            return
+        self._results[task_id] = _PollResult(status=suno_status, polled_at=time.monotonic())
+
+        if previous is None or _status_changed(previous.status, suno_status):
+            await self._publish(task_id, suno_status)
+
+    async def _publish(self, task_id: str, suno_status: SunoStatus) -> None:
+        """Persist a fresh result to Firestore and notify listeners."""
+        generation_status = map_suno_status_to_generation_status(suno_status.status)
+
+        try:
+            await update_task_status(
+                task_id=task_id,
+                status=generation_status.value,
+                progress=suno_status.progress,
+                song_url=suno_status.song_url,
+                error=suno_status.error,
+                variations=variations_to_dicts(suno_status),
+            )
+        except Exception as e:
+            logger.error(
+                f"Failed to persist polled status for task: {task_id}",
+                extra={
+                    "extra_fields": {
+                        "task_id": task_id,
+                        "error": str(e),
+                        "operation": "suno_poller_publish",
+                    }
+                },
+            )
+
+        for listener in list(self._listeners):
+            try:
+                await listener(task_id, suno_status)
+            except Exception as e:
+                logger.error(
+                    f"Poll listener failed for task {task_id}: {e}",
+                    extra={
+                        "extra_fields": {
+                            "task_id": task_id,
+                            "error": str(e),
+                            "operation": "suno_poller_publish",
+                        }
+                    },
+                )
+
+    async def _run(self) -> None:
+        """Background loop: sweep all watched tasks until none remain."""
+        logger.info("Suno poller loop started")
+        try:
+            while self._watched:
+                await self._sweep()
+                if not self._watched:
+                    break
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            logger.info("Suno poller loop cancelled")
+            raise
+        finally:
+            self._prune_results()
+            logger.info("Suno poller loop stopped")
+
+    async def _sweep(self) -> None:
+        """Poll every watched task once with bounded concurrency."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def poll_one(task_id: str) -> None:
+            async with semaphore:
+                await self._poll_watched_task(task_id)
+
+        await asyncio.gather(*(poll_one(task_id) for task_id in list(self._watched)))
+        self._prune_results()
+
+    async def _poll_watched_task(self, task_id: str) -> None:
+        """Poll a single watched task, handling timeouts and terminal states."""
+        watched_at = self._watched.get(task_id)
+        if watched_at is None:
+            return
+
+        if time.monotonic() - watched_at > self.max_poll_duration:
+            logger.warning(f"Polling timeout for task: {task_id}")
+            self.unwatch(task_id)
+            timeout_status = SunoStatus(status="FAILED", progress=0, error=TIMEOUT_ERROR)
+            self._results[task_id] = _PollResult(status=timeout_status, polled_at=time.monotonic())
+            await self._publish(task_id, timeout_status)
+            return
+
+        try:
+            suno_status = await self.get_status(task_id)
+        except Exception as e:
+            # Keep polling on transient errors
+            logger.error(f"Error while polling task {task_id}: {e}")
+            return
+
+        if is_terminal_status(suno_status):
+            logger.info(f"Task {task_id} reached terminal state: {suno_status.status}")
+            self.unwatch(task_id)
+
+    def _prune_results(self, keep: Optional[str] = None) -> None:
+        """
+        Drop cached results for unwatched tasks outside the coalesce window.
+
+        Args:
+            keep: Task whose result is being recorded; kept so a terminal
+                result still guards against a racing poll
+        """
+        self._pruned_at = time.monotonic()
+        cutoff = self._pruned_at - self.window
+        for task_id in [
+            tid for tid, result in self._results.items()
+            if tid not in self._watched and tid != keep and result.polled_at < cutoff
+        ]:
+            del self._results[task_id]
+
+    async def stop(self) -> None:
+        """Stop the background loop; the shared client is closed by the app lifespan."""
+        if self._loop_task is not None and not self._loop_task.done():
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+        self._loop_task = None
+        self._watched.clear()
+        self._results.clear()
+
+
+def _status_changed(previous: SunoStatus, current: SunoStatus) -> bool:
+    """Check whether a poll result differs from the previous one."""
+    return (
+        previous.status != current.status
+        or previous.progress != current.progress
+        or len(previous.variations) != len(current.variations)
+        or previous.error != current.error
+    )
+
+
+# Singleton instance
+_suno_poller: Optional[SunoPoller] = None
+
+
+def get_suno_poller() -> SunoPoller:
+    """Get or create the shared Suno poller singleton."""
+    global _suno_poller
+    if _suno_poller is None:
+        _suno_poller = SunoPoller()
+    return _suno_poller
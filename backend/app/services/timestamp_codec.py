@@ -0,0 +1,233 @@
+"""
+Compact binary encoding for timestamped lyrics.
+
+Aligned words are normally lists of {"word", "startS", "endS", "success",
+"palign"} dicts, which cost tens of bytes per word in Firestore and JSON
+and are slow to decode. This module packs them column-wise instead:
+
+- start times as float32 deltas from the previous start, and durations
+  (endS - startS) as float32
+- palign scores (0..1) quantized to uint8
+- success flags packed eight to a byte
+- waveform samples quantized to uint8 between their min and max
+- word texts as UTF-8 with uint16 lengths
+
+The columns are concatenated behind a small header and zlib-compressed.
+
+The encoding is lossy: times are stored as float32 (well under a
+millisecond of error for songs, and deltas are taken against the decoded
+start so the error does not accumulate), while palign and waveform values
+are quantized to 1/255 of their range. Callers get back close
+approximations of the stored values, not the exact floats.
+
+Times and word lengths are packed and unpacked in bulk with the stdlib
+array module and itertools.accumulate. palign, waveform and success
+values still go through Python loops (generator expressions and a lookup
+table), which is the price of not adding a NumPy dependency.
+"""
+
+import struct
+import sys
+import zlib
+from array import array
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Optional
+
+# Encoding name stored next to the blob in Firestore
+COMPACT_ENCODING = "compact-v1"
+
+# Media type of the opt-in binary wire format
+COMPACT_MEDIA_TYPE = "application/vnd.learningsong.timestamps"
+
+# magic, version, word count, waveform sample count, waveform min, waveform max
+_HEADER = struct.Struct("<4sBIIff")
+_MAGIC = b"TSLC"
+_VERSION = 1
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+# Bits of every byte value, least significant first
+_BITS = [tuple(bool(value >> bit & 1) for bit in range(8)) for value in range(256)]
+
+
+@dataclass
+class CompactTimestamps:
+    """
+    Decoded timestamped lyrics in columnar form.
+
+    Attributes:
+        words: Word texts
+        starts: Start times in seconds
+        ends: End times in seconds
+        success: Whether each word was aligned
+        palign: Alignment scores (0..1)
+        waveform: Waveform samples
+    """
+
+    words: list[str]
+    starts: array
+    ends: array
+    success: list[bool]
+    palign: array
+    waveform: array
+
+    def aligned_words(self) -> list[dict]:
+        """Get the words in the API's dict format."""
+        return [
+            {"word": word, "startS": start, "endS": end, "success": ok, "palign": score}
+            for word, start, end, ok, score in zip(
+                self.words, self.starts, self.ends, self.success, self.palign
+            )
+        ]
+
+    def waveform_data(self) -> list[float]:
+        """Get the waveform as a list of floats."""
+        return self.waveform.tolist()
+
+
+def _little_endian(values: array) -> bytes:
+    """Get an array's bytes in little-endian order."""
+    if not _LITTLE_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    """Build an array from little-endian bytes."""
+    values = array(typecode)
+    values.frombytes(data)
+    if not _LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def _quantize(values: list[float], low: float, high: float) -> bytes:
+    """Map values in [low, high] to 0..255."""
+    scale = 255.0 / (high - low) if high > low else 0.0
+    return bytes(min(255, max(0, round((value - low) * scale))) for value in values)
+
+
+def encode_timestamps(aligned_words: list[dict], waveform_data: Optional[list[float]] = None) -> bytes:
+    """
+    Encode aligned words and waveform data into a compact blob.
+
+    Args:
+        aligned_words: Words as {"word", "startS", "endS", "success", "palign"} dicts
+        waveform_data: Optional waveform samples
+
+    Returns:
+        bytes: zlib-compressed blob
+
+    Raises:
+        ValueError: If a value cannot be represented (palign outside 0..1,
+            a word longer than 65535 bytes, or numbers that are not finite
+            float32 values)
+    """
+    waveform_data = waveform_data or []
+
+    texts = [str(w.get("word", "")).encode("utf-8") for w in aligned_words]
+    starts = [float(w.get("startS", 0.0)) for w in aligned_words]
+    ends = [float(w.get("endS", 0.0)) for w in aligned_words]
+    paligns = [float(w.get("palign", 0.0)) for w in aligned_words]
+
+    if any(len(text) > 0xFFFF for text in texts):
+        raise ValueError("word too long for compact encoding")
+    if any(not 0.0 <= p <= 1.0 for p in paligns):
+        raise ValueError("palign outside 0..1")
+    if not all(map(_is_finite, starts + ends + waveform_data)):
+        raise ValueError("non-finite value in timestamps")
+
+    # Delta against the start the decoder will reconstruct, so float32
+    # rounding does not accumulate along the song
+    start_deltas = array("f")
+    decoded_start = 0.0
+    for start in starts:
+        start_deltas.append(start - decoded_start)
+        decoded_start += start_deltas[-1]
+    durations = array("f", [end - start for start, end in zip(starts, ends)])
+    wave_bounds = array("f", [min(waveform_data, default=0.0), max(waveform_data, default=0.0)])
+    # Values beyond float32 range become infinite
+    if not all(map(_is_finite, start_deltas + durations + wave_bounds)):
+        raise ValueError("value out of float32 range")
+
+    success_bits = bytearray((len(aligned_words) + 7) // 8)
+    for index, word in enumerate(aligned_words):
+        if word.get("success"):
+            success_bits[index // 8] |= 1 << (index % 8)
+
+    wave_low, wave_high = wave_bounds
+
+    payload = b"".join([
+        _HEADER.pack(_MAGIC, _VERSION, len(aligned_words), len(waveform_data), wave_low, wave_high),
+        _little_endian(array("H", map(len, texts))),
+        b"".join(texts),
+        _little_endian(start_deltas),
+        _little_endian(durations),
+        _quantize(paligns, 0.0, 1.0),
+        bytes(success_bits),
+        _quantize(waveform_data, wave_low, wave_high),
+    ])
+    return zlib.compress(payload)
+
+
+def decode_timestamps(blob: bytes) -> CompactTimestamps:
+    """
+    Decode a blob produced by encode_timestamps.
+
+    Args:
+        blob: Compressed timestamps blob
+
+    Returns:
+        CompactTimestamps with the decoded columns
+
+    Raises:
+        ValueError: If the blob is not a valid compact timestamps blob
+    """
+    try:
+        payload = memoryview(zlib.decompress(blob))
+        magic, version, count, samples, wave_low, wave_high = _HEADER.unpack_from(payload)
+    except (zlib.error, struct.error) as e:
+        raise ValueError("invalid compact timestamps blob") from e
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"unsupported compact timestamps version: {magic!r} v{version}")
+
+    offset = _HEADER.size
+
+    def take(size: int) -> memoryview:
+        nonlocal offset
+        chunk = payload[offset:offset + size]
+        if len(chunk) != size:
+            raise ValueError("truncated compact timestamps blob")
+        offset += size
+        return chunk
+
+    lengths = _from_little_endian("H", take(2 * count))
+    text = take(sum(lengths)).tobytes()
+    bounds = list(accumulate(lengths, initial=0))
+    words = [text[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+    starts = array("d", accumulate(_from_little_endian("f", take(4 * count))))
+    durations = _from_little_endian("f", take(4 * count))
+    ends = array("d", map(float.__add__, starts, durations))
+
+    palign = array("d", (value / 255.0 for value in take(count)))
+    success = [bit for byte in take((count + 7) // 8) for bit in _BITS[byte]][:count]
+
+    wave_scale = (wave_high - wave_low) / 255.0
+    waveform = array("d", (wave_low + value * wave_scale for value in take(samples)))
+
+    return CompactTimestamps(
+        words=words,
+        starts=starts,
+        ends=ends,
+        success=success,
+        palign=palign,
+        waveform=waveform,
+    )
+
+
+def _is_finite(value: float) -> bool:
+    """Check that a float is neither NaN nor infinite."""
+    return value - value == 0.0
@@ -3,7 +3,29 @@
 import pytest
 from httpx import AsyncClient, ASGITransport
 
+from app.core.auth import clear_token_cache
 from app.main import app
+from app.services.cache import get_hit_stats, get_l1_cache
+from app.services.rate_limiter import get_quota_cache
+from app.services.song_storage import get_share_cache, get_song_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_l1_cache():
+    """Start every test with empty in-process caches and no pending hit stats."""
+    get_l1_cache().clear()
+    get_hit_stats().clear()
+    get_quota_cache().clear()
+    get_share_cache().clear()
+    get_song_cache().clear()
+    clear_token_cache()
+    yield
+    get_l1_cache().clear()
+    get_hit_stats().clear()
+    get_quota_cache().clear()
+    get_share_cache().clear()
+    get_song_cache().clear()
+    clear_token_cache()
 
 
 @pytest.fixture
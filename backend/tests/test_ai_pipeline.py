@@ -1,8 +1,21 @@
 """Tests for AI Pipeline service."""
 
+import asyncio
+import os
+import time
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
-from app.services.ai_pipeline import LyricsPipeline, PipelineState
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_openai import ChatOpenAI
+from app.services.ai_pipeline import (
+    LLM_MODEL,
+    LyricsPipeline,
+    PipelineState,
+    close_lyrics_pipeline,
+    get_lyrics_pipeline,
+    get_openai_http_client,
+    split_into_chunks,
+)
 
 
 @pytest.fixture
@@ -439,3 +452,338 @@ class TestErrorHandling:
         
         assert result["summary_valid"] is False
         assert result["error"] is not None
+
+
+class StubChatModel(FakeListChatModel):
+    """Fake chat model that records the temperature bound to each call."""
+    
+    temperatures: list = []
+    
+    def _call(self, *args, **kwargs):
+        self.temperatures.append(kwargs.get("temperature"))
+        return super()._call(*args, **kwargs)
+
+
+def stub_llm():
+    """Stub LLM answering the summarize and convert steps."""
+    return StubChatModel(responses=[
+        "1. Python is readable\n2. Python is multi-paradigm",
+        "[Verse 1]\nPython reads like prose\n[Chorus]\nCode it as it flows",
+    ])
+
+
+@pytest.fixture
+async def reset_registry():
+    """Reset the shared pipeline and HTTP transport around a test."""
+    await close_lyrics_pipeline()
+    yield
+    await close_lyrics_pipeline()
+
+
+class TestPipelineRegistry:
+    """Tests for the process-wide pipeline and shared OpenAI transport."""
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_built_once(self, reset_registry):
+        """Test that the graph and LLM client are created on first use only."""
+        with patch('app.services.ai_pipeline.ChatOpenAI') as mock_openai:
+            first = get_lyrics_pipeline()
+            second = get_lyrics_pipeline()
+        
+        assert first is second
+        mock_openai.assert_called_once()
+        assert mock_openai.call_args.kwargs['http_async_client'] is get_openai_http_client()
+    
+    @pytest.mark.asyncio
+    async def test_pipelines_share_one_transport(self, reset_registry):
+        """Test that every pipeline uses the same pooled HTTP client."""
+        with patch('app.services.ai_pipeline.ChatOpenAI') as mock_openai:
+            LyricsPipeline()
+            LyricsPipeline(temperature=0.9)
+        
+        clients = {id(c.kwargs['http_async_client']) for c in mock_openai.call_args_list}
+        assert len(clients) == 1
+    
+    @pytest.mark.asyncio
+    async def test_close_releases_transport(self, reset_registry):
+        """Test that shutdown closes the shared client and drops the pipeline."""
+        client = get_openai_http_client()
+        with patch('app.services.ai_pipeline.ChatOpenAI'):
+            pipeline = get_lyrics_pipeline()
+        
+        await close_lyrics_pipeline()
+        
+        assert client.is_closed
+        with patch('app.services.ai_pipeline.ChatOpenAI'):
+            assert get_lyrics_pipeline() is not pipeline
+    
+    @pytest.mark.asyncio
+    async def test_temperature_passed_per_call(self, sample_content):
+        """Test that execute binds the requested temperature to each LLM call."""
+        llm = stub_llm()
+        pipeline = LyricsPipeline(llm=llm)
+        
+        await pipeline.execute(sample_content, search_enabled=False, temperature=0.9)
+        await pipeline.execute(sample_content, search_enabled=False)
+        
+        assert llm.temperatures == [0.9, 0.9, None, None]
+
+
+class TestPipelineRegistryBenchmark:
+    """Startup and per-request overhead: per-request pipelines vs the shared one."""
+    
+    @pytest.mark.asyncio
+    async def test_startup_and_per_request_overhead(self, sample_content, reset_registry):
+        """Benchmark pipeline construction and request overhead with a stub LLM."""
+        iterations = 20
+        
+        with patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test"}):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                LyricsPipeline(
+                    temperature=0.9,
+                    llm=ChatOpenAI(model=LLM_MODEL, temperature=0.9)
+                )
+            build_ms = (time.perf_counter() - start) / iterations * 1000
+        
+        # Before: a new pipeline (graph compile + client) for every request
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await LyricsPipeline(temperature=0.9, llm=stub_llm()).execute(
+                sample_content, search_enabled=False
+            )
+        per_request_ms = (time.perf_counter() - start) / iterations * 1000
+        
+        # After: one compiled pipeline, temperature passed per call
+        shared = LyricsPipeline(llm=stub_llm())
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await shared.execute(sample_content, search_enabled=False, temperature=0.9)
+        shared_ms = (time.perf_counter() - start) / iterations * 1000
+        
+        print(
+            f"\nPipeline startup (graph + ChatOpenAI): {build_ms:.2f}ms"
+            f"\nPer request, new pipeline: {per_request_ms:.2f}ms"
+            f"\nPer request, shared pipeline: {shared_ms:.2f}ms"
+        )
+        assert shared_ms < per_request_ms
+
+
+class TestExecuteStream:
+    """Tests for streaming pipeline execution."""
+    
+    @pytest.mark.asyncio
+    async def test_yields_stages_tokens_and_result(self, sample_content):
+        """Test that stages and lyric tokens are yielded before the final result."""
+        pipeline = LyricsPipeline(llm=stub_llm())
+        
+        events = [e async for e in pipeline.execute_stream(sample_content, search_enabled=False)]
+        
+        stages = [e["stage"] for e in events if e["event"] == "stage"]
+        tokens = "".join(e["content"] for e in events if e["event"] == "token")
+        assert stages == ["checking_search", "cleaning", "summarizing", "validating", "converting"]
+        assert events[-1]["event"] == "complete"
+        assert events[-1]["lyrics"] == tokens
+        assert events[-1]["content_hash"]
+    
+    @pytest.mark.asyncio
+    async def test_summary_tokens_are_not_streamed(self, sample_content):
+        """Test that only the convert step's tokens reach the client."""
+        pipeline = LyricsPipeline(llm=stub_llm())
+        
+        events = [e async for e in pipeline.execute_stream(sample_content, search_enabled=False)]
+        
+        tokens = "".join(e["content"] for e in events if e["event"] == "token")
+        assert "readable" not in tokens
+    
+    @pytest.mark.asyncio
+    async def test_error_raises_after_stages(self, sample_content):
+        """Test that a failed run raises instead of yielding a result."""
+        pipeline = LyricsPipeline(llm=stub_llm())
+        
+        with patch.object(pipeline, "_get_llm", side_effect=Exception("LLM down")):
+            with pytest.raises(Exception, match="summarize"):
+                async for _ in pipeline.execute_stream(sample_content, search_enabled=False):
+                    pass
+    
+    @pytest.mark.asyncio
+    async def test_time_to_first_event(self, sample_content):
+        """Benchmark: the first event arrives long before the full result."""
+        # Stub LLM emitting one character every 2ms
+        pipeline = LyricsPipeline(llm=FakeListChatModel(sleep=0.002, responses=[
+            "1. Python is readable",
+            "[Verse 1]\nPython reads like prose",
+        ]))
+        
+        start = time.perf_counter()
+        first_event_at = None
+        first_token_at = None
+        async for event in pipeline.execute_stream(sample_content, search_enabled=False):
+            now = time.perf_counter() - start
+            if first_event_at is None:
+                first_event_at = now
+            if event["event"] == "token" and first_token_at is None:
+                first_token_at = now
+        total = time.perf_counter() - start
+        
+        print(
+            f"\nFirst event: {first_event_at * 1000:.1f}ms, "
+            f"first token: {first_token_at * 1000:.1f}ms, "
+            f"complete: {total * 1000:.1f}ms"
+        )
+        assert first_event_at < total / 2
+
+
+class LatencyStubChatModel(FakeListChatModel):
+    """
+    Fake chat model whose latency grows with input size, like a real LLM.
+    
+    Each call takes base_latency plus per_word_latency for every input word,
+    and the highest number of overlapping calls is recorded.
+    """
+    
+    base_latency: float = 0.005
+    per_word_latency: float = 0.00002
+    calls: int = 0
+    active: int = 0
+    max_active: int = 0
+    
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        words = sum(len(str(m.content).split()) for m in messages)
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.base_latency + self.per_word_latency * words)
+        finally:
+            self.active -= 1
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def long_content(words: int) -> str:
+    """Build educational-looking content of roughly the given word count."""
+    sentence = "Photosynthesis converts light energy into chemical energy in plant cells."
+    per_sentence = len(sentence.split())
+    paragraph_count = words // (per_sentence * 10) + 1
+    return "\n\n".join(" ".join([sentence] * 10) for _ in range(paragraph_count))
+
+
+class TestSplitIntoChunks:
+    """Tests for split_into_chunks."""
+    
+    def test_short_text_is_one_chunk(self):
+        """Test that text under the limit stays whole."""
+        assert split_into_chunks("One sentence. Another one.", max_words=50) == [
+            "One sentence. Another one."
+        ]
+    
+    def test_splits_on_sentence_boundaries(self):
+        """Test that chunks end at sentence boundaries and respect the limit."""
+        text = " ".join(f"Sentence number {i} is here." for i in range(20))
+        
+        chunks = split_into_chunks(text, max_words=12)
+        
+        assert all(len(c.split()) <= 12 for c in chunks)
+        assert all(c.endswith(".") for c in chunks)
+        assert " ".join(chunks) == text
+    
+    def test_cuts_overlong_sentences(self):
+        """Test that a sentence longer than a chunk is cut at word boundaries."""
+        chunks = split_into_chunks(" ".join(["word"] * 25), max_words=10)
+        
+        assert [len(c.split()) for c in chunks] == [10, 10, 5]
+    
+    def test_blank_text(self):
+        """Test that blank text yields no chunks."""
+        assert split_into_chunks("   ") == []
+
+
+class TestMapReduceSummarization:
+    """Tests for map-reduce summarization of long inputs."""
+    
+    @pytest.mark.asyncio
+    async def test_short_input_uses_single_call(self, sample_content):
+        """Test that inputs under the threshold keep the single summarize call."""
+        llm = LatencyStubChatModel(responses=["1. Key point"])
+        pipeline = LyricsPipeline(llm=llm)
+        
+        await pipeline.execute(sample_content, search_enabled=False)
+        
+        # summarize + convert
+        assert llm.calls == 2
+    
+    @pytest.mark.asyncio
+    async def test_long_input_maps_then_reduces(self):
+        """Test that long inputs are summarized per chunk, then reduced."""
+        llm = LatencyStubChatModel(responses=["1. Key point"])
+        pipeline = LyricsPipeline(llm=llm)
+        content = long_content(4000)
+        chunk_count = len(split_into_chunks(" ".join(content.split())))
+        
+        result = await pipeline.execute(content, search_enabled=False)
+        
+        assert chunk_count > 1
+        # one call per chunk + reduce + convert
+        assert llm.calls == chunk_count + 2
+        assert result["lyrics"] == "1. Key point"
+    
+    @pytest.mark.asyncio
+    async def test_chunk_concurrency_is_bounded(self):
+        """Test that no more than the configured chunks are summarized at once."""
+        llm = LatencyStubChatModel(responses=["1. Key point"])
+        pipeline = LyricsPipeline(llm=llm)
+        
+        with patch('app.services.ai_pipeline.MAX_CONCURRENT_CHUNK_SUMMARIES', 2):
+            await pipeline.execute(long_content(6000), search_enabled=False)
+        
+        assert llm.max_active == 2
+    
+    @pytest.mark.asyncio
+    async def test_chunk_failure_fails_pipeline(self):
+        """Test that a failed chunk surfaces as a summarize error."""
+        pipeline = LyricsPipeline(llm=stub_llm())
+        failing_chain = MagicMock()
+        failing_chain.ainvoke = AsyncMock(side_effect=Exception("context length exceeded"))
+        
+        with patch('app.services.ai_pipeline.SUMMARIZE_CHUNK_PROMPT') as mock_prompt:
+            mock_prompt.__or__ = MagicMock(return_value=failing_chain)
+            with pytest.raises(Exception, match="Failed to summarize content"):
+                await pipeline.execute(long_content(4000), search_enabled=False)
+    
+    @pytest.mark.asyncio
+    async def test_stream_reports_summarizing_once(self):
+        """Test that map and reduce appear as a single summarizing stage."""
+        pipeline = LyricsPipeline(llm=LatencyStubChatModel(responses=["1. Key point"]))
+        
+        events = [e async for e in pipeline.execute_stream(long_content(4000), search_enabled=False)]
+        
+        stages = [e["stage"] for e in events if e["event"] == "stage"]
+        assert stages == ["checking_search", "cleaning", "summarizing", "validating", "converting"]
+
+
+class TestMapReduceBenchmark:
+    """Single-call vs map-reduce summarization latency with a stub LLM."""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("words", [1000, 10000])
+    async def test_summarization_latency(self, words):
+        """Benchmark both paths at 1k and 10k words (latency grows with input size)."""
+        content = long_content(words)
+        timings = {}
+        
+        for label, threshold in (("single", 10 ** 9), ("map-reduce", 0)):
+            llm = LatencyStubChatModel(responses=["1. Key point"])
+            pipeline = LyricsPipeline(llm=llm)
+            with patch('app.services.ai_pipeline.MAP_REDUCE_THRESHOLD_WORDS', threshold):
+                start = time.perf_counter()
+                await pipeline.execute(content, search_enabled=False)
+                timings[label] = (time.perf_counter() - start) * 1000, llm.calls
+        
+        print(
+            f"\n{words} words: single call {timings['single'][0]:.1f}ms "
+            f"({timings['single'][1]} LLM calls), "
+            f"map-reduce {timings['map-reduce'][0]:.1f}ms "
+            f"({timings['map-reduce'][1]} LLM calls)"
+        )
+        if words >= 10000:
+            assert timings["map-reduce"][0] < timings["single"][0]
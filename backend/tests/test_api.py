@@ -28,3 +28,30 @@ async def test_root_endpoint(client):
     assert response.status_code == 200
     data = response.json()
     assert "message" in data
+
+
+async def test_metrics_endpoint(client):
+    """
+    Test that app-wide cache and background job counters are reported.
+
+    Args:
+        client: Async HTTP client fixture
+    """
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"auth_cache", "quota_cache", "song_cache", "share_cache", "expiry_sweeper"}
+    assert data["song_cache"]["name"] == "songs"
+    assert "deleted" in data["expiry_sweeper"]
+
+
+async def test_lyrics_health_reports_only_lyrics_stats(client):
+    """
+    Test that the lyrics health check is limited to the lyrics service.
+
+    Args:
+        client: Async HTTP client fixture
+    """
+    response = await client.get("/api/lyrics/health")
+    assert response.status_code == 200
+    assert set(response.json()) == {"status", "service", "cache", "pipeline", "search_cache"}
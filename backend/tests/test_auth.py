@@ -1,12 +1,20 @@
 """Tests for authentication module."""
 
+import time
+
 import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from fastapi import HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
 from firebase_admin import auth as firebase_auth
 
-from app.core.auth import get_current_user, get_optional_user
+from app.core.auth import (
+    get_current_user,
+    get_optional_user,
+    get_token_cache_stats,
+    prewarm_token_certificates,
+    verify_websocket_token,
+)
 
 
 @pytest.fixture
@@ -252,3 +260,162 @@ class TestGetOptionalUser:
             await get_optional_user(mock_credentials)
         
         assert exc_info.value.status_code == 401
+
+
+@pytest.fixture
+def expiring_token():
+    """
+    Create a decoded token that expires in one hour.
+    
+    Returns:
+        Dictionary representing a decoded Firebase ID token with exp
+    """
+    return {"uid": "test_user_123", "exp": time.time() + 3600}
+
+
+class TestVerifiedTokenCache:
+    """Tests for the verified ID-token cache."""
+    
+    @pytest.mark.asyncio
+    @patch("app.core.auth.auth.verify_id_token")
+    async def test_repeat_requests_skip_verification(
+        self, mock_verify, mock_credentials, expiring_token
+    ):
+        """Test that a token is verified once and then answered from the cache."""
+        mock_verify.return_value = expiring_token
+        
+        for _ in range(5):
+            assert await get_current_user(mock_credentials) == "test_user_123"
+        
+        mock_verify.assert_called_once_with("valid_test_token_123")
+        stats = get_token_cache_stats()
+        assert stats['verifications'] == 1
+        assert stats['hits'] == 4
+    
+    @pytest.mark.asyncio
+    @patch("app.core.auth.auth.verify_id_token")
+    async def test_cache_is_shared_with_websocket_auth(
+        self, mock_verify, mock_credentials, expiring_token
+    ):
+        """Test that Socket.IO verification reuses tokens verified over HTTP."""
+        mock_verify.return_value = expiring_token
+        
+        await get_current_user(mock_credentials)
+        user_id = await verify_websocket_token("valid_test_token_123")
+        
+        assert user_id == "test_user_123"
+        assert mock_verify.call_count == 1
+    
+    @pytest.mark.asyncio
+    @patch("app.core.auth.auth.verify_id_token")
+    async def test_entry_expires_with_token(
+        self, mock_verify, mock_credentials, expiring_token
+    ):
+        """Test that a cached token is verified again once its exp has passed."""
+        mock_verify.return_value = expiring_token
+        await get_current_user(mock_credentials)
+        
+        mock_verify.side_effect = firebase_auth.ExpiredIdTokenError("Token expired", cause=None)
+        with patch("app.core.auth.time.time", return_value=expiring_token["exp"] + 1):
+            with pytest.raises(HTTPException) as exc_info:
+                await get_current_user(mock_credentials)
+        
+        assert exc_info.value.status_code == 401
+        assert mock_verify.call_count == 2
+    
+    @pytest.mark.asyncio
+    @patch("app.core.auth.auth.verify_id_token")
+    async def test_failures_are_not_cached(self, mock_verify, mock_credentials, expiring_token):
+        """Test that a rejected token is verified again on the next request."""
+        mock_verify.side_effect = firebase_auth.InvalidIdTokenError("Invalid token")
+        with pytest.raises(HTTPException):
+            await get_current_user(mock_credentials)
+        
+        mock_verify.side_effect = None
+        mock_verify.return_value = expiring_token
+        
+        assert await get_current_user(mock_credentials) == "test_user_123"
+        assert get_token_cache_stats()['failures'] == 1
+    
+    @pytest.mark.asyncio
+    @patch("app.core.auth.auth.verify_id_token")
+    async def test_token_without_exp_is_not_cached(
+        self, mock_verify, mock_credentials, mock_decoded_token
+    ):
+        """Test that tokens without an exp claim are always verified."""
+        mock_verify.return_value = mock_decoded_token
+        
+        await get_current_user(mock_credentials)
+        await get_current_user(mock_credentials)
+        
+        assert mock_verify.call_count == 2
+    
+    @pytest.mark.asyncio
+    @patch("app.core.auth.AUTH_CHECK_REVOKED", True)
+    @patch("app.core.auth.auth.verify_id_token")
+    async def test_revocation_is_rechecked_after_interval(
+        self, mock_verify, mock_credentials, expiring_token
+    ):
+        """Test that with revocation checks on, cached tokens are re-verified periodically."""
+        mock_verify.return_value = expiring_token
+        await get_current_user(mock_credentials)
+        await get_current_user(mock_credentials)
+        
+        mock_verify.assert_called_once_with("valid_test_token_123", check_revoked=True)
+        
+        mock_verify.side_effect = firebase_auth.RevokedIdTokenError("Token revoked")
+        with patch("app.core.auth.time.time", return_value=time.time() + 301):
+            with pytest.raises(HTTPException) as exc_info:
+                await get_current_user(mock_credentials)
+        
+        assert exc_info.value.status_code == 401
+    
+    @patch("app.core.auth.firebase_admin.get_app")
+    @patch("app.core.auth.auth._get_client")
+    def test_prewarm_fetches_certificates(self, mock_get_client, mock_get_app):
+        """Test that pre-warming fetches the ID token certificate URL."""
+        verifier = mock_get_client.return_value._token_verifier
+        verifier.request.return_value = Mock(status=200)
+        
+        assert prewarm_token_certificates() is True
+        verifier.request.assert_called_once_with(verifier.id_token_verifier.cert_url)
+    
+    @patch("app.core.auth.firebase_admin.get_app", side_effect=ValueError("no app"))
+    def test_prewarm_failure_is_not_raised(self, mock_get_app):
+        """Test that pre-warming without Firebase only logs a warning."""
+        assert prewarm_token_certificates() is False
+
+
+class TestAuthOverheadBenchmark:
+    """Micro-benchmark of per-request auth overhead with and without the cache."""
+    
+    REQUESTS = 200
+    
+    # Stand-in for verify_id_token's RSA signature check (~0.5 ms)
+    VERIFY_SECONDS = 0.0005
+    
+    @pytest.mark.asyncio
+    async def test_cached_auth_overhead(self, mock_credentials, expiring_token):
+        """Measure per-request auth time for distinct tokens versus one repeated token."""
+        def slow_verify(token, **kwargs):
+            time.sleep(self.VERIFY_SECONDS)
+            return expiring_token
+        
+        with patch("app.core.auth.auth.verify_id_token", side_effect=slow_verify):
+            start = time.perf_counter()
+            for i in range(self.REQUESTS):
+                credentials = Mock(spec=HTTPAuthorizationCredentials)
+                credentials.credentials = f"token_{i}"
+                await get_current_user(credentials)
+            uncached = (time.perf_counter() - start) / self.REQUESTS
+            
+            start = time.perf_counter()
+            for _ in range(self.REQUESTS):
+                await get_current_user(mock_credentials)
+            cached = (time.perf_counter() - start) / self.REQUESTS
+        
+        print(
+            f"\nauth overhead per request: uncached {uncached * 1e6:.0f} us, "
+            f"cached {cached * 1e6:.0f} us"
+        )
+        assert cached < uncached / 5
@@ -8,6 +8,7 @@ from unittest.mock import MagicMock, patch
 from app.services.cache import (
     generate_content_hash,
     check_lyrics_cache,
+    get_hit_stats,
     store_lyrics_cache
 )
 
@@ -148,7 +149,7 @@ class TestCheckLyricsCache:
     async def test_cache_hit_updates_statistics(
         self, mock_datetime, mock_get_client, mock_firestore_client, mock_cache_ref
     ):
-        """Test that cache hit updates hit_count and last_accessed."""
+        """Test that cache hit records hit_count and last_accessed without writing."""
         mock_get_client.return_value = mock_firestore_client
         current_time = datetime(2024, 1, 15, 14, 30, 0, tzinfo=timezone.utc)
         mock_datetime.now.return_value = current_time
@@ -164,11 +165,11 @@ class TestCheckLyricsCache:
         
         await check_lyrics_cache("test_hash_123")
         
-        # Verify update was called with incremented hit_count and new timestamp
-        mock_cache_ref.update.assert_called_once()
-        call_args = mock_cache_ref.update.call_args[0][0]
-        assert call_args['hit_count'] == 4
-        assert call_args['last_accessed'] == current_time
+        # Hit is recorded for the write-behind flush, not written on the read path
+        mock_cache_ref.update.assert_not_called()
+        pending = get_hit_stats().pending['test_hash_123']
+        assert pending.count == 1
+        assert pending.last_accessed == current_time
     
     @pytest.mark.asyncio
     @patch('app.services.cache.get_firestore_client')
@@ -192,6 +193,48 @@ class TestCheckLyricsCache:
         # Should default to 0 and increment to 1
         assert result['hit_count'] == 1
 
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_falls_back_to_lyrics_key(self, mock_get_client, mock_firestore_client):
+        """Test that a song is found by lyrics hash when content_hash is missing."""
+        from app.services.cache import check_song_cache, generate_content_hash
+        
+        mock_get_client.return_value = mock_firestore_client
+        lyrics_key = f"lyrics_{generate_content_hash('La la la')}_pop"
+        variations = [{'audio_url': 'https://a/0.mp3', 'audio_id': 'a0', 'variation_index': 0}]
+        
+        def document(doc_id):
+            doc = MagicMock()
+            doc.exists = doc_id == lyrics_key
+            doc.to_dict.return_value = {
+                'task_id': 'suno_task_456',
+                'song_url': 'https://a/0.mp3',
+                'variations': variations,
+            }
+            ref = MagicMock()
+            ref.get.return_value = doc
+            return ref
+        
+        mock_firestore_client.collection.return_value.document.side_effect = document
+        
+        result = await check_song_cache("unknown_hash", "pop", lyrics="  La La la ")
+        
+        assert result['task_id'] == 'suno_task_456'
+        assert result['variations'] == variations
+        requested = [c.args[0] for c in mock_firestore_client.collection.return_value.document.call_args_list]
+        assert requested == ["unknown_hash_pop", lyrics_key]
+    
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_without_any_key_returns_none(self, mock_get_client, mock_firestore_client):
+        """Test that no lookup happens without content_hash or lyrics."""
+        from app.services.cache import check_song_cache
+        
+        mock_get_client.return_value = mock_firestore_client
+        
+        assert await check_song_cache(None, "pop") is None
+        mock_firestore_client.collection.assert_not_called()
+
 
 class TestStoreLyricsCache:
     """Tests for store_lyrics_cache function."""
@@ -362,7 +405,7 @@ class TestCheckSongCache:
     async def test_cache_hit_updates_statistics(
         self, mock_datetime, mock_get_client, mock_firestore_client, mock_cache_ref
     ):
-        """Test that cache hit updates hit_count and last_accessed."""
+        """Test that cache hit records hit_count and last_accessed without writing."""
         from app.services.cache import check_song_cache
         
         mock_get_client.return_value = mock_firestore_client
@@ -381,11 +424,11 @@ class TestCheckSongCache:
         
         await check_song_cache("test_hash_123", "pop")
         
-        # Verify update was called with incremented hit_count and new timestamp
-        mock_cache_ref.update.assert_called_once()
-        call_args = mock_cache_ref.update.call_args[0][0]
-        assert call_args['hit_count'] == 4
-        assert call_args['last_accessed'] == current_time
+        # Hit is recorded for the write-behind flush, not written on the read path
+        mock_cache_ref.update.assert_not_called()
+        pending = get_hit_stats().pending['test_hash_123_pop']
+        assert pending.count == 1
+        assert pending.last_accessed == current_time
     
     @pytest.mark.asyncio
     @patch('app.services.cache.get_firestore_client')
@@ -436,6 +479,32 @@ class TestCheckSongCache:
         # Should default to 0 and increment to 1
         assert result['hit_count'] == 1
 
+    
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_content_hit_for_other_lyrics_is_skipped(
+        self, mock_get_client, mock_firestore_client
+    ):
+        """Test that the same content with different lyrics does not reuse the old song."""
+        from app.services.cache import check_song_cache, generate_content_hash
+        
+        mock_get_client.return_value = mock_firestore_client
+        content_doc = MagicMock(exists=True)
+        content_doc.to_dict.return_value = {
+            'task_id': 'suno_task_456',
+            'song_url': 'https://suno.ai/songs/abc123.mp3',
+            'lyrics_hash': generate_content_hash("Old lyrics"),
+        }
+        docs = {"abc123_pop": content_doc}
+        mock_firestore_client.collection.return_value.document.side_effect = lambda key: MagicMock(
+            get=MagicMock(return_value=docs.get(key, MagicMock(exists=False)))
+        )
+        
+        assert await check_song_cache("abc123", "pop", lyrics="New lyrics") is None
+        assert 'abc123_pop' not in get_hit_stats().pending
+        
+        result = await check_song_cache("abc123", "pop", lyrics="Old lyrics")
+        assert result['task_id'] == 'suno_task_456'
 
 class TestStoreSongCache:
     """Tests for store_song_cache function."""
@@ -533,3 +602,129 @@ class TestStoreSongCache:
         
         # Verify correct collection
         mock_firestore_client.collection.assert_called_with('cached_songs')
+    
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_stores_variations_under_content_and_lyrics_keys(
+        self, mock_get_client, mock_firestore_client, mock_cache_ref
+    ):
+        """Test that the full variations list is cached under both keys."""
+        from app.services.cache import check_song_cache, generate_content_hash, store_song_cache
+        
+        mock_get_client.return_value = mock_firestore_client
+        variations = [
+            {'audio_url': 'https://a/0.mp3', 'audio_id': 'a0', 'variation_index': 0},
+            {'audio_url': 'https://a/1.mp3', 'audio_id': 'a1', 'variation_index': 1},
+        ]
+        
+        await store_song_cache(
+            "abc123", "rock", "task_123", "https://a/0.mp3",
+            variations=variations, lyrics="La la la",
+        )
+        
+        lyrics_hash = generate_content_hash("La la la")
+        keys = [c.args[0] for c in mock_firestore_client.collection.return_value.document.call_args_list]
+        assert keys == ["abc123_rock", f"lyrics_{lyrics_hash}_rock"]
+        entry = mock_cache_ref.set.call_args[0][0]
+        assert entry['variations'] == variations
+        assert entry['lyrics_hash'] == lyrics_hash
+        
+        # Both keys are now answered from L1
+        mock_cache_ref.get.reset_mock()
+        result = await check_song_cache(None, "rock", lyrics="La la la")
+        assert result['variations'] == variations
+        mock_cache_ref.get.assert_not_called()
+
+
+class TestL1Cache:
+    """Tests for the in-process L1 in front of cached_songs."""
+    
+    @staticmethod
+    def _existing_doc(data):
+        mock_doc = MagicMock()
+        mock_doc.exists = True
+        mock_doc.to_dict.return_value = data
+        return mock_doc
+    
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_repeat_hit_served_from_memory(
+        self, mock_get_client, mock_firestore_client, mock_cache_ref
+    ):
+        """Test that a second lookup does not read Firestore."""
+        mock_get_client.return_value = mock_firestore_client
+        mock_cache_ref.get.return_value = self._existing_doc({
+            'lyrics': 'Test lyrics',
+            'hit_count': 1,
+        })
+        
+        first = await check_lyrics_cache("test_hash_123")
+        second = await check_lyrics_cache("test_hash_123")
+        
+        assert mock_cache_ref.get.call_count == 1
+        assert second['lyrics'] == first['lyrics']
+        assert second['hit_count'] == 3
+    
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_miss_is_negatively_cached(
+        self, mock_get_client, mock_firestore_client, mock_cache_ref
+    ):
+        """Test that repeated misses for a key read Firestore once."""
+        mock_get_client.return_value = mock_firestore_client
+        mock_doc = MagicMock()
+        mock_doc.exists = False
+        mock_cache_ref.get.return_value = mock_doc
+        
+        assert await check_lyrics_cache("test_hash_123") is None
+        assert await check_lyrics_cache("test_hash_123") is None
+        
+        assert mock_cache_ref.get.call_count == 1
+    
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_store_replaces_negative_entry(
+        self, mock_get_client, mock_firestore_client, mock_cache_ref
+    ):
+        """Test that storing lyrics makes them visible despite a cached miss."""
+        mock_get_client.return_value = mock_firestore_client
+        mock_doc = MagicMock()
+        mock_doc.exists = False
+        mock_cache_ref.get.return_value = mock_doc
+        
+        assert await check_lyrics_cache("test_hash_123") is None
+        await store_lyrics_cache("test_hash_123", "Fresh lyrics")
+        result = await check_lyrics_cache("test_hash_123")
+        
+        assert result['lyrics'] == 'Fresh lyrics'
+        assert mock_cache_ref.get.call_count == 1
+    
+    @pytest.mark.asyncio
+    @patch('app.services.cache.get_firestore_client')
+    async def test_concurrent_lookups_share_one_read(
+        self, mock_get_client, mock_firestore_client, mock_cache_ref
+    ):
+        """Test that concurrent lookups for a cold key read Firestore once."""
+        import asyncio
+        from app.services.cache import check_song_cache
+        
+        mock_get_client.return_value = mock_firestore_client
+        mock_cache_ref.get.return_value = self._existing_doc({
+            'task_id': 'task_123',
+            'song_url': 'https://example.com/song.mp3',
+            'hit_count': 0,
+        })
+        
+        results = await asyncio.gather(*[check_song_cache("test_hash", "pop") for _ in range(20)])
+        
+        assert mock_cache_ref.get.call_count == 1
+        assert all(r['task_id'] == 'task_123' for r in results)
+    
+    def test_stats_exposed(self):
+        """Test that cache stats include L1 counters."""
+        from app.services.cache import get_cache_stats
+        
+        stats = get_cache_stats()
+        
+        assert stats['name'] == 'cached_songs'
+        assert {'hits', 'misses', 'evictions', 'hit_rate'} <= stats.keys()
@@ -0,0 +1,162 @@
+"""Tests for write-behind cache hit statistics."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+from google.cloud import firestore
+
+from app.services.cache_stats import MAX_BATCH_WRITES, CacheHitStats
+
+
+T0 = datetime(2024, 1, 15, 14, 30, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def mock_firestore_client():
+    """Mock Firestore client whose batches are recorded in order."""
+    client = MagicMock()
+    client.batches = []
+
+    def new_batch():
+        batch = MagicMock()
+        client.batches.append(batch)
+        return batch
+
+    client.batch.side_effect = new_batch
+    client.collection.return_value.document.side_effect = lambda doc_id: f"ref:{doc_id}"
+    with patch("app.services.cache_stats.get_firestore_client", return_value=client):
+        yield client
+
+
+def updates(batch):
+    """Map document refs to the update payloads written in a batch."""
+    return {c.args[0]: c.args[1] for c in batch.update.call_args_list}
+
+
+class TestRecordHit:
+    """Tests for in-memory hit accumulation."""
+
+    def test_accumulates_count_and_latest_access(self):
+        """Test that repeated hits are summed and the latest time kept."""
+        stats = CacheHitStats(collection="cached_songs")
+        stats.record_hit("doc", T0 + timedelta(seconds=5))
+        stats.record_hit("doc", T0)
+
+        assert stats.pending_hits("doc") == 2
+        assert stats.pending["doc"].last_accessed == T0 + timedelta(seconds=5)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_hits_are_not_lost(self, mock_firestore_client):
+        """Test that concurrent hits on one entry all reach Firestore."""
+        stats = CacheHitStats(collection="cached_songs")
+
+        async def hit():
+            await asyncio.sleep(0)
+            stats.record_hit("popular", T0)
+
+        await asyncio.gather(*[hit() for _ in range(100)])
+        await stats.flush()
+
+        payload = updates(mock_firestore_client.batches[0])["ref:popular"]
+        assert payload["hit_count"] == firestore.Increment(100)
+
+
+class TestFlush:
+    """Tests for batched flushing."""
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_increments_in_one_batch(self, mock_firestore_client):
+        """Test that pending hits become one batch of Increment updates."""
+        stats = CacheHitStats(collection="cached_songs")
+        stats.record_hit("a", T0)
+        stats.record_hit("a", T0)
+        stats.record_hit("b", T0)
+
+        assert await stats.flush() == 2
+
+        mock_firestore_client.collection.assert_called_with("cached_songs")
+        assert len(mock_firestore_client.batches) == 1
+        batch = mock_firestore_client.batches[0]
+        assert updates(batch) == {
+            "ref:a": {"hit_count": firestore.Increment(2), "last_accessed": T0},
+            "ref:b": {"hit_count": firestore.Increment(1), "last_accessed": T0},
+        }
+        batch.commit.assert_called_once()
+        assert stats.pending == {}
+        assert stats.flushed_hits == 3
+
+    @pytest.mark.asyncio
+    async def test_flush_splits_large_backlogs(self, mock_firestore_client):
+        """Test that batches respect the Firestore write limit."""
+        stats = CacheHitStats(collection="cached_songs")
+        for i in range(MAX_BATCH_WRITES + 1):
+            stats.record_hit(f"doc-{i}", T0)
+
+        assert await stats.flush() == MAX_BATCH_WRITES + 1
+        assert [b.update.call_count for b in mock_firestore_client.batches] == [MAX_BATCH_WRITES, 1]
+
+    @pytest.mark.asyncio
+    async def test_flush_with_nothing_pending(self, mock_firestore_client):
+        """Test that an empty flush does not touch Firestore."""
+        stats = CacheHitStats(collection="cached_songs")
+
+        assert await stats.flush() == 0
+        mock_firestore_client.batch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried(self, mock_firestore_client):
+        """Test that hits from a failed commit are merged back into pending."""
+        stats = CacheHitStats(collection="cached_songs")
+        stats.record_hit("a", T0)
+        mock_firestore_client.batch.side_effect = None
+        mock_firestore_client.batch.return_value.commit.side_effect = ServiceUnavailable("down")
+
+        assert await stats.flush() == 0
+        stats.record_hit("a", T0 + timedelta(seconds=1))
+
+        assert stats.pending_hits("a") == 2
+        assert stats.pending["a"].last_accessed == T0 + timedelta(seconds=1)
+        assert stats.flush_failures == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_documents_are_dropped(self, mock_firestore_client):
+        """Test that hits for deleted entries are not retried forever."""
+        stats = CacheHitStats(collection="cached_songs")
+        stats.record_hit("deleted", T0)
+        mock_firestore_client.batch.side_effect = None
+        mock_firestore_client.batch.return_value.commit.side_effect = NotFound("gone")
+
+        await stats.flush()
+
+        assert stats.pending == {}
+
+
+class TestLifecycle:
+    """Tests for the background flush loop."""
+
+    @pytest.mark.asyncio
+    async def test_background_loop_flushes(self, mock_firestore_client):
+        """Test that pending hits are flushed periodically."""
+        stats = CacheHitStats(collection="cached_songs", flush_interval=0.01)
+        stats.record_hit("a", T0)
+
+        stats.start()
+        await asyncio.sleep(0.05)
+        await stats.stop()
+
+        assert stats.pending == {}
+        assert mock_firestore_client.batches[0].commit.called
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_pending_hits(self, mock_firestore_client):
+        """Test that shutdown writes hits recorded since the last flush."""
+        stats = CacheHitStats(collection="cached_songs", flush_interval=3600)
+        stats.start()
+        stats.record_hit("a", T0)
+
+        await stats.stop()
+
+        assert updates(mock_firestore_client.batches[0])["ref:a"]["hit_count"] == firestore.Increment(1)
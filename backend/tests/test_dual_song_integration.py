@@ -135,10 +135,10 @@ class TestCompleteFlow:
                 with patch("app.services.cache.check_song_cache", new_callable=AsyncMock) as mock_cache:
                     mock_cache.return_value = None
                     
-                    with patch("app.services.rate_limiter.check_rate_limit", new_callable=AsyncMock) as mock_rate:
+                    with patch("app.api.songs.reserve_song_quota", new_callable=AsyncMock) as mock_rate:
                         mock_rate.return_value = None
                         
-                        with patch("app.services.rate_limiter.increment_usage", new_callable=AsyncMock):
+                        with patch("app.api.songs.commit_quota", new_callable=AsyncMock):
                             # Generate song request
                             response = await integration_client.post(
                                 "/api/songs/generate",
@@ -293,52 +293,43 @@ class TestWebSocketVariations:
         """
         Test that WebSocket polling extracts and broadcasts variations.
         
-        Note: The current implementation may use song_url for backward compatibility.
-        This test verifies the polling mechanism works correctly.
+        This test verifies the poll result listener broadcasts every variation.
         """
-        from app.api.websocket import poll_and_broadcast
+        from app.api.websocket import handle_poll_result
         
         task_id = "test-task-polling"
         
-        with patch.dict("os.environ", {"SUNO_API_KEY": "test-key"}):
-            with patch("app.api.websocket.SunoClient") as mock_client_class:
-                mock_client = AsyncMock()
-                mock_client_class.return_value.__aenter__.return_value = mock_client
-                mock_client_class.return_value.__aexit__.return_value = None
-                
-                # Return completed status with variations
-                mock_client.get_task_status.return_value = SunoStatus(
-                    status="SUCCESS",
-                    progress=100,
-                    variations=[
-                        SongVariation(
-                            audio_url="https://example.com/song1.mp3",
-                            audio_id="audio-id-1",
-                            variation_index=0
-                        ),
-                        SongVariation(
-                            audio_url="https://example.com/song2.mp3",
-                            audio_id="audio-id-2",
-                            variation_index=1
-                        )
-                    ],
-                    error=None
+        # Completed status with variations, as delivered by the shared poller
+        suno_status = SunoStatus(
+            status="SUCCESS",
+            progress=100,
+            variations=[
+                SongVariation(
+                    audio_url="https://example.com/song1.mp3",
+                    audio_id="audio-id-1",
+                    variation_index=0
+                ),
+                SongVariation(
+                    audio_url="https://example.com/song2.mp3",
+                    audio_id="audio-id-2",
+                    variation_index=1
                 )
+            ],
+            error=None
+        )
+        
+        with patch("app.api.websocket.manager") as mock_manager:
+            mock_manager.has_active_connections.return_value = True
+            
+            with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
+                await handle_poll_result(task_id, suno_status)
                 
-                with patch("app.api.websocket.manager") as mock_manager:
-                    mock_manager.has_active_connections.return_value = True
-                    mock_manager.polling_tasks = {}
-                    
-                    with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
-                        with patch("app.api.websocket.update_task_status", new_callable=AsyncMock):
-                            await poll_and_broadcast(task_id)
-                            
-                            # Verify broadcast was called with completed status
-                            mock_broadcast.assert_called()
-                            call_args = mock_broadcast.call_args[0]
-                            assert call_args[1]["status"] == "completed"
-                            assert call_args[1]["progress"] == 100
-                            # Note: variations may be in the broadcast or stored separately
+                # Verify broadcast was called with completed status
+                mock_broadcast.assert_called()
+                call_args = mock_broadcast.call_args[0]
+                assert call_args[1]["status"] == "completed"
+                assert call_args[1]["progress"] == 100
+                assert len(call_args[1]["variations"]) == 2
 
 
 # ============================================================================
@@ -1098,7 +1098,7 @@ class TestVariationErrorIsolation:
         3. Playback can continue with plain lyrics
         """
         from app.api.songs import get_variation_timestamped_lyrics
-        from app.services.suno_client import SunoClient, SunoAPIError
+        from app.services.suno_client import SunoAPIError
         from unittest.mock import AsyncMock, patch, MagicMock
         
         # Arrange
@@ -1119,14 +1119,12 @@ class TestVariationErrorIsolation:
             ],
         }
         
-        # Mock Suno client to raise an error
+        # Mock shared Suno client to raise an error
         mock_suno_client = AsyncMock()
         mock_suno_client.get_timestamped_lyrics = AsyncMock(side_effect=SunoAPIError("API Error"))
-        mock_suno_client.__aenter__ = AsyncMock(return_value=mock_suno_client)
-        mock_suno_client.__aexit__ = AsyncMock(return_value=None)
         
         with patch('app.api.songs.get_task_from_firestore', new=AsyncMock(return_value=mock_song_data)), \
-             patch('app.api.songs.SunoClient', return_value=mock_suno_client), \
+             patch('app.api.songs.get_suno_client', return_value=mock_suno_client), \
              patch('app.api.songs.os.getenv', return_value="test-api-key"):
             
             # Act - Call the endpoint
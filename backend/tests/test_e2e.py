@@ -22,6 +22,8 @@ from httpx import AsyncClient, ASGITransport
 from datetime import datetime, timedelta, timezone
 from unittest.mock import patch, AsyncMock, MagicMock
 
+from google.cloud import firestore
+
 from app.main import app
 from app.services.cache import generate_content_hash
 
@@ -32,6 +34,7 @@ class MockFirestoreDocument:
     def __init__(self, exists=True, data=None):
         self.exists = exists
         self._data = data or {}
+        self._subcollections = {}
     
     def to_dict(self):
         return self._data
@@ -46,14 +49,29 @@ class MockFirestoreReference:
     def __init__(self, doc):
         self._doc = doc
     
-    def get(self):
+    def get(self, transaction=None):
         return self._doc
     
-    def set(self, data):
-        self._doc._data = data
+    def set(self, data, merge=False):
+        current = self._doc._data if merge and self._doc.exists else {}
+        self._doc._data = {**current, **{
+            key: current.get(key, 0) + value.value if isinstance(value, firestore.Increment) else value
+            for key, value in data.items()
+        }}
+        self._doc.exists = True
     
     def update(self, data):
         self._doc._data.update(data)
+    
+    def collection(self, name):
+        return self._doc._subcollections.setdefault(name, MockFirestoreCollection())
+
+
+class MockFirestoreTransaction:
+    """Mock Firestore transaction that applies writes immediately"""
+    
+    def set(self, ref, data, merge=False):
+        ref.set(data, merge=merge)
 
 
 class MockFirestoreCollection:
@@ -88,6 +106,9 @@ class MockFirestoreClient:
             self._collections[name] = MockFirestoreCollection()
         return self._collections[name]
     
+    def transaction(self):
+        return MockFirestoreTransaction()
+    
     def setup_user(self, user_id, songs_generated=0):
         """Helper to setup a user document"""
         user_doc = MockFirestoreDocument(exists=True, data={
@@ -98,6 +119,12 @@ class MockFirestoreClient:
         })
         self._collections.setdefault('users', MockFirestoreCollection())
         self._collections['users']._documents[user_id] = user_doc
+        
+        # Today's usage counter read by the quota reservation
+        today = datetime.now(timezone.utc).date().isoformat()
+        user_doc._subcollections['usage'] = MockFirestoreCollection({
+            today: MockFirestoreDocument(exists=True, data={'songs': songs_generated})
+        })
     
     def setup_cache(self, content_hash, lyrics=None):
         """Helper to setup a cache document"""
@@ -129,7 +156,8 @@ def mock_firestore():
     # Patch all places where Firestore client is called
     with patch('app.core.firebase.get_firestore_client', return_value=_test_firestore_client):
         with patch('app.api.lyrics.get_firestore_client', return_value=_test_firestore_client):
-            with patch('app.services.rate_limiter.get_firestore_client', return_value=_test_firestore_client):
+            with patch('app.services.rate_limiter.get_firestore_client', return_value=_test_firestore_client), \
+                    patch('app.services.rate_limiter.firestore.transactional', side_effect=lambda fn: fn):
                 with patch('app.services.cache.get_firestore_client', return_value=_test_firestore_client):
                     yield _test_firestore_client
 
@@ -158,14 +186,14 @@ class TestE2EHappyPath:
             with patch('app.core.auth.auth.verify_id_token') as mock_verify:
                 mock_verify.return_value = {'uid': user_id}
                 
-                with patch('app.api.lyrics.LyricsPipeline') as MockPipelineClass:
+                with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                     mock_pipeline_instance = AsyncMock()
                     mock_pipeline_instance.execute = AsyncMock(return_value={
                         'lyrics': expected_lyrics,
                         'content_hash': content_hash,
                         'processing_time': 15.5
                     })
-                    MockPipelineClass.return_value = mock_pipeline_instance
+                    mock_get_pipeline.return_value = mock_pipeline_instance
                     
                     # Step 1: Check rate limit
                     response = await client.get(
@@ -223,14 +251,14 @@ class TestE2ERateLimitScenario:
             with patch('app.core.auth.auth.verify_id_token') as mock_verify:
                 mock_verify.return_value = {'uid': user_id}
                 
-                with patch('app.api.lyrics.LyricsPipeline') as MockPipelineClass:
+                with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                     mock_pipeline_instance = AsyncMock()
                     mock_pipeline_instance.execute = AsyncMock(return_value={
                         'lyrics': 'Test lyrics',
                         'content_hash': 'test-hash',
                         'processing_time': 10.0
                     })
-                    MockPipelineClass.return_value = mock_pipeline_instance
+                    mock_get_pipeline.return_value = mock_pipeline_instance
                     
                     # Generate 3 songs successfully
                     for i in range(3):
@@ -290,14 +318,14 @@ class TestE2ECacheScenario:
             with patch('app.core.auth.auth.verify_id_token') as mock_verify:
                 mock_verify.return_value = {'uid': user_id}
                 
-                with patch('app.api.lyrics.LyricsPipeline') as MockPipelineClass:
+                with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                     mock_pipeline_instance = AsyncMock()
                     mock_pipeline_instance.execute = AsyncMock(return_value={
                         'lyrics': cached_lyrics,
                         'content_hash': content_hash,
                         'processing_time': 20.0
                     })
-                    MockPipelineClass.return_value = mock_pipeline_instance
+                    mock_get_pipeline.return_value = mock_pipeline_instance
                     
                     # First request - cache miss
                     _test_firestore_client.setup_cache(content_hash, lyrics=None)
@@ -440,10 +468,10 @@ class TestE2EErrorScenarios:
             with patch('app.core.auth.auth.verify_id_token') as mock_verify:
                 mock_verify.return_value = {'uid': user_id}
                 
-                with patch('app.api.lyrics.LyricsPipeline') as MockPipelineClass:
+                with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                     mock_pipeline_instance = AsyncMock()
                     mock_pipeline_instance.execute = AsyncMock(side_effect=Exception("Pipeline error"))
-                    MockPipelineClass.return_value = mock_pipeline_instance
+                    mock_get_pipeline.return_value = mock_pipeline_instance
                     
                     response = await client.post(
                         "/api/lyrics/generate",
@@ -481,14 +509,14 @@ class TestE2ESearchGrounding:
             with patch('app.core.auth.auth.verify_id_token') as mock_verify:
                 mock_verify.return_value = {'uid': user_id}
                 
-                with patch('app.api.lyrics.LyricsPipeline') as MockPipelineClass:
+                with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                     mock_pipeline_instance = AsyncMock()
                     mock_pipeline_instance.execute = AsyncMock(return_value={
                         'lyrics': 'Enriched lyrics with search context',
                         'content_hash': content_hash,
                         'processing_time': 25.0
                     })
-                    MockPipelineClass.return_value = mock_pipeline_instance
+                    mock_get_pipeline.return_value = mock_pipeline_instance
                     
                     # Request with search enabled
                     response = await client.post(
@@ -529,14 +557,14 @@ class TestE2ESearchGrounding:
             with patch('app.core.auth.auth.verify_id_token') as mock_verify:
                 mock_verify.return_value = {'uid': user_id}
                 
-                with patch('app.api.lyrics.LyricsPipeline') as MockPipelineClass:
+                with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                     mock_pipeline_instance = AsyncMock()
                     mock_pipeline_instance.execute = AsyncMock(return_value={
                         'lyrics': 'Standard lyrics without search',
                         'content_hash': content_hash,
                         'processing_time': 15.0
                     })
-                    MockPipelineClass.return_value = mock_pipeline_instance
+                    mock_get_pipeline.return_value = mock_pipeline_instance
                     
                     # Request with search disabled
                     response = await client.post(
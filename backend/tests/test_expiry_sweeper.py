@@ -0,0 +1,132 @@
+"""Tests for the background sweeper of expired songs and share links."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.expiry_sweeper import ExpirySweeper, _acquire_lease_in_transaction
+
+
+NOW = datetime(2024, 1, 15, 14, 30, 0, tzinfo=timezone.utc)
+
+
+def lock_ref(lock=None):
+    """Mock lock document reference holding `lock` (None if it does not exist)."""
+    ref = MagicMock()
+    ref.get.return_value = MagicMock(exists=lock is not None, to_dict=lambda: lock)
+    return ref
+
+
+@pytest.fixture
+def mock_cleanups():
+    """Patch the collection cleanups the sweeper runs."""
+    with patch("app.services.expiry_sweeper.cleanup_expired_tasks", new=AsyncMock(return_value=3)) as tasks, \
+         patch("app.services.expiry_sweeper.cleanup_expired_share_links", new=AsyncMock(return_value=5)) as links:
+        yield tasks, links
+
+
+class TestLeaderLease:
+    """Tests for taking the leader lock in a transaction."""
+
+    @pytest.mark.parametrize("lock", [
+        None,
+        {"holder": "other", "lease_until": NOW - timedelta(seconds=1)},
+        {"holder": "me", "lease_until": NOW + timedelta(hours=1)},
+    ])
+    def test_lease_is_taken(self, lock):
+        """Test that missing, expired and own leases are taken."""
+        transaction = MagicMock()
+        ref = lock_ref(lock)
+        lease_until = NOW + timedelta(hours=1)
+
+        assert _acquire_lease_in_transaction(transaction, ref, "me", NOW, lease_until) is True
+        transaction.set.assert_called_once_with(ref, {
+            "holder": "me",
+            "lease_until": lease_until,
+            "acquired_at": NOW,
+        })
+
+    def test_lease_held_by_another_worker(self):
+        """Test that a valid lease of another worker is left alone."""
+        transaction = MagicMock()
+        ref = lock_ref({"holder": "other", "lease_until": NOW + timedelta(minutes=1)})
+
+        assert _acquire_lease_in_transaction(transaction, ref, "me", NOW, NOW + timedelta(hours=1)) is False
+        transaction.set.assert_not_called()
+
+
+class TestSweep:
+    """Tests for a single sweep."""
+
+    @pytest.mark.asyncio
+    async def test_leader_sweeps_and_records_metrics(self, mock_cleanups):
+        """Test that the leader deletes expired documents and counts them."""
+        tasks, links = mock_cleanups
+        sweeper = ExpirySweeper(max_concurrency=3)
+
+        with patch.object(sweeper, "acquire_lease", new=AsyncMock(return_value=True)):
+            deleted = await sweeper.sweep()
+            await sweeper.sweep()
+
+        assert deleted == {"songs": 3, "share_links": 5}
+        tasks.assert_awaited_with(3)
+        links.assert_awaited_with(3)
+        stats = sweeper.stats()
+        assert stats["runs"] == 2
+        assert stats["deleted"] == {"songs": 6, "share_links": 10}
+        assert stats["last_run_seconds"] >= 0
+        assert stats["last_run_at"] is not None
+
+    @pytest.mark.asyncio
+    async def test_other_workers_skip(self, mock_cleanups):
+        """Test that workers without the lease do not sweep."""
+        tasks, links = mock_cleanups
+        sweeper = ExpirySweeper()
+
+        with patch.object(sweeper, "acquire_lease", new=AsyncMock(return_value=False)):
+            assert await sweeper.sweep() is None
+
+        tasks.assert_not_awaited()
+        links.assert_not_awaited()
+        assert sweeper.stats()["skipped_runs"] == 1
+        assert sweeper.stats()["runs"] == 0
+
+
+class TestLifecycle:
+    """Tests for the background sweep loop."""
+
+    @pytest.mark.asyncio
+    async def test_background_loop_sweeps(self, mock_cleanups):
+        """Test that the loop sweeps every interval and stops cleanly."""
+        sweeper = ExpirySweeper(interval=0.01)
+
+        with patch.object(sweeper, "acquire_lease", new=AsyncMock(return_value=True)):
+            sweeper.start()
+            await asyncio.sleep(0.05)
+            await sweeper.stop()
+
+        assert sweeper.runs >= 2
+        assert sweeper._sweep_task is None
+
+    @pytest.mark.asyncio
+    async def test_loop_survives_errors(self, mock_cleanups):
+        """Test that a failed sweep is counted and the loop keeps running."""
+        sweeper = ExpirySweeper(interval=0.01)
+        attempts = 0
+
+        async def acquire_lease():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RuntimeError("Firestore unavailable")
+            return True
+
+        with patch.object(sweeper, "acquire_lease", new=acquire_lease):
+            sweeper.start()
+            await asyncio.sleep(0.05)
+            await sweeper.stop()
+
+        assert sweeper.failures == 1
+        assert sweeper.runs >= 1
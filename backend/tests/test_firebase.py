@@ -0,0 +1,147 @@
+"""Tests for the Firestore access layer.
+
+This module tests that blocking Firestore calls are moved off the event
+loop, including a concurrency check that parallel song status requests
+overlap instead of serializing behind each other.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.core.auth import get_current_user
+from app.core.firebase import (
+    get_firestore_executor,
+    run_firestore,
+    shutdown_firestore_executor,
+    stream_documents,
+)
+from app.main import app
+
+
+TEST_USER_ID = "test-user-123"
+
+# Simulated Firestore round-trip latency (seconds)
+FIRESTORE_LATENCY = 0.2
+
+
+class TestRunFirestore:
+    """Tests for run_firestore helper."""
+
+    @pytest.mark.asyncio
+    async def test_returns_function_result(self):
+        """Test that the callable's return value is passed through."""
+        result = await run_firestore(lambda a, b=0: a + b, 2, b=3)
+        assert result == 5
+
+    @pytest.mark.asyncio
+    async def test_runs_off_event_loop_thread(self):
+        """Test that the call executes on a Firestore worker thread."""
+        thread_name = await run_firestore(lambda: threading.current_thread().name)
+        assert thread_name.startswith("firestore")
+
+    @pytest.mark.asyncio
+    async def test_propagates_exceptions(self):
+        """Test that exceptions raised by the call reach the caller."""
+        def failing_call():
+            raise RuntimeError("deadline exceeded")
+
+        with pytest.raises(RuntimeError, match="deadline exceeded"):
+            await run_firestore(failing_call)
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive(self):
+        """Test that a slow blocking call does not stall other coroutines."""
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        await run_firestore(time.sleep, FIRESTORE_LATENCY)
+        ticker_task.cancel()
+
+        assert ticks >= 5
+
+    @pytest.mark.asyncio
+    async def test_stream_documents_collects_snapshots(self):
+        """Test that stream_documents materializes the query stream."""
+        query = MagicMock()
+        query.stream.return_value = iter(["doc-1", "doc-2"])
+
+        docs = await stream_documents(query)
+
+        assert docs == ["doc-1", "doc-2"]
+
+    def test_shutdown_recreates_executor_lazily(self):
+        """Test that a new executor is created after shutdown."""
+        first = get_firestore_executor()
+        shutdown_firestore_executor()
+        second = get_firestore_executor()
+
+        assert first is not second
+
+
+class TestConcurrentStatusRequests:
+    """Concurrency benchmark for GET /api/songs/{task_id}."""
+
+    @pytest.fixture
+    def slow_firestore(self):
+        """Firestore client whose document reads block like a network call."""
+        now = datetime.now(timezone.utc)
+        snapshot = MagicMock()
+        snapshot.exists = True
+        snapshot.to_dict.side_effect = lambda: {
+            "user_id": TEST_USER_ID,
+            "task_id": "task-1",
+            "status": "completed",
+            "progress": 100,
+            "song_url": "https://example.com/song.mp3",
+            "variations": [],
+            "created_at": now,
+            "expires_at": now + timedelta(hours=48),
+        }
+
+        def blocking_get(field_paths=None):
+            time.sleep(FIRESTORE_LATENCY)
+            return snapshot
+
+        client = MagicMock()
+        client.collection.return_value.document.return_value.get.side_effect = blocking_get
+
+        with patch("app.services.song_storage.get_firestore_client", return_value=client):
+            yield client
+
+    @pytest.mark.asyncio
+    async def test_parallel_status_requests_overlap(self, slow_firestore):
+        """Test that N parallel requests take ~one round trip, not N."""
+        request_count = 10
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+
+        try:
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                start = time.perf_counter()
+                responses = await asyncio.gather(*[
+                    client.get(f"/api/songs/task-{i}") for i in range(request_count)
+                ])
+                elapsed = time.perf_counter() - start
+        finally:
+            app.dependency_overrides.clear()
+
+        assert all(r.status_code == 200 for r in responses)
+        serialized_time = request_count * FIRESTORE_LATENCY
+        print(
+            f"\n{request_count} parallel status requests: {elapsed:.3f}s "
+            f"(serialized would be {serialized_time:.1f}s)"
+        )
+        # Requests must overlap: well under the fully serialized duration
+        assert elapsed < serialized_time / 2
@@ -1,5 +1,8 @@
 """Tests for Google Search service."""
 
+import asyncio
+from datetime import datetime, timedelta, timezone
+
 import pytest
 from unittest.mock import MagicMock, patch, AsyncMock
 from fastapi import HTTPException
@@ -239,6 +242,148 @@ class TestPerformSearch:
                 await search_service._perform_search("test query", 5)
 
 
+class TestSearchCache:
+    """Tests for pooled, cached and coalesced searches."""
+    
+    @pytest.mark.asyncio
+    async def test_reuses_pooled_client(self, search_service):
+        """Test that searches share one HTTP client instead of opening one per call."""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"items": []}
+        
+        with patch('httpx.AsyncClient') as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client.is_closed = False
+            mock_client.get.return_value = mock_response
+            mock_client_class.return_value = mock_client
+            
+            await search_service._perform_search("first query", 5)
+            await search_service._perform_search("second query", 5)
+            
+            mock_client_class.assert_called_once()
+            assert mock_client.get.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_normalized_queries_hit_cache(self, search_service, sample_search_results):
+        """Test that repeated queries differing in case/whitespace search once."""
+        with patch.object(
+            search_service, '_perform_search', new_callable=AsyncMock
+        ) as mock_search:
+            mock_search.return_value = sample_search_results
+            
+            first = await search_service.search_and_enrich("Machine  Learning")
+            second = await search_service.search_and_enrich("  machine learning\n")
+            
+            assert first == second
+            mock_search.assert_called_once_with("Machine  Learning", 5)
+            assert search_service.stats()["hits"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_max_results_is_part_of_key(self, search_service):
+        """Test that different result counts are cached separately."""
+        with patch.object(
+            search_service, '_perform_search', new_callable=AsyncMock
+        ) as mock_search:
+            mock_search.return_value = []
+            
+            await search_service.search_and_enrich("query", max_results=3)
+            await search_service.search_and_enrich("query", max_results=5)
+            
+            assert mock_search.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_queries_are_coalesced(
+        self, search_service, sample_search_results
+    ):
+        """Test that concurrent cache misses share a single upstream search."""
+        async def slow_search(query, max_results):
+            await asyncio.sleep(0.05)
+            return sample_search_results
+        
+        with patch.object(
+            search_service, '_perform_search', new_callable=AsyncMock
+        ) as mock_search:
+            mock_search.side_effect = slow_search
+            
+            results = await asyncio.gather(
+                *[search_service.search_and_enrich("machine learning") for _ in range(10)]
+            )
+            
+            assert len(set(results)) == 1
+            mock_search.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_failures_are_not_cached(self, search_service):
+        """Test that a failed search is retried on the next call."""
+        with patch.object(
+            search_service, '_perform_search', new_callable=AsyncMock
+        ) as mock_search:
+            mock_search.side_effect = [httpx.HTTPError("Connection failed"), []]
+            
+            with pytest.raises(HTTPException):
+                await search_service.search_and_enrich("test query")
+            assert await search_service.search_and_enrich("test query") == ""
+            
+            assert mock_search.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_persisted_results_are_used(self, search_service, sample_search_results):
+        """Test that unexpired Firestore results avoid a Google search."""
+        search_service.persist = True
+        mock_doc = MagicMock()
+        mock_doc.exists = True
+        mock_doc.to_dict.return_value = {
+            "items": sample_search_results,
+            "expires_at": datetime.now(timezone.utc) + timedelta(hours=1),
+        }
+        mock_db = MagicMock()
+        mock_db.collection.return_value.document.return_value.get.return_value = mock_doc
+        
+        with patch("app.services.google_search.get_firestore_client", return_value=mock_db), \
+                patch.object(search_service, '_perform_search', new_callable=AsyncMock) as mock_search:
+            result = await search_service.search_and_enrich("machine learning")
+        
+        assert "Introduction to Machine Learning" in result
+        mock_search.assert_not_called()
+        mock_db.collection.assert_called_with("search_cache")
+    
+    @pytest.mark.asyncio
+    async def test_expired_persisted_results_are_refreshed(self, search_service, sample_search_results):
+        """Test that expired Firestore results trigger a search and a rewrite."""
+        search_service.persist = True
+        mock_doc = MagicMock()
+        mock_doc.exists = True
+        mock_doc.to_dict.return_value = {
+            "items": [],
+            "expires_at": datetime.now(timezone.utc) - timedelta(seconds=1),
+        }
+        mock_db = MagicMock()
+        doc_ref = mock_db.collection.return_value.document.return_value
+        doc_ref.get.return_value = mock_doc
+        
+        with patch("app.services.google_search.get_firestore_client", return_value=mock_db), \
+                patch.object(search_service, '_perform_search', new_callable=AsyncMock) as mock_search:
+            mock_search.return_value = sample_search_results
+            await search_service.search_and_enrich("machine learning")
+        
+        mock_search.assert_called_once()
+        stored = doc_ref.set.call_args[0][0]
+        assert stored["items"] == sample_search_results
+        assert stored["query"] == "5:machine learning"
+    
+    @pytest.mark.asyncio
+    async def test_persistence_errors_fall_back_to_search(self, search_service):
+        """Test that an unavailable Firestore does not break searching."""
+        search_service.persist = True
+        
+        with patch("app.services.google_search.get_firestore_client", side_effect=Exception("down")), \
+                patch.object(search_service, '_perform_search', new_callable=AsyncMock) as mock_search:
+            mock_search.return_value = []
+            assert await search_service.search_and_enrich("query") == ""
+        
+        mock_search.assert_called_once()
+
+
 class TestFormatResults:
     """Tests for _format_results method."""
     
@@ -4,12 +4,16 @@ Tests for lyrics API endpoints.
 Requirements: FR-3, FR-2
 """
 
+import asyncio
+import json
 import pytest
 from unittest.mock import AsyncMock, patch, MagicMock
 from datetime import datetime, timezone, timedelta
 from httpx import AsyncClient
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from app.main import app
 from app.core.auth import get_current_user
+from app.services.ai_pipeline import LyricsPipeline
 
 
 @pytest.fixture
@@ -67,7 +71,7 @@ class TestGenerateLyricsEndpoint:
         app.dependency_overrides[get_current_user] = lambda: mock_user_id
         
         # Mock services
-        with patch('app.api.lyrics.check_rate_limit', new_callable=AsyncMock):
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock):
             with patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=None):
                 mock_pipeline_result = {
                     'lyrics': sample_lyrics,
@@ -75,10 +79,10 @@ class TestGenerateLyricsEndpoint:
                     'cached': False,
                     'processing_time': 15.5
                 }
-                with patch('app.api.lyrics.LyricsPipeline') as mock_pipeline_class:
+                with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                     mock_pipeline = MagicMock()
                     mock_pipeline.execute = AsyncMock(return_value=mock_pipeline_result)
-                    mock_pipeline_class.return_value = mock_pipeline
+                    mock_get_pipeline.return_value = mock_pipeline
                     
                     with patch('app.api.lyrics.store_lyrics_cache', new_callable=AsyncMock):
                         with patch('app.api.lyrics.get_firestore_client') as mock_firestore:
@@ -87,7 +91,7 @@ class TestGenerateLyricsEndpoint:
                             mock_firestore.return_value.collection.return_value = mock_collection
                             mock_collection.document.return_value = mock_doc
                             
-                            with patch('app.api.lyrics.increment_usage', new_callable=AsyncMock):
+                            with patch('app.api.lyrics.commit_quota', new_callable=AsyncMock):
                                 response = await client.post(
                                     "/api/lyrics/generate",
                                     json={
@@ -122,7 +126,7 @@ class TestGenerateLyricsEndpoint:
             'hit_count': 5
         }
         
-        with patch('app.api.lyrics.check_rate_limit', new_callable=AsyncMock):
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock):
             with patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=cached_result):
                 response = await client.post(
                     "/api/lyrics/generate",
@@ -160,7 +164,7 @@ class TestGenerateLyricsEndpoint:
                 }
             )
         
-        with patch('app.api.lyrics.check_rate_limit', side_effect=mock_check_rate_limit):
+        with patch('app.api.lyrics.reserve_song_quota', side_effect=mock_check_rate_limit):
             response = await client.post(
                 "/api/lyrics/generate",
                 json={
@@ -212,6 +216,271 @@ class TestGenerateLyricsEndpoint:
         assert response.status_code == 422
 
 
+class TestConcurrentGeneration:
+    """Tests for single-flight pipeline runs on POST /api/lyrics/generate."""
+    
+    @staticmethod
+    def _slow_pipeline(sample_lyrics: str, delay: float = 0.05):
+        """Build a mock pipeline getter whose pipeline execute takes a while."""
+        async def execute(content, search_enabled):
+            await asyncio.sleep(delay)
+            return {
+                'lyrics': sample_lyrics,
+                'content_hash': 'abc123hash',
+                'cached': False,
+                'processing_time': delay
+            }
+        
+        mock_get_pipeline = MagicMock()
+        mock_get_pipeline.return_value.execute = AsyncMock(side_effect=execute)
+        return mock_get_pipeline
+    
+    @pytest.mark.asyncio
+    async def test_identical_requests_run_pipeline_once(
+        self,
+        client: AsyncClient,
+        mock_user_id: str,
+        sample_content: str,
+        sample_lyrics: str
+    ):
+        """Test that 50 concurrent identical requests share one pipeline execution."""
+        app.dependency_overrides[get_current_user] = lambda: mock_user_id
+        mock_get_pipeline = self._slow_pipeline(sample_lyrics)
+        
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock), \
+                patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=None), \
+                patch('app.api.lyrics.get_lyrics_pipeline', mock_get_pipeline), \
+                patch('app.api.lyrics.store_lyrics_cache', new_callable=AsyncMock) as mock_store, \
+                patch('app.api.lyrics.get_firestore_client'), \
+                patch('app.api.lyrics.commit_quota', new_callable=AsyncMock):
+            responses = await asyncio.gather(*[
+                client.post(
+                    "/api/lyrics/generate",
+                    json={"content": sample_content, "search_enabled": False}
+                )
+                for _ in range(50)
+            ])
+        
+        assert all(r.status_code == 200 for r in responses)
+        assert all(r.json()['lyrics'] == sample_lyrics for r in responses)
+        assert mock_get_pipeline.return_value.execute.await_count == 1
+        mock_store.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_search_flag_is_part_of_the_key(
+        self,
+        client: AsyncClient,
+        mock_user_id: str,
+        sample_content: str,
+        sample_lyrics: str
+    ):
+        """Test that requests differing only in search_enabled run separately."""
+        app.dependency_overrides[get_current_user] = lambda: mock_user_id
+        mock_get_pipeline = self._slow_pipeline(sample_lyrics)
+        
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock), \
+                patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=None), \
+                patch('app.api.lyrics.get_lyrics_pipeline', mock_get_pipeline), \
+                patch('app.api.lyrics.store_lyrics_cache', new_callable=AsyncMock), \
+                patch('app.api.lyrics.get_firestore_client'), \
+                patch('app.api.lyrics.commit_quota', new_callable=AsyncMock):
+            await asyncio.gather(*[
+                client.post(
+                    "/api/lyrics/generate",
+                    json={"content": sample_content, "search_enabled": search_enabled}
+                )
+                for search_enabled in (False, True, False, True)
+            ])
+        
+        assert mock_get_pipeline.return_value.execute.await_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_shared_failure_reaches_every_caller(
+        self,
+        client: AsyncClient,
+        mock_user_id: str,
+        sample_content: str
+    ):
+        """Test that a failed shared run fails all waiting requests and is not reused."""
+        app.dependency_overrides[get_current_user] = lambda: mock_user_id
+        
+        async def failing_execute(content, search_enabled):
+            await asyncio.sleep(0.01)
+            raise Exception("LLM unavailable")
+        
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock), \
+                patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=None), \
+                patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
+            mock_get_pipeline.return_value.execute = AsyncMock(side_effect=failing_execute)
+            responses = await asyncio.gather(*[
+                client.post(
+                    "/api/lyrics/generate",
+                    json={"content": sample_content, "search_enabled": False}
+                )
+                for _ in range(5)
+            ])
+            retry = await client.post(
+                "/api/lyrics/generate",
+                json={"content": sample_content, "search_enabled": False}
+            )
+        
+        assert all(r.status_code == 500 for r in responses)
+        assert retry.status_code == 500
+        assert mock_get_pipeline.return_value.execute.await_count == 2
+
+
+def parse_sse(body: str) -> list:
+    """Parse a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestGenerateLyricsStreamEndpoint:
+    """Tests for POST /api/lyrics/generate/stream endpoint."""
+    
+    @pytest.mark.asyncio
+    async def test_streams_stages_tokens_then_complete(
+        self,
+        client: AsyncClient,
+        mock_user_id: str,
+        sample_content: str
+    ):
+        """Test that the stream carries stages, lyric tokens and the stored result."""
+        app.dependency_overrides[get_current_user] = lambda: mock_user_id
+        stub = FakeListChatModel(responses=[
+            "1. Python is readable",
+            "[Verse 1]\nPython reads like prose",
+        ])
+        
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock) as mock_reserve, \
+                patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=None), \
+                patch('app.api.lyrics.get_lyrics_pipeline', return_value=LyricsPipeline(llm=stub)), \
+                patch('app.api.lyrics.store_lyrics_cache', new_callable=AsyncMock) as mock_store, \
+                patch('app.api.lyrics.get_firestore_client'), \
+                patch('app.api.lyrics.commit_quota', new_callable=AsyncMock) as mock_commit:
+            response = await client.post(
+                "/api/lyrics/generate/stream",
+                json={"content": sample_content, "search_enabled": False}
+            )
+        
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/event-stream')
+        events = parse_sse(response.text)
+        names = [name for name, _ in events]
+        stages = [data['stage'] for name, data in events if name == 'stage']
+        tokens = "".join(data['content'] for name, data in events if name == 'token')
+        
+        assert stages == ['checking_search', 'cleaning', 'summarizing', 'validating', 'converting']
+        assert names.index('token') > events.index(('stage', {'stage': 'converting'}))
+        assert tokens == "[Verse 1]\nPython reads like prose"
+        assert names[-1] == 'complete'
+        assert events[-1][1]['lyrics'] == tokens
+        assert events[-1][1]['cached'] is False
+        mock_store.assert_awaited_once()
+        assert mock_store.call_args.kwargs['lyrics'] == tokens
+        mock_reserve.assert_awaited_once_with(mock_user_id)
+        mock_commit.assert_awaited_once_with(mock_reserve.return_value)
+    
+    @pytest.mark.asyncio
+    async def test_cache_hit_sends_only_complete(
+        self,
+        client: AsyncClient,
+        mock_user_id: str,
+        sample_content: str,
+        sample_lyrics: str
+    ):
+        """Test that a cached result is returned as a single complete event."""
+        app.dependency_overrides[get_current_user] = lambda: mock_user_id
+        cached_result = {
+            'lyrics': sample_lyrics,
+            'content_hash': 'abc123hash',
+            'cached': True,
+            'processing_time': 0.0,
+            'hit_count': 2
+        }
+        
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock), \
+                patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=cached_result), \
+                patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
+            response = await client.post(
+                "/api/lyrics/generate/stream",
+                json={"content": sample_content, "search_enabled": False}
+            )
+        
+        events = parse_sse(response.text)
+        assert [name for name, _ in events] == ['complete']
+        assert events[0][1]['cached'] is True
+        assert events[0][1]['lyrics'] == sample_lyrics
+        mock_get_pipeline.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_failure_sends_error_event(
+        self,
+        client: AsyncClient,
+        mock_user_id: str,
+        sample_content: str
+    ):
+        """Test that a failure mid-stream ends with an error event and nothing is stored."""
+        app.dependency_overrides[get_current_user] = lambda: mock_user_id
+        
+        async def failing_stream(**kwargs):
+            yield {'event': 'stage', 'stage': 'summarizing'}
+            raise Exception("Failed to summarize content")
+        
+        with patch('app.api.lyrics.reserve_song_quota', new_callable=AsyncMock), \
+                patch('app.api.lyrics.check_lyrics_cache', new_callable=AsyncMock, return_value=None), \
+                patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline, \
+                patch('app.api.lyrics.store_lyrics_cache', new_callable=AsyncMock) as mock_store, \
+                patch('app.api.lyrics.commit_quota', new_callable=AsyncMock) as mock_commit:
+            mock_get_pipeline.return_value.execute_stream = failing_stream
+            response = await client.post(
+                "/api/lyrics/generate/stream",
+                json={"content": sample_content, "search_enabled": False}
+            )
+        
+        events = parse_sse(response.text)
+        assert [name for name, _ in events] == ['stage', 'error']
+        assert 'summarize' in events[-1][1]['message']
+        mock_store.assert_not_called()
+        mock_commit.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_rate_limit_exceeded_before_stream(
+        self,
+        client: AsyncClient,
+        mock_user_id: str,
+        sample_content: str
+    ):
+        """Test that rate limiting is an HTTP error, not a stream event."""
+        from fastapi import HTTPException
+        
+        app.dependency_overrides[get_current_user] = lambda: mock_user_id
+        
+        async def mock_check_rate_limit(user_id):
+            raise HTTPException(status_code=429, detail={'error': 'Rate limit exceeded'})
+        
+        with patch('app.api.lyrics.reserve_song_quota', side_effect=mock_check_rate_limit):
+            response = await client.post(
+                "/api/lyrics/generate/stream",
+                json={"content": sample_content, "search_enabled": False}
+            )
+        
+        assert response.status_code == 429
+    
+    @pytest.mark.asyncio
+    async def test_stream_requires_auth(self, client: AsyncClient, sample_content: str):
+        """Test that the stream endpoint requires authentication."""
+        response = await client.post(
+            "/api/lyrics/generate/stream",
+            json={"content": sample_content, "search_enabled": False}
+        )
+        
+        assert response.status_code == 403
+
+
 class TestGetRateLimitEndpoint:
     """Tests for GET /api/lyrics/rate-limit endpoint."""
     
@@ -318,10 +587,10 @@ class TestRegenerateLyricsEndpoint:
                 'cached': False,
                 'processing_time': 12.5
             }
-            with patch('app.api.lyrics.LyricsPipeline') as mock_pipeline_class:
+            with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                 mock_pipeline = MagicMock()
                 mock_pipeline.execute = AsyncMock(return_value=mock_pipeline_result)
-                mock_pipeline_class.return_value = mock_pipeline
+                mock_get_pipeline.return_value = mock_pipeline
                 
                 with patch('app.api.lyrics.get_firestore_client') as mock_firestore:
                     mock_collection = MagicMock()
@@ -344,6 +613,8 @@ class TestRegenerateLyricsEndpoint:
         assert data['content_hash'] == 'abc123hash'
         assert data['cached'] is False
         assert data['processing_time'] == 12.5
+        # Shared pipeline, with the higher temperature passed per call
+        assert mock_pipeline.execute.call_args.kwargs['temperature'] == 0.9
     
     @pytest.mark.asyncio
     async def test_regenerate_lyrics_rate_limit_exceeded(
@@ -429,10 +700,10 @@ class TestRegenerateLyricsEndpoint:
         app.dependency_overrides[get_current_user] = lambda: mock_user_id
         
         with patch('app.api.lyrics.check_regeneration_limit', new_callable=AsyncMock):
-            with patch('app.api.lyrics.LyricsPipeline') as mock_pipeline_class:
+            with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                 mock_pipeline = MagicMock()
                 mock_pipeline.execute = AsyncMock(side_effect=Exception("Pipeline execution failed"))
-                mock_pipeline_class.return_value = mock_pipeline
+                mock_get_pipeline.return_value = mock_pipeline
                 
                 response = await client.post(
                     "/api/lyrics/regenerate",
@@ -481,10 +752,10 @@ class TestRegenerateLyricsEndpoint:
                 'cached': False,
                 'processing_time': 10.0
             }
-            with patch('app.api.lyrics.LyricsPipeline') as mock_pipeline_class:
+            with patch('app.api.lyrics.get_lyrics_pipeline') as mock_get_pipeline:
                 mock_pipeline = MagicMock()
                 mock_pipeline.execute = AsyncMock(return_value=mock_pipeline_result)
-                mock_pipeline_class.return_value = mock_pipeline
+                mock_get_pipeline.return_value = mock_pipeline
                 
                 with patch('app.api.lyrics.get_firestore_client') as mock_firestore:
                     mock_collection = MagicMock()
@@ -493,7 +764,7 @@ class TestRegenerateLyricsEndpoint:
                     mock_collection.document.return_value = mock_doc
                     
                     with patch('app.api.lyrics.increment_regeneration_usage', new_callable=AsyncMock) as mock_incr_regen:
-                        with patch('app.api.lyrics.increment_usage', new_callable=AsyncMock) as mock_incr_song:
+                        with patch('app.api.lyrics.commit_quota', new_callable=AsyncMock) as mock_incr_song:
                             response = await client.post(
                                 "/api/lyrics/regenerate",
                                 json={
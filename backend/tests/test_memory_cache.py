@@ -0,0 +1,241 @@
+"""Tests for the in-process memory cache."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.services.memory_cache import (
+    ENTRY_OVERHEAD_BYTES,
+    MISSING,
+    MemoryCache,
+    estimate_size,
+)
+
+
+def make_cache(**kwargs) -> MemoryCache:
+    """Create a cache with generous defaults for tests."""
+    kwargs.setdefault("max_bytes", 1024 * 1024)
+    kwargs.setdefault("ttl", 60)
+    kwargs.setdefault("negative_ttl", 5)
+    return MemoryCache(name="test", **kwargs)
+
+
+class TestEstimateSize:
+    """Tests for estimate_size function."""
+
+    def test_counts_utf8_bytes_of_strings(self):
+        """Test that string size is measured in encoded bytes."""
+        assert estimate_size("abc") == 3
+        assert estimate_size("é") == 2
+
+    def test_sums_dict_keys_and_values(self):
+        """Test that dict size includes keys and nested values."""
+        assert estimate_size({"lyrics": "abcd"}) == len("lyrics") + 4
+
+    def test_none_is_free(self):
+        """Test that negative entries cost only the fixed overhead."""
+        assert estimate_size(None) == 0
+
+
+class TestLookupAndSet:
+    """Tests for lookup, set, TTL expiry and negative entries."""
+
+    def test_lookup_missing_key(self):
+        """Test that an unknown key is reported as MISSING and counted."""
+        cache = make_cache()
+
+        assert cache.lookup("key") is MISSING
+        assert cache.misses == 1
+
+    def test_set_then_lookup(self):
+        """Test that a stored value is returned and counted as a hit."""
+        cache = make_cache()
+        cache.set("key", {"lyrics": "la la"})
+
+        assert cache.lookup("key") == {"lyrics": "la la"}
+        assert cache.hits == 1
+
+    def test_negative_entry(self):
+        """Test that None is cached as a negative entry."""
+        cache = make_cache()
+        cache.set("key", None)
+
+        assert cache.lookup("key") is None
+        assert cache.negative_hits == 1
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after their TTL."""
+        cache = make_cache(ttl=10, negative_ttl=1)
+        cache.set("positive", "value")
+        cache.set("negative", None)
+
+        now = time.monotonic()
+        with patch("app.services.memory_cache.time.monotonic", return_value=now + 2):
+            assert cache.lookup("negative") is MISSING
+            assert cache.lookup("positive") == "value"
+        with patch("app.services.memory_cache.time.monotonic", return_value=now + 11):
+            assert cache.lookup("positive") is MISSING
+
+        assert cache.current_bytes == 0
+
+    def test_invalidate(self):
+        """Test that invalidate drops the entry and its bytes."""
+        cache = make_cache()
+        cache.set("key", "value")
+        cache.invalidate("key")
+
+        assert cache.lookup("key") is MISSING
+        assert cache.current_bytes == 0
+
+
+class TestEviction:
+    """Tests for the byte budget and LRU eviction."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted first."""
+        entry_size = 100 + ENTRY_OVERHEAD_BYTES
+        cache = make_cache(max_bytes=entry_size * 2)
+        cache.set("a", "x" * 100)
+        cache.set("b", "x" * 100)
+        cache.lookup("a")  # a is now most recently used
+        cache.set("c", "x" * 100)
+
+        assert cache.lookup("b") is MISSING
+        assert cache.lookup("a") is not MISSING
+        assert cache.lookup("c") is not MISSING
+        assert cache.evictions == 1
+        assert cache.current_bytes <= cache.max_bytes
+
+    def test_oversized_value_not_cached(self):
+        """Test that a value larger than the budget is not stored."""
+        cache = make_cache(max_bytes=256)
+        cache.set("big", "x" * 1000)
+
+        assert cache.lookup("big") is MISSING
+        assert cache.current_bytes == 0
+
+    def test_replacing_entry_updates_bytes(self):
+        """Test that overwriting a key does not double count its size."""
+        cache = make_cache()
+        cache.set("key", "x" * 100)
+        cache.set("key", "x" * 10)
+
+        assert cache.current_bytes == 10 + ENTRY_OVERHEAD_BYTES
+
+
+class TestGetOrLoad:
+    """Tests for get_or_load single-flight loading."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        """Test that concurrent lookups for one key run the loader once."""
+        cache = make_cache()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"lyrics": "shared"}
+
+        results = await asyncio.gather(*[cache.get_or_load("key", loader) for _ in range(50)])
+
+        assert calls == 1
+        assert all(r == {"lyrics": "shared"} for r in results)
+        assert cache.loads == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_result_is_negatively_cached(self):
+        """Test that a loader returning None is remembered."""
+        cache = make_cache()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            return None
+
+        assert await cache.get_or_load("key", loader) is None
+        assert await cache.get_or_load("key", loader) is None
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_loader_errors_are_not_cached(self):
+        """Test that a failed load is retried on the next lookup."""
+        cache = make_cache()
+
+        async def failing():
+            raise RuntimeError("backend down")
+
+        async def working():
+            return "value"
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("key", failing)
+        assert await cache.get_or_load("key", working) == "value"
+
+    @pytest.mark.asyncio
+    async def test_write_during_load_wins(self):
+        """Test that a value set while a load is in flight is not overwritten."""
+        cache = make_cache()
+
+        async def stale_loader():
+            cache.set("key", "fresh")
+            return "stale"
+
+        assert await cache.get_or_load("key", stale_loader) == "stale"
+        assert cache.lookup("key") == "fresh"
+
+    @pytest.mark.asyncio
+    async def test_invalidate_during_load_is_not_undone(self):
+        """Test that a load racing an invalidation does not cache its result."""
+        cache = make_cache()
+
+        async def stale_loader():
+            cache.invalidate("key")
+            return None
+
+        assert await cache.get_or_load("key", stale_loader) is None
+        assert cache.lookup("key") is MISSING
+
+        # The next load is cached as usual
+        async def loader():
+            return "value"
+
+        await cache.get_or_load("key", loader)
+        assert cache.lookup("key") == "value"
+
+    @pytest.mark.asyncio
+    async def test_hot_hit_latency(self):
+        """Micro-benchmark: a cached lookup costs microseconds."""
+        cache = make_cache()
+        cache.set("key", {"lyrics": "x" * 2000})
+
+        async def loader():
+            raise AssertionError("should not load")
+
+        iterations = 10000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await cache.get_or_load("key", loader)
+        per_lookup_us = (time.perf_counter() - start) / iterations * 1_000_000
+
+        print(f"\nL1 hit: {per_lookup_us:.2f}us per lookup")
+        assert per_lookup_us < 1000
+
+
+def test_stats_report_counters():
+    """Test that stats expose counters and hit rate."""
+    cache = make_cache()
+    cache.set("key", "value")
+    cache.lookup("key")
+    cache.lookup("other")
+
+    stats = cache.stats()
+
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["hit_rate"] == 0.5
@@ -1,14 +1,26 @@
 """Tests for rate limiter service."""
 
+import asyncio
+import threading
+import time
+
 import pytest
 from datetime import datetime, timedelta, timezone
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from fastapi import HTTPException
+from google.cloud import firestore
 
+from app.core.firebase import run_firestore
 from app.services.rate_limiter import (
-    check_rate_limit,
+    DEV_USER_ID,
+    QUOTA_CACHE_TTL_SECONDS,
+    USAGE_RETENTION_DAYS,
+    QuotaReservation,
+    commit_quota,
+    get_quota_cache,
     get_rate_limit,
-    increment_usage,
+    refund_quota,
+    reserve_song_quota,
     check_regeneration_limit,
     get_regeneration_limit,
     increment_regeneration_usage,
@@ -44,283 +56,385 @@ def next_midnight(current_time):
     return datetime(2024, 1, 16, 0, 0, 0, tzinfo=timezone.utc)
 
 
-class TestCheckRateLimit:
-    """Tests for check_rate_limit function."""
+class FakeUsageFirestore:
+    """
+    In-memory Firestore for the quota tests.
+    
+    Documents are keyed by path. Transactions hold a store-wide lock while
+    they read and buffer writes, which gives the same serialization that
+    Firestore guarantees for concurrent transactions on one document.
+    """
+    
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+        self.transactions = 0
+    
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+    
+    def transaction(self):
+        return FakeTransaction(self)
+    
+    def transactional(self, fn):
+        def run(transaction, *args):
+            with self.lock:
+                self.transactions += 1
+                result = fn(transaction, *args)
+                transaction.commit()
+            return result
+        return run
+    
+    def write(self, path, data, merge=False):
+        current = dict(self.docs.get(path, {})) if merge else {}
+        for key, value in data.items():
+            if isinstance(value, firestore.Increment):
+                value = current.get(key, 0) + value.value
+            current[key] = value
+        self.docs[path] = current
+    
+    def usage(self, user_id, day=None):
+        day = day or datetime.now(timezone.utc).date().isoformat()
+        return self.docs.get(('users', user_id, 'usage', day), {})
+
+
+class FakeCollection:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+    
+    def document(self, doc_id):
+        return FakeDocumentRef(self.store, self.path + (doc_id,))
+
+
+class FakeDocumentRef:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+    
+    def collection(self, name):
+        return FakeCollection(self.store, self.path + (name,))
+    
+    def get(self, transaction=None):
+        snapshot = MagicMock()
+        snapshot.exists = self.path in self.store.docs
+        snapshot.to_dict.return_value = dict(self.store.docs.get(self.path, {}))
+        return snapshot
+    
+    def set(self, data, merge=False):
+        self.store.write(self.path, data, merge)
+
+
+class FakeTransaction:
+    def __init__(self, store):
+        self.store = store
+        self.writes = []
+    
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref.path, data, merge))
+    
+    def commit(self):
+        for path, data, merge in self.writes:
+            self.store.write(path, data, merge)
+
+
+@pytest.fixture
+def fake_firestore():
+    """In-memory Firestore used by the rate limiter."""
+    store = FakeUsageFirestore()
+    with patch('app.services.rate_limiter.get_firestore_client', return_value=store), \
+            patch('app.services.rate_limiter.firestore.transactional', side_effect=store.transactional):
+        yield store
+
+
+class TestReserveSongQuota:
+    """Tests for reserve_song_quota function."""
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    @patch('app.services.rate_limiter.datetime')
-    async def test_new_user_creates_document(
-        self, mock_datetime, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time, next_midnight
-    ):
-        """Test that a new user document is created with initial values."""
-        mock_get_client.return_value = mock_firestore_client
-        mock_datetime.now.return_value = current_time
-        
-        # Mock non-existent user
-        mock_doc = MagicMock()
-        mock_doc.exists = False
-        mock_user_ref.get.return_value = mock_doc
+    async def test_new_user_reserves_slot(self, fake_firestore):
+        """Test that a user without usage today gets a slot counted on today's key."""
+        reservation = await reserve_song_quota("new_user_123")
+        
+        today = datetime.now(timezone.utc).date().isoformat()
+        assert reservation.user_id == "new_user_123"
+        assert reservation.day == today
+        assert fake_firestore.usage("new_user_123")['songs'] == 1
+        assert fake_firestore.transactions == 1
+    
+    @pytest.mark.asyncio
+    async def test_user_at_limit_raises_429(self, fake_firestore):
+        """Test that user at limit gets 429 error without consuming a slot."""
+        fake_firestore.write(
+            ('users', 'user_123', 'usage', datetime.now(timezone.utc).date().isoformat()),
+            {'songs': DAILY_SONG_LIMIT}
+        )
         
-        # Mock _get_next_midnight_utc
-        with patch('app.services.rate_limiter._get_next_midnight_utc', return_value=next_midnight):
-            await check_rate_limit("new_user_123")
+        with pytest.raises(HTTPException) as exc_info:
+            await reserve_song_quota("user_123")
         
-        # Verify user document was created
-        mock_user_ref.set.assert_called_once()
-        call_args = mock_user_ref.set.call_args[0][0]
-        assert call_args['songs_generated_today'] == 0
-        assert call_args['daily_limit_reset'] == next_midnight
-        assert call_args['total_songs_generated'] == 0
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.detail['error'] == 'Rate limit exceeded'
+        assert 'retry_after' in exc_info.value.detail
+        assert 'reset_time' in exc_info.value.detail
+        assert fake_firestore.usage("user_123")['songs'] == DAILY_SONG_LIMIT
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    async def test_user_within_limit_passes(
-        self, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time, next_midnight
-    ):
-        """Test that user with usage < 3 passes rate limit check."""
-        mock_get_client.return_value = mock_firestore_client
+    async def test_previous_day_usage_does_not_count(self, fake_firestore):
+        """Test that the midnight reset needs no write: yesterday's key is ignored."""
+        yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).date().isoformat()
+        fake_firestore.write(('users', 'user_123', 'usage', yesterday), {'songs': DAILY_SONG_LIMIT})
         
-        # Use a reset time in the future relative to now
-        future_reset = datetime.now(timezone.utc) + timedelta(days=1)
+        await reserve_song_quota("user_123")
         
-        # Mock existing user with 2 songs generated
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 2,
-            'daily_limit_reset': future_reset,
-            'total_songs_generated': 5
-        }
-        mock_user_ref.get.return_value = mock_doc
+        assert fake_firestore.usage("user_123")['songs'] == 1
+        assert fake_firestore.usage("user_123", yesterday)['songs'] == DAILY_SONG_LIMIT
+    
+    @pytest.mark.asyncio
+    async def test_usage_document_expires_after_retention(self, fake_firestore):
+        """Test that usage documents carry an expires_at for a TTL policy."""
+        await reserve_song_quota("user_123")
         
-        # Should not raise exception
-        await check_rate_limit("user_123")
+        expires_at = fake_firestore.usage("user_123")['expires_at']
+        assert expires_at - datetime.now(timezone.utc) > timedelta(days=USAGE_RETENTION_DAYS)
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    async def test_user_at_limit_raises_429(
-        self, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time, next_midnight
+    async def test_concurrent_reservations_do_not_overshoot(self, fake_firestore):
+        """Test that parallel reservations grant exactly DAILY_SONG_LIMIT slots."""
+        results = await asyncio.gather(
+            *[reserve_song_quota("user_123") for _ in range(20)],
+            return_exceptions=True
+        )
+        
+        granted = [r for r in results if isinstance(r, QuotaReservation)]
+        rejected = [r for r in results if isinstance(r, HTTPException)]
+        assert len(granted) == DAILY_SONG_LIMIT
+        assert len(rejected) == 20 - DAILY_SONG_LIMIT
+        assert all(e.status_code == 429 for e in rejected)
+        assert fake_firestore.usage("user_123")['songs'] == DAILY_SONG_LIMIT
+
+
+class TestParallelSongGeneration:
+    """End-to-end quota enforcement for one user generating songs in parallel."""
+    
+    @pytest.mark.asyncio
+    async def test_exactly_three_of_twenty_parallel_generations_succeed(
+        self, client, fake_firestore
     ):
-        """Test that user with 3 songs generated raises 429 error."""
-        mock_get_client.return_value = mock_firestore_client
-        
-        # Use a reset time in the future relative to now
-        future_reset = datetime.now(timezone.utc) + timedelta(days=1)
-        
-        # Mock existing user with 3 songs generated
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 3,
-            'daily_limit_reset': future_reset,
-            'total_songs_generated': 10
-        }
-        mock_user_ref.get.return_value = mock_doc
+        """Test that 20 parallel /generate calls for one user yield exactly 3 songs."""
+        from app.core.auth import get_current_user
+        from app.main import app
+        from app.services.suno_client import SunoTask
+        
+        task_ids = iter(range(100))
+        
+        async def create_song(**kwargs):
+            await asyncio.sleep(0.01)
+            return SunoTask(task_id=f"suno-task-{next(task_ids)}", estimated_time=60)
+        
+        suno_client = MagicMock()
+        suno_client.create_song = AsyncMock(side_effect=create_song)
+        app.dependency_overrides[get_current_user] = lambda: "user_123"
+        
+        try:
+            with patch('app.api.songs.check_song_cache', new_callable=AsyncMock, return_value=None), \
+                    patch('app.api.songs.store_song_task', new_callable=AsyncMock), \
+                    patch('app.api.songs.get_suno_client', return_value=suno_client), \
+                    patch.dict('os.environ', {'SUNO_API_KEY': 'test-api-key'}):
+                responses = await asyncio.gather(*[
+                    client.post(
+                        "/api/songs/generate",
+                        json={"lyrics": "Learning is a journey, not a race. " * 3, "style": "pop"},
+                    )
+                    for _ in range(20)
+                ])
+        finally:
+            app.dependency_overrides.clear()
+        
+        statuses = sorted(r.status_code for r in responses)
+        assert statuses.count(200) == 3
+        assert statuses.count(429) == 17
+        assert suno_client.create_song.await_count == 3
+        assert fake_firestore.usage("user_123")['songs'] == 3
+        assert fake_firestore.docs[('users', 'user_123')]['total_songs_generated'] == 3
+
+
+class TestCommitAndRefund:
+    """Tests for commit_quota and refund_quota functions."""
+    
+    @pytest.mark.asyncio
+    async def test_commit_records_totals_with_increment(self, fake_firestore):
+        """Test that commit adds to lifetime totals without touching today's counter."""
+        fake_firestore.write(('users', 'user_123'), {'total_songs_generated': 5})
+        reservation = await reserve_song_quota("user_123")
+        
+        await commit_quota(reservation)
+        await commit_quota(reservation)  # Settling twice is a no-op
+        
+        user = fake_firestore.docs[('users', 'user_123')]
+        assert user['total_songs_generated'] == 6
+        assert 'last_generated_at' in user
+        assert fake_firestore.usage("user_123")['songs'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_refund_returns_slot(self, fake_firestore):
+        """Test that refund gives the reserved slot back."""
+        reservation = await reserve_song_quota("user_123")
         
-        # Should raise HTTPException with 429 status
-        with pytest.raises(HTTPException) as exc_info:
-            await check_rate_limit("user_123")
+        await refund_quota(reservation)
+        await refund_quota(reservation)  # Settling twice is a no-op
         
-        assert exc_info.value.status_code == 429
-        assert 'Rate limit exceeded' in exc_info.value.detail['error']
-        assert 'retry_after' in exc_info.value.detail
+        assert fake_firestore.usage("user_123")['songs'] == 0
+        assert ('users', 'user_123') not in fake_firestore.docs
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    async def test_daily_reset_resets_counter(
-        self, mock_get_client, mock_firestore_client,
-        mock_user_ref, next_midnight
-    ):
-        """Test that counter resets when reset time has passed."""
-        mock_get_client.return_value = mock_firestore_client
-        
-        # Mock existing user with 3 songs but reset time has passed
-        # Use a time in the past so the reset will trigger
-        old_reset_time = datetime(2024, 1, 15, 0, 0, 0, tzinfo=timezone.utc)
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 3,
-            'daily_limit_reset': old_reset_time,
-            'total_songs_generated': 10
-        }
-        mock_user_ref.get.return_value = mock_doc
+    async def test_refund_applies_to_reservation_day(self, fake_firestore):
+        """Test that a refund after midnight goes to the day the slot was taken."""
+        fake_firestore.write(('users', 'user_123', 'usage', '2024-01-15'), {'songs': 2})
         
-        await check_rate_limit("user_123")
+        await refund_quota(QuotaReservation(user_id="user_123", day="2024-01-15"))
         
-        # Verify counter was reset
-        mock_user_ref.update.assert_called_once()
-        call_args = mock_user_ref.update.call_args[0][0]
-        assert call_args['songs_generated_today'] == 0
-        assert 'daily_limit_reset' in call_args
+        assert fake_firestore.usage("user_123", "2024-01-15")['songs'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_refund_errors_are_logged_not_raised(self):
+        """Test that a failing refund never masks the original error."""
+        with patch('app.services.rate_limiter.get_firestore_client', side_effect=Exception("down")):
+            await refund_quota(QuotaReservation(user_id="user_123", day="2024-01-15"))
+    
+    @pytest.mark.asyncio
+    async def test_dev_user_bypasses_quota(self, fake_firestore):
+        """Test that the development user is never counted."""
+        with patch('app.services.rate_limiter.IS_DEVELOPMENT', True):
+            reservation = await reserve_song_quota(DEV_USER_ID)
+            await commit_quota(reservation)
+        
+        assert reservation.bypass is True
+        assert fake_firestore.docs == {}
 
 
 class TestGetRateLimit:
     """Tests for get_rate_limit function."""
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    @patch('app.services.rate_limiter.datetime')
-    async def test_new_user_returns_full_quota(
-        self, mock_datetime, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time, next_midnight
-    ):
-        """Test that new user gets full quota of 3 songs."""
-        mock_get_client.return_value = mock_firestore_client
-        mock_datetime.now.return_value = current_time
-        
-        # Mock non-existent user
-        mock_doc = MagicMock()
-        mock_doc.exists = False
-        mock_user_ref.get.return_value = mock_doc
-        
-        with patch('app.services.rate_limiter._get_next_midnight_utc', return_value=next_midnight):
-            result = await get_rate_limit("new_user_123")
+    async def test_new_user_returns_full_quota(self, fake_firestore):
+        """Test that new user gets full quota of 3 songs without any write."""
+        result = await get_rate_limit("new_user_123")
         
         assert result['remaining'] == 3
-        assert result['reset_time'] == next_midnight
+        assert result['reset_time'] == _get_next_midnight_utc(datetime.now(timezone.utc))
+        assert fake_firestore.docs == {}
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    async def test_existing_user_returns_correct_remaining(
-        self, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time, next_midnight
-    ):
+    async def test_existing_user_returns_correct_remaining(self, fake_firestore):
         """Test that existing user gets correct remaining count."""
-        mock_get_client.return_value = mock_firestore_client
-        
-        # Use a reset time in the future relative to now
-        future_reset = datetime.now(timezone.utc) + timedelta(days=1)
-        
-        # Mock existing user with 1 song generated
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 1,
-            'daily_limit_reset': future_reset,
-            'total_songs_generated': 5
-        }
-        mock_user_ref.get.return_value = mock_doc
+        await reserve_song_quota("user_123")
         
         result = await get_rate_limit("user_123")
         
         assert result['remaining'] == 2
-        assert result['reset_time'] == future_reset
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    async def test_user_at_limit_returns_zero(
-        self, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time, next_midnight
-    ):
+    async def test_user_at_limit_returns_zero(self, fake_firestore):
         """Test that user at limit gets 0 remaining."""
-        mock_get_client.return_value = mock_firestore_client
-        
-        # Use a reset time in the future relative to now
-        future_reset = datetime.now(timezone.utc) + timedelta(days=1)
-        
-        # Mock existing user with 3 songs generated
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 3,
-            'daily_limit_reset': future_reset,
-            'total_songs_generated': 10
-        }
-        mock_user_ref.get.return_value = mock_doc
+        for _ in range(DAILY_SONG_LIMIT):
+            await reserve_song_quota("user_123")
         
         result = await get_rate_limit("user_123")
         
         assert result['remaining'] == 0
-        assert result['reset_time'] == future_reset
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    async def test_after_reset_returns_full_quota(
-        self, mock_get_client, mock_firestore_client,
-        mock_user_ref
-    ):
-        """Test that after reset time, user gets full quota again."""
-        mock_get_client.return_value = mock_firestore_client
-        
-        # Mock existing user with 3 songs but reset time has passed
-        # Use a time in the past so the reset will trigger
-        old_reset_time = datetime(2024, 1, 15, 0, 0, 0, tzinfo=timezone.utc)
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 3,
-            'daily_limit_reset': old_reset_time,
-            'total_songs_generated': 10
-        }
-        mock_user_ref.get.return_value = mock_doc
+    async def test_after_reset_returns_full_quota(self, fake_firestore):
+        """Test that usage from a previous day does not reduce today's quota."""
+        fake_firestore.write(('users', 'user_123', 'usage', '2024-01-15'), {'songs': 3})
         
         result = await get_rate_limit("user_123")
         
         assert result['remaining'] == 3
-        assert 'reset_time' in result
 
 
-class TestIncrementUsage:
-    """Tests for increment_usage function."""
+class TestQuotaCache:
+    """Tests for the in-process daily usage cache."""
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    @patch('app.services.rate_limiter.datetime')
-    async def test_increment_existing_user(
-        self, mock_datetime, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time
-    ):
-        """Test incrementing usage for existing user."""
-        mock_get_client.return_value = mock_firestore_client
-        mock_datetime.now.return_value = current_time
+    async def test_repeated_status_reads_hit_memory(self, fake_firestore):
+        """Test that only the first status read in the TTL goes to Firestore."""
+        fake_firestore.write(
+            ('users', 'user_123', 'usage', datetime.now(timezone.utc).date().isoformat()),
+            {'songs': 1}
+        )
+        
+        with patch('app.services.rate_limiter.run_firestore', wraps=run_firestore) as mock_run:
+            results = [await get_rate_limit("user_123") for _ in range(5)]
+        
+        assert all(r['remaining'] == 2 for r in results)
+        assert mock_run.call_count == 1
+        assert get_quota_cache().stats()['hits'] == 4
+    
+    @pytest.mark.asyncio
+    async def test_reservation_refreshes_cached_usage(self, fake_firestore):
+        """Test that status reads see this worker's reservations without a read."""
+        await get_rate_limit("user_123")
+        await reserve_song_quota("user_123")
         
-        # Mock existing user with 1 song generated
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 1,
-            'total_songs_generated': 5
-        }
-        mock_user_ref.get.return_value = mock_doc
+        with patch('app.services.rate_limiter.run_firestore', wraps=run_firestore) as mock_run:
+            result = await get_rate_limit("user_123")
         
-        await increment_usage("user_123")
+        assert result['remaining'] == 2
+        mock_run.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_refund_invalidates_cached_usage(self, fake_firestore):
+        """Test that a refund is visible to the next status read."""
+        reservation = await reserve_song_quota("user_123")
+        await refund_quota(reservation)
         
-        # Verify counters were incremented
-        mock_user_ref.update.assert_called_once()
-        call_args = mock_user_ref.update.call_args[0][0]
-        assert call_args['songs_generated_today'] == 2
-        assert call_args['total_songs_generated'] == 6
-        assert 'last_generated_at' in call_args
+        result = await get_rate_limit("user_123")
+        
+        assert result['remaining'] == 3
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    @patch('app.services.rate_limiter.datetime')
-    async def test_increment_new_user_creates_document(
-        self, mock_datetime, mock_get_client, mock_firestore_client,
-        mock_user_ref, current_time, next_midnight
-    ):
-        """Test that incrementing for new user creates document."""
-        mock_get_client.return_value = mock_firestore_client
-        mock_datetime.now.return_value = current_time
+    async def test_cached_limit_does_not_reject_after_another_workers_refund(self, fake_firestore):
+        """Test that a count cached at the limit never decides a rejection."""
+        for _ in range(DAILY_SONG_LIMIT):
+            await reserve_song_quota("user_123")
         
-        # Mock non-existent user
-        mock_doc = MagicMock()
-        mock_doc.exists = False
-        mock_user_ref.get.return_value = mock_doc
+        # Another worker refunds a slot; this worker's cache still says 3
+        fake_firestore.write(
+            ('users', 'user_123', 'usage', datetime.now(timezone.utc).date().isoformat()),
+            {'songs': DAILY_SONG_LIMIT - 1}
+        )
         
-        with patch('app.services.rate_limiter._get_next_midnight_utc', return_value=next_midnight):
-            await increment_usage("new_user_123")
+        reservation = await reserve_song_quota("user_123")
         
-        # Verify user document was created with count of 1
-        mock_user_ref.set.assert_called_once()
-        call_args = mock_user_ref.set.call_args[0][0]
-        assert call_args['songs_generated_today'] == 1
-        assert call_args['total_songs_generated'] == 1
+        assert reservation.bypass is False
+        assert fake_firestore.usage("user_123")['songs'] == DAILY_SONG_LIMIT
+        with pytest.raises(HTTPException) as exc_info:
+            await reserve_song_quota("user_123")
+        assert exc_info.value.status_code == 429
+    
+    @pytest.mark.asyncio
+    async def test_stale_entry_is_reconciled_after_ttl(self, fake_firestore):
+        """Test that usage written by another worker is picked up once the entry expires."""
+        await get_rate_limit("user_123")
+        fake_firestore.write(
+            ('users', 'user_123', 'usage', datetime.now(timezone.utc).date().isoformat()),
+            {'songs': 3}
+        )
+        
+        assert (await get_rate_limit("user_123"))['remaining'] == 3
+        
+        with patch('app.services.memory_cache.time.monotonic',
+                   return_value=time.monotonic() + QUOTA_CACHE_TTL_SECONDS + 1):
+            result = await get_rate_limit("user_123")
+        
+        assert result['remaining'] == 0
+    
+    @pytest.mark.asyncio
+    async def test_status_reads_never_write(self, fake_firestore):
+        """Test that status reads for an unknown user leave Firestore untouched."""
+        for _ in range(3):
+            await get_rate_limit("new_user_123")
+        
+        assert fake_firestore.docs == {}
 
 
 class TestGetNextMidnightUtc:
@@ -677,31 +791,15 @@ class TestSeparateCounters:
         await check_regeneration_limit("user_123")
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    async def test_song_limit_independent_of_regeneration_limit(self, mock_get_client):
+    async def test_song_limit_independent_of_regeneration_limit(self, fake_firestore):
         """Test that user at regeneration limit can still generate songs (Requirement 7.3)."""
-        mock_firestore_client = MagicMock()
-        mock_get_client.return_value = mock_firestore_client
-        mock_user_ref = MagicMock()
-        mock_firestore_client.collection.return_value.document.return_value = mock_user_ref
-        
-        # Use a reset time in the future relative to now
-        future_reset = datetime.now(timezone.utc) + timedelta(days=1)
-        
-        # Mock user who has reached regeneration limit but not song limit
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 1,  # Still has songs available
+        fake_firestore.write(('users', 'user_123'), {
             'regenerations_today': DAILY_REGENERATION_LIMIT,  # At regeneration limit
-            'daily_limit_reset': future_reset,
-            'total_songs_generated': 10,
-            'total_regenerations': 100
-        }
-        mock_user_ref.get.return_value = mock_doc
+            'daily_limit_reset': datetime.now(timezone.utc) + timedelta(days=1),
+        })
         
         # Should NOT raise exception - user can still generate songs
-        await check_rate_limit("user_123")
+        await reserve_song_quota("user_123")
     
     @pytest.mark.asyncio
     @patch('app.services.rate_limiter.get_firestore_client')
@@ -738,36 +836,12 @@ class TestSeparateCounters:
         assert 'songs_generated_today' not in call_args  # Song counter should not be touched
     
     @pytest.mark.asyncio
-    @patch('app.services.rate_limiter.get_firestore_client')
-    @patch('app.services.rate_limiter.datetime')
-    async def test_increment_song_does_not_affect_regeneration_counter(
-        self, mock_datetime, mock_get_client
-    ):
-        """Test that incrementing song counter doesn't touch regeneration counter."""
-        mock_firestore_client = MagicMock()
-        mock_get_client.return_value = mock_firestore_client
-        mock_user_ref = MagicMock()
-        mock_firestore_client.collection.return_value.document.return_value = mock_user_ref
+    async def test_increment_song_does_not_affect_regeneration_counter(self, fake_firestore):
+        """Test that committing a song doesn't touch the regeneration counter."""
+        fake_firestore.write(('users', 'user_123'), {'regenerations_today': 5})
         
-        current_time = datetime(2024, 1, 15, 14, 30, 0, tzinfo=timezone.utc)
-        mock_datetime.now.return_value = current_time
+        await commit_quota(await reserve_song_quota("user_123"))
         
-        # Mock existing user with both counters
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_doc.to_dict.return_value = {
-            'songs_generated_today': 2,
-            'regenerations_today': 5,
-            'total_songs_generated': 10,
-            'total_regenerations': 30
-        }
-        mock_user_ref.get.return_value = mock_doc
-        
-        await increment_usage("user_123")
-        
-        # Verify only song counter was incremented
-        mock_user_ref.update.assert_called_once()
-        call_args = mock_user_ref.update.call_args[0][0]
-        assert call_args['songs_generated_today'] == 3
-        assert 'regenerations_today' not in call_args  # Regeneration counter should not be touched
-
+        user = fake_firestore.docs[('users', 'user_123')]
+        assert user['regenerations_today'] == 5  # Regeneration counter should not be touched
+        assert 'regenerations' not in fake_firestore.usage("user_123")
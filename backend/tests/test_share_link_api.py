@@ -181,6 +181,63 @@ class TestGetSharedSongEndpoint:
         assert data["style"] == "pop"
         assert data["is_owner"] is False  # Shared songs are never owned
 
+    @pytest.mark.asyncio
+    async def test_shared_song_is_publicly_cacheable(self, client):
+        """Test that shared songs allow CDN caching capped by the song's expiry."""
+        current_time = datetime.now(timezone.utc)
+        song = {
+            "task_id": "song-123",
+            "lyrics": SAMPLE_LYRICS,
+            "style": "pop",
+            "status": "completed",
+            "song_url": "https://example.com/song.mp3",
+            "created_at": current_time,
+            "updated_at": current_time,
+            "expires_at": current_time + timedelta(minutes=10),
+        }
+        
+        with patch("app.api.songs.get_song_by_share_token", new_callable=AsyncMock, return_value=song), \
+                patch("app.api.songs.load_timestamped_lyrics", new_callable=AsyncMock, return_value=None) as load_mock:
+            response = await client.get("/api/songs/shared/valid-share-token")
+            revalidated = await client.get(
+                "/api/songs/shared/valid-share-token",
+                headers={"If-None-Match": response.headers["etag"]},
+            )
+        
+        assert response.status_code == 200
+        cache_control = response.headers["cache-control"]
+        assert cache_control.startswith("public, max-age=300, s-maxage=")
+        # The CDN lifetime stops at the song's expiry
+        assert 590 <= int(cache_control.rsplit("=", 1)[1]) <= 600
+        assert revalidated.status_code == 304
+        assert revalidated.headers["cache-control"].startswith("public")
+        load_mock.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_shared_song_caching_stops_at_link_expiry(self, client):
+        """Test that caches drop a shared song when its link expires before the song."""
+        current_time = datetime.now(timezone.utc)
+        song = {
+            "task_id": "song-123",
+            "lyrics": SAMPLE_LYRICS,
+            "style": "pop",
+            "status": "completed",
+            "song_url": "https://example.com/song.mp3",
+            "created_at": current_time,
+            "updated_at": current_time,
+            "expires_at": current_time + timedelta(hours=24),
+            "share_expires_at": current_time + timedelta(minutes=2),
+        }
+        
+        with patch("app.api.songs.get_song_by_share_token", new_callable=AsyncMock, return_value=song), \
+                patch("app.api.songs.load_timestamped_lyrics", new_callable=AsyncMock, return_value=None):
+            response = await client.get("/api/songs/shared/valid-share-token")
+        
+        assert response.status_code == 200
+        max_age, s_maxage = (int(part.split("=")[1]) for part in response.headers["cache-control"].split(", ")[1:])
+        assert 110 <= max_age <= 120
+        assert 110 <= s_maxage <= 120
+
     @pytest.mark.asyncio
     async def test_get_shared_song_not_found(self, client):
         """Test 404 response when share token doesn't exist."""
@@ -0,0 +1,77 @@
+"""Tests for single-flight execution."""
+
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight.do."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_run(self):
+        """Test that concurrent calls for one key run the function once."""
+        group = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return "result"
+
+        results = await asyncio.gather(*[group.do("key", work) for _ in range(50)])
+
+        assert calls == 1
+        assert results == ["result"] * 50
+        assert group.stats()["shared"] == 49
+        assert not group.is_running("key")
+
+    @pytest.mark.asyncio
+    async def test_results_are_not_cached(self):
+        """Test that a finished run is not reused by later calls."""
+        group = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await group.do("key", work) == 1
+        assert await group.do("key", work) == 2
+
+    @pytest.mark.asyncio
+    async def test_distinct_keys_run_separately(self):
+        """Test that different keys do not share a run."""
+        group = SingleFlight("test")
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            group.do("a", lambda: work("a")),
+            group.do("b", lambda: work("b")),
+        )
+
+        assert results == ["a", "b"]
+        assert group.runs == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_run(self):
+        """Test that one waiter going away leaves the run for the others."""
+        group = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.create_task(group.do("key", work))
+        second = asyncio.create_task(group.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == "done"
@@ -10,7 +10,7 @@ Requirements: 8.1, 8.2, 8.3
 """
 
 from datetime import datetime, timedelta, timezone
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, call, patch
 
 import pytest
 from httpx import AsyncClient, ASGITransport
@@ -219,3 +219,193 @@ class TestGetSongDetailsEndpoint:
         
         # Should fail with 401 or 403
         assert response.status_code in [401, 403]
+
+
+class TestSongDetailsTimestamps:
+    """Tests for lazily loaded timestamped lyrics on the details endpoint."""
+
+    @staticmethod
+    def _song(**overrides):
+        current_time = datetime.now(timezone.utc)
+        song = {
+            "user_id": TEST_USER_ID,
+            "task_id": "song-123",
+            "lyrics": SAMPLE_LYRICS,
+            "style": "pop",
+            "status": "completed",
+            "progress": 100,
+            "song_url": "https://example.com/song.mp3",
+            "created_at": current_time,
+            "expires_at": current_time + timedelta(hours=24),
+            "primary_variation_index": 1,
+            "has_timestamps": True,
+            "timestamp_variations": [0, 1],
+        }
+        song.update(overrides)
+        return song
+
+    @pytest.mark.asyncio
+    async def test_details_load_primary_variation_timestamps(self, client):
+        """Test that details read the song without timestamps and load the primary variation's."""
+        from app.core.auth import get_current_user
+        from app.services.song_storage import TASK_DETAILS_FIELDS
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        
+        words = [{"word": "Learning", "startS": 0.0, "endS": 0.5, "success": True, "palign": 0}]
+        song = self._song()
+        
+        with patch("app.api.songs.get_task_from_firestore", new_callable=AsyncMock, return_value=song) as firestore_mock, \
+                patch("app.api.songs.load_timestamped_lyrics", new_callable=AsyncMock) as load_mock:
+            load_mock.return_value = {"aligned_words": words, "waveform_data": [0.5]}
+            
+            response = await client.get("/api/songs/song-123/details")
+        
+        app.dependency_overrides.clear()
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["aligned_words"] == words
+        assert data["waveform_data"] == [0.5]
+        assert data["has_timestamps"] is True
+        firestore_mock.assert_awaited_once_with("song-123", fields=TASK_DETAILS_FIELDS)
+        load_mock.assert_awaited_once_with("song-123", 1, song)
+
+    @pytest.mark.asyncio
+    async def test_cached_song_uses_source_task_timestamps(self, client):
+        """Test that a song served from the song cache shows its source task's timestamps."""
+        from app.core.auth import get_current_user
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        
+        song = self._song(source_task_id="suno-task-1", primary_variation_index=0)
+        
+        with patch("app.api.songs.get_task_from_firestore", new_callable=AsyncMock, return_value=song), \
+                patch("app.api.songs.load_timestamped_lyrics", new_callable=AsyncMock, return_value=None) as load_mock:
+            response = await client.get("/api/songs/song-123/details")
+        
+        app.dependency_overrides.clear()
+        
+        assert response.status_code == 200
+        assert response.json()["has_timestamps"] is False
+        # Then the clone's own, stored once the source task has expired
+        assert load_mock.await_args_list == [call("suno-task-1", 0, None), call("song-123", 0, song)]
+
+    @pytest.mark.asyncio
+    async def test_timestamp_load_failure_does_not_fail_details(self, client):
+        """Test that details are still returned when timestamps cannot be loaded."""
+        from app.core.auth import get_current_user
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        
+        with patch("app.api.songs.get_task_from_firestore", new_callable=AsyncMock, return_value=self._song()), \
+                patch("app.api.songs.load_timestamped_lyrics", new_callable=AsyncMock, side_effect=Exception("down")):
+            response = await client.get("/api/songs/song-123/details")
+        
+        app.dependency_overrides.clear()
+        
+        assert response.status_code == 200
+        assert response.json()["aligned_words"] is None
+
+
+class TestSongDetailsConditionalGet:
+    """Tests for ETag and If-None-Match handling on the details endpoint."""
+
+    @staticmethod
+    def _song(**overrides):
+        overrides.setdefault("updated_at", datetime(2024, 1, 15, tzinfo=timezone.utc))
+        return TestSongDetailsTimestamps._song(**overrides)
+
+    async def _get(self, client, song, headers=None):
+        from app.core.auth import get_current_user
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        try:
+            with patch("app.api.songs.get_task_from_firestore", new_callable=AsyncMock, return_value=song), \
+                    patch("app.api.songs.load_timestamped_lyrics", new_callable=AsyncMock, return_value=None) as load_mock:
+                response = await client.get("/api/songs/song-123/details", headers=headers or {})
+        finally:
+            app.dependency_overrides.clear()
+        return response, load_mock
+
+    @pytest.mark.asyncio
+    async def test_details_carry_etag_and_private_caching(self, client):
+        """Test that details responses have an ETag and per-user caching headers."""
+        response, _ = await self._get(client, self._song())
+        
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('"')
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert response.headers["vary"] == "Authorization"
+
+    @pytest.mark.asyncio
+    async def test_matching_if_none_match_returns_304(self, client):
+        """Test that a current client copy gets 304 without loading timestamps."""
+        first, _ = await self._get(client, self._song())
+        etag = first.headers["etag"]
+        
+        response, load_mock = await self._get(client, self._song(), {"If-None-Match": f'W/{etag}, "other"'})
+        
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        load_mock.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_changed_song_gets_new_etag(self, client):
+        """Test that updates to the song invalidate the client's ETag."""
+        first, _ = await self._get(client, self._song())
+        
+        updated = self._song(updated_at=datetime(2024, 1, 16, tzinfo=timezone.utc))
+        response, _ = await self._get(client, updated, {"If-None-Match": first.headers["etag"]})
+        
+        assert response.status_code == 200
+        assert response.headers["etag"] != first.headers["etag"]
+
+    @pytest.mark.asyncio
+    async def test_expired_song_is_not_revalidated(self, client):
+        """Test that an expired song returns 410 even for a matching ETag."""
+        first, _ = await self._get(client, self._song())
+        expired = self._song(expires_at=datetime.now(timezone.utc) - timedelta(hours=1))
+        
+        response, _ = await self._get(client, expired, {"If-None-Match": first.headers["etag"]})
+        
+        assert response.status_code == 410
+
+
+class TestSongDetailsCache:
+    """Tests for details prebuilt for cached songs."""
+
+    async def _get(self, client, song, timestamps):
+        from app.core.auth import get_current_user
+        from app.services.song_storage import get_song_cache
+        get_song_cache().set("song-123", {"doc": song, "details": None})
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        try:
+            with patch("app.services.song_storage.get_firestore_client") as firestore_mock, \
+                    patch("app.api.songs.load_timestamped_lyrics", new_callable=AsyncMock, return_value=timestamps) as load_mock:
+                first = await client.get("/api/songs/song-123/details")
+                second = await client.get("/api/songs/song-123/details")
+        finally:
+            app.dependency_overrides.clear()
+        firestore_mock.assert_not_called()
+        return first, second, load_mock
+
+    @pytest.mark.asyncio
+    async def test_cached_song_details_are_built_once(self, client):
+        """Test that repeated views of a cached song reuse its prebuilt details."""
+        words = [{"word": "Learning", "startS": 0.0, "endS": 0.5, "success": True, "palign": 0}]
+        song = TestSongDetailsConditionalGet._song()
+        
+        first, second, load_mock = await self._get(client, song, {"aligned_words": words, "waveform_data": [0.5]})
+        
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert second.json()["aligned_words"] == words
+        load_mock.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_details_without_timestamps_are_not_cached(self, client):
+        """Test that details are rebuilt until the song's timestamps are available."""
+        song = TestSongDetailsConditionalGet._song(primary_variation_index=0)
+        
+        first, second, load_mock = await self._get(client, song, None)
+        
+        assert second.json()["has_timestamps"] is False
+        assert load_mock.await_count == 2
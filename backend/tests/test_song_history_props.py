@@ -129,8 +129,8 @@ class TestSongHistoryOrdering:
             ordered_songs.append(song)
         
         # Mock Firestore to return songs already ordered (as get_user_tasks does)
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = ordered_songs
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = (ordered_songs, None)
             
             from app.api.songs import get_song_history
             
@@ -200,8 +200,8 @@ class TestSongHistoryExpirationFiltering:
             mixed_songs.append(song)
         
         # Mock Firestore to return mixed songs
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = mixed_songs
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = (mixed_songs, None)
             
             from app.api.songs import get_song_history
             
@@ -254,8 +254,8 @@ class TestSongHistoryResponseCompleteness:
             songs.append(song)
         
         # Mock Firestore to return songs
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = songs
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = (songs, None)
             
             from app.api.songs import get_song_history
             
@@ -325,8 +325,8 @@ class TestSongHistoryLimit:
             songs.append(song)
         
         # Mock Firestore to return all songs
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = songs[:limit]  # Return up to limit songs
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = (songs[:limit], None)  # Return up to limit songs
             
             from app.api.songs import get_song_history
             
@@ -349,8 +349,8 @@ class TestSongHistoryEmptyResponse:
         Test that a user with no songs gets an empty list.
         """
         # Arrange
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = []
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = ([], None)
             
             from app.api.songs import get_song_history
             
@@ -398,8 +398,8 @@ class TestSongHistoryWithoutAudio:
         ]
         
         # Mock Firestore to return both songs
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = songs
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = (songs, None)
             
             from app.api.songs import get_song_history
             
@@ -438,8 +438,8 @@ class TestSongHistoryVariationDetection:
         }
         
         # Mock Firestore
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = [song]
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = ([song], None)
             
             from app.api.songs import get_song_history
             
@@ -471,8 +471,8 @@ class TestSongHistoryVariationDetection:
         }
         
         # Mock Firestore
-        with patch('app.services.song_storage.get_user_tasks', new_callable=AsyncMock) as mock_get_tasks:
-            mock_get_tasks.return_value = [song]
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = ([song], None)
             
             from app.api.songs import get_song_history
             
@@ -482,3 +482,69 @@ class TestSongHistoryVariationDetection:
         # Assert
         assert len(result) == 1
         assert result[0].has_variations is False
+
+
+class TestSongHistoryPagination:
+    """Tests for cursor pagination of the history endpoint."""
+
+    @pytest.fixture
+    def authenticated(self):
+        """Authenticate requests as test-user."""
+        from app.core.auth import get_current_user
+        from app.main import app
+        
+        app.dependency_overrides[get_current_user] = lambda: "test-user"
+        yield
+        app.dependency_overrides.clear()
+
+    @pytest.mark.asyncio
+    async def test_next_cursor_returned_in_header(self, client, authenticated):
+        """Test that the next page's cursor is sent in X-Next-Cursor and passed back."""
+        now = datetime.now(timezone.utc)
+        song = {
+            "task_id": "song-1",
+            "style": "pop",
+            "created_at": now - timedelta(hours=1),
+            "expires_at": now + timedelta(hours=47),
+            "lyrics": "Test lyrics",
+            "song_url": "https://example.com/song.mp3",
+        }
+        
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = ([song], "next-page")
+            
+            response = await client.get("/api/songs/history?limit=1&cursor=this-page")
+        
+        assert response.status_code == 200
+        assert response.headers["X-Next-Cursor"] == "next-page"
+        mock_get_tasks.assert_awaited_once_with("test-user", limit=1, cursor="this-page")
+
+    @pytest.mark.asyncio
+    async def test_cursor_header_readable_cross_origin(self, client, authenticated):
+        """Test that CORS exposes X-Next-Cursor to the frontend's origin."""
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = ([], "next-page")
+            
+            response = await client.get("/api/songs/history", headers={"Origin": "http://localhost:5173"})
+        
+        exposed = response.headers["Access-Control-Expose-Headers"].lower().split(", ")
+        assert "x-next-cursor" in exposed
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_cursor_header(self, client, authenticated):
+        """Test that the last page carries no X-Next-Cursor header."""
+        with patch('app.services.song_storage.get_user_song_history', new_callable=AsyncMock) as mock_get_tasks:
+            mock_get_tasks.return_value = ([], None)
+            
+            response = await client.get("/api/songs/history")
+        
+        assert response.status_code == 200
+        assert "X-Next-Cursor" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_returns_400(self, client, authenticated):
+        """Test that a malformed cursor is a client error, not a 500."""
+        response = await client.get("/api/songs/history?cursor=not-a-cursor")
+        
+        assert response.status_code == 400
+        assert response.json()["detail"]["error"] == "Invalid cursor"
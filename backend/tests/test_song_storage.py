@@ -10,7 +10,14 @@ This module tests the Firestore operations for song tasks including:
 Requirements: FR-3, Task 17.3
 """
 
+import asyncio
+import base64
+import time
+
 import pytest
+from google.cloud import firestore
+from google.cloud.firestore_v1 import _helpers
+from google.cloud.firestore_v1.types import document
 from unittest.mock import MagicMock, patch, AsyncMock
 from datetime import datetime, timezone, timedelta
 
@@ -19,13 +26,32 @@ from app.services.song_storage import (
     get_task_from_firestore,
     update_task_status,
     get_user_tasks,
+    get_user_song_history,
+    encode_history_cursor,
+    decode_history_cursor,
     verify_task_ownership,
     cleanup_expired_tasks,
+    cleanup_expired_share_links,
     extend_task_ttl,
+    create_share_link,
+    get_song_by_share_token,
+    get_share_cache,
+    get_song_cache,
+    cache_song_details,
+    get_cached_song_details,
+    update_primary_variation,
+    store_timestamped_lyrics,
     SONGS_COLLECTION,
+    SHARE_LINKS_COLLECTION,
+    MAX_BATCH_WRITES,
     ANONYMOUS_TTL_HOURS,
+    TASK_DETAILS_FIELDS,
+    TASK_HISTORY_FIELDS,
+    TASK_OWNER_FIELDS,
+    TASK_STATUS_FIELDS,
 )
-from app.models.songs import GenerateSongRequest, MusicStyle, GenerationStatus
+from app.services.memory_cache import MISSING
+from app.models.songs import GenerateSongRequest, MusicStyle, GenerationStatus, SongDetails
 
 
 # Test constants
@@ -123,6 +149,22 @@ class TestStoreSongTask:
         assert result["task_id"] == TEST_TASK_ID
         assert result["style"] == MusicStyle.POP.value
 
+    @pytest.mark.asyncio
+    async def test_store_song_task_from_cache_is_completed(self, mock_firestore, sample_request):
+        """Test that a task reusing a cached song is stored already completed."""
+        variations = [{"audio_url": "https://example.com/a.mp3", "audio_id": "a", "variation_index": 0}]
+        
+        result = await store_song_task(
+            TEST_USER_ID, "cached-1", sample_request,
+            variations=variations, source_task_id=TEST_TASK_ID,
+        )
+        
+        assert result["source_task_id"] == TEST_TASK_ID
+        assert result["status"] == GenerationStatus.COMPLETED.value
+        assert result["progress"] == 100
+        assert result["song_url"] == "https://example.com/a.mp3"
+        assert result["variations"] == variations
+
 
 class TestGetTaskFromFirestore:
     """Tests for get_task_from_firestore function."""
@@ -298,22 +340,587 @@ class TestGetUserTasks:
         mock_query.limit.assert_called_with(5)
 
 
-class TestCleanupExpiredTasks:
-    """Tests for cleanup_expired_tasks function."""
+class TestGetUserSongHistory:
+    """Tests for get_user_song_history function."""
+
+    @staticmethod
+    def _history_query(mock_firestore, docs):
+        """Chain where/order_by/start_after/limit onto one mock query."""
+        mock_query = MagicMock()
+        mock_firestore["collection"].where.return_value = mock_query
+        mock_query.where.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.start_after.return_value = mock_query
+        mock_query.select.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.stream.return_value = docs
+        return mock_query
+
+    @staticmethod
+    def _song_doc(task_id, created_at):
+        doc = MagicMock()
+        doc.id = task_id
+        doc.to_dict.return_value = {
+            "task_id": task_id,
+            "status": "completed",
+            "song_url": f"https://example.com/{task_id}.mp3",
+            "created_at": created_at,
+        }
+        return doc
 
     @pytest.mark.asyncio
-    async def test_cleanup_deletes_expired_tasks(self, mock_firestore):
-        """Test that cleanup deletes expired tasks."""
+    async def test_filters_on_server(self, mock_firestore):
+        """Test that status and expiry are filtered by the query, not in Python."""
+        mock_query = self._history_query(mock_firestore, [])
+        
+        await get_user_song_history(TEST_USER_ID)
+        
+        mock_firestore["collection"].where.assert_called_once_with("user_id", "==", TEST_USER_ID)
+        filters = [c.args for c in mock_query.where.call_args_list]
+        assert ("status", "==", GenerationStatus.COMPLETED.value) in filters
+        assert any(f[0] == "expires_at" and f[1] == ">" for f in filters)
+        assert [c.args for c in mock_query.order_by.call_args_list] == [("created_at",), ("__name__",)]
+        assert all(c.kwargs == {"direction": "DESCENDING"} for c in mock_query.order_by.call_args_list)
+        mock_query.limit.assert_called_once_with(21)
+        mock_query.start_after.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_cursor(self, mock_firestore):
+        """Test that a page shorter than the limit returns no cursor."""
+        now = datetime.now(timezone.utc)
+        self._history_query(mock_firestore, [self._song_doc("task-1", now)])
+        
+        tasks, next_cursor = await get_user_song_history(TEST_USER_ID, limit=2)
+        
+        assert [t["task_id"] for t in tasks] == ["task-1"]
+        assert next_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_full_page_returns_cursor_after_last_item(self, mock_firestore):
+        """Test that the extra document is dropped and the cursor points after the page."""
+        now = datetime.now(timezone.utc)
+        docs = [self._song_doc(f"task-{i}", now - timedelta(minutes=i)) for i in range(3)]
+        mock_query = self._history_query(mock_firestore, docs)
+        
+        tasks, next_cursor = await get_user_song_history(TEST_USER_ID, limit=2)
+        
+        assert [t["task_id"] for t in tasks] == ["task-0", "task-1"]
+        assert decode_history_cursor(next_cursor) == (now - timedelta(minutes=1), "task-1")
+        
+        await get_user_song_history(TEST_USER_ID, limit=2, cursor=next_cursor)
+        
+        mock_query.start_after.assert_called_once_with({
+            "created_at": now - timedelta(minutes=1),
+            "__name__": "task-1",
+        })
+
+    @pytest.mark.asyncio
+    async def test_cursor_separates_songs_created_together(self, mock_firestore):
+        """Test that the cursor names the last document when created_at ties."""
+        now = datetime.now(timezone.utc)
+        docs = [self._song_doc(f"task-{i}", now) for i in (3, 2, 1)]
+        self._history_query(mock_firestore, docs)
+        
+        _, next_cursor = await get_user_song_history(TEST_USER_ID, limit=2)
+        
+        assert decode_history_cursor(next_cursor) == (now, "task-2")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("cursor", [
+        "not-a-cursor",
+        # Cursors without a document ID cannot break created_at ties
+        base64.urlsafe_b64encode(b'{"created_at": "2024-01-15T12:00:00+00:00"}').decode("ascii"),
+    ])
+    async def test_invalid_cursor_raises_value_error(self, mock_firestore, cursor):
+        """Test that a malformed cursor is rejected before querying."""
+        mock_query = self._history_query(mock_firestore, [])
+        
+        with pytest.raises(ValueError):
+            await get_user_song_history(TEST_USER_ID, cursor=cursor)
+        
+        mock_query.stream.assert_not_called()
+
+    def test_cursor_round_trip(self):
+        """Test that cursors are opaque URL-safe strings that decode to the position."""
+        created_at = datetime(2024, 1, 15, 12, 30, 45, 123456, tzinfo=timezone.utc)
+        
+        cursor = encode_history_cursor(created_at, "task-1")
+        
+        assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+        assert decode_history_cursor(cursor) == (created_at, "task-1")
+
+
+class TestFieldProjections:
+    """Tests for projected reads of song documents."""
+
+    @pytest.mark.asyncio
+    async def test_store_writes_lyrics_preview(self, mock_firestore, sample_request):
+        """Test that the history preview is stored alongside the full lyrics."""
+        result = await store_song_task(TEST_USER_ID, TEST_TASK_ID, sample_request)
+        
+        assert result["lyrics_preview"] == sample_request.lyrics[:100]
+
+    @pytest.mark.asyncio
+    async def test_get_task_with_fields_projects_read(self, mock_firestore):
+        """Test that a projected read passes field_paths and still migrates the schema."""
+        mock_snapshot = MagicMock()
+        mock_snapshot.exists = True
+        mock_snapshot.to_dict.return_value = {"user_id": TEST_USER_ID, "status": "processing"}
+        mock_firestore["doc"].get.return_value = mock_snapshot
+        
+        result = await get_task_from_firestore(TEST_TASK_ID, fields=TASK_STATUS_FIELDS)
+        
+        mock_firestore["doc"].get.assert_called_once_with(field_paths=TASK_STATUS_FIELDS)
+        assert result["variations"] == []
+        assert result["primary_variation_index"] == 0
+
+    @pytest.mark.asyncio
+    async def test_verify_ownership_reads_only_owner(self, mock_firestore):
+        """Test that ownership checks download only user_id."""
+        mock_snapshot = MagicMock()
+        mock_snapshot.exists = True
+        mock_snapshot.to_dict.return_value = {"user_id": TEST_USER_ID}
+        mock_firestore["doc"].get.return_value = mock_snapshot
+        
+        assert await verify_task_ownership(TEST_TASK_ID, TEST_USER_ID) is True
+        mock_firestore["doc"].get.assert_called_once_with(field_paths=TASK_OWNER_FIELDS)
+
+    @pytest.mark.asyncio
+    async def test_get_user_tasks_with_fields_selects(self, mock_firestore):
+        """Test that get_user_tasks projects the query when fields are given."""
         mock_query = MagicMock()
         mock_firestore["collection"].where.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
         mock_query.limit.return_value = mock_query
+        mock_query.select.return_value = mock_query
+        mock_query.stream.return_value = []
         
-        # Mock expired documents
-        mock_doc1 = MagicMock()
-        mock_doc1.reference = MagicMock()
-        mock_doc2 = MagicMock()
-        mock_doc2.reference = MagicMock()
-        mock_query.stream.return_value = [mock_doc1, mock_doc2]
+        await get_user_tasks(TEST_USER_ID, fields=TASK_HISTORY_FIELDS)
+        
+        mock_query.select.assert_called_once_with(TASK_HISTORY_FIELDS)
+
+    @pytest.mark.asyncio
+    async def test_history_fills_preview_for_legacy_documents(self, mock_firestore):
+        """Test that songs stored without lyrics_preview get it from one batched read."""
+        now = datetime.now(timezone.utc)
+        new_doc = MagicMock(id="task-new")
+        new_doc.to_dict.return_value = {"task_id": "task-new", "created_at": now, "lyrics_preview": "New"}
+        old_doc = MagicMock(id="task-old")
+        old_doc.to_dict.return_value = {"task_id": "task-old", "created_at": now}
+        
+        mock_query = MagicMock()
+        mock_firestore["collection"].where.return_value = mock_query
+        mock_query.where.return_value = mock_query
+        mock_query.order_by.return_value = mock_query
+        mock_query.select.return_value = mock_query
+        mock_query.limit.return_value = mock_query
+        mock_query.stream.return_value = [new_doc, old_doc]
+        
+        lyrics_snapshot = MagicMock(id="task-old", exists=True)
+        lyrics_snapshot.to_dict.return_value = {"lyrics": "x" * 300}
+        mock_firestore["client"].get_all.return_value = [lyrics_snapshot]
+        
+        tasks, _ = await get_user_song_history(TEST_USER_ID)
+        
+        mock_query.select.assert_called_once_with(TASK_HISTORY_FIELDS)
+        assert tasks[0]["lyrics_preview"] == "New"
+        assert tasks[1]["lyrics_preview"] == "x" * 100
+        refs, = mock_firestore["client"].get_all.call_args.args
+        assert len(refs) == 1
+        assert mock_firestore["client"].get_all.call_args.kwargs == {"field_paths": ["lyrics"]}
+
+
+class TestProjectionBenchmark:
+    """Micro-benchmark of bytes and decode time saved by projected reads."""
+    
+    ITERATIONS = 200
+    
+    @staticmethod
+    def _completed_song():
+        """A completed song document of realistic size."""
+        now = datetime.now(timezone.utc)
+        lyrics = "Learning is a journey, not a race, every step we find our place\n" * 40
+        words = [
+            {"word": w, "startS": i * 0.4, "endS": i * 0.4 + 0.35, "success": True, "palign": 0}
+            for i, w in enumerate(lyrics.split()[:400])
+        ]
+        return {
+            "user_id": TEST_USER_ID,
+            "task_id": TEST_TASK_ID,
+            "content_hash": TEST_CONTENT_HASH,
+            "lyrics": lyrics,
+            "lyrics_preview": lyrics[:100],
+            "style": "pop",
+            "status": "completed",
+            "progress": 100,
+            "song_url": "https://example.com/a.mp3",
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + timedelta(hours=48),
+            "variations": [
+                {"audio_url": f"https://example.com/{i}.mp3", "audio_id": f"id-{i}", "variation_index": i}
+                for i in range(2)
+            ],
+            "primary_variation_index": 0,
+            "aligned_words": words,
+            "waveform_data": [round(0.5 + (i % 17) / 40, 4) for i in range(1000)],
+        }
+    
+    def _measure(self, data, fields=None):
+        """Wire size and decode time of a document, optionally projected."""
+        if fields is not None:
+            data = {k: v for k, v in data.items() if k in fields}
+        payload = document.Document.serialize(document.Document(fields=_helpers.encode_dict(data)))
+        
+        start = time.perf_counter()
+        for _ in range(self.ITERATIONS):
+            _helpers.decode_dict(document.Document.deserialize(payload).fields, None)
+        return len(payload), (time.perf_counter() - start) / self.ITERATIONS
+    
+    def test_projected_reads_are_smaller_and_faster(self):
+        """Compare full, status and history projections of one song."""
+        song = self._completed_song()
+        full_bytes, full_time = self._measure(song)
+        
+        print()
+        for name, fields in [
+            ("status", TASK_STATUS_FIELDS),
+            ("history", TASK_HISTORY_FIELDS),
+            ("owner", TASK_OWNER_FIELDS),
+        ]:
+            size, elapsed = self._measure(song, fields)
+            print(
+                f"{name:8s} {size:7d} B vs {full_bytes} B full "
+                f"({size / full_bytes:.1%}), decode {elapsed * 1e6:.0f} us vs {full_time * 1e6:.0f} us"
+            )
+            assert size < full_bytes / 10
+            assert elapsed < full_time
+
+
+class TestShareLinkCache:
+    """Tests for share link snapshots and the share link cache."""
+    
+    SONG = {
+        "user_id": TEST_USER_ID,
+        "task_id": TEST_TASK_ID,
+        "lyrics": TEST_LYRICS,
+        "song_url": "https://example.com/a.mp3",
+        "primary_variation_index": 0,
+    }
+    
+    @staticmethod
+    def _share_snapshot(mock_firestore, expires_at, song=None):
+        snapshot = MagicMock(exists=True)
+        snapshot.to_dict.return_value = {
+            "share_token": "token-1",
+            "song_id": TEST_TASK_ID,
+            "expires_at": expires_at,
+            **({"song": song} if song is not None else {}),
+        }
+        mock_firestore["doc"].get.return_value = snapshot
+        return snapshot
+    
+    @pytest.mark.asyncio
+    async def test_create_share_link_stores_song_snapshot(self, mock_firestore):
+        """Test that new links carry the song's details fields."""
+        song = {**self.SONG, "aligned_words": [{"word": "x"}]}
+        
+        share = await create_share_link(TEST_TASK_ID, TEST_USER_ID, song)
+        
+        stored = mock_firestore["doc"].set.call_args.args[0]
+        assert stored["song"] == {k: v for k, v in self.SONG.items() if k in TASK_DETAILS_FIELDS}
+        assert "song" not in share
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_views_share_one_read(self, mock_firestore):
+        """Test that many simultaneous views of a link cost one Firestore read."""
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        self._share_snapshot(mock_firestore, expires_at, self.SONG)
+        
+        results = await asyncio.gather(*(get_song_by_share_token("token-1") for _ in range(50)))
+        
+        assert all(result == {**self.SONG, "share_expires_at": expires_at} for result in results)
+        mock_firestore["doc"].get.assert_called_once_with()
+        
+        # Callers cannot modify the cached snapshot
+        results[0]["lyrics"] = "changed"
+        assert (await get_song_by_share_token("token-1"))["lyrics"] == TEST_LYRICS
+    
+    @pytest.mark.asyncio
+    async def test_cached_link_still_expires(self, mock_firestore):
+        """Test that a cached link is rejected once it expires."""
+        self._share_snapshot(mock_firestore, datetime.now(timezone.utc) + timedelta(milliseconds=100), self.SONG)
+        
+        assert await get_song_by_share_token("token-1") is not None
+        await asyncio.sleep(0.15)
+        
+        with pytest.raises(ValueError):
+            await get_song_by_share_token("token-1")
+        mock_firestore["doc"].get.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_unknown_tokens_are_cached_briefly(self, mock_firestore):
+        """Test that unknown tokens are remembered as missing."""
+        mock_firestore["doc"].get.return_value = MagicMock(exists=False)
+        
+        assert await get_song_by_share_token("missing") is None
+        assert await get_song_by_share_token("missing") is None
+        
+        mock_firestore["doc"].get.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_legacy_link_reads_song_and_stores_snapshot(self, mock_firestore):
+        """Test that links without a snapshot read the song and get one written back."""
+        self._share_snapshot(mock_firestore, datetime.now(timezone.utc) + timedelta(hours=1))
+        
+        with patch("app.services.song_storage.get_task_from_firestore", new=AsyncMock(return_value=self.SONG)) as get_mock:
+            result = await get_song_by_share_token("token-1")
+        
+        assert result["lyrics"] == TEST_LYRICS
+        get_mock.assert_awaited_once_with(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        mock_firestore["doc"].update.assert_called_once_with({"song": self.SONG})
+    
+    @pytest.mark.asyncio
+    async def test_primary_variation_change_refreshes_snapshots(self, mock_firestore):
+        """Test that changing the primary variation updates and evicts shared copies."""
+        self._share_snapshot(mock_firestore, datetime.now(timezone.utc) + timedelta(hours=1), self.SONG)
+        await get_song_by_share_token("token-1")
+        
+        link = MagicMock(id="token-1")
+        link.to_dict.return_value = {"song_id": TEST_TASK_ID, "song": {"task_id": TEST_TASK_ID}}
+        mock_query = MagicMock()
+        mock_firestore["collection"].where.return_value.select.return_value = mock_query
+        mock_query.stream.return_value = [link]
+        mock_batch = MagicMock()
+        mock_firestore["client"].batch.return_value = mock_batch
+        
+        assert await update_primary_variation(TEST_TASK_ID, 1) is True
+        
+        mock_firestore["collection"].where.assert_called_once_with("song_id", "==", TEST_TASK_ID)
+        ref, updates = mock_batch.update.call_args.args
+        assert ref is link.reference
+        assert updates["song.primary_variation_index"] == 1
+        assert "song.updated_at" in updates
+        mock_batch.commit.assert_called_once()
+        assert get_share_cache().lookup("token-1") is MISSING
+
+    @pytest.mark.asyncio
+    async def test_links_without_snapshot_are_not_given_a_partial_one(self, mock_firestore):
+        """Test that legacy links keep reading the whole song after a refresh."""
+        link = MagicMock(id="token-1")
+        link.to_dict.return_value = {"song_id": TEST_TASK_ID}
+        mock_query = MagicMock()
+        mock_firestore["collection"].where.return_value.select.return_value = mock_query
+        mock_query.stream.return_value = [link]
+        mock_batch = MagicMock()
+        mock_firestore["client"].batch.return_value = mock_batch
+
+        assert await update_primary_variation(TEST_TASK_ID, 1) is True
+
+        mock_batch.update.assert_not_called()
+
+        # The link still resolves to the full song
+        self._share_snapshot(mock_firestore, datetime.now(timezone.utc) + timedelta(hours=1))
+        with patch("app.services.song_storage.get_task_from_firestore", new=AsyncMock(return_value=self.SONG)):
+            assert (await get_song_by_share_token("token-1"))["lyrics"] == TEST_LYRICS
+
+
+class TestSongCache:
+    """Tests for the per-process cache of completed songs."""
+    
+    SONG = {
+        "user_id": TEST_USER_ID,
+        "task_id": TEST_TASK_ID,
+        "status": "completed",
+        "song_url": "https://example.com/a.mp3",
+        "audio_id": "audio-0",
+        "variations": [{"audio_url": "https://example.com/a.mp3", "audio_id": "audio-0", "variation_index": 0}],
+        "primary_variation_index": 0,
+        "updated_at": datetime(2024, 1, 15, tzinfo=timezone.utc),
+    }
+    
+    @staticmethod
+    def _stored(mock_firestore, song):
+        mock_firestore["doc"].get.return_value = MagicMock(exists=True, to_dict=lambda: dict(song))
+    
+    @staticmethod
+    def _details(lyrics=TEST_LYRICS):
+        return SongDetails(
+            song_id=TEST_TASK_ID,
+            song_url="https://example.com/a.mp3",
+            lyrics=lyrics,
+            style=MusicStyle.POP,
+            created_at=datetime(2024, 1, 15, tzinfo=timezone.utc),
+            expires_at=datetime(2024, 1, 17, tzinfo=timezone.utc),
+            is_owner=True,
+        )
+    
+    @pytest.mark.asyncio
+    async def test_completed_song_is_read_once(self, mock_firestore):
+        """Test that a completed song answers later projected reads from memory."""
+        self._stored(mock_firestore, self.SONG)
+        
+        first = await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        status = await get_task_from_firestore(TEST_TASK_ID, fields=TASK_STATUS_FIELDS)
+        owner = await get_task_from_firestore(TEST_TASK_ID, fields=TASK_OWNER_FIELDS)
+        
+        assert first == status == owner == self.SONG
+        mock_firestore["doc"].get.assert_called_once()
+        
+        # Callers cannot modify the cached document
+        first["status"] = "changed"
+        assert (await get_task_from_firestore(TEST_TASK_ID, fields=TASK_STATUS_FIELDS))["status"] == "completed"
+    
+    @pytest.mark.asyncio
+    async def test_full_reads_populate_but_bypass_cache(self, mock_firestore):
+        """Test that unprojected reads fill the cache and always reach Firestore."""
+        self._stored(mock_firestore, {**self.SONG, "content_hash": TEST_CONTENT_HASH})
+        
+        await get_task_from_firestore(TEST_TASK_ID)
+        full = await get_task_from_firestore(TEST_TASK_ID)
+        projected = await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        
+        assert full["content_hash"] == TEST_CONTENT_HASH
+        assert "content_hash" not in projected
+        assert mock_firestore["doc"].get.call_count == 2
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("status", ["queued", "processing"])
+    async def test_songs_in_progress_are_not_cached(self, mock_firestore, status):
+        """Test that songs still being generated are always read from Firestore."""
+        self._stored(mock_firestore, {**self.SONG, "status": status})
+        
+        await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        
+        assert mock_firestore["doc"].get.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_narrow_reads_do_not_populate(self, mock_firestore):
+        """Test that reads missing details fields are not cached."""
+        self._stored(mock_firestore, self.SONG)
+        
+        await get_task_from_firestore(TEST_TASK_ID, fields=TASK_STATUS_FIELDS)
+        
+        assert get_song_cache().lookup(TEST_TASK_ID) is MISSING
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("write", [
+        lambda: update_task_status(TEST_TASK_ID, "failed", 0, error="boom"),
+        lambda: update_primary_variation(TEST_TASK_ID, 1),
+        lambda: extend_task_ttl(TEST_TASK_ID),
+    ])
+    async def test_writes_invalidate(self, mock_firestore, write):
+        """Test that writing to a song drops it and its details from the cache."""
+        self._stored(mock_firestore, self.SONG)
+        await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        cache_song_details(TEST_TASK_ID, self.SONG, self._details())
+        
+        with patch("app.services.song_storage._refresh_share_snapshots", new=AsyncMock()):
+            assert await write() is True
+        
+        assert get_cached_song_details(TEST_TASK_ID) is None
+        await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        assert mock_firestore["doc"].get.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_read_racing_a_write_is_not_cached(self, mock_firestore):
+        """Test that a read which started before a write does not cache stale data."""
+        async def run(fn, *args, **kwargs):
+            if fn is mock_firestore["doc"].get:
+                # The song is rewritten while its old version is in flight
+                await update_task_status(TEST_TASK_ID, "completed", progress=100)
+                return MagicMock(exists=True, to_dict=lambda: dict(self.SONG))
+            return None
+        
+        with patch("app.services.song_storage.run_firestore", new=run):
+            await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        
+        assert get_song_cache().lookup(TEST_TASK_ID) is MISSING
+    
+    @pytest.mark.asyncio
+    async def test_details_only_attach_to_the_same_document(self, mock_firestore):
+        """Test that details built from an older document are not cached."""
+        self._stored(mock_firestore, self.SONG)
+        await get_task_from_firestore(TEST_TASK_ID, fields=TASK_DETAILS_FIELDS)
+        
+        older = {**self.SONG, "updated_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+        cache_song_details(TEST_TASK_ID, older, self._details("stale"))
+        assert get_cached_song_details(TEST_TASK_ID) is None
+        
+        details = self._details()
+        cache_song_details(TEST_TASK_ID, self.SONG, details)
+        assert get_cached_song_details(TEST_TASK_ID) is details
+
+
+class TestCacheCloneTimestamps:
+    """Tests for passing a source song's timestamps on to its cache clones."""
+
+    WORDS = [{"word": "a", "startS": 0.0, "endS": 1.0, "success": True, "palign": 0.5}]
+
+    @pytest.mark.asyncio
+    async def test_source_timestamps_update_clones(self, mock_firestore):
+        """Test that clones get the source's timestamp fields and a new updated_at."""
+        clone = MagicMock(id="clone-1", reference=MagicMock())
+        mock_query = MagicMock()
+        mock_firestore["collection"].where.return_value = mock_query
+        mock_query.select.return_value = mock_query
+        mock_query.stream.return_value = [clone]
+        batches = []
+        mock_firestore["client"].batch.side_effect = lambda: batches.append(MagicMock()) or batches[-1]
+        get_song_cache().set("clone-1", {"doc": {"status": "completed"}, "details": None})
+        
+        with patch("app.services.song_storage._refresh_share_snapshots", new=AsyncMock()) as refresh:
+            assert await store_timestamped_lyrics(TEST_TASK_ID, self.WORDS, [0.5], 1) is True
+        
+        mock_firestore["collection"].where.assert_called_once_with("source_task_id", "==", TEST_TASK_ID)
+        reference, update = batches[1].update.call_args.args
+        assert reference is clone.reference
+        assert update["timestamp_variations"] == firestore.ArrayUnion([1])
+        assert update["has_timestamps"] is True
+        assert isinstance(update["updated_at"], datetime)
+        assert get_song_cache().lookup("clone-1") is MISSING
+        refresh.assert_any_await("clone-1", update)
+
+    @pytest.mark.asyncio
+    async def test_clone_failures_do_not_fail_the_store(self, mock_firestore):
+        """Test that the source's timestamps are stored even if clones cannot be updated."""
+        mock_firestore["collection"].where.side_effect = Exception("Firestore unavailable")
+        
+        with patch("app.services.song_storage._refresh_share_snapshots", new=AsyncMock()):
+            assert await store_timestamped_lyrics(TEST_TASK_ID, self.WORDS) is True
+
+
+def expired_query(mock_firestore, pages, share_links=()):
+    """
+    Make the collection's expired-documents query return these pages in
+    turn, and queries for the deleted songs' share links return share_links.
+    """
+    mock_query = MagicMock()
+    links_query = MagicMock()
+    mock_firestore["collection"].where.side_effect = (
+        lambda field, *args: mock_query if field == "expires_at" else links_query
+    )
+    for method in ("order_by", "select", "limit", "start_after"):
+        getattr(mock_query, method).return_value = mock_query
+    mock_query.stream.side_effect = pages
+    links_query.select.return_value.stream.return_value = list(share_links)
+    return mock_query
+
+
+def expired_docs(count, prefix="doc"):
+    """Expired document snapshots with IDs and references."""
+    return [MagicMock(id=f"{prefix}-{i}", reference=MagicMock()) for i in range(count)]
+
+
+class TestCleanupExpiredTasks:
+    """Tests for cleanup_expired_tasks function."""
+
+    @pytest.mark.asyncio
+    async def test_cleanup_deletes_expired_tasks(self, mock_firestore):
+        """Test that cleanup deletes expired tasks."""
+        expired_query(mock_firestore, [expired_docs(2)])
         
         # Mock batch
         mock_batch = MagicMock()
@@ -322,20 +929,122 @@ class TestCleanupExpiredTasks:
         result = await cleanup_expired_tasks()
         
         assert result == 2
-        assert mock_batch.delete.call_count == 2
+        # Each song and its two timestamps documents
+        assert mock_batch.delete.call_count == 6
         mock_batch.commit.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_cleanup_no_expired_tasks(self, mock_firestore):
         """Test cleanup when no tasks are expired."""
-        mock_query = MagicMock()
-        mock_firestore["collection"].where.return_value = mock_query
-        mock_query.limit.return_value = mock_query
-        mock_query.stream.return_value = []
+        expired_query(mock_firestore, [[]])
         
         result = await cleanup_expired_tasks()
         
         assert result == 0
+        mock_firestore["client"].batch.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cleanup_pages_through_large_backlogs(self, mock_firestore):
+        """Test that backlogs are deleted in batches of at most 500 writes."""
+        page_size = MAX_BATCH_WRITES // 3
+        pages = [expired_docs(page_size, "a"), expired_docs(page_size, "b"), expired_docs(7, "c")]
+        mock_query = expired_query(mock_firestore, pages)
+        batches = []
+        mock_firestore["client"].batch.side_effect = lambda: batches.append(MagicMock()) or batches[-1]
+        
+        result = await cleanup_expired_tasks()
+        
+        assert result == 2 * page_size + 7
+        assert [b.delete.call_count for b in batches] == [3 * page_size, 3 * page_size, 21]
+        assert all(b.delete.call_count <= MAX_BATCH_WRITES for b in batches)
+        mock_query.limit.assert_called_once_with(page_size)
+        # Each page starts after the last document of the previous one
+        assert [c.args[0] for c in mock_query.start_after.call_args_list] == [pages[0][-1], pages[1][-1]]
+
+    @pytest.mark.asyncio
+    async def test_cleanup_bounds_concurrent_batches(self, mock_firestore):
+        """Test that at most max_concurrency batches commit at once."""
+        page_size = MAX_BATCH_WRITES // 3
+        expired_query(mock_firestore, [expired_docs(page_size) for _ in range(5)] + [[]])
+        in_flight = 0
+        peak = 0
+        
+        async def run(fn, *args, **kwargs):
+            nonlocal in_flight, peak
+            if fn.__name__ != "commit":
+                return fn(*args, **kwargs)
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+        
+        mock_firestore["client"].batch.side_effect = lambda: MagicMock(commit=MagicMock(__name__="commit"))
+        with patch("app.services.song_storage.run_firestore", new=run):
+            result = await cleanup_expired_tasks(max_concurrency=2)
+        
+        assert result == 5 * page_size
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_skipped(self, mock_firestore):
+        """Test that a failed batch does not stop the rest of the cleanup."""
+        page_size = MAX_BATCH_WRITES // 3
+        expired_query(mock_firestore, [expired_docs(page_size, "a"), expired_docs(3, "b")])
+        failing = MagicMock()
+        failing.commit.side_effect = Exception("Firestore unavailable")
+        mock_firestore["client"].batch.side_effect = [failing, MagicMock()]
+        
+        result = await cleanup_expired_tasks()
+        
+        assert result == 3
+
+    @pytest.mark.asyncio
+    async def test_deleted_tasks_leave_the_song_cache(self, mock_firestore):
+        """Test that deleted songs are not served from the song cache."""
+        get_song_cache().set("doc-0", {"doc": {"status": "completed"}, "details": None})
+        expired_query(mock_firestore, [expired_docs(1)])
+        
+        await cleanup_expired_tasks()
+        
+        assert get_song_cache().lookup("doc-0") is MISSING
+
+    @pytest.mark.asyncio
+    async def test_deleted_tasks_take_their_share_links(self, mock_firestore):
+        """Test that share links of deleted songs are deleted, not left serving snapshots."""
+        links = expired_docs(2, "token")
+        get_share_cache().set("token-0", {"expires_at": datetime.now(timezone.utc), "song": {}})
+        expired_query(mock_firestore, [expired_docs(40)], share_links=links)
+        batches = []
+        mock_firestore["client"].batch.side_effect = lambda: batches.append(MagicMock()) or batches[-1]
+        
+        assert await cleanup_expired_tasks() == 40
+        
+        # One "in" query per 30 songs
+        in_queries = [c.args for c in mock_firestore["collection"].where.call_args_list if c.args[0] == "song_id"]
+        assert [(field, op, len(ids)) for field, op, ids in in_queries] == [("song_id", "in", 30), ("song_id", "in", 10)]
+        deleted = [c.args[0] for c in batches[-1].delete.call_args_list]
+        assert deleted == [link.reference for link in links] * 2
+        assert get_share_cache().lookup("token-0") is MISSING
+
+
+class TestCleanupExpiredShareLinks:
+    """Tests for cleanup_expired_share_links function."""
+
+    @pytest.mark.asyncio
+    async def test_cleanup_deletes_expired_links(self, mock_firestore):
+        """Test that expired links are deleted and dropped from the share cache."""
+        get_share_cache().set("token-0", {"expires_at": datetime.now(timezone.utc), "song": {}})
+        mock_query = expired_query(mock_firestore, [expired_docs(MAX_BATCH_WRITES, "token"), []])
+        batches = []
+        mock_firestore["client"].batch.side_effect = lambda: batches.append(MagicMock()) or batches[-1]
+        
+        result = await cleanup_expired_share_links()
+        
+        assert result == MAX_BATCH_WRITES
+        assert batches[0].delete.call_count == MAX_BATCH_WRITES
+        mock_firestore["client"].collection.assert_called_with(SHARE_LINKS_COLLECTION)
+        mock_query.limit.assert_called_once_with(MAX_BATCH_WRITES)
+        assert get_share_cache().lookup("token-0") is MISSING
 
 
 class TestExtendTaskTTL:
@@ -380,3 +1089,12 @@ class TestExtendTaskTTL:
         expected_expiry = before_extend + timedelta(hours=ANONYMOUS_TTL_HOURS)
         actual_expiry = update_data["expires_at"]
         assert abs((actual_expiry - expected_expiry).total_seconds()) < 5
+
+    @pytest.mark.asyncio
+    async def test_extend_ttl_refreshes_share_snapshots(self, mock_firestore):
+        """Test that share links of an extended song get its new expiry."""
+        with patch("app.services.song_storage._refresh_share_snapshots", new=AsyncMock()) as refresh:
+            assert await extend_task_ttl(TEST_TASK_ID) is True
+        
+        update_data = mock_firestore["doc"].update.call_args[0][0]
+        refresh.assert_awaited_once_with(TEST_TASK_ID, update_data)
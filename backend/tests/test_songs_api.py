@@ -9,6 +9,8 @@ This module tests the song generation and status endpoints including:
 Requirements: FR-3
 """
 
+import asyncio
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from httpx import AsyncClient, ASGITransport
@@ -16,12 +18,16 @@ from fastapi import HTTPException
 
 from app.main import app
 from app.models.songs import MusicStyle, GenerationStatus
+from app.services.rate_limiter import QuotaReservation
 from app.services.suno_client import (
     SunoTask,
     SunoStatus,
+    SongVariation as SunoSongVariation,
     SunoAPIError,
     SunoRateLimitError,
     SunoValidationError,
+    AlignedWord,
+    TimestampedLyrics,
 )
 
 
@@ -51,16 +57,20 @@ def mock_auth():
 
 @pytest.fixture
 def mock_rate_limit():
-    """Mock rate limiter to allow requests."""
-    with patch("app.api.songs.check_rate_limit", new_callable=AsyncMock) as mock:
-        mock.return_value = None
-        yield mock
+    """Mock quota reservation to allow requests."""
+    with patch("app.api.songs.reserve_song_quota", new_callable=AsyncMock) as reserve_mock:
+        with patch("app.api.songs.refund_quota", new_callable=AsyncMock) as refund_mock:
+            reserve_mock.return_value = QuotaReservation(user_id=TEST_USER_ID, day="2024-01-15")
+            yield {
+                "reserve": reserve_mock,
+                "refund": refund_mock,
+            }
 
 
 @pytest.fixture
-def mock_increment_usage():
-    """Mock increment usage function."""
-    with patch("app.api.songs.increment_usage", new_callable=AsyncMock) as mock:
+def mock_commit_quota():
+    """Mock quota commit function."""
+    with patch("app.api.songs.commit_quota", new_callable=AsyncMock) as mock:
         mock.return_value = None
         yield mock
 
@@ -78,24 +88,20 @@ def mock_firestore():
     """Mock Firestore operations via song_storage module."""
     with patch("app.api.songs.store_song_task", new_callable=AsyncMock) as store_mock:
         with patch("app.api.songs.get_task_from_firestore", new_callable=AsyncMock) as get_mock:
-            with patch("app.api.songs.update_task_status", new_callable=AsyncMock) as update_mock:
-                store_mock.return_value = {"task_id": "test-task"}
-                get_mock.return_value = None
-                update_mock.return_value = True
-                yield {
-                    "store": store_mock,
-                    "get": get_mock,
-                    "update": update_mock,
-                }
+            store_mock.return_value = {"task_id": "test-task"}
+            get_mock.return_value = None
+            yield {
+                "store": store_mock,
+                "get": get_mock,
+            }
 
 
 @pytest.fixture
 def mock_suno_client():
-    """Mock Suno API client."""
-    with patch("app.api.songs.SunoClient") as mock_class:
+    """Mock the shared Suno API client."""
+    with patch("app.api.songs.get_suno_client") as mock_get_client:
         mock_instance = AsyncMock()
-        mock_class.return_value.__aenter__.return_value = mock_instance
-        mock_class.return_value.__aexit__.return_value = None
+        mock_get_client.return_value = mock_instance
         
         # Default successful response
         mock_instance.create_song.return_value = SunoTask(
@@ -135,7 +141,7 @@ class TestGenerateSongEndpoint:
         client,
         mock_auth,
         mock_rate_limit,
-        mock_increment_usage,
+        mock_commit_quota,
         mock_song_cache,
         mock_firestore,
         mock_suno_client,
@@ -171,17 +177,25 @@ class TestGenerateSongEndpoint:
         client,
         mock_auth,
         mock_rate_limit,
+        mock_commit_quota,
         mock_firestore,
+        mock_suno_client,
     ):
-        """Test song generation returns cached result when available."""
+        """Test song generation returns a completed cached song when available."""
         from app.core.auth import get_current_user
         app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        mock_firestore["store"].return_value = {"song_url": "https://example.com/song.mp3"}
+        variations = [
+            {"audio_url": "https://example.com/song.mp3", "audio_id": "audio-0", "variation_index": 0},
+            {"audio_url": "https://example.com/song-1.mp3", "audio_id": "audio-1", "variation_index": 1},
+        ]
         
         # Mock cache to return a hit
         with patch("app.api.songs.check_song_cache", new_callable=AsyncMock) as cache_mock:
             cache_mock.return_value = {
                 "task_id": "cached-task-456",
                 "song_url": "https://example.com/song.mp3",
+                "variations": variations,
                 "estimated_time": 0,
                 "cached": True
             }
@@ -201,8 +215,81 @@ class TestGenerateSongEndpoint:
         
         assert response.status_code == 200
         data = response.json()
-        assert data["task_id"] == "cached-task-456"
         assert data["estimated_time"] == 0  # Instant from cache
+        assert data["task_id"].startswith("cached-")
+        assert data["status"]["task_id"] == data["task_id"]
+        assert data["status"]["status"] == "completed"
+        assert data["status"]["progress"] == 100
+        assert data["status"]["variations"] == variations
+        
+        # The user gets their own completed task pointing at the cached one
+        store_kwargs = mock_firestore["store"].call_args.kwargs
+        assert store_kwargs["source_task_id"] == "cached-task-456"
+        assert store_kwargs["variations"] == variations
+        mock_suno_client.create_song.assert_not_called()
+        mock_commit_quota.assert_not_called()
+        mock_rate_limit["refund"].assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_generate_song_checks_cache_without_content_hash(
+        self,
+        client,
+        mock_auth,
+        mock_rate_limit,
+        mock_commit_quota,
+        mock_song_cache,
+        mock_firestore,
+        mock_suno_client,
+    ):
+        """Test that the cache is looked up by lyrics when no content_hash is sent."""
+        from app.core.auth import get_current_user
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        
+        with patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
+            response = await client.post(
+                "/api/songs/generate",
+                json={"lyrics": SAMPLE_LYRICS, "style": "pop"},
+                headers={"Authorization": "Bearer test-token"}
+            )
+        
+        app.dependency_overrides.clear()
+        
+        assert response.status_code == 200
+        mock_song_cache.assert_called_once_with(None, "pop", lyrics=SAMPLE_LYRICS)
+
+    @pytest.mark.asyncio
+    async def test_generate_song_ignores_cache_entry_without_variations(
+        self,
+        client,
+        mock_auth,
+        mock_rate_limit,
+        mock_commit_quota,
+        mock_song_cache,
+        mock_firestore,
+        mock_suno_client,
+    ):
+        """Test that legacy cache entries without variations fall through to Suno."""
+        from app.core.auth import get_current_user
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        mock_song_cache.return_value = {
+            "task_id": "cached-task-456",
+            "song_url": "https://example.com/song.mp3",
+            "variations": [],
+            "cached": True
+        }
+        
+        with patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
+            response = await client.post(
+                "/api/songs/generate",
+                json={"lyrics": SAMPLE_LYRICS, "style": "pop", "content_hash": "abc123"},
+                headers={"Authorization": "Bearer test-token"}
+            )
+        
+        app.dependency_overrides.clear()
+        
+        assert response.status_code == 200
+        assert response.json()["task_id"] == "suno-task-123"
+        mock_suno_client.create_song.assert_called_once()
 
     @pytest.mark.asyncio
     async def test_generate_song_rate_limit_exceeded(
@@ -216,7 +303,7 @@ class TestGenerateSongEndpoint:
         app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
         
         # Mock rate limit to raise exception
-        with patch("app.api.songs.check_rate_limit", new_callable=AsyncMock) as rate_mock:
+        with patch("app.api.songs.reserve_song_quota", new_callable=AsyncMock) as rate_mock:
             rate_mock.side_effect = HTTPException(
                 status_code=429,
                 detail={
@@ -292,10 +379,9 @@ class TestGenerateSongEndpoint:
         from app.core.auth import get_current_user
         app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
         
-        with patch("app.api.songs.SunoClient") as mock_class:
+        with patch("app.api.songs.get_suno_client") as mock_get_client:
             mock_instance = AsyncMock()
-            mock_class.return_value.__aenter__.return_value = mock_instance
-            mock_class.return_value.__aexit__.return_value = None
+            mock_get_client.return_value = mock_instance
             mock_instance.create_song.side_effect = SunoAPIError(
                 "API error", status_code=500
             )
@@ -315,6 +401,9 @@ class TestGenerateSongEndpoint:
         assert response.status_code == 500
         data = response.json()
         assert "Generation failed" in str(data)
+        
+        # The reserved slot is given back when no task was started
+        mock_rate_limit["refund"].assert_called_once_with(mock_rate_limit["reserve"].return_value)
 
     @pytest.mark.asyncio
     async def test_generate_song_suno_validation_error(
@@ -329,10 +418,9 @@ class TestGenerateSongEndpoint:
         from app.core.auth import get_current_user
         app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
         
-        with patch("app.api.songs.SunoClient") as mock_class:
+        with patch("app.api.songs.get_suno_client") as mock_get_client:
             mock_instance = AsyncMock()
-            mock_class.return_value.__aenter__.return_value = mock_instance
-            mock_class.return_value.__aexit__.return_value = None
+            mock_get_client.return_value = mock_instance
             mock_instance.create_song.side_effect = SunoValidationError(
                 "Invalid lyrics content"
             )
@@ -413,24 +501,23 @@ class TestGetSongStatusEndpoint:
                 "error": None
             }
             
-            # Mock Suno client
-            with patch("app.api.songs.SunoClient") as mock_class:
-                mock_instance = AsyncMock()
-                mock_class.return_value.__aenter__.return_value = mock_instance
-                mock_class.return_value.__aexit__.return_value = None
-                mock_instance.get_task_status.return_value = SunoStatus(
+            # Mock shared Suno poller
+            with patch("app.api.songs.get_suno_poller") as mock_get_poller:
+                mock_poller = mock_get_poller.return_value
+                mock_poller.get_status = AsyncMock(return_value=SunoStatus(
                     status="GENERATING",
                     progress=60,
                     song_url=None,
                     error=None
-                )
+                ))
+                
+                with patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
+                    response = await client.get(
+                        "/api/songs/task-123",
+                        headers={"Authorization": "Bearer test-token"}
+                    )
                 
-                with patch("app.api.songs.update_task_status", new_callable=AsyncMock):
-                    with patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
-                        response = await client.get(
-                            "/api/songs/task-123",
-                            headers={"Authorization": "Bearer test-token"}
-                        )
+                mock_poller.get_status.assert_awaited_once_with("task-123")
         
         app.dependency_overrides.clear()
         
@@ -550,13 +637,10 @@ class TestGetSongStatusEndpoint:
                 "error": None
             }
             
-            # Mock Suno client to raise error
-            with patch("app.api.songs.SunoClient") as mock_class:
-                mock_instance = AsyncMock()
-                mock_class.return_value.__aenter__.return_value = mock_instance
-                mock_class.return_value.__aexit__.return_value = None
-                mock_instance.get_task_status.side_effect = SunoAPIError(
-                    "API error", status_code=500
+            # Mock shared Suno poller to raise error
+            with patch("app.api.songs.get_suno_poller") as mock_get_poller:
+                mock_get_poller.return_value.get_status = AsyncMock(
+                    side_effect=SunoAPIError("API error", status_code=500)
                 )
                 
                 with patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
@@ -574,10 +658,277 @@ class TestGetSongStatusEndpoint:
         assert data["progress"] == 50
 
 
+# ============================================================================
+# Song Cache Population Tests
+# ============================================================================
+
+class TestCacheCompletedSong:
+    """Tests for the poller listener that populates the song cache."""
+
+    @staticmethod
+    def _completed_status():
+        return SunoStatus(
+            status="SUCCESS",
+            progress=100,
+            song_url="https://example.com/song.mp3",
+            variations=[
+                SunoSongVariation("https://example.com/song.mp3", "audio-0", 0),
+                SunoSongVariation("https://example.com/song-1.mp3", "audio-1", 1),
+            ],
+        )
+
+    def test_registered_with_poller(self):
+        """Test that the listener sees every published completion."""
+        from app.api.songs import cache_completed_song
+        from app.services.suno_poller import get_suno_poller
+        
+        assert cache_completed_song in get_suno_poller()._listeners
+
+    @pytest.mark.asyncio
+    async def test_stores_variations_and_lyrics(self, mock_firestore):
+        """Test that a completed task is cached with its full variations list."""
+        from app.api.songs import cache_completed_song
+        mock_firestore["get"].return_value = {
+            "user_id": TEST_USER_ID,
+            "content_hash": "abc123",
+            "style": "pop",
+            "lyrics": SAMPLE_LYRICS,
+        }
+        
+        with patch("app.api.songs.store_song_cache", new_callable=AsyncMock) as store_mock:
+            await cache_completed_song("suno-task-123", self._completed_status())
+        
+        store_mock.assert_called_once_with(
+            "abc123",
+            "pop",
+            "suno-task-123",
+            "https://example.com/song.mp3",
+            variations=[
+                {"audio_url": "https://example.com/song.mp3", "audio_id": "audio-0", "variation_index": 0},
+                {"audio_url": "https://example.com/song-1.mp3", "audio_id": "audio-1", "variation_index": 1},
+            ],
+            lyrics=SAMPLE_LYRICS,
+        )
+
+    @pytest.mark.asyncio
+    async def test_ignores_incomplete_and_cloned_tasks(self, mock_firestore):
+        """Test that only original, completed tasks are cached."""
+        from app.api.songs import cache_completed_song
+        mock_firestore["get"].return_value = {"source_task_id": "suno-task-123"}
+        
+        with patch("app.api.songs.store_song_cache", new_callable=AsyncMock) as store_mock:
+            await cache_completed_song(
+                "suno-task-123",
+                SunoStatus(status="GENERATING", progress=50, song_url=None),
+            )
+            await cache_completed_song("cached-abc", self._completed_status())
+        
+        store_mock.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cache_errors_are_swallowed(self, mock_firestore):
+        """Test that a failing cache write does not break the poller."""
+        from app.api.songs import cache_completed_song
+        mock_firestore["get"].return_value = {"content_hash": "abc123", "style": "pop"}
+        
+        with patch("app.api.songs.store_song_cache", new_callable=AsyncMock) as store_mock:
+            store_mock.side_effect = Exception("Firestore down")
+            await cache_completed_song("suno-task-123", self._completed_status())
+
+
 # ============================================================================
 # Health Check Endpoint Test
 # ============================================================================
 
+class TestTimestampedLyricsEndpoints:
+    """Tests for POST /api/songs/{task_id}/timestamped-lyrics[/{variation_index}]."""
+
+    SONG = {
+        "user_id": TEST_USER_ID,
+        "task_id": "task-123",
+        "variations": [
+            {"audio_url": "https://example.com/0.mp3", "audio_id": "audio-0", "variation_index": 0},
+            {"audio_url": "https://example.com/1.mp3", "audio_id": "audio-1", "variation_index": 1},
+        ],
+        "timestamp_variations": [0],
+    }
+
+    @staticmethod
+    def _lyrics(word: str) -> TimestampedLyrics:
+        return TimestampedLyrics(
+            aligned_words=[AlignedWord(word=word, start_s=1.0, end_s=1.5, success=True, palign=0.5)],
+            waveform_data=[0.1, 0.2],
+            hoot_cer=0.1,
+            is_streamed=False,
+        )
+
+    @pytest.fixture
+    def timestamps_env(self, mock_suno_client):
+        """Authenticated user, the two-variation song and mocked storage."""
+        from app.core.auth import get_current_user
+        app.dependency_overrides[get_current_user] = lambda: TEST_USER_ID
+        stored = {0: {"aligned_words": [{"word": "stored"}], "waveform_data": [0.5]}}
+        
+        async def load(task_id, variation_index, song_data=None):
+            return stored.get(variation_index)
+        
+        mock_suno_client.get_timestamped_lyrics.side_effect = (
+            lambda task_id, audio_id: self._lyrics(audio_id)
+        )
+        with patch("app.api.songs.get_task_from_firestore", new=AsyncMock(return_value=self.SONG)), \
+             patch("app.api.songs.load_timestamped_lyrics", new=AsyncMock(side_effect=load)), \
+             patch("app.api.songs.store_timestamped_lyrics", new=AsyncMock(return_value=True)) as store, \
+             patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
+            yield {"suno": mock_suno_client, "store": store}
+        app.dependency_overrides.clear()
+
+    @pytest.mark.asyncio
+    async def test_stored_timestamps_skip_suno(self, client, timestamps_env):
+        """Test that stored timestamps are served without calling Suno."""
+        response = await client.post(
+            "/api/songs/task-123/timestamped-lyrics/0",
+            headers={"Authorization": "Bearer test-token"}
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["aligned_words"] == [{"word": "stored"}]
+        timestamps_env["suno"].get_timestamped_lyrics.assert_not_called()
+        timestamps_env["store"].assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_missing_timestamps_are_fetched_and_stored(self, client, timestamps_env):
+        """Test that timestamps not yet stored are fetched once and persisted."""
+        response = await client.post(
+            "/api/songs/task-123/timestamped-lyrics/1",
+            headers={"Authorization": "Bearer test-token"}
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["aligned_words"][0]["word"] == "audio-1"
+        timestamps_env["suno"].get_timestamped_lyrics.assert_awaited_once_with(
+            task_id="task-123", audio_id="audio-1"
+        )
+        store_kwargs = timestamps_env["store"].call_args.kwargs
+        assert store_kwargs["variation_index"] == 1
+        assert store_kwargs["aligned_words"][0]["word"] == "audio-1"
+        assert store_kwargs["waveform_data"] == [0.1, 0.2]
+
+    @pytest.mark.asyncio
+    async def test_unaligned_timestamps_are_not_stored(self, client, timestamps_env):
+        """Test that an empty result (alignment not ready) is fetched again later."""
+        timestamps_env["suno"].get_timestamped_lyrics.side_effect = lambda task_id, audio_id: TimestampedLyrics(
+            aligned_words=[], waveform_data=[], hoot_cer=0.0, is_streamed=False,
+        )
+        
+        for _ in range(2):
+            response = await client.post(
+                "/api/songs/task-123/timestamped-lyrics/1",
+                headers={"Authorization": "Bearer test-token"}
+            )
+            assert response.status_code == 200
+            assert response.json()["aligned_words"] == []
+        
+        assert timestamps_env["suno"].get_timestamped_lyrics.await_count == 2
+        timestamps_env["store"].assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_cache_clone_outlives_its_source(self, client, timestamps_env):
+        """Test that a clone stores and reads its own timestamps once its source task is deleted."""
+        clone = {**self.SONG, "task_id": "cached-1", "source_task_id": "suno-task-1"}
+        stored = {}
+        
+        async def load(task_id, variation_index, song_data=None):
+            return stored.get((task_id, variation_index))
+        
+        async def store(task_id, aligned_words, waveform_data, variation_index):
+            if task_id == "suno-task-1":
+                return False  # Source document was swept
+            stored[(task_id, variation_index)] = {"aligned_words": aligned_words, "waveform_data": waveform_data}
+            return True
+        
+        timestamps_env["store"].side_effect = store
+        with patch("app.api.songs.get_task_from_firestore", new=AsyncMock(return_value=clone)), \
+             patch("app.api.songs.load_timestamped_lyrics", new=AsyncMock(side_effect=load)):
+            for _ in range(2):
+                response = await client.post(
+                    "/api/songs/cached-1/timestamped-lyrics/1",
+                    headers={"Authorization": "Bearer test-token"}
+                )
+                assert response.status_code == 200
+                assert response.json()["aligned_words"][0]["word"] == "audio-1"
+        
+        timestamps_env["suno"].get_timestamped_lyrics.assert_awaited_once_with(
+            task_id="suno-task-1", audio_id="audio-1"
+        )
+        assert [c.kwargs["task_id"] for c in timestamps_env["store"].await_args_list] == ["suno-task-1", "cached-1"]
+
+    @pytest.mark.asyncio
+    async def test_suno_failures_are_not_stored(self, client, timestamps_env):
+        """Test that a Suno error returns empty arrays and stores nothing."""
+        timestamps_env["suno"].get_timestamped_lyrics.side_effect = SunoAPIError("down")
+        
+        response = await client.post(
+            "/api/songs/task-123/timestamped-lyrics/1",
+            headers={"Authorization": "Bearer test-token"}
+        )
+        
+        assert response.status_code == 200
+        assert response.json() == {"aligned_words": [], "waveform_data": []}
+        timestamps_env["store"].assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_batch_returns_all_variations(self, client, timestamps_env):
+        """Test that the batch form returns both variations in one call."""
+        response = await client.post(
+            "/api/songs/task-123/timestamped-lyrics",
+            headers={"Authorization": "Bearer test-token"}
+        )
+        
+        assert response.status_code == 200
+        variations = response.json()["variations"]
+        assert [v["variation_index"] for v in variations] == [0, 1]
+        assert variations[0]["aligned_words"] == [{"word": "stored"}]
+        assert variations[1]["aligned_words"][0]["word"] == "audio-1"
+        timestamps_env["suno"].get_timestamped_lyrics.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_batch_fetches_variations_concurrently(self, client, timestamps_env):
+        """Test that missing variations are fetched from Suno at the same time."""
+        timestamps_env["store"].reset_mock()
+        in_flight = []
+        peak = []
+        
+        async def fetch(task_id, audio_id):
+            in_flight.append(audio_id)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(audio_id)
+            return self._lyrics(audio_id)
+        
+        timestamps_env["suno"].get_timestamped_lyrics.side_effect = fetch
+        with patch("app.api.songs.load_timestamped_lyrics", new=AsyncMock(return_value=None)):
+            response = await client.post(
+                "/api/songs/task-123/timestamped-lyrics",
+                headers={"Authorization": "Bearer test-token"}
+            )
+        
+        assert response.status_code == 200
+        assert max(peak) == 2
+        assert timestamps_env["store"].await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_batch_requires_ownership(self, client, timestamps_env):
+        """Test that the batch form rejects other users' songs."""
+        other_song = {**self.SONG, "user_id": ANOTHER_USER_ID}
+        with patch("app.api.songs.get_task_from_firestore", new=AsyncMock(return_value=other_song)):
+            response = await client.post(
+                "/api/songs/task-123/timestamped-lyrics",
+                headers={"Authorization": "Bearer test-token"}
+            )
+        
+        assert response.status_code == 403
+
+
 class TestSongsHealthEndpoint:
     """Tests for GET /api/songs/health endpoint."""
 
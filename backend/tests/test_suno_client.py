@@ -1,11 +1,18 @@
 """Tests for Suno API client."""
 
+import asyncio
+import json
+import time
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 import httpx
 
+from app.services import suno_client as suno_client_module
 from app.services.suno_client import (
     SunoClient,
+    close_suno_client,
+    get_suno_client,
     SunoTask,
     SunoStatus,
     SunoAPIError,
@@ -140,3 +147,141 @@ class TestStyleMapping:
         for style in MusicStyle:
             assert style in STYLE_MAPPING
             assert STYLE_MAPPING[style]
+
+
+class TestSunoClientPoolConfig:
+    def test_applies_default_pool_limits(self):
+        client = SunoClient(api_key="test-api-key")
+        pool = client.client._transport._pool
+        assert pool._max_connections == suno_client_module.MAX_CONNECTIONS
+        assert pool._max_keepalive_connections == suno_client_module.MAX_KEEPALIVE_CONNECTIONS
+        assert pool._keepalive_expiry == suno_client_module.KEEPALIVE_EXPIRY
+    
+    def test_accepts_custom_limits_and_http2(self):
+        limits = httpx.Limits(max_connections=5, max_keepalive_connections=2, keepalive_expiry=1.0)
+        client = SunoClient(api_key="test-api-key", limits=limits, http2=True)
+        pool = client.client._transport._pool
+        assert pool._max_connections == 5
+        assert pool._http2 is True
+    
+    @pytest.mark.asyncio
+    async def test_client_recreated_after_close(self):
+        client = SunoClient(api_key="test-api-key")
+        first = client.client
+        await client.close()
+        assert client.client is not first
+
+
+class TestSharedSunoClient:
+    @pytest.mark.asyncio
+    async def test_get_suno_client_returns_singleton(self):
+        with patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
+            await close_suno_client()
+            try:
+                assert get_suno_client() is get_suno_client()
+            finally:
+                await close_suno_client()
+    
+    @pytest.mark.asyncio
+    async def test_close_suno_client_resets_singleton(self):
+        with patch.dict("os.environ", {"SUNO_API_KEY": "test-api-key"}):
+            first = get_suno_client()
+            await close_suno_client()
+            try:
+                assert get_suno_client() is not first
+            finally:
+                await close_suno_client()
+    
+    @pytest.mark.asyncio
+    async def test_get_suno_client_requires_api_key(self):
+        with patch.dict("os.environ", {"SUNO_API_KEY": ""}):
+            await close_suno_client()
+            with pytest.raises(ValueError, match="api_key cannot be empty"):
+                get_suno_client()
+
+
+# Simulated cost of establishing a connection (TCP + TLS handshake), seconds
+HANDSHAKE_LATENCY = 0.02
+
+
+class StubSunoServer:
+    """Minimal keep-alive HTTP/1.1 server answering record-info requests."""
+    
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+    
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._server.close()
+        await self._server.wait_closed()
+    
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(HANDSHAKE_LATENCY)
+        body = json.dumps({"code": 200, "msg": "success", "data": {"status": "GENERATING"}}).encode()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                self.requests += 1
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+class TestConnectionReuseBenchmark:
+    """Micro-benchmark: shared pooled client vs a client per request."""
+    
+    REQUEST_COUNT = 20
+    
+    @pytest.mark.asyncio
+    async def test_pooled_client_reuses_connection(self):
+        async with StubSunoServer() as server:
+            # Client per request, as the endpoints used to do
+            start = time.perf_counter()
+            for i in range(self.REQUEST_COUNT):
+                async with SunoClient(api_key="test-api-key", base_url=server.base_url, http2=False) as client:
+                    await client.get_task_status(f"task-{i}")
+            per_request_elapsed = time.perf_counter() - start
+            per_request_connections = server.connections
+            
+            # One shared client with a warm connection pool
+            server.connections = 0
+            client = SunoClient(api_key="test-api-key", base_url=server.base_url, http2=False)
+            start = time.perf_counter()
+            for i in range(self.REQUEST_COUNT):
+                await client.get_task_status(f"task-{i}")
+            pooled_elapsed = time.perf_counter() - start
+            await client.close()
+            pooled_connections = server.connections
+        
+        print(
+            f"\n{self.REQUEST_COUNT} status requests: "
+            f"client per request {per_request_elapsed / self.REQUEST_COUNT * 1000:.2f}ms/req "
+            f"({per_request_connections} connections), "
+            f"shared client {pooled_elapsed / self.REQUEST_COUNT * 1000:.2f}ms/req "
+            f"({pooled_connections} connection)"
+        )
+        assert per_request_connections == self.REQUEST_COUNT
+        assert pooled_connections == 1
+        assert pooled_elapsed < per_request_elapsed / 2
@@ -0,0 +1,327 @@
+"""Tests for the shared Suno status poller.
+
+This module tests the process-wide SunoPoller including:
+- Coalescing of concurrent and recent polls for the same task
+- Upstream request count scaling with distinct tasks, not clients
+- Persistence and listener fan-out of fresh results
+- Background polling of watched tasks until a terminal state or timeout
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.suno_client import SunoAPIError, SunoStatus
+from app.services.suno_poller import (
+    COALESCE_WINDOW,
+    FALLBACK_POLL_INTERVAL,
+    POLL_INTERVAL,
+    TIMEOUT_ERROR,
+    SunoPoller,
+    get_suno_poller,
+)
+
+
+TEST_TASK_ID = "test-task-456"
+
+# Simulated Suno round-trip latency (seconds)
+SUNO_LATENCY = 0.05
+
+
+def make_poller(**kwargs) -> SunoPoller:
+    """Create a poller backed by a mock Suno client."""
+    kwargs.setdefault("poll_interval", 0)
+    poller = SunoPoller(**kwargs)
+    poller._client = AsyncMock()
+    return poller
+
+
+def slow_status(status: str = "GENERATING", progress: int = 50):
+    """Build a get_task_status side effect that takes SUNO_LATENCY to answer."""
+    async def get_task_status(task_id: str) -> SunoStatus:
+        await asyncio.sleep(SUNO_LATENCY)
+        return SunoStatus(status=status, progress=progress)
+    return get_task_status
+
+
+@pytest.fixture
+def mock_update():
+    """Mock Firestore persistence of polled statuses."""
+    with patch("app.services.suno_poller.update_task_status", new_callable=AsyncMock) as update_mock:
+        yield update_mock
+
+
+class TestCoalescing:
+    """Tests for get_status request coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_upstream_call(self, mock_update):
+        """Test that concurrent callers for one task share a single poll."""
+        poller = make_poller()
+        poller.client.get_task_status.side_effect = slow_status()
+
+        results = await asyncio.gather(*[poller.get_status(TEST_TASK_ID) for _ in range(50)])
+
+        assert poller.client.get_task_status.call_count == 1
+        assert poller.upstream_requests == 1
+        assert all(r.progress == 50 for r in results)
+
+    @pytest.mark.asyncio
+    async def test_recent_result_is_reused(self, mock_update):
+        """Test that a result within the coalesce window is served from memory."""
+        poller = make_poller(coalesce_window=60)
+        poller.client.get_task_status.return_value = SunoStatus(status="GENERATING", progress=50)
+
+        await poller.get_status(TEST_TASK_ID)
+        await poller.get_status(TEST_TASK_ID)
+
+        assert poller.client.get_task_status.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_result_is_refreshed(self, mock_update):
+        """Test that results outside the coalesce window trigger a new poll."""
+        poller = make_poller(coalesce_window=0)
+        poller.client.get_task_status.return_value = SunoStatus(status="GENERATING", progress=50)
+
+        await poller.get_status(TEST_TASK_ID)
+        await poller.get_status(TEST_TASK_ID)
+
+        assert poller.client.get_task_status.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_upstream_requests_scale_with_distinct_tasks(self, mock_update):
+        """Test that N clients x M tasks costs M upstream calls, not N x M."""
+        poller = make_poller()
+        poller.client.get_task_status.side_effect = slow_status()
+        task_count = 10
+        clients_per_task = 20
+
+        await asyncio.gather(*[
+            poller.get_status(f"task-{t}")
+            for t in range(task_count)
+            for _ in range(clients_per_task)
+        ])
+
+        print(
+            f"\n{task_count * clients_per_task} status requests -> "
+            f"{poller.upstream_requests} upstream Suno calls"
+        )
+        assert poller.upstream_requests == task_count
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self, mock_update):
+        """Test that an upstream failure reaches every coalesced caller."""
+        poller = make_poller()
+
+        async def failing(task_id):
+            await asyncio.sleep(SUNO_LATENCY)
+            raise SunoAPIError("Transient error", status_code=500)
+
+        poller.client.get_task_status.side_effect = failing
+
+        results = await asyncio.gather(
+            *[poller.get_status(TEST_TASK_ID) for _ in range(5)],
+            return_exceptions=True,
+        )
+
+        assert poller.client.get_task_status.call_count == 1
+        assert all(isinstance(r, SunoAPIError) for r in results)
+
+
+class TestPublish:
+    """Tests for persistence and listener fan-out."""
+
+    @pytest.mark.asyncio
+    async def test_fresh_result_is_persisted_and_dispatched(self, mock_update):
+        """Test that a new result is written once and sent to listeners."""
+        poller = make_poller()
+        poller.client.get_task_status.return_value = SunoStatus(status="GENERATING", progress=50)
+        listener = AsyncMock()
+        poller.add_listener(listener)
+
+        await asyncio.gather(*[poller.get_status(TEST_TASK_ID) for _ in range(10)])
+
+        mock_update.assert_awaited_once()
+        assert mock_update.call_args.kwargs["status"] == "processing"
+        assert mock_update.call_args.kwargs["progress"] == 50
+        listener.assert_awaited_once()
+        assert listener.call_args[0][0] == TEST_TASK_ID
+
+    @pytest.mark.asyncio
+    async def test_unchanged_result_is_not_republished(self, mock_update):
+        """Test that repeated identical results do not rewrite Firestore."""
+        poller = make_poller(coalesce_window=0)
+        poller.client.get_task_status.side_effect = [
+            SunoStatus(status="GENERATING", progress=50),
+            SunoStatus(status="GENERATING", progress=50),
+            SunoStatus(status="GENERATING", progress=70),
+        ]
+        listener = AsyncMock()
+        poller.add_listener(listener)
+
+        for _ in range(3):
+            await poller.get_status(TEST_TASK_ID)
+
+        assert mock_update.await_count == 2
+        assert listener.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failing_listener_does_not_break_others(self, mock_update):
+        """Test that one listener raising does not block the rest."""
+        poller = make_poller()
+        poller.client.get_task_status.return_value = SunoStatus(status="GENERATING", progress=50)
+        failing = AsyncMock(side_effect=RuntimeError("boom"))
+        healthy = AsyncMock()
+        poller.add_listener(failing)
+        poller.add_listener(healthy)
+
+        status = await poller.get_status(TEST_TASK_ID)
+
+        assert status.progress == 50
+        healthy.assert_awaited_once()
+
+
+class TestBackgroundPolling:
+    """Tests for the background loop over watched tasks."""
+
+    @pytest.mark.asyncio
+    async def test_polls_until_terminal_state(self, mock_update):
+        """Test that a watched task is polled until completed, then dropped."""
+        poller = make_poller(coalesce_window=0)
+        poller.client.get_task_status.side_effect = [
+            SunoStatus(status="GENERATING", progress=50),
+            SunoStatus(status="SUCCESS", progress=100, song_url="https://example.com/song.mp3"),
+        ]
+
+        poller.watch(TEST_TASK_ID)
+        await asyncio.wait_for(poller._loop_task, timeout=1)
+
+        assert poller.client.get_task_status.call_count == 2
+        assert not poller.is_watching(TEST_TASK_ID)
+        assert mock_update.call_args.kwargs["status"] == "completed"
+
+    @pytest.mark.asyncio
+    async def test_continues_on_transient_errors(self, mock_update):
+        """Test that polling continues after an upstream error."""
+        poller = make_poller(coalesce_window=0)
+        poller.client.get_task_status.side_effect = [
+            SunoAPIError("Transient error", status_code=500),
+            SunoStatus(status="SUCCESS", progress=100, song_url="https://example.com/song.mp3"),
+        ]
+
+        poller.watch(TEST_TASK_ID)
+        await asyncio.wait_for(poller._loop_task, timeout=1)
+
+        assert poller.client.get_task_status.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_one_loop_serves_all_watched_tasks(self, mock_update):
+        """Test that watching many tasks does not spawn a loop per task."""
+        poller = make_poller(coalesce_window=0)
+        poller.client.get_task_status.return_value = SunoStatus(status="SUCCESS", progress=100)
+
+        poller.watch("task-1")
+        loop_task = poller._loop_task
+        poller.watch("task-2")
+        poller.watch("task-2")
+
+        assert poller._loop_task is loop_task
+        await asyncio.wait_for(loop_task, timeout=1)
+        assert poller.client.get_task_status.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_timeout_publishes_failed_status(self, mock_update):
+        """Test that a task watched past max duration is reported as failed."""
+        poller = make_poller(max_poll_duration=0)
+        listener = AsyncMock()
+        poller.add_listener(listener)
+
+        poller.watch(TEST_TASK_ID)
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(poller._loop_task, timeout=1)
+
+        poller.client.get_task_status.assert_not_called()
+        assert mock_update.call_args.kwargs["status"] == "failed"
+        assert mock_update.call_args.kwargs["error"] == TIMEOUT_ERROR
+        assert listener.call_args[0][1].error == TIMEOUT_ERROR
+
+    @pytest.mark.asyncio
+    async def test_unwatch_stops_polling(self, mock_update):
+        """Test that unwatching the last task ends the loop."""
+        poller = make_poller(poll_interval=0.01, coalesce_window=0)
+        poller.client.get_task_status.return_value = SunoStatus(status="GENERATING", progress=50)
+
+        poller.watch(TEST_TASK_ID)
+        await asyncio.sleep(0.03)
+        poller.unwatch(TEST_TASK_ID)
+        await asyncio.wait_for(poller._loop_task, timeout=1)
+
+        assert not poller.is_watching(TEST_TASK_ID)
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_polling(self, mock_update):
+        """Test that stop cancels the loop and clears watched tasks."""
+        poller = make_poller(poll_interval=10)
+        poller.client.get_task_status.return_value = SunoStatus(status="GENERATING", progress=50)
+
+        poller.watch(TEST_TASK_ID)
+        loop_task = poller._loop_task
+        await asyncio.sleep(0.01)
+        await poller.stop()
+
+        assert loop_task.cancelled()
+        assert poller.active_task_ids == []
+
+
+class TestWebhookFallback:
+    """Tests for polling behaviour when Suno callbacks are enabled."""
+
+    def test_polls_slowly_when_webhooks_enabled(self):
+        """Test that a callback URL switches polling to the fallback interval."""
+        poller = SunoPoller()
+
+        with patch.dict("os.environ", {"SUNO_CALLBACK_URL": ""}):
+            assert poller.interval == POLL_INTERVAL
+            assert poller.window == COALESCE_WINDOW
+
+        # Callbacks are rejected without a secret, so polling stays fast
+        with patch.dict("os.environ", {"SUNO_CALLBACK_URL": "https://example.com/api/webhooks/suno", "SUNO_CALLBACK_SECRET": ""}):
+            assert poller.interval == POLL_INTERVAL
+
+        with patch.dict("os.environ", {
+            "SUNO_CALLBACK_URL": "https://example.com/api/webhooks/suno",
+            "SUNO_CALLBACK_SECRET": "s3cret",
+        }):
+            assert poller.interval == FALLBACK_POLL_INTERVAL
+            assert poller.window == FALLBACK_POLL_INTERVAL
+
+    @pytest.mark.asyncio
+    async def test_stale_poll_does_not_roll_back_callback(self, mock_update):
+        """Test that a poll racing a completion callback is ignored."""
+        poller = make_poller(coalesce_window=0)
+        poller.client.get_task_status.return_value = SunoStatus(status="GENERATING", progress=50)
+
+        await poller.ingest(TEST_TASK_ID, SunoStatus(status="SUCCESS", progress=100))
+        await poller.get_status(TEST_TASK_ID)
+
+        assert mock_update.await_count == 1
+        assert poller._results[TEST_TASK_ID].status.status == "SUCCESS"
+
+    @pytest.mark.asyncio
+    async def test_results_are_pruned_without_a_sweep_loop(self, mock_update):
+        """Test that callback and REST results of unwatched tasks do not pile up."""
+        poller = make_poller(coalesce_window=0.01)
+
+        for i in range(100):
+            await poller.ingest(f"task-{i}", SunoStatus(status="SUCCESS", progress=100))
+            await asyncio.sleep(0.001)
+
+        assert poller._loop_task is None
+        assert len(poller._results) < 20
+        assert "task-99" in poller._results
+
+
+def test_get_suno_poller_returns_singleton():
+    """Test that get_suno_poller returns the same instance."""
+    assert get_suno_poller() is get_suno_poller()
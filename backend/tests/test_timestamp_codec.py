@@ -0,0 +1,193 @@
+"""Tests for the compact timestamped lyrics encoding.
+
+This module tests:
+- Round trips through encode_timestamps/decode_timestamps
+- Rejection of values the format cannot hold and of corrupt blobs
+- The opt-in compact wire format of the timestamped lyrics endpoint
+- Size and decode time against the Firestore map encoding
+"""
+
+import math
+import time
+
+import pytest
+from google.cloud.firestore_v1 import _helpers
+from google.cloud.firestore_v1.types import document
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.suno_client import AlignedWord, TimestampedLyrics
+from app.services.timestamp_codec import (
+    COMPACT_MEDIA_TYPE,
+    decode_timestamps,
+    encode_timestamps,
+)
+
+
+def make_words(count: int) -> list[dict]:
+    """Aligned words of a song with `count` words."""
+    texts = ["Learning", "is", "a", "journey,", "not", "a", "race\n", "every", "step", "我们"]
+    return [
+        {
+            "word": texts[i % len(texts)],
+            "startS": round(i * 0.41 + 1.7, 3),
+            "endS": round(i * 0.41 + 2.0, 3),
+            "success": i % 7 != 0,
+            "palign": round((i % 11) / 10, 2),
+        }
+        for i in range(count)
+    ]
+
+
+def make_waveform(count: int) -> list[float]:
+    """Waveform samples in 0..1."""
+    return [round(0.5 + 0.45 * math.sin(i / 9), 4) for i in range(count)]
+
+
+class TestRoundTrip:
+    """Tests for encoding and decoding timestamps."""
+
+    def test_round_trip_preserves_words(self):
+        """Test that texts and flags are exact and numbers are within precision."""
+        words = make_words(50)
+        waveform = make_waveform(300)
+
+        decoded = decode_timestamps(encode_timestamps(words, waveform))
+
+        for original, result in zip(words, decoded.aligned_words(), strict=True):
+            assert result["word"] == original["word"]
+            assert result["success"] == original["success"]
+            assert result["startS"] == pytest.approx(original["startS"], abs=1e-5)
+            assert result["endS"] == pytest.approx(original["endS"], abs=1e-5)
+            assert result["palign"] == pytest.approx(original["palign"], abs=1 / 510)
+        step = (max(waveform) - min(waveform)) / 255
+        assert decoded.waveform_data() == pytest.approx(waveform, abs=step)
+
+    def test_long_songs_do_not_drift(self):
+        """Test that float32 deltas do not accumulate error over many words."""
+        words = make_words(5000)
+
+        decoded = decode_timestamps(encode_timestamps(words))
+
+        assert decoded.starts[-1] == pytest.approx(words[-1]["startS"], abs=1e-4)
+        assert decoded.ends[-1] == pytest.approx(words[-1]["endS"], abs=1e-4)
+
+    def test_unsorted_starts(self):
+        """Test that starts going backwards survive delta encoding."""
+        words = [
+            {"word": "b", "startS": 5.0, "endS": 5.5, "success": True, "palign": 1},
+            {"word": "a", "startS": 1.0, "endS": 1.5, "success": False, "palign": 0},
+        ]
+
+        decoded = decode_timestamps(encode_timestamps(words)).aligned_words()
+
+        assert [w["startS"] for w in decoded] == [5.0, 1.0]
+        assert [w["success"] for w in decoded] == [True, False]
+
+    def test_empty(self):
+        """Test that no words and no waveform round trip."""
+        decoded = decode_timestamps(encode_timestamps([], None))
+
+        assert decoded.aligned_words() == []
+        assert decoded.waveform_data() == []
+
+    def test_flat_waveform(self):
+        """Test that a waveform with a single value decodes to that value."""
+        decoded = decode_timestamps(encode_timestamps([], [0.25] * 10))
+
+        assert decoded.waveform_data() == [0.25] * 10
+
+
+class TestInvalidInput:
+    """Tests for values and blobs the codec rejects."""
+
+    @pytest.mark.parametrize("palign", [-0.1, 1.5])
+    def test_palign_out_of_range(self, palign):
+        """Test that palign values outside 0..1 are rejected."""
+        words = [{"word": "a", "startS": 0, "endS": 1, "success": True, "palign": palign}]
+
+        with pytest.raises(ValueError):
+            encode_timestamps(words)
+
+    @pytest.mark.parametrize("value", [math.nan, math.inf, 1e39])
+    def test_unrepresentable_times(self, value):
+        """Test that times that are not finite float32 values are rejected."""
+        words = [{"word": "a", "startS": 0, "endS": value, "success": True, "palign": 0}]
+
+        with pytest.raises(ValueError):
+            encode_timestamps(words)
+
+    @pytest.mark.parametrize("blob", [b"", b"not zlib", encode_timestamps(make_words(3))[:-4]])
+    def test_corrupt_blob(self, blob):
+        """Test that corrupt blobs raise ValueError."""
+        with pytest.raises(ValueError):
+            decode_timestamps(blob)
+
+
+class TestCompactWireFormat:
+    """Tests for the compact format of the timestamped lyrics endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_compact_encoding_returns_blob(self):
+        """Test that encoding=compact returns the blob with its media type."""
+        from app.api.songs import get_variation_timestamped_lyrics
+
+        song_data = {
+            "user_id": "user-1",
+            "task_id": "task-1",
+            "variations": [{"audio_url": "https://example.com/0.mp3", "audio_id": "audio-0", "variation_index": 0}],
+        }
+        lyrics = TimestampedLyrics(
+            aligned_words=[AlignedWord(word="hi", start_s=1.0, end_s=1.5, success=True, palign=0.5)],
+            waveform_data=[0.0, 1.0],
+            hoot_cer=0.1,
+            is_streamed=False,
+        )
+        suno_client = MagicMock()
+        suno_client.get_timestamped_lyrics = AsyncMock(return_value=lyrics)
+
+        with patch("app.api.songs.get_task_from_firestore", new=AsyncMock(return_value=song_data)), \
+             patch("app.api.songs.load_timestamped_lyrics", new=AsyncMock(return_value=None)), \
+             patch("app.api.songs.store_timestamped_lyrics", new=AsyncMock(return_value=True)), \
+             patch("app.api.songs.get_suno_client", return_value=suno_client), \
+             patch("app.api.songs.os.getenv", return_value="test-api-key"):
+            response = await get_variation_timestamped_lyrics("task-1", 0, "user-1", encoding="compact")
+
+        assert response.media_type == COMPACT_MEDIA_TYPE
+        decoded = decode_timestamps(response.body)
+        assert decoded.words == ["hi"]
+        assert decoded.waveform_data() == [0.0, 1.0]
+
+
+class TestCodecBenchmark:
+    """Micro-benchmark of the compact encoding against Firestore maps."""
+
+    ITERATIONS = 100
+
+    def test_compact_is_smaller_and_faster(self):
+        """Compare stored size and decode time for a 400-word song."""
+        words = make_words(400)
+        waveform = make_waveform(1000)
+
+        maps = document.Document.serialize(document.Document(
+            fields=_helpers.encode_dict({"aligned_words": words, "waveform_data": waveform})
+        ))
+        blob = encode_timestamps(words, waveform)
+
+        start = time.perf_counter()
+        for _ in range(self.ITERATIONS):
+            _helpers.decode_dict(document.Document.deserialize(maps).fields, None)
+        maps_time = (time.perf_counter() - start) / self.ITERATIONS
+
+        start = time.perf_counter()
+        for _ in range(self.ITERATIONS):
+            decoded = decode_timestamps(blob)
+            decoded.aligned_words()
+            decoded.waveform_data()
+        blob_time = (time.perf_counter() - start) / self.ITERATIONS
+
+        print(
+            f"\ncompact {len(blob)} B vs {len(maps)} B maps ({len(maps) / len(blob):.1f}x), "
+            f"decode {blob_time * 1e6:.0f} us vs {maps_time * 1e6:.0f} us ({maps_time / blob_time:.1f}x)"
+        )
+        assert len(blob) * 5 < len(maps)
+        assert blob_time * 2 < maps_time
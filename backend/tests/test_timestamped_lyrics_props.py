@@ -10,6 +10,7 @@ correctness properties of the timestamped lyrics feature.
 import pytest
 from hypothesis import given, settings, strategies as st, HealthCheck
 from unittest.mock import AsyncMock, MagicMock, patch
+from google.cloud import firestore
 
 from app.services.suno_client import (
     SunoClient,
@@ -18,6 +19,85 @@ from app.services.suno_client import (
 )
 
 
+# Timestamps are stored in the compact encoding: times as float32 and
+# palign/waveform values quantized to 1/255 of their range
+TIME_TOLERANCE = 1e-3
+PALIGN_TOLERANCE = 1 / 255
+
+
+def waveform_tolerance(waveform_data: list[float]) -> float:
+    """Quantization step of a waveform in the compact encoding."""
+    return (max(waveform_data, default=0.0) - min(waveform_data, default=0.0)) / 255 + 1e-6
+
+
+class FakeSongFirestore:
+    """In-memory Firestore keyed by document path, with batches and projections."""
+    
+    def __init__(self, docs=None):
+        self.docs = dict(docs or {})
+    
+    def collection(self, name):
+        return _FakeCollection(self, (name,))
+    
+    def batch(self):
+        return _FakeBatch(self)
+    
+    def write(self, path, data, merge):
+        current = dict(self.docs.get(path, {})) if merge else {}
+        for key, value in data.items():
+            if isinstance(value, firestore.ArrayUnion):
+                existing = current.get(key, [])
+                value = existing + [v for v in value.values if v not in existing]
+            current[key] = value
+        self.docs[path] = current
+
+
+class _FakeCollection:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+    
+    def document(self, doc_id):
+        return _FakeDocument(self.store, self.path + (doc_id,))
+
+
+class _FakeDocument:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+    
+    def collection(self, name):
+        return _FakeCollection(self.store, self.path + (name,))
+    
+    def get(self, field_paths=None):
+        data = self.store.docs.get(self.path)
+        snapshot = MagicMock()
+        snapshot.exists = data is not None
+        if data is not None and field_paths is not None:
+            data = {k: v for k, v in data.items() if k in field_paths}
+        snapshot.to_dict.return_value = dict(data) if data is not None else None
+        return snapshot
+    
+    def update(self, data):
+        if self.path not in self.store.docs:
+            raise KeyError(self.path)
+        self.store.write(self.path, data, merge=True)
+
+
+class _FakeBatch:
+    def __init__(self, store):
+        self.store = store
+        self.writes = []
+    
+    def set(self, ref, data, merge=False):
+        self.writes.append(lambda: self.store.write(ref.path, data, merge))
+    
+    def update(self, ref, data):
+        self.writes.append(lambda: ref.update(data))
+    
+    def commit(self):
+        for write in self.writes:
+            write()
+
+
 # ============================================================================
 # Strategies for generating test data
 # ============================================================================
@@ -232,6 +312,7 @@ class TestTimestampedLyricsStorageIntegrity:
         task_id=task_id_strategy,
         aligned_words=aligned_words_list_strategy,
         waveform_data=waveform_strategy,
+        variation_index=st.integers(min_value=0, max_value=1),
     )
     @settings(max_examples=100, suppress_health_check=[HealthCheck.too_slow])
     @pytest.mark.asyncio
@@ -240,54 +321,43 @@ class TestTimestampedLyricsStorageIntegrity:
         task_id: str,
         aligned_words: list[dict],
         waveform_data: list[float],
+        variation_index: int,
     ):
         """
         **Feature: timestamped-lyrics-sync, Property 3: Timestamped lyrics storage integrity**
         **Validates: Requirements 2.2, 2.3**
         
         Test that for any valid aligned words data, storing and retrieving
-        preserves all word, startS, and endS fields.
+        preserves all word, startS, and endS fields (within the compact
+        encoding's precision), and that the song document itself stays
+        free of the timestamp payload.
         """
-        from app.services.song_storage import store_timestamped_lyrics, get_task_from_firestore
-        
-        # Mock Firestore client
-        stored_data = {}
-        
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        
-        def mock_update(data):
-            stored_data.update(data)
-        
-        def mock_get():
-            mock_snapshot = MagicMock()
-            mock_snapshot.exists = True
-            mock_snapshot.to_dict.return_value = stored_data.copy()
-            return mock_snapshot
-        
-        mock_doc.update = mock_update
-        mock_doc.get = mock_get
-        
-        mock_collection = MagicMock()
-        mock_collection.document.return_value = mock_doc
+        from app.services.song_storage import (
+            get_task_from_firestore,
+            load_timestamped_lyrics,
+            store_timestamped_lyrics,
+        )
         
-        mock_client = MagicMock()
-        mock_client.collection.return_value = mock_collection
+        store = FakeSongFirestore({("songs", task_id): {"task_id": task_id}})
         
-        with patch("app.services.song_storage.get_firestore_client", return_value=mock_client):
+        with patch("app.services.song_storage.get_firestore_client", return_value=store):
             # Store the timestamped lyrics
             result = await store_timestamped_lyrics(
                 task_id=task_id,
                 aligned_words=aligned_words,
                 waveform_data=waveform_data,
+                variation_index=variation_index,
             )
             
             assert result is True
             
             # Retrieve the stored data
-            retrieved = await get_task_from_firestore(task_id)
+            song = await get_task_from_firestore(task_id)
+            retrieved = await load_timestamped_lyrics(task_id, variation_index, song)
             
             assert retrieved is not None
+            assert "aligned_words" not in song
+            assert "waveform_data" not in song
             
             # Verify aligned_words are preserved
             retrieved_words = retrieved.get("aligned_words", [])
@@ -297,20 +367,22 @@ class TestTimestampedLyricsStorageIntegrity:
                 # Verify word field is preserved
                 assert retrieved_word["word"] == original["word"]
                 # Verify startS field is preserved
-                assert retrieved_word["startS"] == original["startS"]
+                assert retrieved_word["startS"] == pytest.approx(original["startS"], abs=TIME_TOLERANCE)
                 # Verify endS field is preserved
-                assert retrieved_word["endS"] == original["endS"]
+                assert retrieved_word["endS"] == pytest.approx(original["endS"], abs=TIME_TOLERANCE)
                 # Verify success field is preserved
                 assert retrieved_word["success"] == original["success"]
                 # Verify palign field is preserved
-                assert retrieved_word["palign"] == original["palign"]
+                assert retrieved_word["palign"] == pytest.approx(original["palign"], abs=PALIGN_TOLERANCE)
             
             # Verify has_timestamps flag
-            assert retrieved.get("has_timestamps") == (len(aligned_words) > 0)
+            assert song.get("has_timestamps") == (len(aligned_words) > 0)
+            assert song.get("timestamp_variations") == [variation_index]
             
             # Verify waveform_data is preserved
-            if waveform_data:
-                assert retrieved.get("waveform_data") == waveform_data
+            assert retrieved.get("waveform_data") == pytest.approx(
+                waveform_data, abs=waveform_tolerance(waveform_data)
+            )
 
     @given(
         task_id=task_id_strategy,
@@ -329,25 +401,11 @@ class TestTimestampedLyricsStorageIntegrity:
         
         Test that update_task_status with aligned_words preserves all timing data.
         """
-        from app.services.song_storage import update_task_status
+        from app.services.song_storage import load_timestamped_lyrics, update_task_status
         
-        # Mock Firestore client
-        stored_data = {}
+        store = FakeSongFirestore({("songs", task_id): {"task_id": task_id}})
         
-        mock_doc = MagicMock()
-        
-        def mock_update(data):
-            stored_data.update(data)
-        
-        mock_doc.update = mock_update
-        
-        mock_collection = MagicMock()
-        mock_collection.document.return_value = mock_doc
-        
-        mock_client = MagicMock()
-        mock_client.collection.return_value = mock_collection
-        
-        with patch("app.services.song_storage.get_firestore_client", return_value=mock_client):
+        with patch("app.services.song_storage.get_firestore_client", return_value=store):
             # Update task status with aligned words
             result = await update_task_status(
                 task_id=task_id,
@@ -359,18 +417,53 @@ class TestTimestampedLyricsStorageIntegrity:
             
             assert result is True
             
-            # Verify aligned_words were stored
-            assert "aligned_words" in stored_data
-            stored_words = stored_data["aligned_words"]
+            # Verify aligned_words were stored for variation 0
+            stored_data = store.docs[("songs", task_id)]
+            assert "aligned_words" not in stored_data
+            stored_words = (await load_timestamped_lyrics(task_id))["aligned_words"]
             assert len(stored_words) == len(aligned_words)
             
             for original, stored_word in zip(aligned_words, stored_words):
                 assert stored_word["word"] == original["word"]
-                assert stored_word["startS"] == original["startS"]
-                assert stored_word["endS"] == original["endS"]
+                assert stored_word["startS"] == pytest.approx(original["startS"], abs=TIME_TOLERANCE)
+                assert stored_word["endS"] == pytest.approx(original["endS"], abs=TIME_TOLERANCE)
             
             # Verify has_timestamps flag is set correctly
             assert stored_data.get("has_timestamps") == (len(aligned_words) > 0)
+            assert stored_data.get("status") == "completed"
+
+    @given(
+        task_id=task_id_strategy,
+        aligned_words=aligned_words_list_strategy.filter(lambda words: len(words) > 0),
+        waveform_data=waveform_strategy,
+    )
+    @settings(max_examples=50, suppress_health_check=[HealthCheck.too_slow])
+    @pytest.mark.asyncio
+    async def test_legacy_inline_timestamps_are_read_as_variation_zero(
+        self,
+        task_id: str,
+        aligned_words: list[dict],
+        waveform_data: list[float],
+    ):
+        """
+        Test that songs stored with inline timestamps still load them (migration on read).
+        """
+        from app.services.song_storage import load_timestamped_lyrics
+        
+        store = FakeSongFirestore({("songs", task_id): {
+            "task_id": task_id,
+            "has_timestamps": True,
+            "aligned_words": aligned_words,
+            "waveform_data": waveform_data,
+        }})
+        song = {"task_id": task_id, "has_timestamps": True}
+        
+        with patch("app.services.song_storage.get_firestore_client", return_value=store):
+            variation_0 = await load_timestamped_lyrics(task_id, 0, song)
+            variation_1 = await load_timestamped_lyrics(task_id, 1, song)
+        
+        assert variation_0 == {"aligned_words": aligned_words, "waveform_data": waveform_data}
+        assert variation_1 is None
 
 
 class TestAlignedWordDataclass:
@@ -0,0 +1,258 @@
+"""Tests for the Suno webhook callback endpoint.
+
+This module drives POST /api/webhooks/suno with a fake Suno that posts
+callbacks the way the real API does, and checks that each callback is
+validated, persisted through update_task_status and pushed to the
+task's WebSocket room without polling Suno.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from httpx import AsyncClient, ASGITransport
+
+from app.api.websocket import handle_poll_result
+from app.main import app
+from app.services.suno_client import status_from_callback
+from app.services.suno_poller import SunoPoller
+
+
+TEST_TASK_ID = "suno-task-123"
+TEST_SECRET = "s3cret"
+
+
+class FakeSuno:
+    """Posts Suno-style generation callbacks to the app."""
+
+    def __init__(self, client: AsyncClient, task_id: str = TEST_TASK_ID, token: str = TEST_SECRET):
+        self.client = client
+        self.task_id = task_id
+        self.token = token
+
+    async def send(self, callback_type: str, tracks: list = None, code: int = 200, msg: str = "success"):
+        """Post one callback, as Suno does at each generation stage."""
+        params = {"token": self.token} if self.token else None
+        return await self.client.post(
+            "/api/webhooks/suno",
+            params=params,
+            json={
+                "code": code,
+                "msg": msg,
+                "data": {
+                    "callbackType": callback_type,
+                    "task_id": self.task_id,
+                    "data": tracks,
+                },
+            },
+        )
+
+    async def complete(self):
+        """Post the final callback with two generated tracks."""
+        return await self.send("complete", tracks=[
+            {"id": "audio-1", "audio_url": "https://example.com/song1.mp3", "title": "Learning Song"},
+            {"id": "audio-2", "audio_url": "https://example.com/song2.mp3", "title": "Learning Song"},
+        ])
+
+
+@pytest.fixture(autouse=True)
+def callback_secret():
+    """Configure the shared callback secret the fake Suno sends."""
+    with patch.dict("os.environ", {"SUNO_CALLBACK_SECRET": TEST_SECRET}):
+        yield
+
+
+@pytest.fixture
+def poller():
+    """Fresh poller wired to the WebSocket listener, with a mock Suno client."""
+    test_poller = SunoPoller(poll_interval=0, coalesce_window=60)
+    test_poller._client = AsyncMock()
+    test_poller.add_listener(handle_poll_result)
+    with patch("app.api.webhooks.get_suno_poller", return_value=test_poller):
+        yield test_poller
+
+
+@pytest.fixture
+def mock_storage():
+    """Mock Firestore reads and writes used by the callback path."""
+    with patch("app.api.webhooks.get_task_from_firestore", new_callable=AsyncMock) as get_mock:
+        with patch("app.services.suno_poller.update_task_status", new_callable=AsyncMock) as update_mock:
+            with patch("app.api.websocket.store_timestamped_lyrics", new_callable=AsyncMock):
+                with patch("app.api.websocket.get_suno_client") as client_mock:
+                    client_mock.return_value.get_timestamped_lyrics = AsyncMock(return_value=None)
+                    get_mock.return_value = {"task_id": TEST_TASK_ID, "status": "processing"}
+                    yield {"get": get_mock, "update": update_mock}
+
+
+@pytest.fixture
+def mock_broadcast():
+    """Capture WebSocket broadcasts for a task with one subscriber."""
+    with patch("app.api.websocket.manager") as mock_manager:
+        mock_manager.has_active_connections.return_value = True
+        with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as broadcast:
+            yield broadcast
+
+
+@pytest.fixture
+async def fake_suno():
+    """Fake Suno posting callbacks through the ASGI app."""
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield FakeSuno(client)
+
+
+class TestSunoCallback:
+    """Tests for POST /api/webhooks/suno."""
+
+    @pytest.mark.asyncio
+    async def test_complete_callback_persists_and_broadcasts(
+        self, fake_suno, poller, mock_storage, mock_broadcast
+    ):
+        """Test that completion is stored with variations and pushed immediately."""
+        response = await fake_suno.complete()
+
+        assert response.status_code == 200
+        assert response.json()["suno_status"] == "SUCCESS"
+
+        update_kwargs = mock_storage["update"].call_args.kwargs
+        assert update_kwargs["status"] == "completed"
+        assert update_kwargs["progress"] == 100
+        assert [v["audio_id"] for v in update_kwargs["variations"]] == ["audio-1", "audio-2"]
+
+        broadcast = mock_broadcast.call_args[0]
+        assert broadcast[0] == TEST_TASK_ID
+        assert broadcast[1]["status"] == "completed"
+        assert len(broadcast[1]["variations"]) == 2
+
+        # Pushed, not polled
+        poller.client.get_task_status.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stage_callbacks_report_progress(
+        self, fake_suno, poller, mock_storage, mock_broadcast
+    ):
+        """Test that text and first stage callbacks are pushed as processing."""
+        await fake_suno.send("text")
+        await fake_suno.send("first", tracks=[{"id": "audio-1", "audio_url": ""}])
+
+        progresses = [c.args[1]["progress"] for c in mock_broadcast.call_args_list]
+        statuses = {c.args[1]["status"] for c in mock_broadcast.call_args_list}
+        assert progresses == [30, 70]
+        assert statuses == {"processing"}
+
+    @pytest.mark.asyncio
+    async def test_error_callback_marks_task_failed(
+        self, fake_suno, poller, mock_storage, mock_broadcast
+    ):
+        """Test that an error callback fails the task."""
+        response = await fake_suno.send("error", code=501, msg="Audio generation failed")
+
+        assert response.status_code == 200
+        update_kwargs = mock_storage["update"].call_args.kwargs
+        assert update_kwargs["status"] == "failed"
+        assert update_kwargs["error"]
+        assert mock_broadcast.call_args[0][1]["status"] == "failed"
+
+    @pytest.mark.asyncio
+    async def test_complete_callback_stops_fallback_polling(
+        self, fake_suno, poller, mock_storage, mock_broadcast
+    ):
+        """Test that a terminal callback unwatches the task and serves status reads."""
+        poller._watched[TEST_TASK_ID] = 0.0
+
+        await fake_suno.complete()
+
+        assert not poller.is_watching(TEST_TASK_ID)
+        status = await poller.get_status(TEST_TASK_ID)
+        assert status.status == "SUCCESS"
+        poller.client.get_task_status.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_duplicate_callback_is_not_republished(
+        self, fake_suno, poller, mock_storage, mock_broadcast
+    ):
+        """Test that Suno retrying the same callback does not rewrite Firestore."""
+        await fake_suno.complete()
+        await fake_suno.complete()
+
+        assert mock_storage["update"].await_count == 1
+        assert mock_broadcast.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_unknown_task_returns_404(self, fake_suno, poller, mock_storage):
+        """Test that callbacks for unknown tasks are rejected."""
+        mock_storage["get"].return_value = None
+
+        response = await fake_suno.complete()
+
+        assert response.status_code == 404
+        mock_storage["update"].assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_malformed_payload_returns_422(self, fake_suno, poller, mock_storage):
+        """Test that payloads without task details are rejected."""
+        response = await fake_suno.client.post(
+            "/api/webhooks/suno",
+            json={"code": 200, "msg": "success"},
+        )
+
+        assert response.status_code == 422
+        mock_storage["update"].assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_callback_token_required(
+        self, fake_suno, poller, mock_storage, mock_broadcast
+    ):
+        """Test that callbacks without the shared secret are rejected."""
+        fake_suno.token = None
+        missing = await fake_suno.complete()
+        fake_suno.token = "wrong"
+        wrong = await fake_suno.complete()
+        fake_suno.token = TEST_SECRET
+        accepted = await fake_suno.complete()
+
+        assert missing.status_code == 401
+        assert wrong.status_code == 401
+        assert accepted.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_callbacks_rejected_without_secret(
+        self, fake_suno, poller, mock_storage, mock_broadcast
+    ):
+        """Test that callbacks fail closed when no secret is configured."""
+        with patch.dict("os.environ", {"SUNO_CALLBACK_SECRET": ""}):
+            response = await fake_suno.complete()
+
+        assert response.status_code == 503
+        mock_storage["get"].assert_not_called()
+        mock_storage["update"].assert_not_called()
+        mock_broadcast.assert_not_called()
+
+
+class TestStatusFromCallback:
+    """Tests for mapping callback payloads to SunoStatus."""
+
+    @pytest.mark.parametrize("callback_type,expected_status,expected_progress", [
+        ("text", "TEXT_SUCCESS", 30),
+        ("first", "FIRST_SUCCESS", 70),
+        ("complete", "SUCCESS", 100),
+        ("error", "FAILED", 0),
+    ])
+    def test_callback_type_mapping(self, callback_type, expected_status, expected_progress):
+        """Test that each stage maps to the status a poll would return."""
+        status = status_from_callback(callback_type, 200, "success", [])
+        assert status.status == expected_status
+        assert status.progress == expected_progress
+
+    def test_non_200_code_is_failure(self):
+        """Test that an error code fails the task regardless of stage."""
+        status = status_from_callback("complete", 400, "bad request", [])
+        assert status.status == "FAILED"
+        assert status.error is not None
+
+    def test_skips_malformed_tracks(self):
+        """Test that tracks without an audio URL are not reported."""
+        status = status_from_callback("complete", 200, "success", [
+            {"id": "audio-1", "audio_url": ""},
+            {"id": "audio-2", "audio_url": "https://example.com/song2.mp3"},
+        ])
+        assert len(status.variations) == 1
+        assert status.song_url == "https://example.com/song2.mp3"
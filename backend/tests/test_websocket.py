@@ -17,12 +17,14 @@ import asyncio
 from app.api.websocket import (
     ConnectionManager,
     manager,
-    poll_and_broadcast,
+    start_polling,
+    handle_poll_result,
     broadcast_status_update,
     _map_suno_status_to_generation_status,
+    _timestamp_fetches,
 )
 from app.models.songs import GenerationStatus
-from app.services.suno_client import SunoStatus, SunoAPIError
+from app.services.suno_client import SunoStatus, SongVariation, TimestampedLyrics, AlignedWord
 
 
 # Test constants
@@ -32,6 +34,14 @@ TEST_SID = "test-session-789"
 TEST_TOKEN = "valid-firebase-token"
 
 
+
+async def handle_completion(task_id, suno_status):
+    """Run the poll listener and wait for the timestamp fetch it starts."""
+    await handle_poll_result(task_id, suno_status)
+    fetch = _timestamp_fetches.get(task_id)
+    if fetch is not None:
+        await fetch
+
 class TestConnectionManager:
     """Tests for ConnectionManager class."""
 
@@ -134,29 +144,20 @@ class TestConnectionManager:
         
         assert cm.has_active_connections(TEST_TASK_ID)
 
-    def test_polling_task_management(self):
-        """Test setting and getting polling tasks."""
-        cm = ConnectionManager()
-        mock_task = MagicMock(spec=asyncio.Task)
-        mock_task.done.return_value = False
-        
-        cm.set_polling_task(TEST_TASK_ID, mock_task)
-        
-        assert cm.get_polling_task(TEST_TASK_ID) == mock_task
-
-    def test_cancel_polling_on_last_disconnect(self):
-        """Test that polling is cancelled when last connection disconnects."""
+    def test_unwatch_on_last_disconnect(self):
+        """Test that polling stops when last connection disconnects."""
         cm = ConnectionManager()
-        mock_task = MagicMock(spec=asyncio.Task)
-        mock_task.done.return_value = False
+        sid2 = "session-2"
         
         cm.add_connection(TEST_TASK_ID, TEST_SID, TEST_USER_ID)
-        cm.set_polling_task(TEST_TASK_ID, mock_task)
-        
-        cm.remove_connection(TEST_SID)
+        cm.add_connection(TEST_TASK_ID, sid2, TEST_USER_ID)
         
-        mock_task.cancel.assert_called_once()
-        assert TEST_TASK_ID not in cm.polling_tasks
+        with patch("app.api.websocket.get_suno_poller") as mock_get_poller:
+            cm.remove_connection(TEST_SID)
+            mock_get_poller.return_value.unwatch.assert_not_called()
+            
+            cm.remove_connection(sid2)
+            mock_get_poller.return_value.unwatch.assert_called_once_with(TEST_TASK_ID)
 
 
 class TestStatusMapping:
@@ -181,139 +182,266 @@ class TestStatusMapping:
         assert result == expected
 
 
-class TestPollAndBroadcast:
-    """Tests for poll_and_broadcast function."""
+class TestStartPolling:
+    """Tests for start_polling function."""
 
     @pytest.mark.asyncio
-    async def test_poll_stops_on_completed_status(self):
-        """Test that polling stops when task is completed."""
+    async def test_registers_task_with_shared_poller(self):
+        """Test that polling is delegated to the shared poller."""
         with patch.dict("os.environ", {"SUNO_API_KEY": "test-key"}):
-            with patch("app.api.websocket.SunoClient") as mock_client_class:
-                mock_client = AsyncMock()
-                mock_client_class.return_value.__aenter__.return_value = mock_client
-                mock_client_class.return_value.__aexit__.return_value = None
-                
-                # Return completed status
-                mock_client.get_task_status.return_value = SunoStatus(
-                    status="SUCCESS",
-                    progress=100,
-                    song_url="https://example.com/song.mp3",
-                    error=None
-                )
+            with patch("app.api.websocket.get_suno_poller") as mock_get_poller:
+                await start_polling(TEST_TASK_ID)
                 
-                with patch("app.api.websocket.manager") as mock_manager:
-                    mock_manager.has_active_connections.return_value = True
-                    mock_manager.polling_tasks = {}
-                    
-                    with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
-                        with patch("app.api.websocket.update_task_status", new_callable=AsyncMock):
-                            await poll_and_broadcast(TEST_TASK_ID)
-                            
-                            # Should broadcast completed status
-                            mock_broadcast.assert_called()
-                            call_args = mock_broadcast.call_args[0]
-                            assert call_args[0] == TEST_TASK_ID
-                            assert call_args[1]["status"] == GenerationStatus.COMPLETED.value
+                mock_get_poller.return_value.watch.assert_called_once_with(TEST_TASK_ID)
 
     @pytest.mark.asyncio
-    async def test_poll_stops_on_failed_status(self):
-        """Test that polling stops when task fails."""
-        with patch.dict("os.environ", {"SUNO_API_KEY": "test-key"}):
-            with patch("app.api.websocket.SunoClient") as mock_client_class:
-                mock_client = AsyncMock()
-                mock_client_class.return_value.__aenter__.return_value = mock_client
-                mock_client_class.return_value.__aexit__.return_value = None
-                
-                mock_client.get_task_status.return_value = SunoStatus(
-                    status="FAILED",
-                    progress=0,
-                    song_url=None,
-                    error="Generation failed"
-                )
-                
-                with patch("app.api.websocket.manager") as mock_manager:
-                    mock_manager.has_active_connections.return_value = True
-                    mock_manager.polling_tasks = {}
+    async def test_poll_handles_missing_api_key(self):
+        """Test that polling handles missing API key gracefully."""
+        with patch.dict("os.environ", {"SUNO_API_KEY": ""}, clear=False):
+            with patch("app.api.websocket.get_suno_poller") as mock_get_poller:
+                with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
+                    await start_polling(TEST_TASK_ID)
                     
-                    with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
-                        with patch("app.api.websocket.update_task_status", new_callable=AsyncMock):
-                            await poll_and_broadcast(TEST_TASK_ID)
-                            
-                            mock_broadcast.assert_called()
-                            call_args = mock_broadcast.call_args[0]
-                            assert call_args[1]["status"] == GenerationStatus.FAILED.value
+                    # Should broadcast error and not start polling
+                    mock_broadcast.assert_called_once()
+                    call_args = mock_broadcast.call_args[0]
+                    assert call_args[1]["status"] == GenerationStatus.FAILED.value
+                    assert "configuration error" in call_args[1]["error"]
+                    mock_get_poller.return_value.watch.assert_not_called()
+
+
+class TestHandlePollResult:
+    """Tests for handle_poll_result listener."""
 
     @pytest.mark.asyncio
-    async def test_poll_stops_when_no_connections(self):
-        """Test that polling stops when no clients are connected."""
-        with patch.dict("os.environ", {"SUNO_API_KEY": "test-key"}):
-            with patch("app.api.websocket.SunoClient") as mock_client_class:
-                mock_client = AsyncMock()
-                mock_client_class.return_value.__aenter__.return_value = mock_client
-                mock_client_class.return_value.__aexit__.return_value = None
-                
-                mock_client.get_task_status.return_value = SunoStatus(
-                    status="GENERATING",
-                    progress=50,
-                    song_url=None,
-                    error=None
-                )
+    async def test_broadcasts_processing_status(self):
+        """Test that an in-progress result is broadcast to subscribers."""
+        suno_status = SunoStatus(status="GENERATING", progress=50)
+        
+        with patch("app.api.websocket.manager") as mock_manager:
+            mock_manager.has_active_connections.return_value = True
+            
+            with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
+                await handle_poll_result(TEST_TASK_ID, suno_status)
                 
-                with patch("app.api.websocket.manager") as mock_manager:
-                    # No active connections
-                    mock_manager.has_active_connections.return_value = False
-                    mock_manager.polling_tasks = {}
-                    
-                    with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
-                        await poll_and_broadcast(TEST_TASK_ID)
-                        
-                        # Should not broadcast since no connections
-                        mock_broadcast.assert_not_called()
+                call_args = mock_broadcast.call_args[0]
+                assert call_args[0] == TEST_TASK_ID
+                assert call_args[1]["status"] == GenerationStatus.PROCESSING.value
+                assert call_args[1]["progress"] == 50
 
     @pytest.mark.asyncio
-    async def test_poll_handles_missing_api_key(self):
-        """Test that polling handles missing API key gracefully."""
-        with patch.dict("os.environ", {"SUNO_API_KEY": ""}, clear=False):
+    async def test_broadcasts_failed_status(self):
+        """Test that a failed result is broadcast with its error."""
+        suno_status = SunoStatus(status="FAILED", progress=0, error="Generation failed")
+        
+        with patch("app.api.websocket.manager") as mock_manager:
+            mock_manager.has_active_connections.return_value = True
+            
             with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
-                await poll_and_broadcast(TEST_TASK_ID)
+                await handle_poll_result(TEST_TASK_ID, suno_status)
                 
-                # Should broadcast error
-                mock_broadcast.assert_called_once()
                 call_args = mock_broadcast.call_args[0]
                 assert call_args[1]["status"] == GenerationStatus.FAILED.value
-                assert "configuration error" in call_args[1]["error"]
+                assert call_args[1]["error"] == "Generation failed"
 
     @pytest.mark.asyncio
-    async def test_poll_continues_on_transient_errors(self):
-        """Test that polling continues on transient API errors."""
-        with patch.dict("os.environ", {"SUNO_API_KEY": "test-key"}):
-            with patch("app.api.websocket.SunoClient") as mock_client_class:
-                mock_client = AsyncMock()
-                mock_client_class.return_value.__aenter__.return_value = mock_client
-                mock_client_class.return_value.__aexit__.return_value = None
+    async def test_skips_broadcast_without_connections(self):
+        """Test that nothing is broadcast when no clients are connected."""
+        suno_status = SunoStatus(status="GENERATING", progress=50)
+        
+        with patch("app.api.websocket.manager") as mock_manager:
+            mock_manager.has_active_connections.return_value = False
+            
+            with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
+                await handle_poll_result(TEST_TASK_ID, suno_status)
                 
-                # First call raises error, second returns completed
-                mock_client.get_task_status.side_effect = [
-                    SunoAPIError("Transient error", status_code=500),
-                    SunoStatus(
-                        status="SUCCESS",
-                        progress=100,
-                        song_url="https://example.com/song.mp3",
-                        error=None
+                mock_broadcast.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_completed_fetches_timestamped_lyrics(self):
+        """Test that completion stores timestamped lyrics via the shared client."""
+        suno_status = SunoStatus(
+            status="SUCCESS",
+            progress=100,
+            song_url="https://example.com/song.mp3",
+            variations=[
+                SongVariation(
+                    audio_url="https://example.com/song.mp3",
+                    audio_id="audio-1",
+                    variation_index=0,
+                )
+            ],
+            audio_id="audio-1",
+        )
+        timestamped = TimestampedLyrics(
+            aligned_words=[AlignedWord(word="Hello", start_s=0.0, end_s=0.5, success=True, palign=0)],
+            waveform_data=[0.1, 0.2],
+            hoot_cer=0.1,
+            is_streamed=False,
+        )
+        
+        with patch("app.api.websocket.manager") as mock_manager:
+            mock_manager.has_active_connections.return_value = True
+            
+            with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast:
+                with patch("app.api.websocket.get_suno_client") as mock_get_client:
+                    mock_get_client.return_value.get_timestamped_lyrics = AsyncMock(
+                        return_value=timestamped
                     )
-                ]
-                
-                with patch("app.api.websocket.manager") as mock_manager:
-                    mock_manager.has_active_connections.return_value = True
-                    mock_manager.polling_tasks = {}
-                    
-                    with patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock):
-                        with patch("app.api.websocket.update_task_status", new_callable=AsyncMock):
-                            with patch("asyncio.sleep", new_callable=AsyncMock):
-                                await poll_and_broadcast(TEST_TASK_ID)
-                                
-                                # Should have called get_task_status twice
-                                assert mock_client.get_task_status.call_count == 2
+                    with patch("app.api.websocket.store_timestamped_lyrics", new_callable=AsyncMock) as mock_store:
+                        await handle_completion(TEST_TASK_ID, suno_status)
+                        
+                        assert mock_broadcast.call_args[0][1]["status"] == GenerationStatus.COMPLETED.value
+                        mock_store.assert_awaited_once()
+                        assert mock_store.call_args.kwargs["aligned_words"][0]["word"] == "Hello"
+
+
+class TestCompletionTimestamps:
+    """Tests for fetching timestamped lyrics of every variation at completion."""
+
+    COMPLETED = SunoStatus(
+        status="SUCCESS",
+        progress=100,
+        song_url="https://example.com/0.mp3",
+        variations=[
+            SongVariation(audio_url="https://example.com/0.mp3", audio_id="audio-0", variation_index=0),
+            SongVariation(audio_url="https://example.com/1.mp3", audio_id="audio-1", variation_index=1),
+        ],
+        audio_id="audio-0",
+    )
+
+    @staticmethod
+    def _lyrics(word: str) -> TimestampedLyrics:
+        return TimestampedLyrics(
+            aligned_words=[AlignedWord(word=word, start_s=0.0, end_s=0.5, success=True, palign=0)],
+            waveform_data=[0.1],
+            hoot_cer=0.1,
+            is_streamed=False,
+        )
+
+    @pytest.mark.asyncio
+    async def test_fetches_all_variations_concurrently(self):
+        """Test that both variations are fetched at once, stored and announced."""
+        in_flight = []
+        peak = []
+        
+        async def fetch(task_id, audio_id):
+            in_flight.append(audio_id)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(audio_id)
+            return self._lyrics(audio_id)
+        
+        with patch("app.api.websocket.manager") as mock_manager, \
+             patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast, \
+             patch("app.api.websocket.get_suno_client") as mock_get_client, \
+             patch("app.api.websocket.store_timestamped_lyrics", new_callable=AsyncMock) as mock_store:
+            mock_manager.has_active_connections.return_value = True
+            mock_get_client.return_value.get_timestamped_lyrics = AsyncMock(side_effect=fetch)
+            mock_store.return_value = True
+            
+            await handle_completion(TEST_TASK_ID, self.COMPLETED)
+        
+        assert max(peak) == 2
+        stored = {call.kwargs["variation_index"]: call.kwargs["aligned_words"][0]["word"]
+                  for call in mock_store.call_args_list}
+        assert stored == {0: "audio-0", 1: "audio-1"}
+        
+        # The completion update, then the follow-up once timestamps are stored
+        assert mock_broadcast.await_count == 2
+        first, follow_up = (call.args[1] for call in mock_broadcast.call_args_list)
+        assert "timestamp_variations" not in first
+        assert follow_up["status"] == GenerationStatus.COMPLETED.value
+        assert follow_up["timestamp_variations"] == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_timeout_keeps_finished_variations(self):
+        """Test that a slow variation is dropped without losing the other."""
+        async def fetch(task_id, audio_id):
+            if audio_id == "audio-1":
+                await asyncio.sleep(10)
+            return self._lyrics(audio_id)
+        
+        with patch("app.api.websocket.manager") as mock_manager, \
+             patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast, \
+             patch("app.api.websocket.get_suno_client") as mock_get_client, \
+             patch("app.api.websocket.store_timestamped_lyrics", new_callable=AsyncMock) as mock_store, \
+             patch("app.api.websocket.TIMESTAMPS_FETCH_TIMEOUT", 0.05):
+            mock_manager.has_active_connections.return_value = True
+            mock_get_client.return_value.get_timestamped_lyrics = AsyncMock(side_effect=fetch)
+            mock_store.return_value = True
+            
+            await handle_completion(TEST_TASK_ID, self.COMPLETED)
+        
+        mock_store.assert_awaited_once()
+        assert mock_broadcast.call_args.args[1]["timestamp_variations"] == [0]
+
+    @pytest.mark.asyncio
+    async def test_no_follow_up_when_nothing_stored(self):
+        """Test that failed fetches send no follow-up update."""
+        with patch("app.api.websocket.manager") as mock_manager, \
+             patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast, \
+             patch("app.api.websocket.get_suno_client") as mock_get_client, \
+             patch("app.api.websocket.store_timestamped_lyrics", new_callable=AsyncMock) as mock_store:
+            mock_manager.has_active_connections.return_value = True
+            mock_get_client.return_value.get_timestamped_lyrics = AsyncMock(side_effect=Exception("down"))
+            
+            await handle_completion(TEST_TASK_ID, self.COMPLETED)
+        
+        mock_store.assert_not_called()
+        mock_broadcast.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_store_is_not_reported_as_stored(self, caplog):
+        """Test that a failed write is logged as a failure and not announced."""
+        with patch("app.api.websocket.manager") as mock_manager, \
+             patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast, \
+             patch("app.api.websocket.get_suno_client") as mock_get_client, \
+             patch("app.api.websocket.store_timestamped_lyrics", new_callable=AsyncMock) as mock_store:
+            mock_manager.has_active_connections.return_value = True
+            mock_get_client.return_value.get_timestamped_lyrics = AsyncMock(
+                side_effect=lambda task_id, audio_id: self._lyrics(audio_id)
+            )
+            mock_store.return_value = False
+            
+            with caplog.at_level("INFO", logger="app.api.websocket"):
+                await handle_completion(TEST_TASK_ID, self.COMPLETED)
+        
+        assert mock_store.await_count == 2
+        mock_broadcast.assert_awaited_once()
+        messages = [record.getMessage() for record in caplog.records]
+        assert messages.count(f"Failed to store timestamped lyrics for task: {TEST_TASK_ID}") == 2
+        assert f"Timestamped lyrics stored for task: {TEST_TASK_ID}" not in messages
+
+    @pytest.mark.asyncio
+    async def test_listener_does_not_wait_for_alignment(self):
+        """Test that the completion update returns before timestamps are fetched."""
+        alignment = asyncio.Event()
+        
+        async def fetch(task_id, audio_id):
+            await alignment.wait()
+            return self._lyrics(audio_id)
+        
+        with patch("app.api.websocket.manager") as mock_manager, \
+             patch("app.api.websocket.broadcast_status_update", new_callable=AsyncMock) as mock_broadcast, \
+             patch("app.api.websocket.get_suno_client") as mock_get_client, \
+             patch("app.api.websocket.store_timestamped_lyrics", new_callable=AsyncMock) as mock_store:
+            mock_manager.has_active_connections.return_value = True
+            mock_get_client.return_value.get_timestamped_lyrics = AsyncMock(side_effect=fetch)
+            mock_store.return_value = True
+            
+            await asyncio.wait_for(handle_poll_result(TEST_TASK_ID, self.COMPLETED), timeout=1)
+            # A repeated completion does not start a second fetch
+            await handle_poll_result(TEST_TASK_ID, self.COMPLETED)
+            
+            mock_store.assert_not_called()
+            fetch_task = _timestamp_fetches[TEST_TASK_ID]
+            alignment.set()
+            await fetch_task
+        
+        assert mock_store.await_count == 2
+        assert mock_broadcast.call_args.args[1]["timestamp_variations"] == [0, 1]
+        assert TEST_TASK_ID not in _timestamp_fetches
 
 
 class TestWebSocketAuthentication:
@@ -463,7 +591,6 @@ class TestSocketIOEvents:
         
         with patch("app.api.websocket.manager") as mock_manager:
             mock_manager.get_user_for_session.return_value = TEST_USER_ID
-            mock_manager.get_polling_task.return_value = None
             mock_manager.has_active_connections.return_value = True
             
             with patch("app.api.websocket.verify_task_ownership", new_callable=AsyncMock) as mock_verify:
@@ -479,9 +606,12 @@ class TestSocketIOEvents:
                     
                     with patch.object(sio, "emit", new_callable=AsyncMock) as mock_emit:
                         with patch.object(sio, "enter_room", new_callable=AsyncMock):
-                            with patch("asyncio.create_task") as mock_create_task:
+                            with patch("app.api.websocket.start_polling", new_callable=AsyncMock) as mock_start_polling:
                                 await subscribe(TEST_SID, {"task_id": TEST_TASK_ID})
                                 
+                                # Should start shared polling for non-terminal task
+                                mock_start_polling.assert_awaited_once_with(TEST_TASK_ID)
+                                
                                 # Should add connection
                                 mock_manager.add_connection.assert_called_once_with(
                                     TEST_TASK_ID, TEST_SID, TEST_USER_ID